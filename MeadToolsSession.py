@@ -0,0 +1,164 @@
+from __future__ import annotations
+import random
+import threading
+from time import sleep
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# (connect, read) seconds - a hung endpoint must never be able to block a caller forever
+DEFAULT_TIMEOUT = (5, 30)
+# methods that are safe to resend when we don't know if the server got the first attempt
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+def failed_before_send(error: requests.RequestException) -> bool:
+    """Whether a request failed while connecting, so the server can't have seen it. A reset or aborted connection
+    (e.g. a stale pooled keep-alive connection) may have failed after the request went out
+
+    Args:
+        error (requests.RequestException): error from the request
+
+    Returns:
+        bool: True if the request never reached the server
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    # refused, unreachable, dns - urllib3 wraps them in a MaxRetryError with the cause as its reason
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+class MeadToolsSession(object):
+    def __init__(
+        self,
+        pill_holder,
+        headers_func=None,
+        refresh_func=None,
+        timeout: tuple = DEFAULT_TIMEOUT,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30,
+        pool_size: int = 8,
+    ):
+        """Shared http session for talking to MeadTools. Connections are kept alive and pooled so we only pay for the
+        TCP + TLS handshake once, every request gets a timeout, 5xx/connection errors are retried with exponential
+        backoff + jitter and a 401 refreshes the login and replays the request once. Requests that aren't idempotent
+        (POST, PATCH) are only retried if they never reached the server - the caller (e.g. the outbox) owns retrying
+        anything else.
+
+        Args:
+            pill_holder (PillHolder): holder used for logging
+            headers_func (callable): returns the auth headers to use for `authorized` requests
+            refresh_func (callable): refreshes the login, returns True if it worked
+            timeout (tuple): default (connect, read) timeout in seconds
+            retries (int): how many times to retry after the first attempt
+            backoff (float): base delay in seconds, doubled every retry
+            max_backoff (float): cap on the delay between retries
+            pool_size (int): max connections kept open per host
+        """
+        self.pill_holder = pill_holder
+        self.headers_func = headers_func
+        self.refresh_func = refresh_func
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.__refresh_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def log_event(self, message, severity="info"):
+        self.pill_holder.log_event(message, severity)
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Full jitter exponential backoff so several retrying threads don't hammer the server in lock step
+
+        Args:
+            attempt (int): 0 based retry number
+
+        Returns:
+            float: seconds to sleep
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2**attempt)))
+
+    def send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request, retrying 5xx responses and connection errors. Methods not in IDEMPOTENT_METHODS are only
+        retried when connecting failed, never on a 5xx or an error after the request may have been sent
+
+        Args:
+            method (str): http method
+            url (str): url to send to
+
+        Raises:
+            requests.RequestException: the last error if every attempt failed to get a response
+
+        Returns:
+            requests.Response: the response from the last attempt
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        method = method.upper()
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, **kwargs)
+                if response.status_code < 500 or method not in IDEMPOTENT_METHODS or attempt >= self.retries:
+                    return response
+                reason = response.status_code
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # the server may have the request already (read timeout, connection dropped after sending), only
+                # resend if that is harmless
+                retryable = method in IDEMPOTENT_METHODS or failed_before_send(e)
+                if not retryable or attempt >= self.retries:
+                    raise
+                reason = e
+            delay = self.backoff_delay(attempt)
+            attempt += 1
+            self.log_event(f"{method} {url} failed ({reason}), retry {attempt}/{self.retries} in {delay:.1f}s", "warn")
+            sleep(delay)
+
+    def request(self, method: str, url: str, authorized: bool = False, **kwargs) -> requests.Response:
+        """Send a request, if `authorized` add the auth headers and refresh + replay once on a 401
+
+        Args:
+            method (str): http method
+            url (str): url to send to
+            authorized (bool): add the headers from `headers_func`
+
+        Returns:
+            requests.Response: response
+        """
+        if not authorized or self.headers_func is None:
+            return self.send(method, url, **kwargs)
+
+        headers = self.headers_func()
+        response = self.send(method, url, headers=headers, **kwargs)
+        if response.status_code != 401 or self.refresh_func is None:
+            return response
+
+        with self.__refresh_lock:
+            # another thread may have refreshed while we were waiting on the lock
+            if self.headers_func() == headers:
+                self.log_event(f"Got 401 from {url}, refreshing login...")
+                if not self.refresh_func():
+                    return response
+        return self.send(method, url, headers=self.headers_func(), **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,162 @@
+from __future__ import annotations
+import json
+from collections import namedtuple
+from pathlib import Path
+from time import monotonic, time
+
+from PillScanner import PillScanner
+
+# One advert of a capture file. timestamp is seconds into the capture with the runs in it put back to back,
+# manufacturer_data maps manufacturer id -> payload bytes like bleak's AdvertisementData
+CapturedAdvert = namedtuple("CapturedAdvert", "timestamp, address, manufacturer_data, rssi")
+# what device_found reads from bleak's BLEDevice/AdvertisementData, so a replay doesn't depend on bleak's constructors
+ReplayDevice = namedtuple("ReplayDevice", "address, name")
+ReplayAdvertisement = namedtuple("ReplayAdvertisement", "manufacturer_data, rssi")
+# adverts handed over between yields to the loop when replaying as fast as possible
+REPLAY_BATCH = 256
+# the capture file is flushed every this many adverts or seconds, whichever comes first
+FLUSH_ADVERTS = 256
+FLUSH_SECONDS = 5
+
+
+class CaptureWriter(object):
+    def __init__(self, path: Path):
+        """Writes every advertisement the scanner sees to a JSON lines file. Each run (from the first advert till close)
+        starts with a header line, {"run": wall clock time it started}, then one advert a line:
+        {"t": seconds since the run started, "mac": address, "rssi": rssi, "data": {manufacturer id: payload as hex}}
+        Times are relative to the run because monotonic() starts again every boot, so a file appended to across
+        restarts still replays in order.
+
+        Args:
+            path (Path): capture file, appended to if it exists
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # opened on the first advert, so a scanner started again after stop carries on appending with a new run
+        self.__file = None
+        self.started = None
+        self.unflushed = 0
+        self.flushed_at = None
+        self.written = 0
+
+    def write(self, device, advertisement_data, timestamp: float = None):
+        """Append an advert. Called on the ble callback, so it only formats a line into the file's buffer
+
+        Args:
+            device (BLEDevice): bluetooth device that was found
+            advertisement_data (AdvertisementData): advertisment data from the found bluetooth device
+            timestamp (float): seconds since the run started the advert arrived at, now if not given
+        """
+        now = monotonic()
+        if self.__file is None:
+            self.__file = self.path.open("a", encoding="utf-8")
+            self.__file.write(json.dumps({"run": round(time(), 3)}) + "\n")
+            self.started = self.flushed_at = now
+        line = {
+            "t": round(now - self.started if timestamp is None else timestamp, 6),
+            "mac": device.address,
+            "rssi": advertisement_data.rssi,
+            "data": {str(k): v.hex() for k, v in advertisement_data.manufacturer_data.items()},
+        }
+        self.__file.write(json.dumps(line, separators=(",", ":")) + "\n")
+        self.written += 1
+        self.unflushed += 1
+        if self.unflushed >= FLUSH_ADVERTS or now - self.flushed_at >= FLUSH_SECONDS:
+            # so a crash only loses the last few seconds
+            self.__file.flush()
+            self.unflushed = 0
+            self.flushed_at = now
+
+    def close(self):
+        """Flush and close the file, the next advert starts a new run"""
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+
+def read_capture(path: Path):
+    """Adverts from a capture file, in the order they were written. Each run picks up where the last one ended, so the
+    time between runs (the pi being off) isn't replayed
+
+    Args:
+        path (Path): capture file written by CaptureWriter
+
+    Yields:
+        CapturedAdvert: each advert
+    """
+    # seconds into the capture the current run starts at, and the time its adverts are relative to
+    base, origin, last = 0.0, None, 0.0
+    with Path(path).open(encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            advert = json.loads(line)
+            if "run" in advert:
+                base, origin = last, 0.0
+                continue
+            if origin is None:
+                # a capture from before runs had headers, its times are monotonic()
+                origin = advert["t"]
+            last = base + advert["t"] - origin
+            yield CapturedAdvert(
+                last,
+                advert["mac"],
+                {int(k): bytes.fromhex(v) for k, v in advert["data"].items()},
+                advert.get("rssi"),
+            )
+
+
+class ReplayScanner(PillScanner):
+    def __init__(self, pill_holder, path: Path, speed: float = 1.0, **kwargs):
+        """Stands in for the shared scanner without any bluetooth: feeds the adverts of a capture file to the same
+        device_found callback, so pills, dedup and the readings workers run exactly as they do on a pi.
+
+        Args:
+            pill_holder (PillHolder): holder used for logging
+            path (Path): capture file written by CaptureWriter
+            speed (float): 1 replays at the pace it was captured, 10 ten times as fast, 0 as fast as possible
+            **kwargs: passed on to PillScanner
+        """
+        super().__init__(pill_holder, **kwargs)
+        self.path = Path(path)
+        self.speed = float(speed)
+        self.replayed = 0
+        # seconds adverts were handed over after the time they were due at (the pace can't be kept up)
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def log_stats(self):
+        super().log_stats()
+        self.log_event(
+            f"Replay of {self.path.name} at {self.speed or 'max'}x - Replayed: {self.replayed} "
+            f"Lag: {self.last_lag:.3f}s (max {self.max_lag:.3f}s)"
+        )
+
+    async def scan(self):
+        """Hand the capture's adverts to device_found at its pace (scaled by speed), till the capture ends or stop is
+        called"""
+        self.log_event(f"Replaying BLE capture {self.path} at {self.speed or 'max'}x...")
+        devices = {}
+        first = None
+        for advert in read_capture(self.path):
+            if first is None:
+                first = advert.timestamp
+            if self.speed > 0:
+                due = self.started + (advert.timestamp - first) / self.speed
+                wait = due - monotonic()
+                if wait > 0:
+                    if await self.rest(wait):
+                        return
+                else:
+                    self.last_lag = -wait
+                    self.max_lag = max(self.max_lag, self.last_lag)
+            elif self.replayed % REPLAY_BATCH == 0:
+                # let stop (and anything else on the loop) in
+                if await self.rest(0):
+                    return
+            device = devices.get(advert.address)
+            if device is None:
+                device = devices[advert.address] = ReplayDevice(advert.address, None)
+            self.replayed += 1
+            self.device_found(device, ReplayAdvertisement(advert.manufacturer_data, advert.rssi))
+        self.log_event(f"Replay of {self.path.name} finished after {self.replayed} adverts")
@@ -0,0 +1,85 @@
+from __future__ import annotations
+from collections import namedtuple
+from datetime import datetime, timezone
+from struct import Struct
+
+# RAPT Pill advertisement layouts, taken from rapt_ble on github
+# (https://github.com/sairon/rapt-ble/blob/main/src/rapt_ble/parser.py#L14). Every advert is 23 bytes: "PT", the
+# version, then the metrics. Compiled once and read in place with unpack_from, so decoding never slices the payload
+RAPT_ADVERT_LENGTH = 23
+RAPT_HEADER = Struct(">2sB")
+# version, mac, temperature, gravity, x, y, z, battery - starts at the version byte
+RAPT_METRICS_V1 = Struct(">B6sHfhhhh")
+RAPT_METRICS_V1_OFFSET = 2
+# hasGravityVel, gravityVel, temperature, gravity, x, y, z, battery
+RAPT_METRICS_V2 = Struct(">BfHfhhhH")
+RAPT_METRICS_V2_OFFSET = 4
+# advert the pill sends with its name rather than metrics
+RAPT_NAME_ADVERT = b"PTdPillG1"
+
+# A decoded advertisement, in units: gravity as SG, temperature in kelvin, x/y/z in g, battery in %.
+# gravity_velocity is None for V1 pills (and V2 ones that don't send it)
+RaptMetrics = namedtuple("RaptMetrics", "version, gravity, temperature, gravity_velocity, x, y, z, battery")
+
+
+def decode(data) -> RaptMetrics:
+    """Decode the manufacturer data of a RAPT Pill advertisement. Pure - no state, no clock
+
+    Args:
+        data (bytes): advertisement data, anything with the buffer protocol (bytes, bytearray, memoryview)
+
+    Raises:
+        ValueError: data isn't a 23 byte RAPT advert
+
+    Returns:
+        RaptMetrics: decoded values
+    """
+    if len(data) != RAPT_ADVERT_LENGTH:
+        raise ValueError("advertisment data must have length 23")
+    prefix, version = RAPT_HEADER.unpack_from(data)
+    if prefix != b"PT":
+        raise ValueError("Unexpected prefix")
+
+    if version == 1:
+        _, _, temperature, gravity, x, y, z, battery = RAPT_METRICS_V1.unpack_from(data, RAPT_METRICS_V1_OFFSET)
+        gravity_velocity = None
+    else:
+        has_velocity, velocity, temperature, gravity, x, y, z, battery = RAPT_METRICS_V2.unpack_from(
+            data, RAPT_METRICS_V2_OFFSET
+        )
+        gravity_velocity = velocity if has_velocity else None
+    return RaptMetrics(version, gravity / 1000, temperature / 128, gravity_velocity, x / 16, y / 16, z / 16, battery / 256)
+
+
+def encode(metrics: RaptMetrics, mac: bytes = bytes(6)) -> bytes:
+    """The advert a pill would send for these values, the inverse of decode (used by PillSimulator)
+
+    Args:
+        metrics (RaptMetrics): values in the units decode returns
+        mac (bytes): 6 byte mac address V1 pills put in their adverts
+
+    Returns:
+        bytes: 23 byte advertisement data
+    """
+    temperature = round(metrics.temperature * 128)
+    x, y, z = (round(v * 16) for v in (metrics.x, metrics.y, metrics.z))
+    battery = round(metrics.battery * 256)
+    if metrics.version == 1:
+        return b"PT" + RAPT_METRICS_V1.pack(1, mac, temperature, metrics.gravity * 1000, x, y, z, battery)
+    velocity = metrics.gravity_velocity
+    return b"PT" + bytes((metrics.version, 0)) + RAPT_METRICS_V2.pack(
+        velocity is not None, velocity or 0.0, temperature, metrics.gravity * 1000, x, y, z, battery
+    )
+
+
+def format_timestamp(timestamp: float) -> str:
+    """Format a time.time() timestamp the way events are shown and logged. Kept apart from decode so it only runs for
+    adverts that are actually shown, not the ones throttled away
+
+    Args:
+        timestamp (float): seconds since the epoch
+
+    Returns:
+        str: UTC time, e.g. 2025-03-01T12:00:00Z
+    """
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
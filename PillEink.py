@@ -0,0 +1,291 @@
+from __future__ import annotations
+import inspect
+from pathlib import Path
+from time import monotonic
+
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+
+from waveshare.waveshare_epd import epdbuffer, epdconfig, epdregistry
+
+# values drawn on the e-ink hud -> reading field. Each is shown rounded to HUD_ROUNDING places and only counts as
+# changed once it has moved at least HUD_DEADBANDS from what is on screen, both can be overridden from the "Eink" config
+HUD_FIELDS = {"SG": "curr_gravity", "ABV": "abv", "Temp": "temperature"}
+HUD_ROUNDING = {"SG": 4, "ABV": 2, "Temp": 1}
+HUD_DEADBANDS = {"SG": 0.001, "ABV": 0.1, "Temp": 0.5}
+# float slack when comparing a move with its deadband, so 5.3 - 5.2 (0.0999...) counts as a move of 0.1
+DEADBAND_TOLERANCE = 1e-9
+# hud layout for the landscape frame, (x, y, text). Labels never change so they are drawn once into the background,
+# values are format strings filled from hud_state (+ Event) each frame
+HUD_LABELS = ((10, 5, "Brew: "), (10, 60, "SG: "), (10, 90, "ABV: "), (160, 90, "Temp: "), (10, 115, "Last Event: "))
+HUD_VALUES = (
+    (10, 30, "{Brew}"),
+    (55, 60, "{SG}:"),
+    (73, 90, "{ABV}"),
+    (218, 90, "{Temp}°{Unit}"),
+    (10, 140, "{Event}"),
+)
+# glyphs rasterised up front, anything else (brew names, events) is added to the atlas the first time it is drawn
+HUD_GLYPHS = "0123456789.-:°CF None"
+
+
+class HudRenderer(object):
+    def __init__(self, size: tuple, font, white, black, rotate: bool = False):
+        """Draws the hud from a pre-rendered background and cached glyph masks for the values, so FreeType only runs
+        the first time a character is seen rather than for every piece of text every frame.
+
+        With rotate the frame is kept in the panel's portrait orientation and the (landscape) layout is turned as it
+        is drawn - the background once, each value's small mask as it is blitted - so getbuffer never has to turn a
+        whole frame.
+
+        Args:
+            size (tuple): (width, height) of the hud layout
+            font (FreeTypeFont): hud font, must be monospaced - glyphs are placed a fixed advance apart
+            white: background colour
+            black: text colour
+            rotate (bool): draw the layout turned 90 degrees, the way the drivers turn a landscape image
+        """
+        self.font = font
+        self.size = size
+        self.rotate = rotate
+        self.ink = Image.new("RGB", (1, 1), black).getpixel((0, 0))
+        self.advance = int(font.getlength("0"))
+        ascent, descent = font.getmetrics()
+        # glyphs can poke out of their advance/line box a little, keep a margin so they aren't clipped
+        self.pad = 4
+        self.glyph_size = (self.advance + 2 * self.pad, ascent + descent + 2 * self.pad)
+        self.atlas = {}
+        for ch in HUD_GLYPHS:
+            self.glyph(ch)
+
+        background = Image.new("RGB", size, white)
+        draw = ImageDraw.Draw(background)
+        for x, y, text in HUD_LABELS:
+            draw.text((x, y), text, font=self.font, fill=black)
+        self.background = background.transpose(Image.Transpose.ROTATE_90) if rotate else background
+        # frame handed out by render, values are drawn over it in place
+        self.frame = self.background.copy()
+        # frame boxes drawn over by the last render, put back from the background before the next
+        self.drawn = []
+
+    def glyph(self, ch: str) -> Image.Image:
+        """Coverage mask for a character, rendered on first use
+
+        Args:
+            ch (str): character
+
+        Returns:
+            Image: "L" mask with the glyph drawn at (pad, pad)
+        """
+        mask = self.atlas.get(ch)
+        if mask is None:
+            mask = Image.new("L", self.glyph_size, 0)
+            ImageDraw.Draw(mask).text((self.pad, self.pad), ch, font=self.font, fill=255)
+            self.atlas[ch] = mask
+        return mask
+
+    def text_mask(self, text: str) -> Image.Image:
+        """Coverage mask for a line of text built from atlas glyphs. Overlapping glyph edges are combined with max,
+        the same as FreeType does when it renders a whole string, so it matches ImageDraw.text
+
+        Args:
+            text (str): text to draw
+
+        Returns:
+            Image: "L" mask with the text starting at (pad, pad)
+        """
+        mask = Image.new("L", (len(text) * self.advance + 2 * self.pad, self.glyph_size[1]), 0)
+        for i, ch in enumerate(text):
+            glyph = self.glyph(ch)
+            box = (i * self.advance, 0, i * self.advance + glyph.width, glyph.height)
+            mask.paste(ImageChops.lighter(mask.crop(box), glyph), box)
+        return mask
+
+    def render(self, values: dict) -> Image.Image:
+        """Draw a hud frame. The frame is reused, it is only valid until the next render
+
+        Args:
+            values (dict): hud_state plus "Event"
+
+        Returns:
+            Image: frame, ready for getbuffer
+        """
+        for box in self.drawn:
+            self.frame.paste(self.background.crop(box), box)
+        self.drawn = []
+        for x, y, fmt in HUD_VALUES:
+            mask = self.text_mask(fmt.format(**values))
+            x, y = x - self.pad, y - self.pad
+            if self.rotate:
+                # landscape (x, y) lands on (y, width - x) once turned, and the mask's right edge becomes its top
+                mask = mask.transpose(Image.Transpose.ROTATE_90)
+                x, y = y, self.size[0] - x - mask.height
+            box = (x, y, x + mask.width, y + mask.height)
+            self.frame.paste(self.ink, box, mask)
+            self.drawn.append(box)
+        return self.frame
+
+
+class EinkScreen(object):
+    def __init__(self, pill_holder):
+        self.pill_holder = pill_holder
+        config = pill_holder.data.get("Eink", {})
+        self.rounding = {**HUD_ROUNDING, **config.get("Rounding", {})}
+        self.deadbands = {**HUD_DEADBANDS, **config.get("Deadbands", {})}
+        # a full refresh takes seconds and wears the panel, never do them closer together than this
+        self.min_refresh_interval = float(config.get("MinRefreshInterval", 180))
+        # partial updates leave ghosting behind, a full refresh every so often clears it
+        self.full_refresh_every = int(config.get("FullRefreshEvery", 10))
+
+        # state (see hud_state) of the frame on the panel now
+        self.shown = None
+        self.last_refresh = None
+        self.rendered = 0
+        self.skipped_unchanged = 0
+        self.skipped_too_soon = 0
+        self.full_refreshes = 0
+        self.partial_refreshes = 0
+        # packed frame on the panel and partial updates done since the last full refresh
+        self.last_buffer = None
+        self.partials = 0
+
+        # only the configured panel's driver is imported, and only when the screen is enabled
+        self.panel = epdregistry.get_panel(config.get("size", "3inch"))
+        if config.get("Backend"):
+            epdconfig.select_backend(config["Backend"])
+        self.log_event(
+            f"Setup Eink Screen! {self.panel.module}: {self.panel.width}x{self.panel.height}, "
+            f"{self.panel.colors} colours, ~{self.panel.refresh_secs}s full refresh"
+        )
+        self.epd = epdregistry.load_driver(self.panel).EPD()
+        self.partial = self.panel.partial if config.get("Partial", True) else None
+        # mono drivers don't define colours, frames are drawn in rgb and getbuffer converts to what the panel takes
+        self.white = getattr(self.epd, "WHITE", 0xFFFFFF)
+        self.black = getattr(self.epd, "BLACK", 0x000000)
+        # colour panels dither frames down to their palette by default. The hud is drawn in flat panel colours so
+        # there is nothing to dither, turning it off maps each pixel straight to its nearest colour and is quicker
+        self.buffer_args = {}
+        if not config.get("Dither", True):
+            if "dither" in inspect.signature(self.epd.getbuffer).parameters:
+                self.buffer_args["dither"] = False
+            else:
+                self.log_event(f"{self.panel.module} has no dithering to turn off, ignoring Dither", "warn")
+        self.epd.init(*epdregistry.init_args(self.panel, self.epd))
+        self.epd.Clear()
+        self.font_path = Path(__file__).parent.joinpath("waveshare/fonts/FiraCode-Bold.ttf").as_posix()
+        print(f"FontPath:{self.font_path}")
+        self.font = ImageFont.truetype(self.font_path, 20)
+        # the hud is laid out landscape (400w x 168h pixels on the waveshare 3" 4 colour screen). Portrait panels get
+        # it drawn turned so frames are already in panel orientation
+        rotate = self.epd.width < self.epd.height
+        size = (self.epd.height, self.epd.width) if rotate else (self.epd.width, self.epd.height)
+        self.hud = HudRenderer(size, self.font, self.white, self.black, rotate)
+
+    def hud_state(self, pill) -> dict:
+        """Everything the hud would draw for a reading, with numbers rounded to what is shown. Last event isn't part of
+        it - it moves every reading, so on its own it isn't worth a refresh.
+
+        Args:
+            pill (PillReading): reading to show
+
+        Returns:
+            dict: hud value name -> value
+        """
+        state = {"Brew": pill.session_name, "Unit": pill.temp_unit}
+        for name, field in HUD_FIELDS.items():
+            value = getattr(pill, field)
+            state[name] = value if value is None else round(value, self.rounding[name])
+        return state
+
+    def has_changed(self, state: dict) -> bool:
+        """Whether a new state is visibly different from what is on the panel
+
+        Args:
+            state (dict): state from hud_state
+
+        Returns:
+            bool: True if a value moved by at least its deadband or any text changed
+        """
+        if self.shown is None:
+            return True
+        for name, value in state.items():
+            shown = self.shown.get(name)
+            deadband = self.deadbands.get(name)
+            if deadband is None or value is None or shown is None:
+                if value != shown:
+                    return True
+            elif abs(value - shown) > deadband - DEADBAND_TOLERANCE:
+                return True
+        return False
+
+    def update_hud(self, pill):
+        """Redraw the hud for a reading if something visible changed and the last refresh wasn't too recent.
+        Skipped readings are fine to drop, the next one is compared against what is on screen.
+
+        Args:
+            pill (PillReading): reading to show
+        """
+        state = self.hud_state(pill)
+        if not self.has_changed(state):
+            self.skipped_unchanged += 1
+            return
+        if self.last_refresh is not None and monotonic() - self.last_refresh < self.min_refresh_interval:
+            self.skipped_too_soon += 1
+            return
+
+        self.render_hud(state, pill.last_event)
+        self.shown = state
+        self.last_refresh = monotonic()
+        self.rendered += 1
+
+    def render_hud(self, state: dict, last_event: str):
+        self.show(self.epd.getbuffer(self.hud.render({**state, "Event": last_event}), **self.buffer_args))
+
+    def show(self, buf):
+        """Put a packed frame on the panel. Drivers with a partial update only send what changed, with a full refresh
+        first and then every `full_refresh_every` partials. Anything else gets a full refresh every time.
+
+        Args:
+            buf (bytes): frame from epd.getbuffer
+        """
+        if self.partial is None:
+            if self.panel.colors == 3:
+                # black/red panels take a second frame for red, keep it empty
+                self.epd.display(buf, [0xFF] * len(buf))
+            else:
+                self.epd.display(buf)
+            self.full_refreshes += 1
+            return
+
+        buf = bytes(buf)
+        if self.last_buffer is None or len(buf) != len(self.last_buffer) or self.partials >= self.full_refresh_every:
+            self.epd.init(*epdregistry.init_args(self.panel, self.epd))
+            getattr(self.epd, self.partial.base)(buf)
+            if self.partial.init_part:
+                getattr(self.epd, self.partial.init_part)()
+            self.partials = 0
+            self.full_refreshes += 1
+        else:
+            stride = (self.epd.width + 7) // 8
+            rect = epdbuffer.dirty_rect(self.last_buffer, buf, stride)
+            if rect is None:
+                return
+            partial = getattr(self.epd, self.partial.partial)
+            if self.partial.mode == "frame":
+                partial(buf)
+            elif self.partial.mode == "window":
+                partial(buf, *rect)
+            else:
+                partial(epdbuffer.crop_rect(buf, stride, rect), *rect)
+            self.partials += 1
+            self.partial_refreshes += 1
+        self.last_buffer = buf
+
+    def stats(self) -> str:
+        return (
+            f"eink: rendered {self.rendered}, skipped {self.skipped_unchanged} unchanged "
+            f"and {self.skipped_too_soon} within {self.min_refresh_interval:.0f}s of the last refresh, "
+            f"{self.full_refreshes} full / {self.partial_refreshes} partial refreshes"
+        )
+
+    def log_event(self, message, severity="info"):
+        self.pill_holder.log_event(message, severity)
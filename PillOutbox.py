@@ -0,0 +1,226 @@
+from __future__ import annotations
+import json
+import random
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from time import monotonic, time
+
+# 4xx answers that can change on a later try (login expired, timed out, rate limited) - MeadTools will never take a point
+# it answered any other 4xx for, so those are moved out of the way instead of retried
+RETRYABLE_CLIENT_ERRORS = (401, 408, 429)
+
+
+class PillOutbox(object):
+    def __init__(self, db_path: Path, max_points: int = 50000, max_age_days: float = 14):
+        """Append only, on disk queue of data points waiting to go to MeadTools. Points are written (and fsynced) before
+        we try to upload them and only deleted once MeadTools acknowledges them, so an outage or a crash doesn't lose
+        them. Delivery is at least once: a crash between MeadTools taking a point and the ack sends it again, so every
+        point keeps the key it was stored with for MeadTools to spot the repeat. Uses sqlite in WAL mode so a reader
+        never blocks the writer.
+
+        Args:
+            db_path (Path): sqlite file to store the outbox in
+            max_points (int): oldest points are dropped once we hold more than this
+            max_age_days (float): points older than this are dropped
+        """
+        self.db_path = db_path
+        self.max_points = int(max_points)
+        self.max_age = float(max_age_days) * 86400
+        self.dropped = 0
+        self.rejected = 0
+        self.__lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.__db = sqlite3.connect(self.db_path.as_posix(), check_same_thread=False)
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        # FULL so a point is on disk before put returns - the pi losing power is the common crash
+        self.__db.execute("PRAGMA synchronous=FULL")
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL NOT NULL, body TEXT NOT NULL)"
+        )
+        # outboxes from before points had keys - those points fall back to a key made from their id
+        if "key" not in [row[1] for row in self.__db.execute("PRAGMA table_info(outbox)")]:
+            self.__db.execute("ALTER TABLE outbox ADD COLUMN key TEXT")
+        # points MeadTools refused, kept (till they are max_age_days old) so they can be looked at
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS rejected (id INTEGER PRIMARY KEY, created REAL NOT NULL, rejected REAL NOT NULL, "
+            "status INTEGER, body TEXT NOT NULL)"
+        )
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return self.__db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def put(self, body: dict) -> int:
+        """Store a data point
+
+        Args:
+            body (dict): json body to post to MeadTools
+
+        Returns:
+            int: id of the stored point
+        """
+        with self.__lock:
+            with self.__db:
+                row_id = self.__db.execute(
+                    "INSERT INTO outbox (created, key, body) VALUES (?, ?, ?)",
+                    (time(), uuid.uuid4().hex, json.dumps(body)),
+                ).lastrowid
+                self.__prune()
+        return row_id
+
+    def __prune(self):
+        self.__db.execute("DELETE FROM rejected WHERE rejected < ?", (time() - self.max_age,))
+        dropped = self.__db.execute("DELETE FROM outbox WHERE created < ?", (time() - self.max_age,)).rowcount
+        dropped += self.__db.execute(
+            "DELETE FROM outbox WHERE id <= (SELECT id FROM outbox ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (self.max_points,),
+        ).rowcount
+        self.dropped += dropped
+
+    def peek(self) -> tuple:
+        """Get the oldest point without removing it
+
+        Returns:
+            tuple: (id, created, key, body) or None if the outbox is empty. key stays the same however many times the
+                point is tried
+        """
+        with self.__lock:
+            row = self.__db.execute("SELECT id, created, key, body FROM outbox ORDER BY id LIMIT 1").fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], row[2] or f"outbox-{row[0]}-{row[1]}", json.loads(row[3])
+
+    def ack(self, row_id: int):
+        """Remove a point once MeadTools has it
+
+        Args:
+            row_id (int): id from put/peek
+        """
+        with self.__lock:
+            with self.__db:
+                self.__db.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+
+    def reject(self, row_id: int, status: int):
+        """Move a point MeadTools won't ever accept out of the queue, so the points behind it can go
+
+        Args:
+            row_id (int): id from put/peek
+            status (int): http status MeadTools answered with
+        """
+        with self.__lock:
+            with self.__db:
+                self.__db.execute(
+                    "INSERT OR REPLACE INTO rejected (id, created, rejected, status, body) "
+                    "SELECT id, created, ?, ?, body FROM outbox WHERE id = ?",
+                    (time(), status, row_id),
+                )
+                self.__db.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+        self.rejected += 1
+
+    def close(self):
+        with self.__lock:
+            self.__db.close()
+
+
+class OutboxDrainer(object):
+    def __init__(self, outbox: PillOutbox, upload_func, pill_holder, backoff: float = 5, max_backoff: float = 300):
+        """Background thread that uploads outbox points in order, oldest first, backing off while MeadTools is down
+
+        Args:
+            outbox (PillOutbox): outbox to drain
+            upload_func (callable): takes a point body and its key (send it along so a repeat can be spotted), returns the http status MeadTools answered with (None if there
+                was no answer). 2xx acks the point, a 4xx other than RETRYABLE_CLIENT_ERRORS rejects it, anything else
+                is retried with backoff
+            pill_holder (PillHolder): holder used for logging
+            backoff (float): first delay in seconds after a failed upload, doubled every failure
+            max_backoff (float): cap on the delay between attempts
+        """
+        self.outbox = outbox
+        self.upload_func = upload_func
+        self.pill_holder = pill_holder
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.thread = None
+        self.running = False
+        self.uploaded = 0
+        self.rejected = 0
+        self.failures = 0
+        self.__wake = threading.Event()
+        # start is called from the login and the upload worker, two drain threads would post the same point twice
+        self.__lock = threading.Lock()
+
+    def start(self):
+        with self.__lock:
+            self.running = True
+            # a thread that is still winding down after stop carries on instead
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.drain, name="outbox-drainer", daemon=True)
+                self.thread.start()
+
+    def stop(self, timeout: float = None) -> bool:
+        """Stop draining, the point being uploaded (if any) is finished first
+
+        Args:
+            timeout (float): seconds to wait for the thread to finish, None to not wait
+
+        Returns:
+            bool: True if the thread has finished
+        """
+        with self.__lock:
+            self.running = False
+            thread = self.thread
+        self.__wake.set()
+        if thread is not None and timeout is not None:
+            thread.join(timeout)
+        return thread is None or not thread.is_alive()
+
+    def notify(self):
+        """Let the drainer know there is a new point"""
+        self.__wake.set()
+
+    def drain(self):
+        failures = 0
+        while True:
+            with self.__lock:
+                if not self.running:
+                    self.thread = None
+                    return
+            point = self.outbox.peek()
+            if point is None:
+                self.__wake.wait()
+                self.__wake.clear()
+                continue
+
+            row_id, created, key, body = point
+            try:
+                status = self.upload_func(body, key)
+            except Exception as e:
+                self.pill_holder.log_event(f"Outbox upload failed: {e}", "error")
+                status = None
+
+            if status is not None and 200 <= status < 300:
+                self.outbox.ack(row_id)
+                self.uploaded += 1
+                failures = 0
+                continue
+            if status is not None and 400 <= status < 500 and status not in RETRYABLE_CLIENT_ERRORS:
+                # a bad point would otherwise hold up every point behind it till it ages out
+                self.outbox.reject(row_id, status)
+                self.rejected += 1
+                self.pill_holder.log_event(
+                    f"MeadTools rejected data point {row_id} ({status}), moved it out of the outbox: {body}", "error"
+                )
+                continue
+
+            self.failures += 1
+            delay = random.uniform(0.5, 1) * min(self.max_backoff, self.backoff * (2**failures))
+            failures += 1
+            self.pill_holder.log_event(f"MeadTools unavailable, {len(self.outbox)} points waiting. Retry in {delay:.0f}s")
+            # new points wake us too, keep waiting till the backoff is over unless we are stopped
+            until = monotonic() + delay
+            while self.running and monotonic() < until:
+                self.__wake.wait(until - monotonic())
+                self.__wake.clear()
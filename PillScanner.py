@@ -0,0 +1,313 @@
+from __future__ import annotations
+import asyncio
+import threading
+from time import monotonic
+
+from bleak import BleakScanner
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+from bleak.exc import BleakError
+
+from PillDecoder import RAPT_NAME_ADVERT
+from PillSchedule import ScanSchedule
+
+try:
+    from bleak.assigned_numbers import AdvertisementDataType
+    from bleak.backends.bluezdbus.advertisement_monitor import OrPattern
+    from bleak.backends.bluezdbus.scanner import BlueZScannerArgs
+except ImportError:
+    # not on linux/bluez - passive scanning (where supported) just won't be filtered by the controller
+    OrPattern = None
+
+# RAPT manufacturer id ("RA" little endian) that the pills advertise under
+RAPT_MANUFACTURER_ID = 16722
+# seconds the old per-pill scanner rested between polls, used to compare capture rates against
+DUTY_CYCLE_REST = 10
+# seconds an identical payload from the same address counts as a repeat of the last advert
+DUPLICATE_WINDOW = 30
+# seconds between checks of the schedule while the radio is on, and the longest it is left off without a check
+RADIO_TICK = 0.25
+RADIO_RECHECK = 5
+# longest wait between restarts of a scanner that keeps failing
+MAX_RESTART_DELAY = 60
+# what bleak/bluez say when the backend can't scan passively (macOS, bluez without advertisement monitors) - anything
+# else is a passing failure (adapter reset, dbus hiccup) and passive scanning is kept
+PASSIVE_UNSUPPORTED = ("passive", "advertisementmonitor", "advertisement monitor", "org.bluez.error.notsupported")
+
+
+def passive_unsupported(error: Exception) -> bool:
+    """Whether a scanner error means passive scanning isn't available on this backend"""
+    message = str(error).lower()
+    return any(text in message for text in PASSIVE_UNSUPPORTED)
+
+
+class PillScanner(object):
+    def __init__(
+        self,
+        pill_holder,
+        passive: bool = True,
+        restart_delay: float = 5,
+        duplicate_window: float = DUPLICATE_WINDOW,
+        capture=None,
+        schedule: ScanSchedule = None,
+    ):
+        """One BleakScanner shared by every pill session. It runs the whole time and hands each advertisement to the
+        pill registered for that mac address, so there is only ever one scan on the adapter however many pills we track.
+        Subclasses change where the adverts come from by overriding scan (PillCapture.ReplayScanner,
+        PillSimulator.SimulatedScanner), or radio, clock and rest to run the real scan loop without bluetooth or
+        real time (benchmarks/bench_scan_schedule.py).
+
+        Args:
+            pill_holder (PillHolder): holder used for logging
+            passive (bool): scan passively where the backend allows it. On bluez this registers an advertisement
+                monitor for the RAPT manufacturer id so the controller drops everything else before it reaches python
+            restart_delay (float): seconds to wait before restarting the scanner if bluez drops it, doubled for each
+                failure in a row up to MAX_RESTART_DELAY
+            duplicate_window (float): a pill repeats the same payload many times an interval and bleak reports every
+                copy. Repeats inside this many seconds of the last one passed on are dropped before the pill sees them.
+                Past it the payload is passed on again, so a pill whose readings don't change still gets logged
+            capture (CaptureWriter): if given every advert seen is written to it (see PillCapture), closed when the
+                scanner stops
+            schedule (ScanSchedule): if given the radio is only on around the bursts each pill's learned cadence
+                predicts, instead of the whole time - for pis running off a battery or solar panel
+        """
+        self.pill_holder = pill_holder
+        self.passive = passive
+        self.restart_delay = restart_delay
+        self.started = None
+        # upper case mac address -> pill. Replaced (not mutated) on register so the bleak callback never needs a lock
+        self.pills = {}
+        # address as bleak reports it -> (last payload passed on, monotonic() it was passed on at). Replaced on
+        # register/unregister, so at worst a repeat racing with that gets through once more
+        self.last_payloads = {}
+        self.duplicate_window = duplicate_window
+        self.capture = capture
+        self.schedule = schedule
+        # seconds the radio has been scanning for, not counting the monotonic() it was last switched on at if it is on
+        self.radio_on = 0.0
+        self.radio_since = None
+        self.thread = None
+        self.loop = None
+        self.__stop_event = None
+
+        self.adverts_seen = 0
+        # RAPT adverts that weren't a repeat of the last payload from the same address
+        self.adverts_unique = 0
+        self.adverts_dispatched = 0
+        # pill adverts handed on to be decoded (not the name adverts)
+        self.adverts_decoded = 0
+        # pill adverts that would have landed inside a poll window of the old duty cycled scan
+        self.duty_cycle_adverts = 0
+        self.restarts = 0
+
+    @property
+    def running(self) -> bool:
+        return self.loop is not None and self.__stop_event is not None and not self.__stop_event.is_set()
+
+    @property
+    def capture_ratio(self) -> float:
+        """How many pill adverts we got for every one the old poll_interval + 10s duty cycle would have caught"""
+        if not self.duty_cycle_adverts:
+            return 0.0
+        return self.adverts_dispatched / self.duty_cycle_adverts
+
+    @property
+    def duty_cycle(self) -> float:
+        """Share of the time since the scanner started that the radio was on"""
+        now = self.clock()
+        if not self.started or now <= self.started:
+            return 0.0
+        return (self.radio_on + (now - self.radio_since if self.radio_since else 0)) / (now - self.started)
+
+    def log_event(self, message, severity="info"):
+        self.pill_holder.log_event(message, severity)
+
+    def clock(self) -> float:
+        """monotonic(), every time the scanner keeps is taken from here"""
+        return monotonic()
+
+    def log_stats(self):
+        self.log_event(
+            f"Scanner ({'passive' if self.passive else 'active'}) - Seen: {self.adverts_seen} "
+            f"Unique: {self.adverts_unique} Pill adverts: {self.adverts_dispatched} Decoded: {self.adverts_decoded} "
+            f"Duty cycled equivalent: {self.duty_cycle_adverts} "
+            f"Capture ratio: {self.capture_ratio:.2f}x Restarts: {self.restarts}"
+        )
+        if self.schedule is not None:
+            self.log_event(
+                f"Scan schedule - Radio on: {self.duty_cycle:.1%} Bursts caught: {self.schedule.capture_ratio:.1%} "
+                f"Learned: {sum(c.learned for c in self.schedule.cadences.values())}/{len(self.schedule.cadences)}"
+            )
+
+    def scanner_kwargs(self) -> dict:
+        """Arguments for BleakScanner depending on whether we are scanning passively
+
+        Returns:
+            dict: kwargs for BleakScanner
+        """
+        if not self.passive:
+            return {}
+        kwargs = {"scanning_mode": "passive"}
+        if OrPattern is not None:
+            pattern = OrPattern(
+                0, AdvertisementDataType.MANUFACTURER_SPECIFIC_DATA, RAPT_MANUFACTURER_ID.to_bytes(2, "little")
+            )
+            kwargs["bluez"] = BlueZScannerArgs(or_patterns=[pattern])
+        return kwargs
+
+    def register(self, pill):
+        """Start routing advertisements from the pill's mac address to it
+
+        Args:
+            pill (RaptPill): pill to route to
+        """
+        pills = dict(self.pills)
+        pills[pill.mac_address.upper()] = pill
+        self.pills = pills
+        self.forget_payload(pill.mac_address)
+        if self.schedule is not None:
+            self.schedule.track(pill.mac_address)
+        self.log_event(f"Scanner tracking {pill.mac_address} for {pill.session_name} ({len(pills)} pills)")
+
+    def unregister(self, pill):
+        pills = dict(self.pills)
+        if pills.get(pill.mac_address.upper()) is pill:
+            del pills[pill.mac_address.upper()]
+            if self.schedule is not None:
+                self.schedule.forget(pill.mac_address)
+        self.pills = pills
+        self.forget_payload(pill.mac_address)
+
+    def forget_payload(self, mac_address: str):
+        """Drop the last payload seen from an address, so its next advert is passed on even if it is a repeat"""
+        mac_address = mac_address.upper()
+        self.last_payloads = {a: p for a, p in self.last_payloads.items() if a.upper() != mac_address}
+
+    def device_found(self, device: BLEDevice, advertisement_data: AdvertisementData):
+        """Detection callback for the shared scanner - drop repeats, look up the pill by address and pass the
+        advertisement on
+
+        Args:
+            device (BLEDevice): bluetooth device that was found
+            advertisement_data (AdvertisementData): advertisment data from the found bluetooth device
+        """
+        self.adverts_seen += 1
+        if self.capture is not None:
+            self.capture.write(device, advertisement_data)
+        raw_data = advertisement_data.manufacturer_data.get(RAPT_MANUFACTURER_ID)
+        if raw_data is None:
+            return
+        now = self.clock()
+        if self.schedule is not None:
+            # every copy, a repeat of the last payload still tells us the pill is broadcasting
+            self.schedule.observe(device.address.upper(), now)
+        # bytes compare against the last payload from this address, before the address is normalised or looked up
+        last = self.last_payloads.get(device.address)
+        if last is not None and last[0] == raw_data and now - last[1] < self.duplicate_window:
+            return
+        self.last_payloads[device.address] = (raw_data, now)
+        self.adverts_unique += 1
+
+        pill = self.pills.get(device.address.upper())
+        if pill is None:
+            return
+        self.adverts_dispatched += 1
+        if (now - self.started) % (pill.poll_interval + DUTY_CYCLE_REST) < pill.poll_interval:
+            self.duty_cycle_adverts += 1
+        if raw_data == RAPT_NAME_ADVERT:
+            return
+        self.adverts_decoded += 1
+        pill.device_found(device, advertisement_data)
+
+    async def run(self):
+        """Scan until `stop` is called (or the source runs dry)"""
+        self.loop = asyncio.get_running_loop()
+        self.__stop_event = asyncio.Event()
+        self.started = self.clock()
+        try:
+            await self.scan()
+        finally:
+            self.__stop_event.set()
+            if self.capture is not None:
+                self.capture.close()
+            self.log_stats()
+
+    async def scan(self):
+        """Feed bleak's adverts to device_found till `stop` is called. If the backend errors out we restart the scanner
+        rather than give up."""
+        self.log_event(f"Starting shared BLE scanner ({'passive' if self.passive else 'active'})...")
+        failures = 0
+        while not self.__stop_event.is_set():
+            if self.schedule is not None:
+                off_for = self.schedule.radio_off_for(self.clock())
+                if off_for > 0:
+                    await self.rest(min(off_for, RADIO_RECHECK))
+                    continue
+            started = self.clock()
+            try:
+                async with self.radio():
+                    await self.listen()
+            except (BleakError, OSError) as e:
+                self.restarts += 1
+                if self.passive and passive_unsupported(e):
+                    # e.g. macOS, or bluez without advertisement monitor support - fall back to active scanning
+                    self.log_event(f"Passive scanning not available, scanning actively instead: {e}", "warn")
+                    self.passive = False
+                    continue
+                if self.clock() - started > MAX_RESTART_DELAY:
+                    # it had been scanning fine, this is a new run of failures
+                    failures = 0
+                delay = min(self.restart_delay * 2 ** failures, MAX_RESTART_DELAY)
+                failures += 1
+                self.log_event(f"BLE scanner failed, restarting in {delay}s: {e}", "error")
+                await self.rest(delay)
+            else:
+                failures = 0
+
+    def radio(self):
+        """The scanner that has the radio on while it is entered, handing its adverts to device_found"""
+        return BleakScanner(detection_callback=self.device_found, **self.scanner_kwargs())
+
+    async def listen(self):
+        """Keep the radio on till `stop` is called, or with a schedule till no pill is due"""
+        self.radio_since = self.clock()
+        try:
+            if self.schedule is None:
+                await self.__stop_event.wait()
+                return
+            while self.schedule.radio_off_for(self.clock()) <= 0:
+                if await self.rest(RADIO_TICK):
+                    return
+        finally:
+            self.radio_on += self.clock() - self.radio_since
+            self.radio_since = None
+
+    async def rest(self, seconds: float) -> bool:
+        """Wait up to `seconds`, returning early if `stop` is called
+
+        Args:
+            seconds (float): how long to wait, 0 just lets the rest of the loop run
+
+        Returns:
+            bool: True if the scanner is stopping
+        """
+        if seconds <= 0:
+            await asyncio.sleep(0)
+        else:
+            try:
+                await asyncio.wait_for(self.__stop_event.wait(), seconds)
+            except asyncio.TimeoutError:
+                pass
+        return self.__stop_event.is_set()
+
+    def start(self):
+        """Run the scanner on its own thread/loop - for when there is no supervisor loop to host it (gui mode)"""
+        if self.running or (self.thread and self.thread.is_alive()):
+            return
+        self.thread = threading.Thread(target=asyncio.run, args=(self.run(),), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self.loop.call_soon_threadsafe(self.__stop_event.set)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+import math
+
+# adverts closer together than this are one burst of the same reading
+BURST_GAP = 2.0
+# weight a new gap gets in the learned period
+SMOOTHING = 0.25
+# gaps seen before the period is trusted
+MIN_SAMPLES = 2
+# bursts in a row missed before a pill counts as missing and is scanned for continuously again
+MAX_MISSES = 2
+# seconds before and after a predicted burst the radio is on for
+SCHEDULE_MARGIN = 3.0
+
+
+class PillCadence(object):
+    def __init__(self):
+        """Learns how often a pill broadcasts from when its adverts arrive. A pill wakes up every interval set in its
+        firmware and sends a burst of adverts, so the learned period is a smoothed gap between burst starts."""
+        self.period = None
+        # monotonic() the last burst started/was last heard at
+        self.burst = None
+        self.last_advert = None
+        self.samples = 0
+        self.caught = 0
+        self.missed = 0
+
+    @property
+    def learned(self) -> bool:
+        return self.samples >= MIN_SAMPLES
+
+    def observe(self, now: float):
+        """An advert from the pill arrived
+
+        Args:
+            now (float): monotonic() it arrived at
+        """
+        same_burst = self.last_advert is not None and now - self.last_advert < BURST_GAP
+        self.last_advert = now
+        if same_burst:
+            return
+        self.caught += 1
+        if self.burst is not None:
+            gap = now - self.burst
+            if self.period is None:
+                self.period = gap
+            else:
+                # bursts missed in between turn up as a whole number of periods
+                periods = max(1, round(gap / self.period))
+                if self.learned:
+                    self.missed += periods - 1
+                self.period += SMOOTHING * (gap / periods - self.period)
+            self.samples += 1
+        self.burst = now
+
+    def due(self, now: float, margin: float):
+        """When the next burst is expected. A pill that has missed MAX_MISSES bursts in a row is forgotten, so it is
+        learned again from scratch
+
+        Args:
+            now (float): monotonic() now
+            margin (float): seconds a burst can be late by and still be the one expected
+
+        Returns:
+            float: monotonic() the next burst is due at, None if the period isn't known
+        """
+        if not self.learned:
+            return None
+        periods = max(1, math.floor((now - margin - self.burst) / self.period) + 1)
+        if periods > MAX_MISSES:
+            self.missed += periods - 1
+            self.period = None
+            self.burst = None
+            self.samples = 0
+            return None
+        return self.burst + periods * self.period
+
+
+class ScanSchedule(object):
+    def __init__(self, margin: float = SCHEDULE_MARGIN):
+        """Decides when the shared scanner needs the radio on: only around the bursts each pill's learned cadence
+        predicts, and all the time while any pill's cadence isn't known (just registered or gone missing). Every time
+        here is monotonic(), so it can be driven by a simulated clock as well
+
+        Args:
+            margin (float): seconds either side of a predicted burst to listen for, covers jitter in the pill's timing
+                and the time bluetooth takes to start scanning
+        """
+        self.margin = float(margin)
+        # upper case mac address -> cadence, replaced (not mutated) on track/forget like PillScanner.pills
+        self.cadences = {}
+
+    @property
+    def capture_ratio(self) -> float:
+        """Bursts heard for every burst a pill with a known cadence sent"""
+        caught = sum(c.caught for c in self.cadences.values())
+        missed = sum(c.missed for c in self.cadences.values())
+        return caught / (caught + missed) if caught else 0.0
+
+    def track(self, mac_address: str):
+        cadences = dict(self.cadences)
+        cadences.setdefault(mac_address.upper(), PillCadence())
+        self.cadences = cadences
+
+    def forget(self, mac_address: str):
+        cadences = dict(self.cadences)
+        cadences.pop(mac_address.upper(), None)
+        self.cadences = cadences
+
+    def observe(self, mac_address: str, now: float):
+        """An advert arrived from this (upper case) address, learn from it if it is a tracked pill"""
+        cadence = self.cadences.get(mac_address)
+        if cadence is not None:
+            cadence.observe(now)
+
+    def radio_off_for(self, now: float) -> float:
+        """How long the radio can stay off
+
+        Args:
+            now (float): monotonic() now
+
+        Returns:
+            float: seconds till a burst is due, 0 if the radio should be on now, inf with no pills to listen for
+        """
+        wait = math.inf
+        for cadence in self.cadences.values():
+            due = cadence.due(now, self.margin)
+            if due is None:
+                return 0.0
+            wait = min(wait, due - self.margin - now)
+        return max(0.0, wait)
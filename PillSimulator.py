@@ -0,0 +1,174 @@
+from __future__ import annotations
+import heapq
+import math
+import random
+from collections import namedtuple
+from time import monotonic
+
+from PillCapture import ReplayAdvertisement, ReplayDevice
+from PillDecoder import RaptMetrics, encode
+from PillScanner import PillScanner, RAPT_MANUFACTURER_ID
+
+# adverts handed over between yields to the loop when simulating as fast as possible
+SIMULATE_BATCH = 256
+# share of the virtual pills running the V1 firmware
+V1_SHARE = 0.2
+
+# How a virtual pill's brew goes, all drawn at random per pill
+Fermentation = namedtuple("Fermentation", "og, fg, midpoint, steepness, setpoint, battery_days, tilt, phase")
+
+
+def simulated_mac(index: int) -> str:
+    """mac address of the virtual pill with this index, so sessions can be set up for them in data.json"""
+    return f"5A:50:00:00:{index >> 8 & 0xFF:02X}:{index & 0xFF:02X}"
+
+
+class VirtualPill(object):
+    def __init__(self, index: int, rng: random.Random):
+        """A pill in a made up brew: gravity follows a logistic fermentation curve from OG to FG, temperature drifts
+        with the time of day and rises with the fermentation's activity, the battery runs down, and every value is
+        sent with a little sensor noise.
+
+        Args:
+            index (int): which virtual pill this is, picks its mac address
+            rng (random.Random): random source, seeded by the simulator so runs repeat
+        """
+        self.address = simulated_mac(index)
+        self.mac = bytes.fromhex(self.address.replace(":", ""))
+        self.version = 1 if rng.random() < V1_SHARE else 2
+        self.rng = rng
+        og = rng.uniform(1.060, 1.120)
+        self.brew = Fermentation(
+            og=og,
+            fg=og - (og - 1) * rng.uniform(0.75, 0.95),
+            midpoint=rng.uniform(36, 96),
+            steepness=rng.uniform(12, 30),
+            setpoint=rng.uniform(17, 24),
+            battery_days=rng.uniform(60, 120),
+            tilt=rng.uniform(15, 30),
+            # hours into the brew the simulation starts at
+            phase=rng.uniform(0, 240),
+        )
+        self.device = ReplayDevice(self.address, "RAPT Pill")
+
+    def metrics(self, seconds: float) -> RaptMetrics:
+        """Values the pill reads `seconds` into the simulation
+
+        Args:
+            seconds (float): simulated seconds since the simulation started
+
+        Returns:
+            RaptMetrics: values in the units decode returns
+        """
+        brew, rng = self.brew, self.rng
+        hours = brew.phase + seconds / 3600
+        # e is how far along the curve we are, activity peaks (at 1) at the midpoint
+        e = math.exp(min((hours - brew.midpoint) / brew.steepness, 50))
+        activity = 4 * e / (1 + e) ** 2
+        gravity = brew.fg + (brew.og - brew.fg) / (1 + e) + rng.gauss(0, 0.0002)
+        # points a day, negative while the gravity drops
+        velocity = -(brew.og - brew.fg) * 1000 * 24 * activity / (4 * brew.steepness)
+        celsius = brew.setpoint + 1.5 * math.sin(2 * math.pi * hours / 24) + 2 * activity + rng.gauss(0, 0.05)
+        battery = max(0.0, 100 - hours / 24 * 100 / brew.battery_days)
+        # the pill floats more upright as the gravity drops
+        tilt = math.radians(brew.tilt + (gravity - 1) * 300)
+        x, y, z = math.sin(tilt), rng.gauss(0, 0.02), math.cos(tilt)
+        return RaptMetrics(
+            self.version,
+            gravity,
+            celsius + 273.15,
+            velocity if self.version == 2 else None,
+            x,
+            y,
+            z,
+            battery,
+        )
+
+    def advert(self, seconds: float) -> ReplayAdvertisement:
+        payload = encode(self.metrics(seconds), self.mac)
+        return ReplayAdvertisement({RAPT_MANUFACTURER_ID: payload}, round(self.rng.gauss(-70, 6)))
+
+
+class SimulatedScanner(PillScanner):
+    def __init__(
+        self,
+        pill_holder,
+        pills: int,
+        interval: float = 60,
+        repeats: int = 5,
+        speed: float = 1.0,
+        duration: float = None,
+        seed: int = None,
+        **kwargs,
+    ):
+        """Stands in for the shared scanner with a crowd of virtual pills, for seeing how the app copes with far more
+        pills than anyone owns. Their adverts go to the same device_found callback as bleak's, so they are only decoded
+        for pills with a session for their mac address (see simulated_mac).
+
+        Args:
+            pill_holder (PillHolder): holder used for logging
+            pills (int): how many virtual pills
+            interval (float): seconds between readings from each pill
+            repeats (int): times each reading is reported, bleak reports a pill's repeats of an advert too
+            speed (float): simulated seconds per real second, 0 as fast as possible
+            duration (float): simulated seconds to run for, None till stop is called
+            seed (int): seed for the random brews and noise, so runs can be repeated
+            **kwargs: passed on to PillScanner
+        """
+        super().__init__(pill_holder, **kwargs)
+        rng = random.Random(seed)
+        self.virtual_pills = [VirtualPill(i, rng) for i in range(int(pills))]
+        self.interval = float(interval)
+        self.repeats = int(repeats)
+        self.speed = float(speed)
+        self.duration = duration
+        self.rng = rng
+        self.simulated = 0
+        # seconds adverts were handed over after the time they were due at (the pace can't be kept up)
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def log_stats(self):
+        super().log_stats()
+        self.log_event(
+            f"Simulated {len(self.virtual_pills)} pills at {self.speed or 'max'}x - Adverts: {self.simulated} "
+            f"Lag: {self.last_lag:.3f}s (max {self.max_lag:.3f}s)"
+        )
+
+    async def scan(self):
+        """Send each virtual pill's readings every interval, spread out over the interval, till the duration is up or
+        stop is called"""
+        count = len(self.virtual_pills)
+        self.log_event(
+            f"Simulating {count} RAPT pills ({simulated_mac(0)} to {simulated_mac(count - 1)}) "
+            f"at {self.speed or 'max'}x..."
+        )
+        # (simulated seconds the next reading is due at, pill index)
+        due = [(self.rng.uniform(0, self.interval), i) for i in range(count)]
+        heapq.heapify(due)
+        batch = 0
+        while due:
+            seconds, i = due[0]
+            if self.duration is not None and seconds > self.duration:
+                break
+            if self.speed > 0:
+                wait = self.started + seconds / self.speed - monotonic()
+                if wait > 0:
+                    if await self.rest(wait):
+                        return
+                else:
+                    self.last_lag = -wait
+                    self.max_lag = max(self.max_lag, self.last_lag)
+            elif batch >= SIMULATE_BATCH:
+                # let stop (and anything else on the loop) in
+                batch = 0
+                if await self.rest(0):
+                    return
+            heapq.heapreplace(due, (seconds + self.interval, i))
+            pill = self.virtual_pills[i]
+            advert = pill.advert(seconds)
+            batch += self.repeats
+            for _ in range(self.repeats):
+                self.simulated += 1
+                self.device_found(pill.device, advert)
+        self.log_event(f"Simulation finished after {self.simulated} adverts")
@@ -0,0 +1,199 @@
+from __future__ import annotations
+import asyncio
+import signal
+import sys
+from time import monotonic
+
+
+class PeriodicJob(object):
+    def __init__(self, name: str, interval: float, func, run_in_executor: bool = True):
+        """A job the supervisor runs every `interval` seconds
+
+        Args:
+            name (str): name used when logging the job
+            interval (float): seconds between runs
+            func (callable): function or coroutine function to run
+            run_in_executor (bool): run plain functions on the default executor so slow jobs (http etc.) can't
+                block the supervisor loop
+        """
+        self.name = name
+        self.interval = float(interval)
+        self.func = func
+        self.run_in_executor = run_in_executor
+        self.runs = 0
+        self.failures = 0
+        self.last_run = None
+
+
+class PillSupervisor(object):
+    def __init__(self, pill_holder):
+        """Owns the headless event loop - pill lifecycles, signal handling and periodic jobs.
+        The loop sleeps until there is actually something to do so it idles at ~0% cpu instead of spinning.
+
+        Args:
+            pill_holder (PillHolder): holder used for logging
+        """
+        self.pill_holder = pill_holder
+        self.pills = []
+        self.jobs = []
+        self.services = []
+        self.tasks = []
+        self.loop = None
+        self.started = None
+        self.__stop_event = None
+
+    @property
+    def running(self) -> bool:
+        return self.loop is not None and self.__stop_event is not None and not self.__stop_event.is_set()
+
+    def log_event(self, message, severity="info"):
+        self.pill_holder.log_event(message, severity)
+
+    def add_pill(self, pill):
+        """Add a pill to be started when the supervisor runs (or straight away if we are already running)
+
+        Args:
+            pill (RaptPill): pill to supervise
+        """
+        self.pills.append(pill)
+        if self.running:
+            self.loop.call_soon_threadsafe(self.start_pill, pill)
+
+    def remove_pill(self, pill):
+        """Stop and forget about a pill
+
+        Args:
+            pill (RaptPill): pill to stop
+        """
+        if pill not in self.pills:
+            return
+        self.pills.remove(pill)
+        if pill.running:
+            pill.end_session()
+
+    def add_job(self, name: str, interval: float, func, run_in_executor: bool = True) -> PeriodicJob:
+        """Register a periodic job. Jobs added before `run` start with the loop.
+
+        Args:
+            name (str): job name for logging
+            interval (float): seconds between runs
+            func (callable): function or coroutine function
+            run_in_executor (bool): run plain functions off the loop thread
+
+        Returns:
+            PeriodicJob: the registered job
+        """
+        job = PeriodicJob(name, interval, func, run_in_executor)
+        self.jobs.append(job)
+        if self.running:
+            self.loop.call_soon_threadsafe(self.__start_job, job)
+        return job
+
+    def add_service(self, name: str, coro_func):
+        """Register a long running coroutine (e.g. the ble scanner) that lives as long as the supervisor
+
+        Args:
+            name (str): service name for logging
+            coro_func (callable): coroutine function to run, it should return once cancelled
+        """
+        self.services.append((name, coro_func))
+        if self.running:
+            self.loop.call_soon_threadsafe(self.__start_service, name, coro_func)
+
+    def start_pill(self, pill):
+        self.log_event(f"Supervisor starting pill: {pill.session_name}")
+        pill.start()
+
+    def stop(self):
+        """Ask the supervisor to shut down - safe to call from any thread or a signal handler"""
+        if self.loop is None or self.__stop_event is None:
+            return
+        self.loop.call_soon_threadsafe(self.__stop_event.set)
+
+    def __start_service(self, name: str, coro_func):
+        self.tasks.append(self.loop.create_task(self.__run_service(name, coro_func), name=name))
+
+    async def __run_service(self, name: str, coro_func):
+        try:
+            await coro_func()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.log_event(f"Service {name} crashed: {e}", "critical")
+        else:
+            self.log_event(f"Service {name} finished")
+
+    def __start_job(self, job: PeriodicJob):
+        self.tasks.append(self.loop.create_task(self.__run_job(job), name=job.name))
+
+    async def __run_job(self, job: PeriodicJob):
+        while True:
+            await asyncio.sleep(job.interval)
+            try:
+                if asyncio.iscoroutinefunction(job.func):
+                    await job.func()
+                elif job.run_in_executor:
+                    await self.loop.run_in_executor(None, job.func)
+                else:
+                    job.func()
+                job.runs += 1
+            except Exception as e:
+                job.failures += 1
+                self.log_event(f"Periodic job {job.name} failed: {e}", "error")
+            job.last_run = monotonic()
+
+    def __install_signal_handlers(self):
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.add_signal_handler(sig, self.__on_signal, sig)
+            except (NotImplementedError, RuntimeError):
+                # windows event loops don't support add_signal_handler
+                signal.signal(sig, lambda signum, frame: self.loop.call_soon_threadsafe(self.__on_signal, signum))
+
+    def __remove_signal_handlers(self):
+        if sys.platform == "win32":
+            return
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.remove_signal_handler(sig)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass
+
+    def __on_signal(self, signum):
+        self.log_event(f"Received {signal.Signals(signum).name}, ending sessions...")
+        self.__stop_event.set()
+
+    async def run(self):
+        """Start all services, pills and jobs then sleep until `stop` is called or we get SIGINT/SIGTERM"""
+        self.loop = asyncio.get_running_loop()
+        self.__stop_event = asyncio.Event()
+        self.started = monotonic()
+        self.__install_signal_handlers()
+
+        for name, coro_func in self.services:
+            self.__start_service(name, coro_func)
+        for pill in self.pills:
+            self.start_pill(pill)
+        for job in self.jobs:
+            self.__start_job(job)
+
+        try:
+            await self.__stop_event.wait()
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+        for pill in self.pills:
+            if pill.running:
+                pill.end_session()
+        self.__remove_signal_handlers()
+        self.log_event(f"Supervisor stopped after {monotonic() - self.started:.0f}s")
+
+    def run_forever(self):
+        """Blocking entry point for headless mode"""
+        asyncio.run(self.run())
@@ -1,35 +1,34 @@
 from __future__ import annotations
 import sys
-from bleak import BleakScanner
 from bleak.backends.device import BLEDevice
 from bleak.backends.scanner import AdvertisementData
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from urllib.parse import urlparse, parse_qs
 
-import asyncio
 from pathlib import Path
 import json
-from struct import unpack
 from collections import namedtuple
-from datetime import datetime, timezone
 import logging
 import requests
 from pprint import pprint
-from time import time
+from time import monotonic, time
 import threading
 import webbrowser
 
-try:
-    from waveshare.waveshare_epd import epd3in0g
-    from PIL import Image, ImageDraw, ImageFont
-except ImportError:
-    print("Couldn't import waveshare or PIL")
-
-# Taken from rapt_ble on github (https://github.com/sairon/rapt-ble/blob/main/src/rapt_ble/parser.py#L14) as well as the decode_rapt_data
-RAPTPillMetricsV1 = namedtuple("RAPTPillMetrics", "version, mac, temperature, gravity, x, y, z, battery")
-RAPTPillMetricsV2 = namedtuple(
-    "RAPTPillMetrics",
-    "hasGravityVel, gravityVel, temperature, gravity, x, y, z, battery",
+from MeadToolsSession import MeadToolsSession
+from PillCapture import CaptureWriter, ReplayScanner
+from PillDecoder import RAPT_NAME_ADVERT, decode, format_timestamp
+from PillOutbox import OutboxDrainer, PillOutbox
+from PillSchedule import SCHEDULE_MARGIN, ScanSchedule
+from PillScanner import DUPLICATE_WINDOW, PillScanner, RAPT_MANUFACTURER_ID
+from PillSimulator import SimulatedScanner
+from PillSupervisor import PillSupervisor
+from PillWorkers import ReadingDispatcher
+
+# Immutable snapshot of a pill handed to the upload/ui/eink workers - field names match RaptPill so either can be shown
+PillReading = namedtuple(
+    "PillReading",
+    "session_name, pill_name, mac_address, curr_gravity, abv, temperature, temp_unit, battery, gravity_velocity, last_event, received",
 )
 PILLS = []
 WINDOW = None
@@ -75,6 +74,16 @@ class MeadTools(object):
         self.hydrometers = []
         self.brews = []
         self.logged_in = False
+        # pooled keep-alive session with timeouts/retries - 401s refresh the login and replay the request
+        self.http = MeadToolsSession(pill_holder, headers_func=lambda: self.headers, refresh_func=self.refresh_login)
+        # data points are written here first so they survive MeadTools/network outages and restarts
+        outbox_data = data.get("Outbox", {})
+        self.outbox = PillOutbox(
+            pill_holder.appdata.joinpath("meadtools/outbox.sqlite3"),
+            max_points=outbox_data.get("MaxPoints", 50000),
+            max_age_days=outbox_data.get("MaxAgeDays", 14),
+        )
+        self.drainer = OutboxDrainer(self.outbox, self.upload_data_point, pill_holder)
 
     @property
     def mt_data(self):
@@ -165,6 +174,11 @@ class MeadTools(object):
         elif self.mt_data.get("LoginType", "MeadTools") == "Google":
             self.google_auth()
 
+        if len(self.outbox):
+            # points left over from the last run/an outage
+            self.pill_holder.log_event(f"{len(self.outbox)} data points waiting in the outbox, uploading...")
+            self.drainer.start()
+
         if self.ui:
             self.ui.logged_in(self.logged_in)
 
@@ -179,7 +193,7 @@ class MeadTools(object):
             "refreshToken": self.mt_data.get("RefreshToken", None),
         }
         self.pill_holder.log_event("Refreshing login details...")
-        response = requests.post(self.__refresh_url__, json=body)
+        response = self.http.post(self.__refresh_url__, json=body)
         if response.status_code == 200:
             self.mt_data["AccessToken"] = response.json().get("accessToken")
             self.__token__ = response.json().get("accessToken")
@@ -204,7 +218,7 @@ class MeadTools(object):
             "password": self.mt_data.get("MTPassword", None),
         }
         self.pill_holder.log_event("Trying to login to MeadTools...")
-        response = requests.post(self.__login_url__, json=body)
+        response = self.http.post(self.__login_url__, json=body)
         self.pill_holder.log_event(f"LoginResponse: {response.status_code}")
         if response.status_code == 200:
             self.mt_data["RefreshToken"] = response.json().get("refreshToken")
@@ -265,7 +279,7 @@ class MeadTools(object):
     def get_hydrometers(self):
         self.pill_holder.log_event(f"Getting Hydrometers from MeadTools: {self.headers} - {self.__hyrdom_url__}")
 
-        response = requests.get(self.__hyrdom_url__, headers=self.headers)
+        response = self.http.get(self.__hyrdom_url__, authorized=True)
         if response.status_code == 200:
             self.pill_holder.log_event(f"Hydrometers: {response.json()}")
             self.hydrometers = response.json().get("devices")
@@ -292,7 +306,7 @@ class MeadTools(object):
             f"Registering Hydrometer on MeadTools... Body: {body}  URL:{self.__reg_hydrom_url__}"
         )
         pprint(body, indent=4)
-        response = requests.post(self.__reg_hydrom_url__, json=body)
+        response = self.http.post(self.__reg_hydrom_url__, json=body)
         if response.status_code == 200:
             self.pill_holder.log_event("Successfully logged data to MTools...")
             return response.json().get("id", "No Id!")
@@ -307,7 +321,7 @@ class MeadTools(object):
             bool: True if successful, else false
         """
         self.pill_holder.log_event(f"Getting Brews from MeadTools - {self.headers} - {self.__brews_url__}")
-        response = requests.get(self.__brews_url__, headers=self.headers)
+        response = self.http.get(self.__brews_url__, authorized=True)
         if response.status_code == 200:
             self.pill_holder.log_event(f"Brews: {response.json()}")
             # should return just a list of brew objects
@@ -328,7 +342,7 @@ class MeadTools(object):
             "brew_name": brew_name,
         }
         self.pill_holder.log_event(f"Registering brews with MeadTools : {body}  URL:{self.__brews_url__}")
-        response = requests.post(self.__brews_url__, headers=self.headers, json=body)
+        response = self.http.post(self.__brews_url__, authorized=True, json=body)
         self.pill_holder.log_event(f"Response: { response}")
         if response.status_code == 200:
             self.pill_holder.log_event(f"brews: {response.json()}")
@@ -350,7 +364,7 @@ class MeadTools(object):
             str: generated token
         """
         self.pill_holder.log_event(f"Try to register deviceId... {self.__token_url__} : headers{self.headers}")
-        response = requests.post(self.__token_url__, headers=self.headers)
+        response = self.http.post(self.__token_url__, authorized=True)
         # this should respond with
         """
         "200": {
@@ -375,7 +389,7 @@ class MeadTools(object):
         brew_id = brew_data.get("id")
         self.pill_holder.log_event(f"Trying to delete brew: {self.__brews_url__}/{brew_id}")
 
-        response = requests.delete(f"{self.__brews_url__}/{brew_id}", headers=self.headers)
+        response = self.http.delete(f"{self.__brews_url__}/{brew_id}", authorized=True)
         self.pill_holder.log_event(response)
 
         if response.status_code == 200:
@@ -391,7 +405,7 @@ class MeadTools(object):
             return
         body = {"recipe_id": int(recipe_id)}
         self.pill_holder.log_event(f"Trying to link brew: {body} - url: {self.__brews_url__}/{self.brewid}")
-        response = requests.patch(f"{self.__brews_url__}/{brewid}", headers=self.headers, json=body)
+        response = self.http.patch(f"{self.__brews_url__}/{brewid}", authorized=True, json=body)
         # this should respond with
         """
         "200": {
@@ -413,7 +427,7 @@ class MeadTools(object):
         }
 
         self.pill_holder.log_event(f"Trying to end brew with {body}")
-        response = requests.patch(f"{self.__brews_url__}", headers=self.headers, json=body)
+        response = self.http.patch(f"{self.__brews_url__}", authorized=True, json=body)
         # this should respond with
         """
         "200": {
@@ -438,32 +452,65 @@ class MeadTools(object):
         }
         __login_url__ = f"{self.__base_url__}/ingredients"
         self.pill_holder.log_event(__login_url__, body)
-        response = requests.get(__login_url__)
+        response = self.http.get(__login_url__)
         self.pill_holder.log_event(response.json())
 
-    def add_data_point(self, pill: RaptPill):
+    def add_data_point(self, reading: PillReading):
+        """Queue a reading in the outbox, the drainer uploads it in the background
+
+        Args:
+            reading (PillReading): reading to log
+
+        Returns:
+            bool: True once the point is safely in the outbox
+        """
         body = {
             "token": self.deviceid,
-            "name": pill.session_data.get("Pill Name", pill.mac_address),
-            "gravity": pill.curr_gravity,
-            "temperature": pill.temperature,
-            "temp_units": pill.temp_unit,
-            "battery": pill.battery,
+            "name": reading.pill_name,
+            "gravity": reading.curr_gravity,
+            "temperature": reading.temperature,
+            "temp_units": reading.temp_unit,
+            "battery": reading.battery,
         }
         self.pill_holder.log_event(f"----------------")
-        self.pill_holder.log_event(f"Sending data to MeadTools... Body: {body}  URL:{self.__pill_url__}")
+        self.pill_holder.log_event(f"Queueing data for MeadTools... Body: {body}")
         pprint(body, indent=4)
-        response = requests.post(self.__pill_url__, json=body)
+        self.outbox.put(body)
+        self.drainer.start()
+        self.drainer.notify()
+        return True
+
+    def upload_data_point(self, body: dict, key: str) -> int:
+        """Post a data point from the outbox to MeadTools
+
+        Args:
+            body (dict): data point body
+            key (str): the point's outbox key, sent as an Idempotency-Key header so a point sent again after a crash
+                can be told apart from a new one
+
+        Returns:
+            int: http status MeadTools answered with, None if we couldn't reach it
+        """
+        self.pill_holder.log_event(f"Sending data to MeadTools... Body: {body}  URL:{self.__pill_url__}")
+        try:
+            response = self.http.post(self.__pill_url__, json=body, headers={"Idempotency-Key": key})
+        except requests.RequestException as e:
+            self.pill_holder.log_event(f"!!! Failed to log data to MeadTools! {e} !!!", "error")
+            return None
         if response.status_code == 200:
             self.pill_holder.log_event("Successfully logged data to MTools...")
-            if self.ui:
-                self.ui.update_huds(pill)
-            elif self.eink:
-                self.eink.update_hud(pill)
-            return True
         else:
             self.pill_holder.log_event(f"!!! Failed to log data to MeadTools! {response} !!!", "error")
-            return False
+        return response.status_code
+
+    def close(self):
+        """Stop the outbox drainer and close the outbox, points still waiting are uploaded on the next start"""
+        # an upload in flight is finished (or times out) before the drainer stops
+        if self.drainer.stop(timeout=30):
+            self.outbox.close()
+        else:
+            self.pill_holder.log_event("Outbox upload still running at shutdown, leaving the outbox open", "error")
+        self.http.close()
 
 
 class RaptPill(object):
@@ -496,7 +543,6 @@ class RaptPill(object):
         self.min_time = int(session_data.get("Poll Interval", 120))
         self.last_time = time()
 
-        self.thread = None
         self.running = False
 
         self.mt_data = mt_data
@@ -538,8 +584,8 @@ class RaptPill(object):
         self.__z = -100
         # battery life
         self.__battery = 100
-        # When was the last event
-        self.__last_event = None
+        # time() of the last advert, only formatted when something shows it
+        self.__last_seen = None
 
         self.__log_to_db = log_to_db
         self.mtools = mtools
@@ -568,10 +614,7 @@ class RaptPill(object):
                     self.hydrometer_token = self.hydrometer.get("id", "No Hydrom ID!")
                 self.initialise_brew()
 
-        # polling variables
-        self.__polling_task = None
         self.active_pollers.append(self)
-        self.bt_scanner = None
 
     @property
     def starting_gravity(self) -> float:
@@ -644,7 +687,7 @@ class RaptPill(object):
 
     @property
     def last_event(self):
-        return self.__last_event
+        return None if self.__last_seen is None else format_timestamp(self.__last_seen)
 
     @property
     def mac_address(self):
@@ -658,36 +701,22 @@ class RaptPill(object):
     def brewid(self, id: str):
         self.mtools.brewid = id
 
+    @property
+    def scanner(self) -> PillScanner:
+        return self.pill_holder.scanner
+
     def start(self):
+        self.pill_holder.log_event(f"Starting Session: {self.session_name}")
         self.running = True
-        self.thread = threading.Thread(target=self.start_session, daemon=True)
-        self.thread.start()
+        self.scanner.register(self)
 
     def stop(self):
         self.running = False
-        self.thread.join()
-
-    def start_session(self):
-        self.pill_holder.log_event(f"Starting Session: {self.session_name}")
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
-        async def scan():
-
-            # self.bt_scanner = BleakScanner(detection_callback=self.device_found)
-            while self.running:
-                # print("Starting BLE scan...")  # ✅ This should print
-                async with BleakScanner(self.device_found) as scanner:
-                    await asyncio.sleep(self.poll_interval)
-                # print("Scan complete. Waiting for next cycle...")
-                await asyncio.sleep(10)
-
-        loop.run_until_complete(scan())
+        self.scanner.unregister(self)
 
     def end_session(self):
-        self.pill_holder.log_event(f"Stopping thread: {self.session_name}")
-        self.running = False
-        self.thread = None
+        self.pill_holder.log_event(f"Stopping session: {self.session_name}")
+        self.stop()
 
         self.pill_holder.log_event(f"Ended Session: {self.session_name}")
 
@@ -747,18 +776,15 @@ class RaptPill(object):
             self.mtools.link_brew_to_recipe(self.brewid, self.session_data.get("MTRecipeId", ""))
 
     def device_found(self, device: BLEDevice, advertisement_data: AdvertisementData):
-        """This is fired everytime the bleakScanner finds a bluetooth device so we check if it is the macaddress of the pill we are tracking
-        if it is not, then we ignore it
+        """Fired by the shared PillScanner for advertisements from this pill's mac address
 
         Args:
             device (BLEDevice): bluetooth device that was found
             advertisement_data (AdvertisementData): advertisment data from the found bluetooth device
         """
-        if device.address.lower() != self.__mac_address.lower():
-            return
         # Assuming the custom data is under manufacturer specific data
-        raw_data = advertisement_data.manufacturer_data.get(16722, None)
-        if raw_data == b"PTdPillG1":
+        raw_data = advertisement_data.manufacturer_data.get(RAPT_MANUFACTURER_ID, None)
+        if raw_data == RAPT_NAME_ADVERT:
             return
         if raw_data is None:
             return
@@ -792,8 +818,8 @@ class RaptPill(object):
         return (kelvin - 273.15) * (9 / 5) + 32
 
     def decode_rapt_data(self, data: bytes):
-        """Given bytes from a bluetooth advertisement, decode it into the RAPTPillMetrics tuple and return it so it can be used.
-        Updates class values
+        """Given bytes from a bluetooth advertisement, decode it (see PillDecoder.decode) and update class values
+
         Args:
             data (bytes): advertisement data as bytes
 
@@ -801,58 +827,62 @@ class RaptPill(object):
             ValueError: length of data isn't correct
 
         """
-        if len(data) != 23:
-            raise ValueError("advertisment data must have length 23")
-
-        # print(f"===> raw_data: {data}")
-
-        # Extract and check the version
-        prefix, version = unpack(">2sB", data[:3])
-        # Validate the prefix
-        if prefix != b"PT":
-            raise ValueError("Unexpected prefix")
-        # get "raw" data, drop second part of the prefix ("PT"), start with the version
-        if version == 1:
-            metrics_raw = RAPTPillMetricsV1._make(unpack(">B6sHfhhhh", data[2:]))
-        else:
-            metrics_raw = RAPTPillMetricsV2._make(unpack(">BfHfhhhH", data[4:]))
+        metrics = decode(data)
+        now = time()
 
-        now = datetime.now(timezone.utc)
-        dt_string = now.strftime("%Y-%m-%dT%H:%M:%SZ")
-        # print("date and time =", dt_string)
         if not self.__starting_gravity_set:
-            self.starting_gravity = round(metrics_raw.gravity / 1000, 4)
-        self.__api_version = version
-        self.__gravity_velocity = metrics_raw.gravityVel
-        self.__curr_gravity = round(metrics_raw.gravity / 1000, 4)
+            self.starting_gravity = round(metrics.gravity, 4)
+        self.__api_version = metrics.version
+        self.__gravity_velocity = metrics.gravity_velocity
+        self.__curr_gravity = round(metrics.gravity, 4)
         self.__abv = self.calculate_abv(self.__curr_gravity)
-        self.__temperature = self.calculate_temp(metrics_raw.temperature / 128)
-        self.__battery = round(metrics_raw.battery / 256)
-        self.__last_event = dt_string
-        self.__x = metrics_raw.x / 16
-        self.__y = metrics_raw.y / 16
-        self.__z = metrics_raw.z / 16
+        self.__temperature = self.calculate_temp(metrics.temperature)
+        self.__battery = round(metrics.battery)
+        self.__last_seen = now
+        self.__x = metrics.x
+        self.__y = metrics.y
+        self.__z = metrics.z
 
         if self.__log_to_db:
-            curr_time = time()
-            time_since = curr_time - self.last_time
+            time_since = now - self.last_time
             if time_since >= self.min_time:
-                self.last_time = time()
+                self.last_time = now
 
-                self.mtools.add_data_point(self)
+                # only queue it here - uploads and screen updates happen on their own workers
+                self.pill_holder.readings.publish(self.reading())
                 self.pill_holder.log_event(self)
                 self.pill_holder.update_status(
                     f"Logged Data to MeadTools for: {self.session_name} - SG:{self.curr_gravity} , Temp: {self.temperature} , ~ABV:{self.abv}"
                 )
         else:
-            curr_time = time()
-            time_since = curr_time - self.last_time
+            time_since = now - self.last_time
             if time_since >= self.min_time:
-                self.last_time = curr_time
+                self.last_time = now
 
+                self.pill_holder.readings.publish(self.reading(), exclude=("upload",))
                 self.pill_holder.log_event(self)
                 self.pill_holder.log_event("Logging to console only")
 
+    def reading(self) -> PillReading:
+        """Snapshot the current values
+
+        Returns:
+            PillReading: immutable reading
+        """
+        return PillReading(
+            self.__session_name,
+            self.session_data.get("Pill Name", self.__mac_address),
+            self.__mac_address,
+            self.__curr_gravity,
+            self.__abv,
+            self.__temperature,
+            self.temp_unit,
+            self.__battery,
+            self.__gravity_velocity,
+            self.last_event,
+            monotonic(),
+        )
+
     def __repr__(self):
         return (
             "Current Data: \n"
@@ -868,7 +898,7 @@ class RaptPill(object):
             "\n"
             f"ABV: {self.__abv} , "
             "\n"
-            f"Last Event TimeStamp:{self.__last_event}"
+            f"Last Event TimeStamp:{self.last_event}"
             "\n"
             f"Temp: {self.__temperature} {'f' if not self.__is_celsius else 'c'}, "
             "\n"
@@ -904,6 +934,8 @@ class PillHolder(object):
         self.pills = []
         self.ui = None
         self.eink = None
+        self.supervisor = None
+        self.scanner = None
         self.log_to_db = True
 
         # if data is filled in data.json file use it and start sessions and database (if set)
@@ -913,6 +945,10 @@ class PillHolder(object):
         # Read data.json and spin up processes
         self.data = json.loads(self.data_path.read_text())
         self.mtools = MeadTools(self.data, self.data_path, self)
+        self.scanner = self.make_scanner(self.data.get("Scanner", {}))
+        # decoded readings are fanned out to upload/ui/eink workers so nothing slow runs on the ble callback
+        self.readings = ReadingDispatcher(self)
+        self.readings.add_worker("upload", self.mtools.add_data_point, maxsize=10000)
         if not self.data.get("Sessions", []):
             self.data["Sessions"] = []
         self.mtools.save_data()
@@ -926,14 +962,19 @@ class PillHolder(object):
             self.ui = WINDOW
             self.check_for_release_updates()
             if WINDOW:
-
+                self.readings.add_worker("ui", self.ui.update_huds)
                 WINDOW.qapp.exec()
+                self.shutdown()
 
             else:
                 raise RuntimeError("data.json not found! - refer to github depot on how to get/setup data.json")
         elif self.data.get("Eink", {}).get("enabled", False):
+            from PillEink import EinkScreen
+
             self.mtools.handle_login()
             self.eink = EinkScreen(self)
+            # only the latest reading matters to the screen, older queued ones are dropped
+            self.readings.add_worker("eink", self.eink.update_hud, maxsize=1)
             self.run_headless_pills()
         else:
             self.check_for_release_updates()
@@ -1016,9 +1057,48 @@ class PillHolder(object):
         else:
             return 0
 
+    def make_scanner(self, scanner_config: dict) -> PillScanner:
+        """The shared scanner, or in place of bluetooth one simulating pills if "Simulate" is set or replaying a capture
+        file if "Replay" is set
+
+        Args:
+            scanner_config (dict): "Scanner" section of data.json
+
+        Returns:
+            PillScanner: scanner the pills register with
+        """
+        kwargs = {
+            "passive": scanner_config.get("Passive", True),
+            "duplicate_window": scanner_config.get("DuplicateWindow", DUPLICATE_WINDOW),
+        }
+        if scanner_config.get("Adaptive", False):
+            kwargs["schedule"] = ScanSchedule(scanner_config.get("Margin", SCHEDULE_MARGIN))
+        if scanner_config.get("Capture"):
+            kwargs["capture"] = CaptureWriter(self.appdata.joinpath(scanner_config["Capture"]))
+            self.log_event(f"Capturing BLE adverts to {kwargs['capture'].path}")
+        if simulate := scanner_config.get("Simulate"):
+            return SimulatedScanner(
+                self,
+                simulate.get("Pills", 50),
+                interval=simulate.get("Interval", 60),
+                repeats=simulate.get("Repeats", 5),
+                speed=simulate.get("Speed", 1),
+                **kwargs,
+            )
+        if scanner_config.get("Replay"):
+            return ReplayScanner(
+                self,
+                self.appdata.joinpath(scanner_config["Replay"]),
+                speed=scanner_config.get("ReplaySpeed", 1),
+                **kwargs,
+            )
+        return PillScanner(self, **kwargs)
+
     def run_headless_pills(self):
 
         self.log_event("Starting Pill Sessions...")
+        self.supervisor = PillSupervisor(self)
+        self.supervisor.add_service("ble-scanner", self.scanner.run)
         for pill_details in self.data.get("Sessions", []):
             # MAC addresses of your RAPT Pill(s) - in case you have more (This hasn't been actually tested but it should in theory work.)
             self.log_event(pill_details)
@@ -1039,13 +1119,32 @@ class PillHolder(object):
             self.pills.append(pill)
             if pill.mtools.logged_in:
                 self.log_event(f'Should start pill session! {pill_details.get("BrewName", "No Session")}')
-                pill.start()
+                self.supervisor.add_pill(pill)
 
             else:
                 self.update_status(f"Not logged in to MeadTools - can't start Brew: {pill.session_name}")
-        while True:
-            # just keep running while headless - this means that the program needs to be quit by the user in console/etc.
-            time()
+        # sleep on the supervisor loop till SIGINT/SIGTERM so we don't burn a core just keeping the process alive
+        self.supervisor.add_job("pill-status", self.data.get("StatusInterval", 600), self.log_pill_status)
+        self.supervisor.run_forever()
+        self.log_event("Headless sessions ended")
+        self.shutdown()
+
+    def shutdown(self):
+        """Stop the readings workers and close MeadTools' outbox once the sessions have ended"""
+        self.readings.stop()
+        upload = self.readings.workers.get("upload")
+        if upload is not None and upload.thread is not None:
+            # it may be putting a reading in the outbox
+            upload.thread.join(5)
+        self.mtools.close()
+
+    def log_pill_status(self):
+        for pill in self.pills:
+            self.log_event(pill)
+        self.scanner.log_stats()
+        self.readings.log_stats()
+        if self.eink:
+            self.log_event(self.eink.stats())
 
     def run_pills(self):
         self.log_event("Starting Pill Sessions...")
@@ -1069,6 +1168,7 @@ class PillHolder(object):
             self.pills.append(pill)
             if pill.mtools.logged_in:
                 self.log_event("Should start pill session!")
+                self.scanner.start()
                 pill.start()
 
             else:
@@ -1091,6 +1191,7 @@ class PillHolder(object):
         self.pills.append(pill)
         if pill.mtools.logged_in:
             self.log_event("Should start pill session!")
+            self.scanner.start()
             pill.start()
 
         else:
@@ -1182,44 +1283,6 @@ class PillHolder(object):
         sys.stdout = sys_stdout
 
 
-class EinkScreen:
-    def __init__(self, pill_holder):
-        self.pill_holder = pill_holder
-
-        self.log_event("Setup Eink Screen!")
-        self.epd = epd3in0g.EPD()
-        self.epd.init()
-        self.epd.Clear()
-        self.font_path = Path(__file__).parent.joinpath("waveshare/fonts/FiraCode-Bold.ttf").as_posix()
-        print(f"FontPath:{self.font_path}")
-        self.font = ImageFont.truetype(
-            Path(__file__).parent.joinpath("waveshare/fonts/FiraCode-Bold.ttf").as_posix(), 20
-        )
-
-    def update_hud(self, pill):
-        # 400w x 168h pixels for waveshare 3" 4 colour screen
-        HImage = Image.new(mode="L", size=(self.epd.height, self.epd.width), color=self.epd.WHITE)
-        draw = ImageDraw.Draw(HImage)
-        draw.text((10, 5), "Brew: ", font=self.font, fill=self.epd.BLACK)
-        draw.text((10, 30), f"{pill.session_name}", font=self.font, fill=self.epd.BLACK)
-
-        draw.text((10, 60), "SG: ", font=self.font, fill=self.epd.BLACK)
-        draw.text((55, 60), f"{pill.curr_gravity}:", font=self.font, fill=self.epd.BLACK)
-
-        draw.text((10, 90), "ABV: ", font=self.font, fill=self.epd.BLACK)
-        draw.text((73, 90), f"{pill.abv}", font=self.font, fill=self.epd.BLACK)
-
-        draw.text((160, 90), "Temp: ", font=self.font, fill=self.epd.BLACK)
-        draw.text((218, 90), f"{pill.temperature}°{pill.temp_unit}", font=self.font, fill=self.epd.BLACK)
-
-        draw.text((10, 115), f"Last Event: ", font=self.font, fill=self.epd.BLACK)
-        draw.text((10, 140), f"{pill.last_event}", font=self.font, fill=self.epd.BLACK)
-        self.epd.display(self.epd.getbuffer(HImage))
-
-    def log_event(self, message, severity="info"):
-        self.pill_holder.log_event(message, severity)
-
-
 def main() -> None:
     # Handle setup of database and pill(s)
     pillHolder = PillHolder()
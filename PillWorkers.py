@@ -0,0 +1,140 @@
+from __future__ import annotations
+import queue
+import threading
+from time import monotonic
+
+
+class ReadingWorker(object):
+    def __init__(self, name: str, handler, pill_holder, maxsize: int = 100):
+        """Consumes readings on its own thread so slow consumers (http, a 20s e-ink refresh) never hold up the ble
+        callback. When the queue is full the oldest reading is dropped - newer readings are worth more.
+
+        Args:
+            name (str): worker name for logging/metrics
+            handler (callable): called with each reading
+            pill_holder (PillHolder): holder used for logging
+            maxsize (int): max readings waiting before we start dropping the oldest
+        """
+        self.name = name
+        self.handler = handler
+        self.pill_holder = pill_holder
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.thread = None
+        self.running = False
+
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.max_depth = 0
+        # seconds between a reading being decoded and the handler picking it up
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.work, name=f"{self.name}-worker", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def submit(self, reading):
+        """Queue a reading without blocking
+
+        Args:
+            reading (PillReading): reading to hand to the handler
+        """
+        self.submitted += 1
+        while True:
+            try:
+                self.queue.put_nowait(reading)
+                break
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def work(self):
+        while self.running:
+            reading = self.queue.get()
+            if reading is None:
+                continue
+            self.last_lag = monotonic() - reading.received
+            self.max_lag = max(self.max_lag, self.last_lag)
+            try:
+                self.handler(reading)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                self.pill_holder.log_event(f"{self.name} worker failed on {reading.session_name}: {e}", "error")
+
+    def stats(self) -> str:
+        return (
+            f"{self.name}: depth {self.depth} (max {self.max_depth}), processed {self.processed}/{self.submitted}, "
+            f"dropped {self.dropped}, failed {self.failed}, lag {self.last_lag:.3f}s (max {self.max_lag:.3f}s)"
+        )
+
+
+class ReadingDispatcher(object):
+    def __init__(self, pill_holder):
+        """Fans readings out to every registered worker
+
+        Args:
+            pill_holder (PillHolder): holder used for logging
+        """
+        self.pill_holder = pill_holder
+        # name -> worker, replaced (not mutated) when adding so publish never needs a lock
+        self.workers = {}
+
+    def add_worker(self, name: str, handler, maxsize: int = 100) -> ReadingWorker:
+        """Create and start a worker, replacing any existing worker with the same name
+
+        Args:
+            name (str): worker name
+            handler (callable): called with each reading
+            maxsize (int): queue size before readings are dropped
+
+        Returns:
+            ReadingWorker: the started worker
+        """
+        worker = ReadingWorker(name, handler, self.pill_holder, maxsize)
+        worker.start()
+        workers = dict(self.workers)
+        if old := workers.get(name):
+            old.stop()
+        workers[name] = worker
+        self.workers = workers
+        return worker
+
+    def publish(self, reading, exclude: tuple = ()):
+        """Hand a reading to every worker - never blocks
+
+        Args:
+            reading (PillReading): reading to publish
+            exclude (tuple): names of workers that shouldn't get this reading
+        """
+        for name, worker in self.workers.items():
+            if name not in exclude:
+                worker.submit(reading)
+
+    def log_stats(self):
+        for worker in self.workers.values():
+            self.pill_holder.log_event(worker.stats())
+
+    def stop(self):
+        for worker in self.workers.values():
+            worker.stop()
@@ -0,0 +1,85 @@
+"""getbuffer for every black/white (and black/red) driver: each driver's getbuffer as it was at a baseline commit
+(read from git and run as a method of the current driver) against its getbuffer now, which packs with
+epdbuffer.pack_1bit, in both orientations. Both have to give the same bytes.
+
+python benchmarks/bench_epd_1bit.py [frames] [baseline commit, default the first commit]
+"""
+import ast
+import importlib
+import random
+import subprocess
+import sys
+import types
+from pathlib import Path
+from time import perf_counter
+
+import epd_fake
+
+epd_fake.install()
+from PIL import Image
+from waveshare.waveshare_epd import epdregistry
+
+ROOT = Path(__file__).parent.parent
+
+
+def git(*args) -> str:
+    return subprocess.run(("git",) + args, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+
+
+def first_commit() -> str:
+    return git("rev-list", "--max-parents=0", "HEAD").split()[-1]
+
+
+def baseline_getbuffer(epd, rev: str):
+    """The driver's getbuffer as it was at rev, bound to epd. Only the method is taken (some old drivers imported
+    RPi.GPIO at the top), it runs with the current module's globals. None if the driver didn't exist then"""
+    module = sys.modules[type(epd).__module__]
+    path = f"waveshare/waveshare_epd/{module.__name__.rsplit('.', 1)[-1]}.py"
+    try:
+        source = git("show", f"{rev}:{path}")
+    except subprocess.CalledProcessError:
+        return None
+    classes = [n for n in ast.parse(source).body if isinstance(n, ast.ClassDef) and n.name == "EPD"]
+    method = next(n for n in classes[0].body if isinstance(n, ast.FunctionDef) and n.name == "getbuffer")
+    namespace = dict(vars(module))
+    exec(compile(ast.Module(body=[method], type_ignores=[]), f"{rev}:{path}", "exec"), namespace)
+    return types.MethodType(namespace["getbuffer"], epd)
+
+
+def timed(func, frames: int) -> tuple:
+    out = func()
+    start = perf_counter()
+    for _ in range(frames):
+        func()
+    return (perf_counter() - start) / frames, bytes(x & 0xFF for x in out)
+
+
+if __name__ == "__main__":
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    rev = sys.argv[2] if len(sys.argv) > 2 else first_commit()
+    random.seed(1)
+    print(f"baseline: {git('log', '-1', '--format=%h %s', rev).strip()}")
+    print(f"{'driver':<18}{'size':>10}{'orient':>8}{'before ms':>11}{'after ms':>10}{'speedup':>9}")
+    for name, panel in sorted(epdregistry.PANELS.items()):
+        if panel.bpp != 1:
+            continue
+        try:
+            epd = importlib.import_module(f"waveshare.waveshare_epd.{name}").EPD()
+        except ImportError as e:
+            print(f"{name:<18} skipped, {e}")
+            continue
+        legacy = baseline_getbuffer(epd, rev)
+        if legacy is None:
+            print(f"{name:<18} skipped, not in the baseline")
+            continue
+        for orient, size in (("native", (epd.width, epd.height)), ("turned", (epd.height, epd.width))):
+            if orient == "turned" and epd.width == epd.height:
+                continue
+            image = Image.frombytes("L", size, bytes(random.getrandbits(8) for _ in range(size[0] * size[1])))
+            before, old = timed(lambda: legacy(image), frames)
+            after, new = timed(lambda: epd.getbuffer(image), frames)
+            assert old == new, f"{name} {orient} output differs"
+            print(
+                f"{name:<18}{'%dx%d' % (epd.width, epd.height):>10}{orient:>8}"
+                f"{before * 1000:>11.2f}{after * 1000:>10.3f}{before / after:>8.0f}x"
+            )
@@ -0,0 +1,102 @@
+"""getbuffer_4Gray on every 4 gray driver: the per pixel loop they had against epdbuffer.pack_4gray. Before timing,
+each driver's output is checked byte for byte against the old loop on a set of sample images (random full range
+gray, the four levels the drivers document, an rgb gradient, rendered text) in both orientations.
+
+python benchmarks/bench_epd_4gray.py [frames]
+"""
+import importlib
+import random
+import sys
+from time import perf_counter
+
+import epd_fake
+
+epd_fake.install()
+from PIL import Image, ImageDraw
+from waveshare.waveshare_epd import epdregistry
+
+# epd4in2/_V2 transpose landscape frames instead of turning them
+TRANSPOSED = {"epd4in2", "epd4in2_V2"}
+# 4 gray drivers the registry leaves out (epd3in7 has no plain display)
+UNREGISTERED = ["epd3in7"]
+
+
+def legacy_4gray(epd, image, transposed=False):
+    buf = [0xFF] * (int(epd.width / 4) * epd.height)
+    image_monocolor = image.convert("L")
+    imwidth, imheight = image_monocolor.size
+    pixels = image_monocolor.load()
+    i = 0
+    if imwidth == epd.width and imheight == epd.height:
+        for y in range(imheight):
+            for x in range(imwidth):
+                if pixels[x, y] == 0xC0:
+                    pixels[x, y] = 0x80
+                elif pixels[x, y] == 0x80:
+                    pixels[x, y] = 0x40
+                i = i + 1
+                if i % 4 == 0:
+                    buf[int((x + (y * epd.width)) / 4)] = (
+                        (pixels[x - 3, y] & 0xC0) | (pixels[x - 2, y] & 0xC0) >> 2
+                        | (pixels[x - 1, y] & 0xC0) >> 4 | (pixels[x, y] & 0xC0) >> 6
+                    )
+    elif imwidth == epd.height and imheight == epd.width:
+        for x in range(imwidth):
+            for y in range(imheight):
+                newx = y
+                newy = x if transposed else epd.height - x - 1
+                if pixels[x, y] == 0xC0:
+                    pixels[x, y] = 0x80
+                elif pixels[x, y] == 0x80:
+                    pixels[x, y] = 0x40
+                i = i + 1
+                if i % 4 == 0:
+                    buf[int((newx + (newy * epd.width)) / 4)] = (
+                        (pixels[x, y - 3] & 0xC0) | (pixels[x, y - 2] & 0xC0) >> 2
+                        | (pixels[x, y - 1] & 0xC0) >> 4 | (pixels[x, y] & 0xC0) >> 6
+                    )
+    return buf
+
+
+def samples(size: tuple) -> dict:
+    w, h = size
+    text = Image.new("L", size, 0xFF)
+    draw = ImageDraw.Draw(text)
+    for y, fill in zip(range(0, h, 24), (0x00, 0x80, 0xC0) * h):
+        draw.text((4, y), "SG 1.0345 ABV 7.21% 19.5C", fill=fill)
+    return {
+        "random": Image.frombytes("L", size, bytes(random.getrandbits(8) for _ in range(w * h))),
+        "4 levels": Image.frombytes("L", size, bytes(random.choice((0x00, 0x80, 0xC0, 0xFF)) for _ in range(w * h))),
+        "gradient": Image.linear_gradient("L").resize(size).convert("RGB"),
+        "text": text,
+    }
+
+
+if __name__ == "__main__":
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    random.seed(1)
+    print(f"{'driver':<14}{'size':>10}{'before ms':>11}{'after ms':>10}{'speedup':>9}")
+    for name in sorted([name for name, panel in epdregistry.PANELS.items() if panel.gray4] + UNREGISTERED):
+        try:
+            epd = importlib.import_module(f"waveshare.waveshare_epd.{name}").EPD()
+        except ImportError as e:
+            print(f"{name:<14} skipped, {e}")
+            continue
+        for size in ((epd.width, epd.height), (epd.height, epd.width)):
+            for sample, image in samples(size).items():
+                old = bytes(legacy_4gray(epd, image, name in TRANSPOSED))
+                assert old == bytes(epd.getbuffer_4Gray(image)), f"{name} {size} {sample} output differs"
+
+        image = samples((epd.width, epd.height))["text"]
+        start = perf_counter()
+        for _ in range(frames):
+            legacy_4gray(epd, image, name in TRANSPOSED)
+        before = (perf_counter() - start) / frames
+        start = perf_counter()
+        for _ in range(frames):
+            epd.getbuffer_4Gray(image)
+        after = (perf_counter() - start) / frames
+        print(
+            f"{name:<14}{'%dx%d' % (epd.width, epd.height):>10}"
+            f"{before * 1000:>11.1f}{after * 1000:>10.3f}{before / after:>8.0f}x"
+        )
@@ -0,0 +1,55 @@
+"""CPU used while waiting out a panel refresh, in real drivers: their old ReadBusy poll loops (digital_read then
+delay_ms, 5-100ms depending on the driver) against their ReadBusy now, epdconfig.wait_busy sleeping on the backend's
+wait_for_idle. Both run on epd_fake's recording backend with BUSY held by a timer for the refresh and real delay_ms
+sleeps, so this runs anywhere; on a pi each poll also costs a gpiozero read. Also reports how late after BUSY dropped
+each wait returned and how many times BUSY was read.
+
+python benchmarks/bench_epd_busy.py [refresh seconds]
+"""
+import sys
+import time
+
+import epd_fake
+
+recorder = epd_fake.install()
+from waveshare.waveshare_epd import epdconfig, epd1in54, epd2in13_V4, epd3in0g
+
+# driver, its busy wait, BUSY level while busy and the delay_ms its old poll loop slept for
+DRIVERS = (
+    (epd3in0g, "ReadBusyH", 0, 5),
+    (epd2in13_V4, "ReadBusy", 1, 10),
+    (epd1in54, "ReadBusy", 1, 100),
+)
+
+
+def legacy_read_busy(epd, busy_level: int, delay: int):
+    # what the drivers' ReadBusy did, e.g. epd2in13_V4: while(digital_read(busy_pin) == 1): delay_ms(10)
+    while epdconfig.digital_read(epd.busy_pin) == busy_level:
+        epdconfig.delay_ms(delay)
+
+
+def measure(wait, busy_for: float, busy_level: int) -> tuple:
+    recorder.busy_for(busy_for, busy_level)
+    wall, cpu = time.perf_counter(), time.process_time()
+    wait()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    return wall, cpu, wall - busy_for, recorder.busy_reads
+
+
+if __name__ == "__main__":
+    busy_for = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    recorder.real_delays = True
+    print(f"{'driver':<14}{'busy wait':<18}{'wall s':>8}{'cpu ms':>10}{'cpu %':>8}{'late ms':>9}{'reads':>7}")
+    for module, method, busy_level, delay in DRIVERS:
+        epd = module.EPD()
+        name = module.__name__.rsplit(".", 1)[-1]
+        for label, wait in (
+            (f"delay_ms({delay}) poll", lambda: legacy_read_busy(epd, busy_level, delay)),
+            ("wait_busy", getattr(epd, method)),
+        ):
+            wall, cpu, late, reads = measure(wait, busy_for, busy_level)
+            assert late >= 0, f"{name} {label} returned while BUSY was still held"
+            print(
+                f"{name:<14}{label:<18}{wall:>8.2f}{cpu * 1000:>10.1f}{cpu / wall * 100:>8.1f}{late * 1000:>9.1f}"
+                f"{reads:>7}"
+            )
@@ -0,0 +1,54 @@
+"""Frames/sec of epd3in0g.getbuffer on the 168x400 panel against the old per pixel python packing.
+
+python benchmarks/bench_epd_getbuffer.py [frames]
+"""
+import sys
+from time import perf_counter
+
+import epd_fake
+
+epd_fake.install()
+from PIL import Image, ImageDraw
+from waveshare.waveshare_epd import epd3in0g
+
+
+def legacy_getbuffer(epd, image):
+    pal_image = Image.new("P", (1, 1))
+    pal_image.putpalette((0, 0, 0, 255, 255, 255, 255, 255, 0, 255, 0, 0) + (0, 0, 0) * 252)
+    image_temp = image.rotate(90, expand=True)
+    buf_4color = bytearray(image_temp.convert("RGB").quantize(palette=pal_image).tobytes("raw"))
+    buf = [0x00] * int(epd.width * epd.height / 4)
+    idx = 0
+    for i in range(0, len(buf_4color), 4):
+        buf[idx] = (buf_4color[i] << 6) + (buf_4color[i + 1] << 4) + (buf_4color[i + 2] << 2) + buf_4color[i + 3]
+        idx += 1
+    return buf
+
+
+def hud_frame(epd):
+    image = Image.new("L", (epd.height, epd.width), 255)
+    draw = ImageDraw.Draw(image)
+    draw.text((10, 5), "Brew: Pacific Tangerine Sunrise", fill=0)
+    draw.text((10, 60), "SG: 1.0345  ABV: 0.7219  Temp: 19.53C", fill=0)
+    draw.rectangle((300, 100, 390, 160), fill=128)
+    return image
+
+
+def frames_per_sec(func, frames: int) -> float:
+    start = perf_counter()
+    for _ in range(frames):
+        func()
+    return frames / (perf_counter() - start)
+
+
+if __name__ == "__main__":
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    epd = epd3in0g.EPD()
+    image = hud_frame(epd)
+    assert bytes(legacy_getbuffer(epd, image)) == bytes(epd.getbuffer(image)), "packed output differs"
+    before = frames_per_sec(lambda: legacy_getbuffer(epd, image), frames)
+    after = frames_per_sec(lambda: epd.getbuffer(image), frames)
+    print(f"{'getbuffer':<12}{'frames/s':>10}")
+    print(f"{'before':<12}{before:>10.1f}")
+    print(f"{'after':<12}{after:>10.1f}")
+    print(f"speedup {after / before:.1f}x")
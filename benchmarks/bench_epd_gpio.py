@@ -0,0 +1,197 @@
+"""GPIO overhead of the two raspberry pi backends in epdconfig: RaspberryPi (gpiozero LED/Button objects behind an
+if/elif chain) and RaspberryPiLgpio (pin -> lgpio handle table, one lgpio call per write). Both run against the same
+mock chip and a spidev that drops the bytes, so what is timed is the python between a driver and the chip:
+    pin toggles/sec
+    a full epd3in0g frame sent the per byte way (send_command/send_data, four pin writes a byte)
+    the same frame as one bulk transfer (send_data_bulk)
+
+gpiozero's own MockFactory is used when gpiozero is installed. Without it a stand-in makes the same chain of calls
+gpiozero does for LED.on()/off() down to lgpio, but skips its locks and checks, so it is cheaper than the real thing.
+
+python benchmarks/bench_epd_gpio.py [toggles]
+"""
+import sys
+import types
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, Path(__file__).parent.parent.as_posix())
+
+
+class MockChip(object):
+    def __init__(self):
+        """Pin levels of a gpiochip, shared by the lgpio mock and the gpiozero stand-in"""
+        self.levels = {}
+        self.writes = 0
+
+    def write(self, pin, level):
+        self.writes += 1
+        self.levels[pin] = level
+        return 0
+
+
+chip = MockChip()
+
+
+def mock_lgpio() -> types.ModuleType:
+    lgpio = types.ModuleType("lgpio")
+    lgpio.BOTH_EDGES = 3
+    lgpio.SET_PULL_DOWN = 64
+    lgpio.gpiochip_open = lambda gpiochip: 0
+    lgpio.gpiochip_close = lambda handle: 0
+    lgpio.gpio_claim_output = lambda handle, gpio, level=0, flags=0: chip.write(gpio, level)
+    lgpio.gpio_claim_alert = lambda handle, gpio, edge, flags=0, notify_handle=None: 0
+    lgpio.gpio_free = lambda handle, gpio: 0
+    lgpio.gpio_read = lambda handle, gpio: chip.levels.get(gpio, 0)
+    lgpio.callback = lambda handle, gpio, edge, func: types.SimpleNamespace(cancel=lambda: None)
+
+    def gpio_write(handle, gpio, level):
+        # the real wrapper turns a negative status into an exception
+        status = chip.write(gpio, level)
+        if status < 0:
+            raise RuntimeError(status)
+        return status
+
+    lgpio.gpio_write = gpio_write
+    return lgpio
+
+
+def mock_spidev() -> types.ModuleType:
+    class SpiDev(object):
+        def open(self, bus, device):
+            pass
+
+        def close(self):
+            pass
+
+        def writebytes(self, data):
+            pass
+
+        def writebytes2(self, data):
+            pass
+
+    return types.SimpleNamespace(SpiDev=SpiDev)
+
+
+def gpiozero_standin(lgpio: types.ModuleType) -> types.SimpleNamespace:
+    # the calls gpiozero 2.0 makes for LED.on()/off() with its lgpio pin factory, minus the locking and validation
+    class LGPIOPin(object):
+        def __init__(self, number):
+            self._number = number
+            self._handle = lgpio.gpiochip_open(0)
+
+        def _get_state(self):
+            return lgpio.gpio_read(self._handle, self._number)
+
+        def _set_state(self, value):
+            lgpio.gpio_write(self._handle, self._number, bool(value))
+
+        state = property(lambda self: self._get_state(), lambda self, value: self._set_state(value))
+
+    class LED(object):
+        def __init__(self, pin, active_high=True):
+            self.pin = LGPIOPin(pin)
+            self.active_high = active_high
+            self._blink_thread = None
+            self._closed = False
+
+        def _check_open(self):
+            if self._closed:
+                raise RuntimeError("device is closed")
+
+        def _stop_blink(self):
+            if getattr(self, "_controller", None):
+                self._controller._stop_blink(self)
+            if self._blink_thread:
+                self._blink_thread.stop()
+
+        def _write(self, value):
+            if not self.active_high:
+                value = not value
+            self._check_open()
+            self.pin.state = bool(value)
+
+        def on(self):
+            self._stop_blink()
+            self._write(True)
+
+        def off(self):
+            self._stop_blink()
+            self._write(False)
+
+    class Button(LED):
+        def __init__(self, pin, pull_up=True):
+            super().__init__(pin)
+
+        @property
+        def value(self):
+            return self.pin.state
+
+    return types.SimpleNamespace(LED=LED, Button=Button)
+
+
+def install_gpiozero(lgpio: types.ModuleType) -> str:
+    try:
+        import gpiozero
+        from gpiozero.pins.mock import MockFactory
+    except ImportError:
+        sys.modules["gpiozero"] = gpiozero_standin(lgpio)
+        return "stand-in"
+    gpiozero.Device.pin_factory = MockFactory()
+    return "gpiozero MockFactory"
+
+
+def toggles(impl, count: int) -> float:
+    start = perf_counter()
+    for _ in range(count // 2):
+        impl.digital_write(impl.DC_PIN, 1)
+        impl.digital_write(impl.DC_PIN, 0)
+    return count / (perf_counter() - start)
+
+
+def per_byte_upload(impl, buf) -> float:
+    start = perf_counter()
+    for byte in buf:
+        impl.digital_write(impl.DC_PIN, 1)
+        impl.digital_write(impl.CS_PIN, 0)
+        impl.spi_writebyte([byte])
+        impl.digital_write(impl.CS_PIN, 1)
+    return perf_counter() - start
+
+
+def bulk_upload(impl, buf) -> float:
+    start = perf_counter()
+    impl.digital_write(impl.DC_PIN, 1)
+    impl.digital_write(impl.CS_PIN, 0)
+    for i in range(0, len(buf), 4096):
+        impl.spi_writebyte2(buf[i:i + 4096])
+    impl.digital_write(impl.CS_PIN, 1)
+    return perf_counter() - start
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    sys.modules["lgpio"] = mock_lgpio()
+    sys.modules["spidev"] = mock_spidev()
+    gpiozero = install_gpiozero(sys.modules["lgpio"])
+    from waveshare.waveshare_epd import epdconfig, epdregistry
+
+    panel = epdregistry.get_panel("epd3in0g")
+    buf = bytes(range(256)) * (panel.width * panel.height // 4 // 256 + 1)
+    buf = buf[0:panel.width * panel.height // 4]
+    print(f"gpio: {gpiozero}, frame: {len(buf)} bytes ({panel.module})")
+    print(f"{'backend':<18}{'toggles/s':>12}{'per byte ms':>14}{'bulk ms':>10}{'chip writes':>13}")
+    results = {}
+    for name, backend in (("gpiozero", epdconfig.RaspberryPi), ("lgpio", epdconfig.RaspberryPiLgpio)):
+        impl = backend()
+        impl.module_init()
+        chip.writes = 0
+        rate = toggles(impl, count)
+        per_byte = per_byte_upload(impl, buf)
+        bulk = bulk_upload(impl, buf)
+        results[name] = rate, per_byte
+        print(f"{name:<18}{rate:>12.0f}{per_byte * 1000:>14.1f}{bulk * 1000:>10.3f}{chip.writes:>13}")
+    print(
+        f"lgpio: {results['lgpio'][0] / results['gpiozero'][0]:.1f}x the toggles/s, "
+        f"per byte frame {results['gpiozero'][1] / results['lgpio'][1]:.1f}x faster"
+    )
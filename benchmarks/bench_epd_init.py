@@ -0,0 +1,78 @@
+"""Panel wake-up: every init method of every registered driver, with its command tables sent the way the drivers used
+to (send_command/send_data, a CS frame and four pin writes per byte) against epdsequence sending each command and its
+parameters in one CS frame with epdconfig's own send_command_bulk. Both run on epd_fake's recording backend. Checks
+both put the same bytes on the bus with the same DC levels, and reports the pin writes and SPI transfers per init - on
+the pi each of those is a gpiozero/spidev call, which is where the time goes.
+
+python benchmarks/bench_epd_init.py [rounds]
+"""
+import importlib
+import inspect
+import sys
+from time import perf_counter
+
+import epd_fake
+
+recorder = epd_fake.install()
+from waveshare.waveshare_epd import epdconfig, epdregistry
+
+
+def legacy_send(dc_pin, cs_pin, command, data=()):
+    # what send_command followed by send_data for each parameter did, on the same backend
+    for dc, byte in [(0, command)] + [(1, b) for b in data]:
+        epdconfig.digital_write(dc_pin, dc)
+        epdconfig.digital_write(cs_pin, 0)
+        epdconfig.spi_writebyte([byte])
+        epdconfig.digital_write(cs_pin, 1)
+
+
+def inits(epd, panel) -> dict:
+    """init methods that can be called without arguments, plus init with the registry's arguments"""
+    calls = {"init": lambda: epd.init(*epdregistry.init_args(panel, epd))}
+    for name, method in inspect.getmembers(epd, inspect.ismethod):
+        required = [p for p in inspect.signature(method).parameters.values() if p.default is p.empty]
+        if name.lower().startswith("init") and name != "init" and not required:
+            calls[name] = method
+    return calls
+
+
+def measure(call, rounds: int) -> tuple:
+    # also puts BUSY back, so both ways read it the same
+    recorder.reset()
+    call()
+    result = bytes(recorder.sent), bytes(recorder.dc), recorder.pin_writes, recorder.writes
+    start = perf_counter()
+    for _ in range(rounds):
+        call()
+    return result, (perf_counter() - start) / rounds
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    bulk = epdconfig.send_command_bulk
+    assert bulk.__module__ == epdconfig.__name__, "should time epdconfig's send_command_bulk"
+    print(f"{'driver':<18}{'init':<14}{'bytes':>6}{'pin writes':>16}{'spi transfers':>16}{'host us':>14}")
+    totals = [0, 0, 0, 0]
+    for name, panel in sorted(epdregistry.PANELS.items()):
+        try:
+            module = importlib.import_module(f"waveshare.waveshare_epd.{name}")
+        except ImportError as e:
+            print(f"{name:<18} skipped, {e}")
+            continue
+        if not hasattr(module, "epdsequence"):
+            # epd4in2b_V2(_old) talk to the panel through the DEV_SPI library and keep their own send_command
+            print(f"{name:<18} skipped, doesn't use epdsequence")
+            continue
+        epd = module.EPD()
+        for init, call in inits(epd, panel).items():
+            epdconfig.send_command_bulk = legacy_send
+            (sent, dc, pins_before, spi_before), before = measure(call, rounds)
+            epdconfig.send_command_bulk = bulk
+            (new_sent, new_dc, pins_after, spi_after), after = measure(call, rounds)
+            assert (sent, dc) == (new_sent, new_dc), f"{name}.{init} sends different bytes"
+            totals = [t + v for t, v in zip(totals, (pins_before, pins_after, spi_before, spi_after))]
+            print(
+                f"{name:<18}{init:<14}{len(sent):>6}{pins_before:>8}->{pins_after:<7}{spi_before:>8}->{spi_after:<7}"
+                f"{before * 1e6:>6.0f}->{after * 1e6:<6.0f}"
+            )
+    print(f"all inits: pin writes {totals[0]} -> {totals[1]}, spi transfers {totals[2]} -> {totals[3]}")
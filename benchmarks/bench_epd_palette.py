@@ -0,0 +1,135 @@
+"""getbuffer on every colour (4 colour "g", 7 colour "f", 6 colour "e") driver: the palette image built on each call and
+the python packing loop they had against epdbuffer.pack_palette, dithered and not. epd4in01f matched colours exactly,
+pixel by pixel, and is checked against epdbuffer.pack_palette_exact. Each driver's output is checked against its old
+implementation in both orientations before timing.
+
+Besides the time per frame it reports the peak python allocation (tracemalloc) and the pixel memory of the images PIL
+allocates, which tracemalloc can't see.
+
+python benchmarks/bench_epd_palette.py [frames]
+"""
+import importlib
+import random
+import sys
+import tracemalloc
+from time import perf_counter
+
+import epd_fake
+
+epd_fake.install()
+from PIL import Image, ImageDraw
+from waveshare.waveshare_epd import epdregistry
+
+# drivers that never quantized, pixels that aren't exactly a panel colour are sent as colour 0
+EXACT = {"epd4in01f"}
+
+
+class PixelCounter(object):
+    def __init__(self):
+        """Adds up the pixel memory of every image PIL creates (4 bytes a pixel for the multi band modes)"""
+        self.bytes = 0
+        self.__new = Image.Image._new
+
+        def _new(image, im):
+            self.bytes += im.size[0] * im.size[1] * (1 if Image.getmodebands(im.mode) == 1 else 4)
+            return self.__new(image, im)
+
+        Image.Image._new = _new
+
+
+def legacy_quantize(epd, image, bits):
+    pal_image = Image.new("P", (1, 1))
+    palette = importlib.import_module(type(epd).__module__).PALETTE
+    pal_image.putpalette(palette + (0, 0, 0) * (256 - len(palette) // 3))
+    image_temp = image if image.size == (epd.width, epd.height) else image.rotate(90, expand=True)
+    image_color = image_temp.convert("RGB").quantize(palette=pal_image)
+    buf_color = bytearray(image_color.tobytes("raw"))
+    # rows are padded to whole bytes (epd2in13g is 122 wide)
+    per_byte = 8 // bits
+    linewidth = (epd.width + per_byte - 1) // per_byte
+    buf = [0x00] * (linewidth * epd.height)
+    for i, color in enumerate(buf_color):
+        y, x = divmod(i, epd.width)
+        buf[y * linewidth + x // per_byte] |= color << (8 - bits * (x % per_byte + 1))
+    return buf
+
+
+def legacy_exact(epd, image):
+    palette = importlib.import_module(type(epd).__module__).PALETTE
+    colors = {palette[i:i + 3]: i // 3 for i in range(0, len(palette), 3)}
+    buf = [0x00] * int(epd.width * epd.height / 2)
+    image_rgb = image.convert("RGB")
+    imwidth, imheight = image_rgb.size
+    pixels = image_rgb.load()
+    for y in range(imheight):
+        for x in range(imwidth):
+            newx, newy = (x, y) if imwidth == epd.width else (y, epd.height - x - 1)
+            add = int((newx + newy * epd.width) / 2)
+            color = colors.get(pixels[x, y], 0)
+            buf[add] = buf[add] & ~(0xF0 >> ((newx % 2) * 4)) | ((color << 4) >> ((newx % 2) * 4))
+    return buf
+
+
+def samples(size: tuple, palette: tuple) -> dict:
+    w, h = size
+    colors = [palette[i:i + 3] for i in range(0, len(palette), 3)]
+    flat = Image.new("RGB", size, colors[1])
+    draw = ImageDraw.Draw(flat)
+    for i, y in enumerate(range(0, h, 20)):
+        draw.text((4, y), "SG 1.0345 ABV 7.21% 19.5C", fill=colors[i % len(colors)])
+    return {
+        "random": Image.frombytes("RGB", size, bytes(random.getrandbits(8) for _ in range(w * h * 3))),
+        "gradient": Image.linear_gradient("L").resize(size).convert("RGB"),
+        "panel colours": flat,
+    }
+
+
+def measure(func, image, frames: int, counter: PixelCounter) -> tuple:
+    func(image)
+    counter.bytes = 0
+    tracemalloc.start()
+    start = perf_counter()
+    for _ in range(frames):
+        func(image)
+    secs = (perf_counter() - start) / frames
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return secs, peak, counter.bytes / frames
+
+
+if __name__ == "__main__":
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    random.seed(1)
+    counter = PixelCounter()
+    print(
+        f"{'driver':<12}{'size':>9}  {'path':<14}{'ms/frame':>10}{'py peak KB':>12}{'PIL KB/frame':>14}"
+    )
+    for name, panel in sorted(epdregistry.PANELS.items()):
+        if panel.colors < 4:
+            continue
+        try:
+            epd = importlib.import_module(f"waveshare.waveshare_epd.{name}").EPD()
+        except ImportError as e:
+            print(f"{name:<12} skipped, {e}")
+            continue
+        palette = importlib.import_module(f"waveshare.waveshare_epd.{name}").PALETTE
+        if name in EXACT:
+            legacy = lambda image: legacy_exact(epd, image)
+            paths = {"exact": epd.getbuffer}
+        else:
+            legacy = lambda image: legacy_quantize(epd, image, panel.bpp)
+            paths = {"dither": epd.getbuffer, "no dither": lambda image: epd.getbuffer(image, dither=False)}
+        for size in ((epd.width, epd.height), (epd.height, epd.width)):
+            for sample, image in samples(size, palette).items():
+                old = bytes(legacy(image))
+                new = bytes(next(iter(paths.values()))(image))
+                assert old == new, f"{name} {size} {sample} output differs"
+
+        image = samples((epd.width, epd.height), palette)["random"]
+        results = {"legacy": measure(legacy, image, frames, counter)}
+        results.update((path, measure(func, image, frames, counter)) for path, func in paths.items())
+        for path, (secs, peak, pil) in results.items():
+            print(
+                f"{name:<12}{'%dx%d' % (epd.width, epd.height):>9}  {path:<14}"
+                f"{secs * 1000:>10.2f}{peak / 1024:>12.1f}{pil / 1024:>14.1f}"
+            )
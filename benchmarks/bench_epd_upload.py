@@ -0,0 +1,54 @@
+"""Time to push one epd3in0g frame through epdconfig onto the recording backend (epd_fake), per byte send_data vs the
+bulk send_data2, which is epdconfig's own send_data_bulk. The recorder costs almost nothing per pin write or transfer,
+so on a pi the gap is bigger - every spi transfer is an ioctl and every pin write goes through gpiozero. The
+transfer/pin write counts are the numbers that carry over.
+
+python benchmarks/bench_epd_upload.py [frames]
+"""
+import sys
+from time import perf_counter
+
+import epd_fake
+
+recorder = epd_fake.install()
+from waveshare.waveshare_epd import epd3in0g
+
+
+def legacy_upload(epd, buf):
+    width = epd.width // 4 if epd.width % 4 == 0 else epd.width // 4 + 1
+    epd.send_command(0x10)
+    for j in range(0, epd.height):
+        for i in range(0, width):
+            epd.send_data(buf[i + j * width])
+
+
+def bulk_upload(epd, buf):
+    width = epd.width // 4 if epd.width % 4 == 0 else epd.width // 4 + 1
+    epd.send_command(0x10)
+    epd.send_data2(buf[0:width * epd.height])
+
+
+def measure(func, frames: int) -> tuple:
+    recorder.reset()
+    func()
+    sent, writes, pin_writes = bytes(recorder.sent), recorder.writes, recorder.pin_writes
+    start = perf_counter()
+    for _ in range(frames):
+        func()
+    return (perf_counter() - start) / frames, sent, writes, pin_writes
+
+
+if __name__ == "__main__":
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    epd = epd3in0g.EPD()
+    buf = bytes(range(256)) * (epd.width * epd.height // 4 // 256 + 1)
+    buf = buf[0:epd.width * epd.height // 4]
+
+    before = measure(lambda: legacy_upload(epd, buf), frames)
+    after = measure(lambda: bulk_upload(epd, buf), frames)
+    assert before[1] == after[1], "bytes sent differ"
+
+    print(f"{'upload':<10}{'ms/frame':>10}{'spi xfers':>12}{'pin writes':>12}")
+    for name, (secs, _, writes, pin_writes) in (("per byte", before), ("bulk", after)):
+        print(f"{name:<10}{secs * 1000:>10.2f}{writes:>12}{pin_writes:>12}")
+    print(f"speedup {before[0] / after[0]:.1f}x for {len(buf)} bytes")
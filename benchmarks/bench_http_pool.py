@@ -0,0 +1,67 @@
+"""Per request latency against a local stub MeadTools server, with and without connection pooling.
+
+python benchmarks/bench_http_pool.py [requests]
+"""
+import json
+import statistics
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from time import perf_counter
+
+import requests
+
+sys.path.insert(0, Path(__file__).parent.parent.as_posix())
+from MeadToolsSession import MeadToolsSession
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"ok": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        return
+
+
+class QuietHolder(object):
+    def log_event(self, message, severity="info"):
+        pass
+
+
+def time_requests(send, count: int) -> list:
+    timings = []
+    for _ in range(count):
+        start = perf_counter()
+        send()
+        timings.append((perf_counter() - start) * 1000)
+    return timings
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/hydrometer/rapt-pill"
+    body = {"token": "bench", "name": "Bench Pill", "gravity": 1.05, "temperature": 20.1, "battery": 100}
+
+    session = MeadToolsSession(QuietHolder())
+    results = {
+        "requests.post (no pool)": time_requests(lambda: requests.post(url, json=body, timeout=5), count),
+        "MeadToolsSession (pooled)": time_requests(lambda: session.post(url, json=body), count),
+    }
+    print(f"{'client':<28}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, timings in results.items():
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        print(f"{name:<28}{statistics.mean(timings):>10.3f}{statistics.median(timings):>10.3f}{p99:>10.3f}")
+    server.shutdown()
@@ -0,0 +1,77 @@
+"""Hud reading -> packed epd3in0g frame, the way it was done (landscape frame copied from the background, then turned,
+converted and quantized by getbuffer) against drawing straight into the panel's portrait orientation. Counts the full
+frame images PIL allocates on the way, as well as the time, and checks both give the same bytes.
+
+python benchmarks/bench_hud_frame.py [frames]
+"""
+import sys
+from pathlib import Path
+from time import perf_counter
+
+import epd_fake
+
+epd_fake.install()
+from PIL import Image, ImageFont
+from waveshare.waveshare_epd import epd3in0g, epdbuffer
+
+from bench_hud_render import frames
+from PillEink import HudRenderer
+
+WHITE, BLACK = 0xFFFFFF, 0x000000
+
+
+class FrameCounter(object):
+    def __init__(self, sizes: tuple):
+        """Counts images PIL creates with one of the given sizes (either orientation of the frame)
+
+        Args:
+            sizes (tuple): (width, height) sizes that count as a full frame
+        """
+        self.sizes = sizes
+        self.count = 0
+        self.__new = Image.Image._new
+
+        def _new(image, im):
+            if im.size in self.sizes:
+                self.count += 1
+            return self.__new(image, im)
+
+        Image.Image._new = _new
+
+
+def legacy_getbuffer(epd, image):
+    image_temp = image.rotate(90, expand=True)
+    image_4color = image_temp.convert("RGB").quantize(palette=epdbuffer.palette_image(epd3in0g.PALETTE))
+    return image_4color.tobytes("raw", "P;2")
+
+
+def measure(func, values: list, counter: FrameCounter) -> tuple:
+    func(values[0])
+    counter.count = 0
+    start = perf_counter()
+    for v in values:
+        func(v)
+    return (perf_counter() - start) / len(values), counter.count / len(values)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    epd = epd3in0g.EPD()
+    font = ImageFont.truetype(Path(__file__).parent.parent.joinpath("waveshare/fonts/FiraCode-Bold.ttf").as_posix(), 20)
+    landscape = HudRenderer((epd.height, epd.width), font, WHITE, BLACK)
+    native = HudRenderer((epd.height, epd.width), font, WHITE, BLACK, rotate=True)
+    values = frames(count)
+    counter = FrameCounter(((epd.width, epd.height), (epd.height, epd.width)))
+
+    # the landscape renderer used to copy the background every frame, keep that copy in the old path
+    legacy = lambda v: legacy_getbuffer(epd, landscape.render(v).copy())
+    current = lambda v: epd.getbuffer(native.render(v))
+    for v in values:
+        assert legacy(v) == current(v), f"packed frames differ for {v}"
+
+    before = measure(legacy, values, counter)
+    after = measure(current, values, counter)
+    print(f"{'frame':<10}{'ms/frame':>10}{'frame allocs':>14}")
+    for name, (secs, allocs) in (("landscape", before), ("native", after)):
+        print(f"{name:<10}{secs * 1000:>10.3f}{allocs:>14.1f}")
+    print(f"speedup {before[0] / after[0]:.1f}x")
@@ -0,0 +1,68 @@
+"""Time to draw one e-ink hud frame: ImageDraw.text for every label and value (how render_hud used to draw) vs
+HudRenderer, which copies a pre-rendered background and blits cached glyphs. Both are checked to give the same pixels.
+Run it on the pi itself for numbers that mean anything there - FreeType is a bigger share of the frame on a slow cpu.
+
+python benchmarks/bench_hud_render.py [frames]
+"""
+import sys
+from pathlib import Path
+from time import perf_counter
+
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+
+sys.path.insert(0, Path(__file__).parent.parent.as_posix())
+from PillEink import HUD_LABELS, HUD_VALUES, HudRenderer
+
+SIZE = (400, 168)
+WHITE, BLACK = 0xFFFFFF, 0x000000
+
+
+def legacy_render(font, values: dict) -> Image.Image:
+    image = Image.new(mode="RGB", size=SIZE, color=WHITE)
+    draw = ImageDraw.Draw(image)
+    for x, y, text in HUD_LABELS:
+        draw.text((x, y), text, font=font, fill=BLACK)
+    for x, y, fmt in HUD_VALUES:
+        draw.text((x, y), fmt.format(**values), font=font, fill=BLACK)
+    return image
+
+
+def frames(count: int) -> list:
+    return [
+        {
+            "Brew": "Blackberry Mead",
+            "SG": round(1.1 - i * 0.0007, 4),
+            "ABV": round(i * 0.09, 2),
+            "Temp": round(18 + (i % 40) * 0.1, 1),
+            "Unit": "C" if i % 2 else "F",
+            "Event": f"Logged data point {i} to MeadTools",
+        }
+        for i in range(count)
+    ]
+
+
+def measure(render, values: list) -> float:
+    render(values[0])
+    start = perf_counter()
+    for v in values:
+        render(v)
+    return (perf_counter() - start) / len(values)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    font = ImageFont.truetype(Path(__file__).parent.parent.joinpath("waveshare/fonts/FiraCode-Bold.ttf").as_posix(), 20)
+    values = frames(count)
+
+    start = perf_counter()
+    hud = HudRenderer(SIZE, font, WHITE, BLACK)
+    setup = perf_counter() - start
+    for v in values:
+        assert ImageChops.difference(legacy_render(font, v), hud.render(v)).getbbox() is None, f"frames differ for {v}"
+
+    before = measure(lambda v: legacy_render(font, v), values)
+    after = measure(hud.render, values)
+    print(f"{'render':<16}{'ms/frame':>10}")
+    print(f"{'ImageDraw.text':<16}{before * 1000:>10.3f}")
+    print(f"{'glyph atlas':<16}{after * 1000:>10.3f}")
+    print(f"speedup {before / after:.1f}x, atlas setup {setup * 1000:.1f}ms for {len(hud.atlas)} glyphs")
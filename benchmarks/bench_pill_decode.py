@@ -0,0 +1,79 @@
+"""RAPT advertisement decodes/sec: how RaptPill.decode_rapt_data decoded (slices, format strings parsed on every call,
+namedtuple._make, a datetime string per advert) against PillDecoder.decode (precompiled Structs read in place, no
+timestamp). Both are checked to give the same values for V1 and V2 payloads first.
+
+python benchmarks/bench_pill_decode.py [decodes]
+"""
+import random
+import struct
+import sys
+from collections import namedtuple
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, Path(__file__).parent.parent.as_posix())
+from PillDecoder import decode
+
+RAPTPillMetricsV1 = namedtuple("RAPTPillMetrics", "version, mac, temperature, gravity, x, y, z, battery")
+RAPTPillMetricsV2 = namedtuple(
+    "RAPTPillMetrics",
+    "hasGravityVel, gravityVel, temperature, gravity, x, y, z, battery",
+)
+
+
+def legacy_decode(data: bytes) -> tuple:
+    if len(data) != 23:
+        raise ValueError("advertisment data must have length 23")
+    prefix, version = struct.unpack(">2sB", data[:3])
+    if prefix != b"PT":
+        raise ValueError("Unexpected prefix")
+    if version == 1:
+        metrics_raw = RAPTPillMetricsV1._make(struct.unpack(">B6sHfhhhh", data[2:]))
+    else:
+        metrics_raw = RAPTPillMetricsV2._make(struct.unpack(">BfHfhhhH", data[4:]))
+    dt_string = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return metrics_raw, dt_string
+
+
+def adverts(count: int, version: int) -> list:
+    out = []
+    for _ in range(count):
+        temperature, gravity = random.randint(36000, 39000), random.uniform(990, 1120)
+        x, y, z = (random.randint(-512, 512) for _ in range(3))
+        if version == 1:
+            body = struct.pack(">B6sHfhhhh", 1, bytes(6), temperature, gravity, x, y, z, random.randint(0, 25600))
+            out.append(b"PT" + body)
+        else:
+            body = struct.pack(
+                ">BfHfhhhH", 1, random.uniform(-5, 5), temperature, gravity, x, y, z, random.randint(0, 25600)
+            )
+            out.append(b"PT\x02\x00" + body)
+    return out
+
+
+def matches(data: bytes) -> bool:
+    old, _ = legacy_decode(data)
+    new = decode(data)
+    velocity = old.gravityVel if hasattr(old, "gravityVel") else None
+    return (new.gravity, new.temperature, new.gravity_velocity, new.x, new.y, new.z, new.battery) == (
+        old.gravity / 1000, old.temperature / 128, velocity, old.x / 16, old.y / 16, old.z / 16, old.battery / 256
+    )
+
+
+def rate(func, payloads: list) -> float:
+    start = perf_counter()
+    for data in payloads:
+        func(data)
+    return len(payloads) / (perf_counter() - start)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    random.seed(1)
+    print(f"{'payload':<9}{'legacy/s':>12}{'decoder/s':>12}{'speedup':>9}")
+    for version in (1, 2):
+        payloads = adverts(count, version)
+        assert all(matches(data) for data in payloads[:1000]), f"V{version} values differ"
+        before, after = rate(legacy_decode, payloads), rate(decode, payloads)
+        print(f"{'V%d' % version:<9}{before:>12.0f}{after:>12.0f}{after / before:>8.1f}x")
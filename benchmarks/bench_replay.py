@@ -0,0 +1,105 @@
+"""End to end ingest without bluetooth: a capture file replayed through ReplayScanner into real RaptPill sessions and a
+readings worker, the same path adverts take from bleak on a pi (dedup, decode, throttle, publish, worker).
+
+Reports adverts/sec replayed as fast as possible, then replays at `speed`x and reports how late adverts were handed
+over and how long readings waited for the worker. Without a capture one is made up: an hour of 4 pills sending a
+reading a minute, each reported 20 times, among 20 adverts a second from other devices, written as two half hour runs
+the way a capture kept across a restart is.
+
+python benchmarks/bench_replay.py [capture.jsonl] [speed]
+"""
+import asyncio
+import random
+import struct
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter, sleep
+from types import SimpleNamespace
+
+sys.path.insert(0, Path(__file__).parent.parent.as_posix())
+from PillCapture import CaptureWriter, ReplayScanner, read_capture
+from PillScanner import RAPT_MANUFACTURER_ID
+from PillToMeadTools import RaptPill
+from PillWorkers import ReadingDispatcher
+
+
+class BenchHolder(object):
+    def __init__(self):
+        """The bits of PillHolder a RaptPill and the scanner use"""
+        self.readings = ReadingDispatcher(self)
+        self.worker = self.readings.add_worker("ui", lambda reading: None, maxsize=10000)
+        self.scanner = None
+
+    def log_event(self, message, severity="info"):
+        pass
+
+
+def make_capture(path: Path, pills: int = 4, repeats: int = 20, runs: int = 2):
+    for _ in range(runs):
+        write_run(CaptureWriter(path), 3600 // runs, pills, repeats)
+
+
+def write_run(writer: CaptureWriter, seconds: int, pills: int, repeats: int):
+    others = [SimpleNamespace(address=f"11:22:33:44:55:{i:02x}") for i in range(16)]
+    other_data = SimpleNamespace(manufacturer_data={76: b"\x02\x15" + bytes(21)}, rssi=-80)
+    for second in range(seconds):
+        for i in range(20):
+            writer.write(random.choice(others), other_data, second + i / 20)
+        if second % 60:
+            continue
+        for pill in range(pills):
+            payload = b"PT\x02\x00" + struct.pack(
+                ">BfHfhhhH", 1, random.uniform(-5, 5), random.randint(36000, 39000), random.uniform(990, 1120),
+                *(random.randint(-512, 512) for _ in range(3)), random.randint(0, 25600),
+            )
+            device = SimpleNamespace(address=f"AA:BB:CC:DD:EE:{pill:02X}")
+            data = SimpleNamespace(manufacturer_data={RAPT_MANUFACTURER_ID: payload}, rssi=-60)
+            for repeat in range(repeats):
+                writer.write(device, data, second + pill / 10 + repeat / 100)
+    writer.close()
+
+
+def replay(path: Path, speed: float) -> tuple:
+    holder = BenchHolder()
+    holder.scanner = ReplayScanner(holder, path, speed=speed)
+    addresses = {a.address for a in read_capture(path) if RAPT_MANUFACTURER_ID in a.manufacturer_data}
+    pills = []
+    for i, address in enumerate(sorted(addresses)):
+        pill = RaptPill({}, {"Poll Interval": 0}, None, f"Bench Pill {i}", "bench", address, 60, holder, log_to_db=False)
+        holder.scanner.register(pill)
+        pills.append(pill)
+    start = perf_counter()
+    asyncio.run(holder.scanner.run())
+    secs = perf_counter() - start
+    # stop only drops the worker's backlog, let it catch up first
+    while holder.worker.processed + holder.worker.failed < holder.worker.submitted:
+        sleep(0.01)
+    holder.readings.stop()
+    holder.worker.thread.join()
+    return secs, holder.scanner, holder.worker
+
+
+if __name__ == "__main__":
+    speed = float(sys.argv[2]) if len(sys.argv) > 2 else 600
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 1:
+            path = Path(sys.argv[1])
+        else:
+            random.seed(1)
+            path = Path(tmp, "capture.jsonl")
+            make_capture(path)
+        secs, scanner, worker = replay(path, 0)
+        times = [a.timestamp for a in read_capture(path)]
+        assert scanner.replayed == len(times)
+        assert all(abs(b - a) < 1 for a, b in zip(times, times[1:])), "runs should replay back to back"
+        assert worker.processed == scanner.adverts_decoded, "every decoded advert should reach the worker"
+        print(
+            f"max speed: {scanner.replayed} adverts in {secs:.2f}s, {scanner.replayed / secs:.0f} adverts/s, "
+            f"{scanner.adverts_decoded} decoded, {worker.processed} readings"
+        )
+        secs, scanner, worker = replay(path, speed)
+        print(
+            f"{speed:g}x: {secs:.2f}s, adverts late by {scanner.max_lag * 1000:.2f}ms at most, "
+            f"readings waited {worker.max_lag * 1000:.2f}ms at most for the worker"
+        )
@@ -0,0 +1,182 @@
+"""Radio on time against bursts caught for the adaptive scan schedule, over a simulated day. Pills broadcast a burst
+of adverts every interval (with some jitter) and PillScanner's own scan/listen loop runs against them on a simulated
+clock: rest() moves the clock on instead of sleeping and hands over the adverts sent meanwhile, and radio() stands in
+for BleakScanner, taking a moment to start and losing whatever is sent while it is off. Bursts caught are the ones
+that made it through device_found to the pill, radio on is the scanner's own accounting. Compared against scanning
+all the time and the old duty cycle (on for the poll interval, off for 10s).
+
+Also runs a day where one pill goes quiet for two hours (a third of the run if that is shorter), to check the schedule
+goes back to scanning all the time and then learns the pill again.
+
+python benchmarks/bench_scan_schedule.py [hours, at least 1]
+"""
+import asyncio
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, Path(__file__).parent.parent.as_posix())
+from PillCapture import ReplayAdvertisement, ReplayDevice
+from PillSchedule import ScanSchedule
+from PillScanner import DUTY_CYCLE_REST, RAPT_MANUFACTURER_ID, PillScanner
+
+# seconds between bursts of each pill, adverts a burst and seconds a burst lasts
+PERIODS = (30, 60, 60, 120, 300, 900)
+BURST_ADVERTS = 3
+BURST_LENGTH = 1.0
+JITTER = 0.2
+# seconds bluetooth takes to start scanning once asked to
+RADIO_START = 0.5
+
+
+class BenchHolder(object):
+    def log_event(self, message, severity="info"):
+        pass
+
+
+class BenchPill(object):
+    def __init__(self, pill: int, clock):
+        """Stands in for a RaptPill session, keeping when (by the scanner's clock) each burst reached it"""
+        self.clock = clock
+        self.mac_address = f"AA:BB:CC:DD:EE:{pill:02X}"
+        self.session_name = f"Pill {pill}"
+        self.poll_interval = PERIODS[pill]
+        self.heard = []
+
+    def device_found(self, device, advertisement_data):
+        self.heard.append(self.clock())
+
+
+class FakeRadio(object):
+    def __init__(self, scanner):
+        self.scanner = scanner
+
+    async def __aenter__(self):
+        self.scanner.listening_from = self.scanner.now + RADIO_START
+        self.scanner.radio_log.append([self.scanner.now, None])
+        return self
+
+    async def __aexit__(self, *exc):
+        self.scanner.listening_from = None
+        self.scanner.radio_log[-1][1] = self.scanner.now
+
+
+class ClockedScanner(PillScanner):
+    def __init__(self, adverts: list, hours: float, margin: float):
+        """PillScanner on a simulated clock with adverts from a list instead of bluetooth. scan, listen and the schedule
+        are the real ones
+
+        Args:
+            adverts (list): (time, pill, payload) of every advert sent, in time order
+            hours (float): simulated hours to scan for
+            margin (float): ScanSchedule margin
+        """
+        super().__init__(BenchHolder(), schedule=ScanSchedule(margin))
+        self.adverts = adverts
+        self.end = hours * 3600
+        self.now = 0.0
+        self.next_advert = 0
+        # simulated time the radio hears adverts from, None while it is off
+        self.listening_from = None
+        # [on, off] simulated times of every time the radio was on
+        self.radio_log = []
+        self.devices = [ReplayDevice(f"AA:BB:CC:DD:EE:{pill:02X}", None) for pill in range(len(PERIODS))]
+
+    def clock(self) -> float:
+        return self.now
+
+    def radio(self):
+        return FakeRadio(self)
+
+    async def rest(self, seconds: float) -> bool:
+        until = min(self.now + max(seconds, 0), self.end)
+        while self.next_advert < len(self.adverts) and self.adverts[self.next_advert][0] < until:
+            sent, pill, payload = self.adverts[self.next_advert]
+            self.next_advert += 1
+            if self.listening_from is not None and sent >= self.listening_from:
+                self.now = sent
+                self.device_found(self.devices[pill], ReplayAdvertisement({RAPT_MANUFACTURER_ID: payload}, -60))
+        self.now = until
+        if self.now >= self.end:
+            self.stop()
+        return await super().rest(0)
+
+
+def bursts(hours: float, quiet: tuple = None) -> tuple:
+    """(time, pill, payload) of every advert, and the bursts each pill sent. Every burst has its own payload"""
+    adverts, sent = [], [0] * len(PERIODS)
+    for pill, period in enumerate(PERIODS):
+        t = random.uniform(0, period)
+        while t < hours * 3600:
+            if not (quiet and pill == 0 and quiet[0] <= t < quiet[1]):
+                sent[pill] += 1
+                payload = b"PT" + sent[pill].to_bytes(21, "big")
+                adverts.extend((t + i * BURST_LENGTH / BURST_ADVERTS, pill, payload) for i in range(BURST_ADVERTS))
+            t += period + random.gauss(0, JITTER)
+    return sorted(adverts), sent
+
+
+def caught_share(heard: dict, sent: list) -> float:
+    return sum(len(b) for b in heard.values()) / sum(sent)
+
+
+def heard_burst(heard: dict, pill: int, t: float):
+    # adverts heard within a burst of each other are the same burst
+    if not heard.setdefault(pill, []) or t - heard[pill][-1] > BURST_LENGTH * 2:
+        heard[pill].append(t)
+    else:
+        heard[pill][-1] = t
+
+
+def run_schedule(margin: float, adverts: list, sent: list, hours: float, window: tuple = None) -> tuple:
+    scanner = ClockedScanner(adverts, hours, margin)
+    pills = [BenchPill(pill, scanner.clock) for pill in range(len(PERIODS))]
+    for pill in pills:
+        scanner.register(pill)
+    asyncio.run(scanner.run())
+    heard = {pill: p.heard for pill, p in enumerate(pills)}
+    on = scanner.radio_on / scanner.end
+    window_on = None
+    if window:
+        window_on = sum(max(0.0, min(off, window[1]) - max(on_at, window[0])) for on_at, off in scanner.radio_log)
+        window_on /= window[1] - window[0]
+    return on, caught_share(heard, sent), window_on, heard
+
+
+def run_duty_cycle(adverts: list, sent: list) -> tuple:
+    # the old per pill scan: each pill on for its poll interval then off for 10s, started together
+    heard = {}
+    for t, pill, _ in adverts:
+        if t % (PERIODS[pill] + DUTY_CYCLE_REST) < PERIODS[pill]:
+            heard_burst(heard, pill, t)
+    on = sum(p / (p + DUTY_CYCLE_REST) for p in PERIODS) / len(PERIODS)
+    return on, caught_share(heard, sent)
+
+
+if __name__ == "__main__":
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 24
+    if hours < 1:
+        sys.exit("run for at least an hour, the schedule takes a few bursts of every pill to learn")
+    random.seed(1)
+    adverts, sent = bursts(hours)
+    print(f"{len(PERIODS)} pills broadcasting every {', '.join(map(str, PERIODS))}s for {hours:g} hours")
+    print(f"{'scan':<22}{'radio on':>10}{'bursts caught':>15}")
+    print(f"{'all the time':<22}{1:>10.1%}{1:>15.1%}")
+    old_on, old_caught = run_duty_cycle(adverts, sent)
+    print(f"{'old duty cycle (avg)':<22}{old_on:>10.1%}{old_caught:>15.1%}")
+    for margin in (1, 2, 3, 5, 10):
+        on, caught, _, _ = run_schedule(margin, adverts, sent, hours)
+        print(f"{'adaptive, margin %gs' % margin:<22}{on:>10.1%}{caught:>15.1%}")
+        assert on < old_on and caught > 0.95, f"margin {margin}s: radio on {on:.1%}, caught {caught:.1%}"
+
+    start = hours * 3600 / 3
+    quiet = (start, start + min(7200, start))
+    adverts, sent = bursts(hours, quiet)
+    on, caught, quiet_on, heard = run_schedule(3, adverts, sent, hours, quiet)
+    back = [t for t in heard[0] if t >= quiet[1]]
+    print(
+        f"pill quiet for {(quiet[1] - quiet[0]) / 60:.0f}min: radio on {quiet_on:.1%} of that time, {on:.1%} overall, "
+        f"caught {caught:.1%}, heard {len(back)} of its bursts after"
+    )
+    assert quiet_on > 0.9, "should scan all the time while a pill is missing"
+    assert len(back) > 0.9 * (hours * 3600 - quiet[1]) / PERIODS[0], "should learn the pill again"
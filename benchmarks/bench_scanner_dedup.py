@@ -0,0 +1,94 @@
+"""CPU per hour spent in the shared scanner's detection callback, every copy of a pill's advert passed on
+(DuplicateWindow 0, how it used to be) against repeats of the last payload dropped before decoding. An hour of adverts
+is replayed through PillScanner.device_found: each pill sends a new reading every interval and bleak reports it
+`repeats` times, with other bluetooth devices chattering around it.
+
+The pills stand in for RaptPill, decoding the payload with PillDecoder and keeping the result. RaptPill also
+converts units, checks its throttle and builds a reading per advert, so each decode saved is worth more than here.
+
+python benchmarks/bench_scanner_dedup.py [repeats]
+"""
+import random
+import struct
+import sys
+from pathlib import Path
+from time import process_time
+from types import SimpleNamespace
+
+sys.path.insert(0, Path(__file__).parent.parent.as_posix())
+from PillDecoder import decode
+from PillScanner import PillScanner, RAPT_MANUFACTURER_ID
+
+# seconds between readings from each pill, other devices' adverts a second
+PILL_INTERVAL = 60
+OTHER_ADVERTS = 20
+
+
+class QuietHolder(object):
+    def log_event(self, message, severity="info"):
+        pass
+
+
+class BenchPill(object):
+    def __init__(self, index: int):
+        self.mac_address = f"aa:bb:cc:dd:ee:{index:02x}"
+        self.session_name = f"Bench Pill {index}"
+        self.poll_interval = PILL_INTERVAL
+        self.decoded = 0
+        self.metrics = None
+
+    def device_found(self, device, advertisement_data):
+        self.metrics = decode(advertisement_data.manufacturer_data[RAPT_MANUFACTURER_ID])
+        self.decoded += 1
+
+
+def payload() -> bytes:
+    return b"PT\x02\x00" + struct.pack(
+        ">BfHfhhhH", 1, random.uniform(-5, 5), random.randint(36000, 39000), random.uniform(990, 1120),
+        *(random.randint(-512, 512) for _ in range(3)), random.randint(0, 25600),
+    )
+
+
+def hour_of_adverts(pills: list, repeats: int) -> list:
+    adverts = []
+    others = [SimpleNamespace(address=f"11:22:33:44:55:{i:02x}") for i in range(16)]
+    other_data = SimpleNamespace(manufacturer_data={76: b"\x02\x15" + bytes(21)})
+    for second in range(3600):
+        adverts.extend((random.choice(others), other_data) for _ in range(OTHER_ADVERTS))
+        for pill in pills:
+            if second % PILL_INTERVAL == 0:
+                # bleak reports the address in upper case on linux
+                device = SimpleNamespace(address=pill.mac_address.upper())
+                data = SimpleNamespace(manufacturer_data={RAPT_MANUFACTURER_ID: payload()})
+                adverts.extend((device, data) for _ in range(repeats))
+    return adverts
+
+
+def replay(pills: list, adverts: list, duplicate_window: float) -> tuple:
+    scanner = PillScanner(QuietHolder(), duplicate_window=duplicate_window)
+    scanner.started = 0
+    for pill in pills:
+        scanner.register(pill)
+        pill.decoded = 0
+    start = process_time()
+    for device, data in adverts:
+        scanner.device_found(device, data)
+    return process_time() - start, scanner, sum(pill.decoded for pill in pills)
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    random.seed(1)
+    print(f"{'pills':>6}{'window':>8}{'seen':>9}{'unique':>8}{'decoded':>9}{'cpu s/hour':>12}")
+    for count in (1, 4, 8):
+        pills = [BenchPill(i) for i in range(count)]
+        adverts = hour_of_adverts(pills, repeats)
+        readings = count * 3600 // PILL_INTERVAL
+        for window in (0, 30):
+            cpu, scanner, decoded = replay(pills, adverts, window)
+            # every reading is decoded, once when repeats are dropped
+            assert decoded == readings * (repeats if window == 0 else 1), f"{count} pills decoded {decoded}"
+            assert scanner.adverts_decoded == decoded
+            print(
+                f"{count:>6}{window:>8}{scanner.adverts_seen:>9}{scanner.adverts_unique:>8}{decoded:>9}{cpu:>12.3f}"
+            )
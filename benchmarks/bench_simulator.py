@@ -0,0 +1,102 @@
+"""How many pills the ingest path keeps up with: SimulatedScanner's virtual pills (V1 and V2 adverts from made up
+brews) fed through the shared scanner's callback into a RaptPill session each and on to a readings worker.
+
+For each pill count it reports the adverts/sec handled when simulating as fast as possible - the most that can be
+sustained - then runs at half that rate and reports how late adverts were handed over and, per pill, how long its
+readings took from being decoded to reaching the worker.
+
+python benchmarks/bench_simulator.py [pills ...]
+"""
+import asyncio
+import random
+import statistics
+import sys
+from collections import defaultdict
+from pathlib import Path
+from time import monotonic, perf_counter, sleep
+
+sys.path.insert(0, Path(__file__).parent.parent.as_posix())
+from PillDecoder import decode, encode
+from PillScanner import RAPT_MANUFACTURER_ID
+from PillSimulator import SimulatedScanner, VirtualPill, simulated_mac
+from PillToMeadTools import RaptPill
+from PillWorkers import ReadingDispatcher
+
+INTERVAL = 60
+REPEATS = 5
+# adverts per run at max speed, and real seconds for the paced run
+ADVERTS = 100000
+PACED_SECONDS = 3
+
+
+class BenchHolder(object):
+    def __init__(self):
+        """The bits of PillHolder a RaptPill and the scanner use, with a worker timing each pill's readings"""
+        self.readings = ReadingDispatcher(self)
+        self.latency = defaultdict(list)
+        self.worker = self.readings.add_worker("ui", self.handle, maxsize=100000)
+        self.scanner = None
+
+    def handle(self, reading):
+        self.latency[reading.session_name].append(monotonic() - reading.received)
+
+    def log_event(self, message, severity="info"):
+        pass
+
+
+def check_adverts():
+    # what the simulator sends decodes back to what it meant to send
+    rng = random.Random(1)
+    for i in range(200):
+        pill = VirtualPill(i, rng)
+        meant = pill.metrics(i * 3600)
+        got = decode(encode(meant, pill.mac))
+        assert got.version == meant.version and (got.gravity_velocity is None) == (meant.version == 1)
+        assert abs(got.gravity - meant.gravity) < 1e-6 and abs(got.temperature - meant.temperature) < 1 / 128
+        sent = decode(pill.advert(i * 3600).manufacturer_data[RAPT_MANUFACTURER_ID])
+        assert 0 <= sent.battery <= 100 and 0.99 < sent.gravity < 1.13 and 285 < sent.temperature < 305
+
+
+def simulate(pills: int, speed: float, duration: float) -> tuple:
+    holder = BenchHolder()
+    holder.scanner = SimulatedScanner(
+        holder, pills, interval=INTERVAL, repeats=REPEATS, speed=speed, duration=duration, seed=1
+    )
+    for i in range(pills):
+        pill = RaptPill({}, {"Poll Interval": 0}, None, f"Pill {i}", "bench", simulated_mac(i), 60, holder, log_to_db=False)
+        holder.scanner.register(pill)
+    start = perf_counter()
+    asyncio.run(holder.scanner.run())
+    secs = perf_counter() - start
+    # stop only drops the worker's backlog, let it catch up first
+    while holder.worker.processed + holder.worker.failed < holder.worker.submitted:
+        sleep(0.01)
+    holder.readings.stop()
+    holder.worker.thread.join()
+    return secs, holder
+
+
+if __name__ == "__main__":
+    counts = [int(n) for n in sys.argv[1:]] or [50, 100, 250, 500]
+    check_adverts()
+    print(
+        f"{'pills':>6}{'max adverts/s':>15}{'paced adverts/s':>17}{'max lag ms':>12}"
+        f"{'pill latency ms (median / worst pill)':>40}"
+    )
+    for pills in counts:
+        # simulated seconds that give about ADVERTS adverts
+        duration = ADVERTS / (pills * REPEATS) * INTERVAL
+        secs, holder = simulate(pills, 0, duration)
+        scanner = holder.scanner
+        assert scanner.adverts_decoded == scanner.simulated // REPEATS, "each reading should be decoded once"
+        assert holder.worker.processed == scanner.adverts_decoded
+        sustainable = scanner.simulated / secs
+
+        # half the sustainable rate, in simulated seconds per real second
+        speed = sustainable / 2 / (pills * REPEATS / INTERVAL)
+        secs, holder = simulate(pills, speed, speed * PACED_SECONDS)
+        per_pill = [statistics.mean(v) * 1000 for v in holder.latency.values()]
+        print(
+            f"{pills:>6}{sustainable:>15.0f}{holder.scanner.simulated / secs:>17.0f}{holder.scanner.max_lag * 1000:>12.2f}"
+            f"{statistics.median(per_pill):>25.3f} / {max(per_pill):.3f}"
+        )
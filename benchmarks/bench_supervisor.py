@@ -0,0 +1,70 @@
+"""CPU time used by the headless supervisor while idling with N pills.
+
+python benchmarks/bench_supervisor.py [seconds_per_run]
+"""
+import asyncio
+import sys
+import threading
+from pathlib import Path
+from time import process_time, sleep, time
+
+sys.path.insert(0, Path(__file__).parent.parent.as_posix())
+from PillSupervisor import PillSupervisor
+
+
+class QuietHolder(object):
+    def log_event(self, message, severity="info"):
+        pass
+
+
+class IdlePill(object):
+    """Stands in for a RaptPill - a daemon thread that sleeps like a pill waiting on adverts"""
+
+    def __init__(self, index):
+        self.session_name = f"Bench Pill {index}"
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.__idle, daemon=True)
+        self.thread.start()
+
+    def __idle(self):
+        while self.running:
+            sleep(0.5)
+
+    def end_session(self):
+        self.running = False
+
+
+def cpu_per_hour_supervisor(pills: int, seconds: float) -> float:
+    supervisor = PillSupervisor(QuietHolder())
+    for i in range(pills):
+        supervisor.add_pill(IdlePill(i))
+    supervisor.add_job("noop", 1, lambda: None)
+
+    async def run():
+        asyncio.get_running_loop().call_later(seconds, supervisor.stop)
+        await supervisor.run()
+
+    start = process_time()
+    asyncio.run(run())
+    return (process_time() - start) * 3600 / seconds
+
+
+def cpu_per_hour_spin(seconds: float) -> float:
+    # the old `while True: time()` keep-alive
+    start = process_time()
+    end = time() + seconds
+    while time() < end:
+        time()
+    return (process_time() - start) * 3600 / seconds
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    print(f"{'mode':<12}{'pills':>6}{'cpu s/hour':>14}")
+    print(f"{'spin':<12}{'-':>6}{cpu_per_hour_spin(min(seconds, 2.0)):>14.1f}")
+    for count in (1, 4, 8, 32):
+        print(f"{'supervisor':<12}{count:>6}{cpu_per_hour_supervisor(count, seconds):>14.2f}")
@@ -0,0 +1,102 @@
+"""Recording epdconfig backend for benchmarking the waveshare drivers without a panel attached.
+It is registered with epdconfig and selected like any other backend, so the drivers and epdconfig's own send_data_bulk,
+send_command_bulk and wait_busy run unchanged and only the pin writes and SPI transfers end up here. It records every
+byte sent over "SPI" (and the DC level it went with).
+"""
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, Path(__file__).parent.parent.as_posix())
+from waveshare.waveshare_epd import epdconfig
+
+
+class Recorder(epdconfig.Simulated):
+    def __init__(self):
+        """Simulated backend that keeps what was sent. BUSY flips on every read like Simulated, unless busy_for has
+        set it to stay busy for a while. delay_ms is skipped unless real_delays is set"""
+        super().__init__()
+        self.busy_level = None
+        self.busy_reads = 0
+        self.real_delays = False
+        self.__idle = threading.Event()
+        self.reset()
+
+    def reset(self):
+        self.sent = bytearray()
+        # DC level for each byte in sent, 0 for commands and 1 for data
+        self.dc = bytearray()
+        self.dc_level = 0
+        self.writes = 0
+        self.pin_writes = 0
+        self._busy = 0
+        # level BUSY reads once busy_for has released it
+        self.idle_level = None
+
+    def busy_for(self, seconds: float, busy_level: int = 1):
+        """Hold BUSY at busy_level for `seconds` then release it from a timer thread, like a panel refresh
+
+        Args:
+            seconds (float): how long the panel stays busy
+            busy_level (int): level BUSY reads while busy
+        """
+        self.__idle.clear()
+        self.idle_level = None
+        self.busy_level = busy_level
+        self.busy_reads = 0
+        timer = threading.Timer(seconds, self.__release)
+        timer.daemon = True
+        timer.start()
+
+    def __release(self):
+        self.idle_level = 1 - self.busy_level
+        self.busy_level = None
+        self.__idle.set()
+
+    def digital_write(self, pin, value):
+        self.pin_writes += 1
+        if pin == self.DC_PIN:
+            self.dc_level = 1 if value else 0
+
+    def digital_read(self, pin):
+        if pin == self.BUSY_PIN:
+            busy_level = self.busy_level
+            if busy_level is not None:
+                self.busy_reads += 1
+                return busy_level
+            if self.idle_level is not None:
+                return self.idle_level
+        return super().digital_read(pin)
+
+    def delay_ms(self, delaytime):
+        if self.real_delays:
+            time.sleep(delaytime / 1000.0)
+
+    def wait_for_idle(self, pin, busy_level, timeout=None):
+        # sleeps on the release like gpiozero's wait_for_release, rather than polling
+        if self.busy_level is None:
+            return True
+        return self.__idle.wait(timeout)
+
+    def spi_writebyte(self, data):
+        self.writes += 1
+        self.sent += bytes(data)
+        self.dc += bytes([self.dc_level]) * len(data)
+
+    def spi_writebyte2(self, data):
+        self.spi_writebyte(data)
+
+
+def install() -> Recorder:
+    """Select the recording backend before any driver talks to the panel
+
+    Returns:
+        Recorder: the backend recording the bytes
+    """
+    epdconfig.BACKENDS["recorder"] = Recorder
+    # EPD_BACKEND would win over select_backend
+    os.environ.pop("EPD_BACKEND", None)
+    epdconfig.select_backend("recorder")
+    return epdconfig.get_implementation()
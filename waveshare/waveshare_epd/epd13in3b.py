@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 960
@@ -42,6 +44,21 @@ GRAY4  = 0x00 #Blackest
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x12,),  #SWRESET
+    epdsequence.Busy("ReadBusy"),
+    (0x0C, 0xAE, 0xC7, 0xC3, 0xC0, 0x80),
+    (0x01, 0xA7, 0x02, 0x00),
+    (0x11, 0x03),
+    (0x44, 0x00, 0x00, 0xBF, 0x03),
+    (0x45, 0x00, 0x00, 0xA7, 0x02),
+    (0x3C, 0x01),
+    (0x18, 0x80),
+    (0x4E, 0x00, 0x00),
+    (0x4F, 0x00, 0x00),
+    epdsequence.Busy("ReadBusy"),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -75,17 +92,11 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 1)
 
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.SPI.writebytes2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
 
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        busy = epdconfig.digital_read(self.busy_pin)
-        while(busy == 1):
-            busy = epdconfig.digital_read(self.busy_pin)
-            epdconfig.delay_ms(20)
+        epdconfig.wait_busy(self.busy_pin, 1)
         epdconfig.delay_ms(20)
         logger.debug("e-Paper busy release")
 
@@ -106,77 +117,17 @@ class EPD:
         self.reset()
         self.ReadBusy()
 
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x0C) 
-        self.send_data(0xAE)
-        self.send_data(0xC7)  
-        self.send_data(0xC3)
-        self.send_data(0xC0)
-        self.send_data(0x80)
-
-        self.send_command(0x01) 
-        self.send_data(0xA7)
-        self.send_data(0x02)  
-        self.send_data(0x00)
-
-        self.send_command(0x11) 
-        self.send_data(0x03)
-
-        self.send_command(0x44) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0xBF)
-        self.send_data(0x03) 
-        
-        self.send_command(0x45) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0xA7)
-        self.send_data(0x02)
-
-        self.send_command(0x3C)
-        self.send_data(0x01)
-
-        self.send_command(0x18) 
-        self.send_data(0x80)
-
-        self.send_command(0x4E) 
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x4F) 
-        self.send_data(0x00)
-        self.send_data(0x00) 
-        self.ReadBusy()
+        epdsequence.run(self, INIT)
 
         # EPD hardware init end
         return 0
 
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy * self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
     def Clear(self):
@@ -207,11 +158,8 @@ class EPD:
             self.send_command(0x24)
             self.send_data2(blackimage)        
         if (ryimage != None):
-            for j in range(Height):
-                for i in range(Width):
-                    ryimage[i + j * Width] = ~ryimage[i + j * Width]
             self.send_command(0x26)
-            self.send_data2(ryimage)
+            self.send_data2(epdbuffer.invert(ryimage[0:Width * Height]))
 
         self.TurnOnDisplay()
 
@@ -225,11 +173,8 @@ class EPD:
             self.send_command(0x24)
             self.send_data2(blackimage)        
         if (ryimage != None):
-            for j in range(Height):
-                for i in range(Width):
-                    ryimage[i + j * Width] = ~ryimage[i + j * Width]
             self.send_command(0x26)
-            self.send_data2(ryimage)
+            self.send_data2(epdbuffer.invert(ryimage[0:Width * Height]))
 
         self.TurnOnDisplay()
 
@@ -278,17 +223,19 @@ class EPD:
         self.send_data((Ystart>>8) & 0x01)
 
         self.send_command(0x24) 
+        buf = bytearray()
         for j in range(Height):
-            for i in range(Width):
-                if((j > Ystart-1) & (j < (Yend + 1)) & (i > Xstart-1) & (i < (Xend + 1))):
-                    self.send_data(Image[i + j * Width])
+            if((j > Ystart-1) & (j < (Yend + 1))):
+                buf += bytes(Image[j * Width + max(Xstart, 0):j * Width + min(Xend + 1, Width)])
+        self.send_data2(buf)
         self.TurnOnDisplay_Part()
 
         self.send_command(0x26) 
+        buf = bytearray()
         for j in range(Height):
-            for i in range(Width):
-                if((j > Ystart-1) & (j < (Yend + 1)) & (i > Xstart-1) & (i < (Xend + 1))):
-                    self.send_data(Image[i + j * Width])
+            if((j > Ystart-1) & (j < (Yend + 1))):
+                buf += bytes(Image[j * Width + max(Xstart, 0):j * Width + min(Xend + 1, Width)])
+        self.send_data2(buf)
 
     def sleep(self):
         self.send_command(0x10) # DEEP_SLEEP
@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 960
@@ -42,6 +44,42 @@ GRAY4  = 0x00 #Blackest
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x12,),  #SWRESET
+    epdsequence.Busy("ReadBusy"),
+    (0x0C, 0xAE, 0xC7, 0xC3, 0xC0, 0x80),
+    (0x01, 0xA7, 0x02, 0x00),
+    (0x11, 0x03),
+    (0x44, 0x00, 0x00, 0xBF, 0x03),
+    (0x45, 0x00, 0x00, 0xA7, 0x02),
+    (0x3C, 0x05),
+    (0x18, 0x80),
+    (0x4E, 0x00, 0x00),
+    (0x4F, 0x00, 0x00),
+)
+
+INIT_PART = (
+    (0x37, 0x00, 0x00, 0x00, 0x00, 0x00, 0x40, 0x00, 0x00, 0x00, 0x00),
+    (0x3C, 0x80),
+    (0x22, 0xC0),
+    (0x20,),
+    epdsequence.Busy("ReadBusy"),
+)
+
+INIT_4GRAY = (
+    (0x12,),
+    epdsequence.Busy("ReadBusy"),
+    (0x0C, 0xAE, 0xC7, 0xC3, 0xC0, 0x80),
+    (0x01, 0xA7, 0x02, 0x00),
+    (0x11, 0x03),
+    (0x44, 0x00, 0x00, 0xBF, 0x03),
+    (0x45, 0x00, 0x00, 0xA7, 0x02),
+    (0x3C, 0x00),
+    (0x18, 0x80),
+    (0x4E, 0x00, 0x00),
+    (0x4F, 0x00, 0x00),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -120,17 +158,11 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 1)
 
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.SPI.writebytes2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
 
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        busy = epdconfig.digital_read(self.busy_pin)
-        while(busy == 1):
-            busy = epdconfig.digital_read(self.busy_pin)
-            epdconfig.delay_ms(20)
+        epdconfig.wait_busy(self.busy_pin, 1)
         epdconfig.delay_ms(20)
         logger.debug("e-Paper busy release")
 
@@ -153,9 +185,7 @@ class EPD:
         self.ReadBusy()
 
     def Lut(self, LUT):
-        self.send_command(0x32)
-        for i in range(105):
-            self.send_data(LUT[i])
+        epdsequence.run(self, ((0x32, LUT[0:105]),))
 
         self.send_command(0x03) 
         self.send_data(LUT[105])
@@ -174,49 +204,7 @@ class EPD:
         self.reset()
         self.ReadBusy()
 
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x0C) 
-        self.send_data(0xAE)
-        self.send_data(0xC7)  
-        self.send_data(0xC3)
-        self.send_data(0xC0)
-        self.send_data(0x80)
-
-        self.send_command(0x01) 
-        self.send_data(0xA7)
-        self.send_data(0x02)  
-        self.send_data(0x00)
-
-        self.send_command(0x11)
-        self.send_data(0x03)
-
-        self.send_command(0x44) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0xBF)
-        self.send_data(0x03) 
-        
-        self.send_command(0x45) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0xA7)
-        self.send_data(0x02)
-
-        self.send_command(0x3C) 
-        self.send_data(0x05)
-
-        self.send_command(0x18) 
-        self.send_data(0x80)
-
-        self.send_command(0x4E) 
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x4F) 
-        self.send_data(0x00)
-        self.send_data(0x00) 
+        epdsequence.run(self, INIT)
 
         # EPD hardware init end
         return 0
@@ -229,73 +217,12 @@ class EPD:
 
         self.Lut(self.Lut_Partial)
 
-        self.send_command(0x37) 
-        self.send_data(0x00)  
-        self.send_data(0x00)  
-        self.send_data(0x00)  
-        self.send_data(0x00)  
-        self.send_data(0x00) 
-        self.send_data(0x40)  
-        self.send_data(0x00)  
-        self.send_data(0x00)   
-        self.send_data(0x00)  
-        self.send_data(0x00)  
-
-        self.send_command(0x3C) 
-        self.send_data(0x80)   
-
-        self.send_command(0x22) 
-        self.send_data(0xC0)   
-        self.send_command(0x20) 
-
-        self.ReadBusy()
+        epdsequence.run(self, INIT_PART)
     def init_4GRAY(self):
         self.reset()
 
         self.ReadBusy()   
-        self.send_command(0x12)
-        self.ReadBusy()   
-
-        self.send_command(0x0C)   
-        self.send_data(0xAE)
-        self.send_data(0xC7)
-        self.send_data(0xC3)
-        self.send_data(0xC0)
-        self.send_data(0x80)
-
-        self.send_command(0x01) 
-        self.send_data(0xA7)
-        self.send_data(0x02)  
-        self.send_data(0x00)
-
-        self.send_command(0x11)
-        self.send_data(0x03) 
-
-        self.send_command(0x44) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0xBF)
-        self.send_data(0x03) 
-        
-        self.send_command(0x45) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0xA7)
-        self.send_data(0x02)
-
-        self.send_command(0x3C)
-        self.send_data(0x00)
-
-        self.send_command(0x18) 
-        self.send_data(0x80)
-        
-        self.send_command(0x4E) 
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x4F) 
-        self.send_data(0x00)
-        self.send_data(0x00) 
+        epdsequence.run(self, INIT_4GRAY)
 
         self.Lut(self.LUT_DATA_4Gray)
         
@@ -303,63 +230,17 @@ class EPD:
 
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy * self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
     def getbuffer_4Gray(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 4) * self.height)
-        image_monocolor = image.convert('L')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        i=0
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((x + (y * self.width))/4)] = ((pixels[x-3, y]&0xc0) | (pixels[x-2, y]&0xc0)>>2 | (pixels[x-1, y]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6)
-                        
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = self.height - x - 1
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((newx + (newy * self.width))/4)] = ((pixels[x, y-3]&0xc0) | (pixels[x, y-2]&0xc0)>>2 | (pixels[x, y-1]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6) 
+        buf = epdbuffer.pack_4gray(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width / 4) * self.height)
         return buf
 
     def Clear(self):
@@ -391,14 +272,10 @@ class EPD:
             Width = self.width // 8 +1
         Height = self.height
         self.send_command(0x24)   #Write Black and White image to RAM
-        for j in range(Height):
-            for i in range(Width):
-                self.send_data(color)
+        self.send_data2([color] * Width * Height)
                 
         self.send_command(0x26)  #Write Black and White image to RAM
-        for j in range(Height):
-            for i in range(Width):
-                self.send_data(color)
+        self.send_data2([color] * Width * Height)
         # self.TurnOnDisplay()
 
     def display_Partial(self, Image, Xstart, Ystart, Xend, Yend):
@@ -440,14 +317,16 @@ class EPD:
         self.send_data((Ystart>>8) & 0x01)
 
         self.send_command(0x24)  
+        buf = bytearray()
         for j in range(Height):
-            for i in range(Width):
-                if((j > Ystart-1) & (j < (Yend + 1)) & (i > Xstart-1) & (i < (Xend + 1))):
-                    self.send_data(Image[i + j * Width])
+            if((j > Ystart-1) & (j < (Yend + 1))):
+                buf += bytes(Image[j * Width + max(Xstart, 0):j * Width + min(Xend + 1, Width)])
+        self.send_data2(buf)
         self.TurnOnDisplay_Part()
     
     def display_4Gray(self, image):
         self.send_command(0x24)
+        buf = bytearray()
         for i in range(0, 81600): 
             temp3=0
             for j in range(0, 2):
@@ -477,9 +356,11 @@ class EPD:
                     if(j!=1 or k!=1):				
                         temp3 <<= 1
                     temp1 <<= 2
-            self.send_data(temp3)
+            buf.append(temp3)
+        self.send_data2(buf)
             
         self.send_command(0x26)	       
+        buf = bytearray()
         for i in range(0, 81600): 
             temp3=0
             for j in range(0, 2):
@@ -509,7 +390,8 @@ class EPD:
                     if(j!=1 or k!=1):					
                         temp3 <<= 1
                     temp1 <<= 2
-            self.send_data(temp3)
+            buf.append(temp3)
+        self.send_data2(buf)
         
         self.TurnOnDisplay_4GRAY()
 
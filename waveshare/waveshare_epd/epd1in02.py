@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 80
@@ -37,6 +39,27 @@ EPD_HEIGHT      = 128
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0xD2, 0x3F),
+    (0x00, 0x6F),  #from outside
+    (0x01, 0x03, 0x00, 0x2b, 0x2b),  #power setting
+    (0x06, 0x3f),  #Configuring the charge pump
+    (0x2A, 0x00, 0x00),  #Setting XON and the options of LUT
+    (0x30,  #Set the clock frequency
+        0x17,  #50Hz
+    ),
+    (0x50, 0x57),  #Set VCOM and data output interval
+    (0x60, 0x22),  #Set The non-overlapping period of Gate and Source.
+    (0x61,  #resolution setting
+        0x50,  #source 128
+        0x80,
+    ),
+    (0x82,  #sets VCOM_DC value
+        0x12,  #-1v
+    ),
+    (0xe3, 0x33),  #Set POWER SAVING
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -109,6 +132,10 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 0)
         epdconfig.spi_writebyte([data])
         epdconfig.digital_write(self.cs_pin, 1)
+
+    # send a lot of data
+    def send_data2(self, data):
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):
         logger.debug("e-Paper busy")
@@ -128,22 +155,16 @@ class EPD:
         self.ReadBusy()
 
     def SetFulltReg(self):
-        self.send_command(0x23)
-        for count in range(0, 42):
-            self.send_data(self.lut_w1[count]) 
-        
-        self.send_command(0x24)
-        for count in range(0, 42):
-            self.send_data(self.lut_b1[count])     
+        epdsequence.run(self, (
+            (0x23, self.lut_w1[0:42]),
+            (0x24, self.lut_b1[0:42]),
+        ))
 
     def SetPartReg(self):
-        self.send_command(0x23)
-        for count in range(0, 42):
-            self.send_data(self.lut_w[count]) 
-        
-        self.send_command(0x24)
-        for count in range(0, 42):
-            self.send_data(self.lut_b[count])     
+        epdsequence.run(self, (
+            (0x23, self.lut_w[0:42]),
+            (0x24, self.lut_b[0:42]),
+        ))
 
     def Init(self):
         if (epdconfig.module_init() != 0):
@@ -151,43 +172,7 @@ class EPD:
         # EPD hardware init start
         self.reset()
         
-        self.send_command(0xD2)			
-        self.send_data(0x3F)
-
-        self.send_command(0x00)  			
-        self.send_data (0x6F)  #from outside
-
-        self.send_command(0x01)  #power setting
-        self.send_data (0x03)	    
-        self.send_data (0x00)
-        self.send_data (0x2b)		
-        self.send_data (0x2b) 
-
-        self.send_command(0x06)  #Configuring the charge pump
-        self.send_data(0x3f)
-
-        self.send_command(0x2A)  #Setting XON and the options of LUT
-        self.send_data(0x00) 
-        self.send_data(0x00) 
-
-        self.send_command(0x30)  #Set the clock frequency
-        self.send_data(0x17) #50Hz
-
-        self.send_command(0x50)  #Set VCOM and data output interval
-        self.send_data(0x57)			
-
-        self.send_command(0x60)  #Set The non-overlapping period of Gate and Source.
-        self.send_data(0x22)
-
-        self.send_command(0x61)  #resolution setting
-        self.send_data (0x50)    #source 128 	 
-        self.send_data (0x80)       
-
-        self.send_command(0x82)  #sets VCOM_DC value
-        self.send_data(0x12)  #-1v
-
-        self.send_command(0xe3)#Set POWER SAVING
-        self.send_data(0x33)
+        epdsequence.run(self, INIT)
         self.SetFulltReg()	
         self.send_command(0x04)     		#power on
         self.ReadBusy()
@@ -239,25 +224,10 @@ class EPD:
         return 0
     
     def getbuffer(self, image):
-        buf = [0xFF] * (int(self.width / 8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
     def display(self, image):
@@ -270,14 +240,10 @@ class EPD:
             Width = self.width // 8 + 1
             
         self.send_command(0x10)
-        for j in range(0, self.height):
-            for i in range(0, int(Width)):
-                self.send_data(0xff)  
+        self.send_data2([0xff] * int(Width) * self.height)
         
         self.send_command(0x13)
-        for j in range(0, self.height):
-            for i in range(0, int(Width)):
-                self.send_data(image[i + j * int(Width)])  
+        self.send_data2(image[0:int(Width) * self.height])
         self.TurnOnDisplay()
         
     def Clear(self):
@@ -290,14 +256,10 @@ class EPD:
         Height = self.height
         
         self.send_command(0x10)
-        for j in range(0, Height):
-            for i in range(0, int(Width)):
-                self.send_data(0x00)  
+        self.send_data2([0x00] * int(Width) * Height)
         
         self.send_command(0x13)
-        for j in range(0, Height):
-            for i in range(0, int(Width)):
-                self.send_data(0xff)  
+        self.send_data2([0xff] * int(Width) * Height)
         self.TurnOnDisplay()
 
     def DisplayPartial(self, old_Image, Image):
@@ -321,14 +283,10 @@ class EPD:
         Height = self.height
         # send data
         self.send_command(0x10)
-        for j in range(0, Height):
-            for i in range(0, int(Width)):
-                self.send_data(old_Image[i + j * int(Width)])
+        self.send_data2(old_Image[0:int(Width) * Height])
 
         self.send_command(0x13)
-        for j in range(0, Height):
-            for i in range(0, int(Width)):
-                self.send_data(Image[i + j * int(Width)])
+        self.send_data2(Image[0:int(Width) * Height])
 
         # Set partial refresh
         self.TurnOnDisplay()
@@ -81,6 +81,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 200
@@ -88,6 +90,22 @@ EPD_HEIGHT      = 200
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x0C, 0xD7, 0xD6, 0x9D),  # BOOSTER_SOFT_START_CONTROL
+    (0x2C,  # WRITE_VCOM_REGISTER
+        0xA8,  # VCOM 7C
+    ),
+    (0x3A,  # SET_DUMMY_LINE_PERIOD
+        0x1A,  # 4 dummy lines per gate
+    ),
+    (0x3B,  # SET_GATE_TIME
+        0x08,  # 2us per line
+    ),
+    (0x11,  # DATA_ENTRY_MODE_SETTING
+        0x03,  # X increment Y increment
+    ),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -131,11 +149,14 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 0)
         epdconfig.spi_writebyte([data])
         epdconfig.digital_write(self.cs_pin, 1)
+
+    # send a lot of data
+    def send_data2(self, data):
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      # 0: idle, 1: busy
-            epdconfig.delay_ms(100)
+        epdconfig.wait_busy(self.busy_pin, 1)      # 0: idle, 1: busy
         logger.debug("e-Paper busy release")
 
     def TurnOnDisplay(self):
@@ -178,50 +199,18 @@ class EPD:
         self.send_data(((EPD_HEIGHT - 1) >> 8) & 0xFF)
         self.send_data(0x00) # GD = 0 SM = 0 TB = 0
         
-        self.send_command(0x0C) # BOOSTER_SOFT_START_CONTROL
-        self.send_data(0xD7)
-        self.send_data(0xD6)
-        self.send_data(0x9D)
-        
-        self.send_command(0x2C) # WRITE_VCOM_REGISTER
-        self.send_data(0xA8) # VCOM 7C
-        
-        self.send_command(0x3A) # SET_DUMMY_LINE_PERIOD
-        self.send_data(0x1A) # 4 dummy lines per gate
-        
-        self.send_command(0x3B) # SET_GATE_TIME
-        self.send_data(0x08) # 2us per line
-        
-        self.send_command(0x11) # DATA_ENTRY_MODE_SETTING
-        self.send_data(0x03) # X increment Y increment
+        epdsequence.run(self, INIT)
         
         # set the look-up table register
-        self.send_command(0x32)
-        for i in range(0, len(lut)):
-            self.send_data(lut[i])
+        epdsequence.run(self, ((0x32, lut),))
         # EPD hardware init end
         return 0
 
     def getbuffer(self, image):
-        buf = [0xFF] * (int(self.width / 8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
     def display(self, image):
@@ -232,8 +221,7 @@ class EPD:
         for j in range(0, self.height):
             self.SetCursor(0, j)
             self.send_command(0x24)
-            for i in range(0, int(self.width / 8)):
-                self.send_data(image[i + j * int(self.width / 8)])   
+            self.send_data2(image[j * int(self.width / 8):(j + 1) * int(self.width / 8)])
         self.TurnOnDisplay()
         
     def Clear(self, color=0xFF):
@@ -245,8 +233,7 @@ class EPD:
         for j in range(0, self.height):
             self.SetCursor(0, j)
             self.send_command(0x24)
-            for i in range(0, int(self.width / 8)):
-                self.send_data(color)
+            self.send_data2([color] * int(self.width / 8))
         # epdconfig.digital_write(self.cs_pin, 1)
         self.TurnOnDisplay()
 
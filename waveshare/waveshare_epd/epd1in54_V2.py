@@ -29,6 +29,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 200
@@ -36,6 +38,34 @@ EPD_HEIGHT      = 200
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x37, 0x00, 0x00, 0x00, 0x00, 0x00, 0x40, 0x00, 0x00, 0x00, 0x00),
+    (0x3c, 0x80),  # BorderWavefrom
+    (0x22, 0xc0),
+    (0x20,),
+    epdsequence.Busy("ReadBusy"),
+)
+
+# init(), part 2
+INIT_2 = (
+    (0x12,),  # SWRESET (software reset)
+    epdsequence.Busy("ReadBusy"),
+    (0x01,  # DRIVER_OUTPUT_CONTROL
+        0xC7,  # (EPD_HEIGHT - 1) & 0xFF
+        0x00,  # ((EPD_HEIGHT - 1) >> 8) & 0xFF
+        0x01,  # GD = 0 SM = 0 TB = 0
+    ),
+    (0x11, 0x01),  # data entry mode
+)
+
+# init(), part 3
+INIT_3 = (
+    (0x3C, 0x01),  # BorderWavefrom
+    (0x18, 0x80),
+    (0x22, 0XB1),  # #Load Temperature and waveform setting.
+    (0x20,),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -114,15 +144,11 @@ class EPD:
     
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):
-            epdconfig.delay_ms(20)
+        epdconfig.wait_busy(self.busy_pin, 1)
         logger.debug("e-Paper busy release")
 
     def TurnOnDisplay(self):
@@ -189,25 +215,7 @@ class EPD:
             
             self.set_lut(self.WF_PARTIAL_1IN54_0)
             
-            self.send_command(0x37)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x40)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            
-            self.send_command(0x3c)  # BorderWavefrom
-            self.send_data(0x80)
-            
-            self.send_command(0x22)
-            self.send_data(0xc0)
-            self.send_command(0x20)
-            self.ReadBusy()
+            epdsequence.run(self, INIT)
         
         else:
             logger.debug("full refresh")
@@ -215,28 +223,11 @@ class EPD:
             self.reset()
             
             self.ReadBusy()
-            self.send_command(0x12) # SWRESET (software reset)
-            self.ReadBusy()
-            
-            self.send_command(0x01) # DRIVER_OUTPUT_CONTROL
-            self.send_data(0xC7) # (EPD_HEIGHT - 1) & 0xFF
-            self.send_data(0x00) # ((EPD_HEIGHT - 1) >> 8) & 0xFF
-            self.send_data(0x01) # GD = 0 SM = 0 TB = 0
-            
-            self.send_command(0x11) # data entry mode
-            self.send_data(0x01)
+            epdsequence.run(self, INIT_2)
                       
             self.SetWindows(0, self.height-1, self.width-1, 0) # Set Windows
     
-            self.send_command(0x3C) # BorderWavefrom
-            self.send_data(0x01)
-
-            self.send_command(0x18)
-            self.send_data(0x80)
-
-            self.send_command(0x22) # #Load Temperature and waveform setting.
-            self.send_data(0XB1)
-            self.send_command(0x20)
+            epdsequence.run(self, INIT_3)
 
             self.SetCursor(0, self.height-1) # Set Cursor
             
@@ -256,25 +247,10 @@ class EPD:
         self.TurnOnDisplay()
         
     def getbuffer(self, image):
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
     def display(self, image):
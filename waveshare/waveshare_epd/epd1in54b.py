@@ -29,6 +29,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 200
@@ -36,6 +38,18 @@ EPD_HEIGHT      = 200
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x01, 0x07, 0x00, 0x08, 0x00),  # POWER_SETTING
+    (0x06, 0x07, 0x07, 0x07),  # BOOSTER_SOFT_START
+    (0x04,),  # POWER_ON
+    epdsequence.Busy("ReadBusy"),
+    (0X00, 0xCF),  # PANEL_SETTING
+    (0X50, 0x17),  # VCOM_AND_DATA_INTERVAL_SETTING
+    (0x30, 0x39),  # PLL_CONTROL
+    (0x61, 0xC8, 0x00, 0xC8),  # TCON_RESOLUTION set x and y
+    (0x82, 0x0E),  # VCM_DC_SETTING_REGISTER
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -74,40 +88,31 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 0)
         epdconfig.spi_writebyte([data])
         epdconfig.digital_write(self.cs_pin, 1)
+
+    # send a lot of data
+    def send_data2(self, data):
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 0):
-            epdconfig.delay_ms(100)    
+        epdconfig.wait_busy(self.busy_pin, 0)
         logger.debug("e-Paper busy release")
       
     def set_lut_bw(self):
-        self.send_command(0x20) # vcom
-        for count in range(0, 15):
-            self.send_data(self.lut_vcom0[count])
-        self.send_command(0x21) # ww --
-        for count in range(0, 15):
-            self.send_data(self.lut_w[count])
-        self.send_command(0x22) # bw r
-        for count in range(0, 15):
-            self.send_data(self.lut_b[count])
-        self.send_command(0x23) # wb w
-        for count in range(0, 15):
-            self.send_data(self.lut_g1[count])
-        self.send_command(0x24) # bb b
-        for count in range(0, 15):
-            self.send_data(self.lut_g2[count])
+        epdsequence.run(self, (
+            (0x20, self.lut_vcom0[0:15]),  # vcom
+            (0x21, self.lut_w[0:15]),  # ww --
+            (0x22, self.lut_b[0:15]),  # bw r
+            (0x23, self.lut_g1[0:15]),  # wb w
+            (0x24, self.lut_g2[0:15]),  # bb b
+        ))
 
     def set_lut_red(self):
-        self.send_command(0x25)
-        for count in range(0, 15):
-            self.send_data(self.lut_vcom1[count])
-        self.send_command(0x26)
-        for count in range(0, 15):
-            self.send_data(self.lut_red0[count])
-        self.send_command(0x27)
-        for count in range(0, 15):
-            self.send_data(self.lut_red1[count])
+        epdsequence.run(self, (
+            (0x25, self.lut_vcom1[0:15]),
+            (0x26, self.lut_red0[0:15]),
+            (0x27, self.lut_red1[0:15]),
+        ))
             
     def init(self):
         if (epdconfig.module_init() != 0):
@@ -115,88 +120,51 @@ class EPD:
         # EPD hardware init start
         self.reset()
         
-        self.send_command(0x01) # POWER_SETTING
-        self.send_data(0x07)
-        self.send_data(0x00)
-        self.send_data(0x08)
-        self.send_data(0x00)
-        self.send_command(0x06) # BOOSTER_SOFT_START
-        self.send_data(0x07)
-        self.send_data(0x07)
-        self.send_data(0x07)
-        self.send_command(0x04) # POWER_ON
-
-        self.ReadBusy()
-
-        self.send_command(0X00) # PANEL_SETTING
-        self.send_data(0xCF)
-        self.send_command(0X50) # VCOM_AND_DATA_INTERVAL_SETTING
-        self.send_data(0x17)
-        self.send_command(0x30) # PLL_CONTROL
-        self.send_data(0x39)
-        self.send_command(0x61) # TCON_RESOLUTION set x and y
-        self.send_data(0xC8)
-        self.send_data(0x00)
-        self.send_data(0xC8)
-        self.send_command(0x82) # VCM_DC_SETTING_REGISTER
-        self.send_data(0x0E)
+        epdsequence.run(self, INIT)
         
         self.set_lut_bw()
         self.set_lut_red()
         return 0
 
     def getbuffer(self, image):
-        buf = [0xFF] * int(self.width * self.height / 8)
-        # Set buffer to value of Python Imaging Library image.
-        # Image must be in mode 1.
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        if imwidth != self.width or imheight != self.height:
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
             raise ValueError('Image must be same dimensions as display \
                 ({0}x{1}).' .format(self.width, self.height))
-
-        pixels = image_monocolor.load()
-        for y in range(self.height):
-            for x in range(self.width):
-                # Set the bits for the column of pixels at the current position.
-                if pixels[x, y] == 0:
-                    buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
         return buf
 
     def display(self, blackimage, redimage):
         # send black data
         if (blackimage != None):
             self.send_command(0x10) # DATA_START_TRANSMISSION_1
+            buf = bytearray()
             for i in range(0, int(self.width * self.height / 8)):
                 temp = 0x00
                 for bit in range(0, 4):
                     if (blackimage[i] & (0x80 >> bit) != 0):
                         temp |= 0xC0 >> (bit * 2)
-                self.send_data(temp)  
+                buf.append(temp)
                 temp = 0x00
                 for bit in range(4, 8):
                     if (blackimage[i] & (0x80 >> bit) != 0):
                         temp |= 0xC0 >> ((bit - 4) * 2)
-                self.send_data(temp)
+                buf.append(temp)
+            self.send_data2(buf)
                 
         # send red data        
         if (redimage != None):
             self.send_command(0x13) # DATA_START_TRANSMISSION_2
-            for i in range(0, int(self.width * self.height / 8)):
-                self.send_data(redimage[i])  
+            self.send_data2(redimage[0:int(self.width * self.height / 8)])
 
         self.send_command(0x12) # DISPLAY_REFRESH
         self.ReadBusy()
 
     def Clear(self):
         self.send_command(0x10) # DATA_START_TRANSMISSION_1
-        for i in range(0, int(self.width * self.height / 8)):
-            self.send_data(0xFF)
-            self.send_data(0xFF)
+        self.send_data2([0xFF] * int(self.width * self.height / 8) * 2)
             
         self.send_command(0x13) # DATA_START_TRANSMISSION_2
-        for i in range(0, int(self.width * self.height / 8)):
-            self.send_data(0xFF)
+        self.send_data2([0xFF] * int(self.width * self.height / 8))
 
         self.send_command(0x12) # DISPLAY_REFRESH
         self.ReadBusy()
@@ -29,6 +29,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 200
@@ -36,6 +38,28 @@ EPD_HEIGHT      = 200
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x12,),  #SWRESET
+    epdsequence.Busy("ReadBusy"),
+    (0x01, 0xC7, 0x00, 0x01),  #Driver output control
+    (0x11, 0x01),  #data entry mode
+    (0x44,  #set Ram-X address start/end position
+        0x00,
+        0x18,  #0x18-->(24+1)*8=200
+    ),
+    (0x45,  #set Ram-Y address start/end position
+        0xC7,  #0xC7-->(199+1)=200
+        0x00,
+        0x00,
+        0x00,
+    ),
+    (0x3C, 0x05),  #BorderWavefrom
+    (0x18, 0x80),  #Read built-in temperature sensor
+    (0x4E, 0x00),  # set RAM x address count to 0
+    (0x4F, 0xC7, 0x00),  # set RAM y address count to 0X199
+    epdsequence.Busy("ReadBusy"),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -69,15 +93,11 @@ class EPD:
 
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):
-            epdconfig.delay_ms(100)    
+        epdconfig.wait_busy(self.busy_pin, 1)
         logger.debug("e-Paper busy release")
         
     def init(self):
@@ -87,68 +107,17 @@ class EPD:
         self.reset()
         
         self.ReadBusy()   
-        self.send_command(0x12)  #SWRESET
-        self.ReadBusy()   
-
-        self.send_command(0x01) #Driver output control      
-        self.send_data(0xC7)
-        self.send_data(0x00)
-        self.send_data(0x01)
-
-        self.send_command(0x11) #data entry mode       
-        self.send_data(0x01)
-
-        self.send_command(0x44) #set Ram-X address start/end position   
-        self.send_data(0x00)
-        self.send_data(0x18)    #0x18-->(24+1)*8=200
-
-        self.send_command(0x45) #set Ram-Y address start/end position          
-        self.send_data(0xC7)    #0xC7-->(199+1)=200
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x00) 
-
-        self.send_command(0x3C) #BorderWavefrom
-        self.send_data(0x05)
-
-        self.send_command(0x18) #Read built-in temperature sensor
-        self.send_data(0x80)
-
-        self.send_command(0x4E)   # set RAM x address count to 0
-        self.send_data(0x00)
-        self.send_command(0x4F)   # set RAM y address count to 0X199    
-        self.send_data(0xC7)
-        self.send_data(0x00)
-        self.ReadBusy()
+        epdsequence.run(self, INIT)
         return 0
 
     def getbuffer(self, image):
-        buf = [0xFF] * int(self.width * self.height / 8)
-        # Set buffer to value of Python Imaging Library image.
-        # Image must be in mode 1.
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        if imwidth != self.width or imheight != self.height:
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
             raise ValueError('Image must be same dimensions as display \
                 ({0}x{1}).' .format(self.width, self.height))
-
-        pixels = image_monocolor.load()
-        for y in range(self.height):
-            for x in range(self.width):
-                # Set the bits for the column of pixels at the current position.
-                if pixels[x, y] == 0:
-                    buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
         return buf
 
     def display(self, blackimage, redimage):
-
-        if self.width%8 == 0:
-            linewidth = int(self.width/8)
-        else:
-            linewidth = int(self.width/8) + 1
-
-        buf = [0x00] * self.height * linewidth
-
         # send black data
         if (blackimage != None):
             self.send_command(0x24) # DATA_START_TRANSMISSION_1
@@ -157,9 +126,7 @@ class EPD:
         # send red data        
         if (redimage != None):
             self.send_command(0x26) # DATA_START_TRANSMISSION_2
-            for i in range(0, int(self.width * self.height / 8)):
-                buf[i] = ~redimage[i]
-            self.send_data2(buf)
+            self.send_data2(epdbuffer.invert(redimage[0:int(self.width * self.height / 8)]))
 
         self.send_command(0x22) # DISPLAY_REFRESH
         self.send_data(0xF7)
@@ -28,6 +28,8 @@
 #
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 152
@@ -35,6 +37,18 @@ EPD_HEIGHT      = 152
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x06, 0x17, 0x17, 0x17),  # boost soft start
+    (0x04,),  # power on
+    epdsequence.Busy("ReadBusy"),
+    (0x00,  # panel setting
+        0x0f,  # LUT from OTP,160x296
+        0x0d,  # VCOM to 0V fast
+    ),
+    (0x61, 0x98, 0x00, 0x98),  # resolution setting
+    (0x50, 0x77),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -64,11 +78,14 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 0)
         epdconfig.spi_writebyte([data])
         epdconfig.digital_write(self.cs_pin, 1)
+
+    # send a lot of data
+    def send_data2(self, data):
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 0):      #  0: idle, 1: busy
-            epdconfig.delay_ms(200)                
+        epdconfig.wait_busy(self.busy_pin, 0)      #  0: idle, 1: busy
         logger.debug("e-Paper busy release")
      
     def init(self):
@@ -77,68 +94,31 @@ class EPD:
         # EPD hardware init start
         self.reset()
         
-        self.send_command(0x06) # boost soft start
-        self.send_data(0x17)
-        self.send_data(0x17)
-        self.send_data(0x17)
-        self.send_command(0x04) # power on
-        
-        self.ReadBusy()
-        
-        self.send_command(0x00) # panel setting
-        self.send_data(0x0f) # LUT from OTP,160x296
-        self.send_data(0x0d) # VCOM to 0V fast
-        
-        self.send_command(0x61) # resolution setting
-        self.send_data(0x98)
-        self.send_data(0x00)
-        self.send_data(0x98)
-        
-        self.send_command(0x50)
-        self.send_data(0x77)
+        epdsequence.run(self, INIT)
 
     def getbuffer(self, image):
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    #  Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
     def display(self, blackimage, yellowimage):
         self.send_command(0x10)
         logger.debug("blackimage")
-        for i in range(0, int(self.width * self.height / 8)):
-            self.send_data(blackimage[i])
+        self.send_data2(blackimage[0:int(self.width * self.height / 8)])
         self.send_command(0x13)
         logger.debug("yellowimage")
-        for i in range(0, int(self.width * self.height / 8)):
-            self.send_data(yellowimage[i])
+        self.send_data2(yellowimage[0:int(self.width * self.height / 8)])
             
         self.send_command(0x12)
         self.ReadBusy()
         
     def Clear(self):
         self.send_command(0x10)
-        for i in range(0, int(self.width * self.height / 8)):
-            self.send_data(0xFF)            
+        self.send_data2([0xFF] * int(self.width * self.height / 8))
         self.send_command(0x13)
-        for i in range(0, int(self.width * self.height / 8)):
-            self.send_data(0xFF)
+        self.send_data2([0xFF] * int(self.width * self.height / 8))
             
         self.send_command(0x12)
         self.ReadBusy()
@@ -30,9 +30,10 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 import PIL
-from PIL import Image
 import io
 
 # Display resolution
@@ -41,6 +42,24 @@ EPD_HEIGHT      = 168
 
 logger = logging.getLogger(__name__)
 
+# The 4 colors supported by the panel, in panel index order
+PALETTE = (0,0,0,  255,255,255,  255,255,0,   255,0,0)
+
+INIT = (
+    (0x66, 0x49, 0x55, 0x13, 0x5D),
+    (0x66, 0x49, 0x55),
+    (0xB0, 0x03),
+    (0x00, 0x4F, 0x6B),
+    (0x03, 0x00),
+    (0xF0, 0xF6, 0x0D, 0x00, 0x00, 0x00),
+    (0x06, 0xCF, 0xDF, 0x0F),
+    (0x41, 0x00),
+    (0x50, 0x30),
+    (0x60, 0x0C, 0x05),
+    (0x61, 0xA8, 0x00, 0xA8),
+    (0x84, 0x01),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -74,17 +93,19 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 0)
         epdconfig.spi_writebyte([data])
         epdconfig.digital_write(self.cs_pin, 1)
+
+    # send a lot of data
+    def send_data2(self, data):
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusyH(self):
         logger.debug("e-Paper busy H")
-        while(epdconfig.digital_read(self.busy_pin) == 0):      # 0: idle, 1: busy
-            epdconfig.delay_ms(5)
+        epdconfig.wait_busy(self.busy_pin, 0)      # 0: idle, 1: busy
         logger.debug("e-Paper busy H release")
 
     def ReadBusyL(self):
         logger.debug("e-Paper busy L")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      # 0: busy, 1: idle
-            epdconfig.delay_ms(5)
+        epdconfig.wait_busy(self.busy_pin, 1)      # 0: busy, 1: idle
         logger.debug("e-Paper busy L release")
 
     def TurnOnDisplay(self):
@@ -103,83 +124,16 @@ class EPD:
 
         self.reset()
 
-        self.send_command(0x66)
-        self.send_data(0x49)
-        self.send_data(0x55)
-        self.send_data(0x13)
-        self.send_data(0x5D)
-
-        self.send_command(0x66)
-        self.send_data(0x49)
-        self.send_data(0x55)
-
-        self.send_command(0xB0)
-        self.send_data(0x03)
-
-        self.send_command(0x00)
-        self.send_data(0x4F)
-        self.send_data(0x6B)
-
-        self.send_command(0x03)
-        self.send_data(0x00)
-
-        self.send_command(0xF0)
-        self.send_data(0xF6)
-        self.send_data(0x0D)
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x06)
-        self.send_data(0xCF)
-        self.send_data(0xDF)
-        self.send_data(0x0F)
-
-        self.send_command(0x41)
-        self.send_data(0x00)
-
-        self.send_command(0x50)
-        self.send_data(0x30)
-
-        self.send_command(0x60)
-        self.send_data(0x0C)
-        self.send_data(0x05)
-
-        self.send_command(0x61)
-        self.send_data(0xA8)
-        self.send_data(0x00)
-        self.send_data(0xA8)
-
-        self.send_command(0x84)
-        self.send_data(0x01)
+        epdsequence.run(self, INIT)
         return 0
 
-    def getbuffer(self, image):
-        # Create a pallette with the 4 colors supported by the panel
-        pal_image = Image.new("P", (1,1))
-        pal_image.putpalette( (0,0,0,  255,255,255,  255,255,0,   255,0,0) + (0,0,0)*252)
-
-        # Check if we need to rotate the image
-        imwidth, imheight = image.size
-        if(imwidth == self.width and imheight == self.height):
-            image_temp = image
-        elif(imwidth == self.height and imheight == self.width):
-            image_temp = image.rotate(90, expand=True)
-        else:
-            logger.warning("Invalid image dimensions: %d x %d, expected %d x %d" % (imwidth, imheight, self.width, self.height))
-
-        # Convert the soruce image to the 4 colors, dithering if needed
-        image_4color = image_temp.convert("RGB").quantize(palette=pal_image)
-        buf_4color = bytearray(image_4color.tobytes('raw'))
+    def getbuffer(self, image, dither=True):
+        # Turn the image to the panel's orientation if it was drawn the other way round
+        image_temp = epdbuffer.native_image(image, self.width, self.height)
 
+        # Convert the source image to the 4 colors, dithering if asked, and pack 4 pixels
         # into a single byte to transfer to the panel
-        buf = [0x00] * int(self.width * self.height / 4)
-        idx = 0
-        for i in range(0, len(buf_4color), 4):
-            buf[idx] = (buf_4color[i] << 6) + (buf_4color[i+1] << 4) + (buf_4color[i+2] << 2) + buf_4color[i+3]
-            idx += 1
-
-        return buf
+        return epdbuffer.pack_palette(image_temp, PALETTE, 2, dither)
 
     def display(self, image):
         if self.width % 4 == 0 :
@@ -195,9 +149,7 @@ class EPD:
         self.ReadBusyH()
 
         self.send_command(0x10)
-        for j in range(0, Height):
-            for i in range(0, Width):
-                    self.send_data(image[i + j * Width])
+        self.send_data2(image[0:Width * Height])
 
         self.send_command(0x68)
         self.send_data(0x00)
@@ -218,9 +170,7 @@ class EPD:
         self.ReadBusyH()
 
         self.send_command(0x10)
-        for j in range(0, Height):
-            for i in range(0, Width):
-                self.send_data(color)
+        self.send_data2([color] * Width * Height)
 
         self.send_command(0x68)
         self.send_data(0x00)
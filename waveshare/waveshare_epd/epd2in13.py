@@ -30,6 +30,10 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
+
+from PIL import Image
 
 # Display resolution
 EPD_WIDTH       = 122
@@ -37,6 +41,23 @@ EPD_HEIGHT      = 250
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x0C, 0xD7, 0xD6, 0x9D),  # BOOSTER_SOFT_START_CONTROL
+    (0x2C,  # WRITE_VCOM_REGISTER
+        0xA8,  # VCOM 7C
+    ),
+    (0x3A,  # SET_DUMMY_LINE_PERIOD
+        0x1A,  # 4 dummy lines per gate
+    ),
+    (0x3B,  # SET_GATE_TIME
+        0x08,  # 2us per line
+    ),
+    (0X3C, 0x03),  # BORDER_WAVEFORM_CONTROL
+    (0X11,  # DATA_ENTRY_MODE_SETTING
+        0x03,  # X increment; Y increment
+    ),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -80,10 +101,13 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 0)
         epdconfig.spi_writebyte([data])
         epdconfig.digital_write(self.cs_pin, 1)
+
+    # send a lot of data
+    def send_data2(self, data):
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):        
-        while(epdconfig.digital_read(self.busy_pin) == 1):      # 0: idle, 1: busy
-            epdconfig.delay_ms(100)            
+        epdconfig.wait_busy(self.busy_pin, 1)      # 0: idle, 1: busy
 
     def TurnOnDisplay(self):
         self.send_command(0x22) # DISPLAY_UPDATE_CONTROL_2
@@ -105,30 +129,10 @@ class EPD:
         self.send_data(((EPD_HEIGHT - 1) >> 8) & 0xFF)
         self.send_data(0x00) # GD = 0 SM = 0 TB = 0
         
-        self.send_command(0x0C) # BOOSTER_SOFT_START_CONTROL
-        self.send_data(0xD7)
-        self.send_data(0xD6)
-        self.send_data(0x9D)
-        
-        self.send_command(0x2C) # WRITE_VCOM_REGISTER
-        self.send_data(0xA8) # VCOM 7C
-        
-        self.send_command(0x3A) # SET_DUMMY_LINE_PERIOD
-        self.send_data(0x1A) # 4 dummy lines per gate
-        
-        self.send_command(0x3B) # SET_GATE_TIME
-        self.send_data(0x08) # 2us per line
-        
-        self.send_command(0X3C) # BORDER_WAVEFORM_CONTROL
-        self.send_data(0x03)      
-        
-        self.send_command(0X11) # DATA_ENTRY_MODE_SETTING
-        self.send_data(0x03) # X increment; Y increment
+        epdsequence.run(self, INIT)
         
         # WRITE_LUT_REGISTER
-        self.send_command(0x32)
-        for count in range(30):
-            self.send_data(lut[count])
+        epdsequence.run(self, ((0x32, lut[0:30]),))
 
         return 0
         
@@ -162,30 +166,15 @@ class EPD:
             linewidth = int(self.width/8)
         else:
             linewidth = int(self.width/8) + 1
-         
-        buf = [0xFF] * (linewidth * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):                    
-                    if pixels[x, y] == 0:
-                        # x = imwidth - x
-                        buf[int(x / 8) + y * linewidth] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        # newy = imwidth - newy - 1
-                        buf[int(newx / 8) + newy*linewidth] &= ~(0x80 >> (y % 8))
-        return buf   
 
+        image_monocolor = epdbuffer.native_image(image.convert('1'), self.width, self.height)
+        if image_monocolor is None:
+            # return a blank buffer
+            return [0xFF] * (linewidth * self.height)
+        # the padding at the end of each row is sent white, PIL would pack it as black
+        img = Image.new('1', (linewidth * 8, self.height), 1)
+        img.paste(image_monocolor, (0, 0))
+        return epdbuffer.pack_1bit(img, linewidth * 8, self.height)
         
     def display(self, image):
         if self.width%8 == 0:
@@ -197,8 +186,7 @@ class EPD:
         for j in range(0, self.height):
             self.SetCursor(0, j);
             self.send_command(0x24);
-            for i in range(0, linewidth):
-                self.send_data(image[i + j * linewidth])   
+            self.send_data2(image[j * linewidth:(j + 1) * linewidth])
         self.TurnOnDisplay()
     
     def Clear(self, color=0xFF):
@@ -211,8 +199,7 @@ class EPD:
         for j in range(0, self.height):
             self.SetCursor(0, j);
             self.send_command(0x24);
-            for i in range(0, linewidth):
-                self.send_data(color)   
+            self.send_data2([color] * linewidth)
         self.TurnOnDisplay()
 
     def sleep(self):
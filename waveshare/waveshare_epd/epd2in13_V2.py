@@ -30,6 +30,10 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
+
+from PIL import Image
 
 # Display resolution
 EPD_WIDTH       = 122
@@ -37,6 +41,45 @@ EPD_HEIGHT      = 250
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x12,),  # soft reset
+    epdsequence.Busy("ReadBusy"),
+    (0x74, 0x54),  #set analog block control
+    (0x7E, 0x3B),  #set digital block control
+    (0x01, 0xF9, 0x00, 0x00),  #Driver output control
+    (0x11, 0x01),  #data entry mode
+    (0x44,  #set Ram-X address start/end position
+        0x00,
+        0x0F,  #0x0C-->(15+1)*8=128
+    ),
+    (0x45,  #set Ram-Y address start/end position
+        0xF9,  #0xF9-->(249+1)=250
+        0x00,
+        0x00,
+        0x00,
+    ),
+    (0x3C, 0x03),  #BorderWavefrom
+    (0x2C,  #VCOM Voltage
+        0x55,  #
+    ),
+)
+
+# init(), part 2
+INIT_2 = (
+    (0x4E, 0x00),  # set RAM x address count to 0
+    (0x4F, 0xF9, 0x00),  # set RAM y address count to 0X127
+    epdsequence.Busy("ReadBusy"),
+)
+
+# init(), part 3
+INIT_3 = (
+    (0x37, 0x00, 0x00, 0x00, 0x00, 0x40, 0x00, 0x00),
+    (0x22, 0xC0),
+    (0x20,),
+    epdsequence.Busy("ReadBusy"),
+    (0x3C, 0x01),  #BorderWavefrom
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -107,14 +150,10 @@ class EPD:
 
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):
-        while(epdconfig.digital_read(self.busy_pin) == 1):      # 0: idle, 1: busy
-            epdconfig.delay_ms(100)    
+        epdconfig.wait_busy(self.busy_pin, 1)      # 0: idle, 1: busy
 
     def TurnOnDisplay(self):
         self.send_command(0x22)
@@ -135,37 +174,7 @@ class EPD:
         self.reset()
         if(update == self.FULL_UPDATE):
             self.ReadBusy()
-            self.send_command(0x12) # soft reset
-            self.ReadBusy()
-
-            self.send_command(0x74) #set analog block control
-            self.send_data(0x54)
-            self.send_command(0x7E) #set digital block control
-            self.send_data(0x3B)
-
-            self.send_command(0x01) #Driver output control
-            self.send_data(0xF9)
-            self.send_data(0x00)
-            self.send_data(0x00)
-
-            self.send_command(0x11) #data entry mode
-            self.send_data(0x01)
-
-            self.send_command(0x44) #set Ram-X address start/end position
-            self.send_data(0x00)
-            self.send_data(0x0F)    #0x0C-->(15+1)*8=128
-
-            self.send_command(0x45) #set Ram-Y address start/end position
-            self.send_data(0xF9)   #0xF9-->(249+1)=250
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            
-            self.send_command(0x3C) #BorderWavefrom
-            self.send_data(0x03)
-
-            self.send_command(0x2C)     #VCOM Voltage
-            self.send_data(0x55)    #
+            epdsequence.run(self, INIT)
 
             self.send_command(0x03)
             self.send_data(self.lut_full_update[70])
@@ -180,42 +189,18 @@ class EPD:
             self.send_command(0x3B)     #Gate time
             self.send_data(self.lut_full_update[75])
 
-            self.send_command(0x32)
-            for count in range(70):
-                self.send_data(self.lut_full_update[count])
+            epdsequence.run(self, ((0x32, self.lut_full_update[0:70]),))
 
-            self.send_command(0x4E)   # set RAM x address count to 0
-            self.send_data(0x00)
-            self.send_command(0x4F)   # set RAM y address count to 0X127
-            self.send_data(0xF9)
-            self.send_data(0x00)
-            self.ReadBusy()
+            epdsequence.run(self, INIT_2)
         else:
             self.send_command(0x2C)     #VCOM Voltage
             self.send_data(0x26)
 
             self.ReadBusy()
 
-            self.send_command(0x32)
-            for count in range(70):
-                self.send_data(self.lut_partial_update[count])
-
-            self.send_command(0x37)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x40)
-            self.send_data(0x00)
-            self.send_data(0x00)
-
-            self.send_command(0x22)
-            self.send_data(0xC0)
-            self.send_command(0x20)
-            self.ReadBusy()
+            epdsequence.run(self, ((0x32, self.lut_partial_update[0:70]),))
 
-            self.send_command(0x3C) #BorderWavefrom
-            self.send_data(0x01)
+            epdsequence.run(self, INIT_3)
         return 0
 
     def getbuffer(self, image):
@@ -223,30 +208,22 @@ class EPD:
             linewidth = int(self.width/8)
         else:
             linewidth = int(self.width/8) + 1
-         
-        buf = [0xFF] * (linewidth * self.height)
+
         image_monocolor = image.convert('1')
         imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        
         if(imwidth == self.width and imheight == self.height):
             logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):                    
-                    if pixels[x, y] == 0:
-                        x = imwidth - x
-                        buf[int(x / 8) + y * linewidth] &= ~(0x80 >> (x % 8))
+            # rows are mirrored on this panel, pixel x goes to bit (width - x) of the padded row, the rest stays white
+            img = Image.new('1', (linewidth * 8, self.height), 1)
+            img.paste(image_monocolor.transpose(Image.Transpose.FLIP_LEFT_RIGHT), (1, 0))
+            return epdbuffer.pack_1bit(img, linewidth * 8, self.height)
         elif(imwidth == self.height and imheight == self.width):
             logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        newy = imwidth - newy - 1
-                        buf[int(newx / 8) + newy*linewidth] &= ~(0x80 >> (y % 8))
-        return buf   
-        
+            # mirrored and turned, which leaves image x as the panel row and image y as the column
+            img = Image.new('1', (linewidth * 8, self.height), 1)
+            img.paste(image_monocolor.transpose(Image.Transpose.TRANSPOSE), (0, 0))
+            return epdbuffer.pack_1bit(img, linewidth * 8, self.height)
+        return [0xFF] * (linewidth * self.height)
         
     def display(self, image):
         self.send_command(0x24)
@@ -259,10 +236,7 @@ class EPD:
         else:
             linewidth = int(self.width/8) + 1
 
-        buf = [0x00] * self.height * linewidth
-        for j in range(0, self.height):
-            for i in range(0, linewidth):
-                buf[i + j * linewidth] = ~image[i + j * linewidth]
+        buf = epdbuffer.invert(image[0:self.height * linewidth])
 
         self.send_command(0x24)
         self.send_data2(image)   
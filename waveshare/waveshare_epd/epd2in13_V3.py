@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 122
@@ -37,6 +39,21 @@ EPD_HEIGHT      = 250
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x12,),  #SWRESET
+    epdsequence.Busy("ReadBusy"),
+    (0x01, 0xf9, 0x00, 0x00),  #Driver output control
+    (0x11, 0x03),  #data entry mode
+)
+
+# init(), part 2
+INIT_2 = (
+    (0x3c, 0x05),
+    (0x21, 0x00, 0x80),  #  Display update control
+    (0x18, 0x80),
+    epdsequence.Busy("ReadBusy"),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -126,10 +143,7 @@ class EPD:
 
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
     
     '''
     function :Wait until the busy_pin goes LOW
@@ -137,8 +151,7 @@ class EPD:
     '''
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      # 0: idle, 1: busy
-            epdconfig.delay_ms(10)  
+        epdconfig.wait_busy(self.busy_pin, 1)      # 0: idle, 1: busy
         logger.debug("e-Paper busy release")
 
     '''
@@ -167,9 +180,7 @@ class EPD:
         lut : lut data
     '''    
     def Lut(self, lut):
-        self.send_command(0x32)
-        for i in range(0, 153):
-            self.send_data(lut[i])
+        epdsequence.run(self, ((0x32, lut[0:153]),))
         self.ReadBusy()
     
     '''
@@ -236,31 +247,12 @@ class EPD:
         self.reset()
         
         self.ReadBusy()
-        self.send_command(0x12)  #SWRESET
-        self.ReadBusy() 
-
-        self.send_command(0x01) #Driver output control      
-        self.send_data(0xf9)
-        self.send_data(0x00)
-        self.send_data(0x00)
-    
-        self.send_command(0x11) #data entry mode       
-        self.send_data(0x03)
+        epdsequence.run(self, INIT)
 
         self.SetWindow(0, 0, self.width-1, self.height-1)
         self.SetCursor(0, 0)
         
-        self.send_command(0x3c)
-        self.send_data(0x05)
-
-        self.send_command(0x21) #  Display update control
-        self.send_data(0x00)
-        self.send_data(0x80)
-    
-        self.send_command(0x18)
-        self.send_data(0x80)
-        
-        self.ReadBusy()
+        epdsequence.run(self, INIT_2)
         
         self.SetLut(self.lut_full_update)
         return 0
@@ -271,20 +263,12 @@ class EPD:
         image : Image data
     '''
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        if(imwidth == self.width and imheight == self.height):
-            img = img.convert('1')
-        elif(imwidth == self.height and imheight == self.width):
-            # image has correct dimensions, but needs to be rotated
-            img = img.rotate(90, expand=True).convert('1')
-        else:
-            logger.warning("Wrong image dimensions: must be " + str(self.width) + "x" + str(self.height))
+        # turn before converting so landscape frames dither in panel orientation
+        img = epdbuffer.native_image(image, self.width, self.height)
+        if img is None:
             # return a blank buffer
             return [0x00] * (int(self.width/8) * self.height)
-
-        buf = bytearray(img.tobytes('raw'))
-        return buf
+        return epdbuffer.pack_1bit(img, self.width, self.height)
         
     '''
     function : Sends the image buffer in RAM to e-Paper and displays
@@ -298,9 +282,7 @@ class EPD:
             linewidth = int(self.width/8) + 1
 
         self.send_command(0x24)
-        for j in range(0, self.height):
-            for i in range(0, linewidth):
-                self.send_data(image[i + j * linewidth])   
+        self.send_data2(image[0:linewidth * self.height])
         self.TurnOnDisplay()
     
     '''
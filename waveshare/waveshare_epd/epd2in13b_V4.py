@@ -29,6 +29,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 122
@@ -36,6 +38,21 @@ EPD_HEIGHT      = 250
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x12,),  # SWRESET
+    epdsequence.Busy("busy"),
+    (0x01, 0xf9, 0x00, 0x00),  # Driver output control
+    (0x11, 0x03),  # data entry mode
+)
+
+# init(), part 2
+INIT_2 = (
+    (0x3C, 0x05),  # BorderWavefrom
+    (0x18, 0x80),  # Read built-in temperature sensor
+    (0x21, 0x80, 0x80),  # Display update control
+    epdsequence.Busy("busy"),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -70,10 +87,7 @@ class EPD:
         
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     # judge e-Paper whether is busy
     def busy(self):
@@ -111,31 +125,12 @@ class EPD:
         self.reset()
 
         self.busy()
-        self.send_command(0x12)  # SWRESET
-        self.busy()   
-
-        self.send_command(0x01) # Driver output control      
-        self.send_data(0xf9)
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x11) # data entry mode       
-        self.send_data(0x03)
+        epdsequence.run(self, INIT)
 
         self.set_windows(0, 0, self.width - 1, self.height - 1)
         self.set_cursor(0, 0)
 
-        self.send_command(0x3C) # BorderWavefrom
-        self.send_data(0x05)	
-
-        self.send_command(0x18) # Read built-in temperature sensor
-        self.send_data(0x80)	
-
-        self.send_command(0x21) # Display update control
-        self.send_data(0x80)	
-        self.send_data(0x80)
-
-        self.busy()
+        epdsequence.run(self, INIT_2)
         
         return 0
 
@@ -146,20 +141,12 @@ class EPD:
 
     # image converted to bytearray
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        if(imwidth == self.width and imheight == self.height):
-            img = img.convert('1')
-        elif(imwidth == self.height and imheight == self.width):
-            # image has correct dimensions, but needs to be rotated
-            img = img.rotate(90, expand=True).convert('1')
-        else:
-            logger.warning("Wrong image dimensions: must be " + str(self.width) + "x" + str(self.height))
+        # turn before converting so landscape frames dither in panel orientation
+        img = epdbuffer.native_image(image, self.width, self.height)
+        if img is None:
             # return a blank buffer
             return [0x00] * (int(self.width/8) * self.height)
-
-        buf = bytearray(img.tobytes('raw'))
-        return buf
+        return epdbuffer.pack_1bit(img, self.width, self.height)
 
     # display image
     def display(self, imageblack, imagered):
@@ -30,8 +30,9 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 from PIL import Image
-import RPi.GPIO as GPIO
 
 # Display resolution
 EPD_WIDTH       = 104
@@ -39,6 +40,26 @@ EPD_HEIGHT      = 212
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x01, 0x03, 0x00, 0x2b, 0x2b, 0x03),  # POWER SETTING
+    (0x06,  # boost soft start
+        0x17,  # A
+        0x17,  # B
+        0x17,  # C
+    ),
+    (0x04,),
+    epdsequence.Busy("ReadBusy"),
+    (0x00,  # panel setting
+        0xbf,  # LUT from OTP,128x296
+        0x0d,  # VCOM to 0V fast
+    ),
+    (0x30,  # PLL setting
+        0x3a,  # 3a 100HZ   29 150Hz 39 200HZ	31 171HZ
+    ),
+    (0x61, EPD_WIDTH, (EPD_HEIGHT >> 8) & 0xff, EPD_HEIGHT& 0xff),  # resolution setting
+    (0x82, 0x28),  # vcom_DC setting
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -173,10 +194,7 @@ class EPD:
         
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
     
     def ReadBusy(self):
         logger.debug("e-Paper busy")
@@ -196,35 +214,7 @@ class EPD:
         # EPD hardware init start
         self.reset()
         
-        self.send_command(0x01)	# POWER SETTING
-        self.send_data(0x03)
-        self.send_data(0x00)
-        self.send_data(0x2b)
-        self.send_data(0x2b)
-        self.send_data(0x03)
-
-        self.send_command(0x06)	# boost soft start
-        self.send_data(0x17) # A
-        self.send_data(0x17) # B
-        self.send_data(0x17) # C
-
-        self.send_command(0x04)
-        self.ReadBusy()
-
-        self.send_command(0x00)	# panel setting
-        self.send_data(0xbf) # LUT from OTP,128x296
-        self.send_data(0x0d) # VCOM to 0V fast
-
-        self.send_command(0x30)	# PLL setting
-        self.send_data(0x3a) # 3a 100HZ   29 150Hz 39 200HZ	31 171HZ
-
-        self.send_command(0x61)	# resolution setting
-        self.send_data(self.width)
-        self.send_data((self.height >> 8) & 0xff)
-        self.send_data(self.height& 0xff)
-
-        self.send_command(0x82)	# vcom_DC setting
-        self.send_data(0x28)
+        epdsequence.run(self, INIT)
         return 0
         
     def SetFullReg(self):
@@ -262,27 +252,10 @@ class EPD:
         self.send_data2(self.lut_bb1)
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
     def display(self, image):
@@ -325,10 +298,7 @@ class EPD:
         else:
             linewidth = int(self.width/8) + 1
 
-        buf = [0x00] * self.height * linewidth
-
-        for i in range(self.height * linewidth):
-            buf[i] = ~image[i]
+        buf = epdbuffer.invert(image[0:self.height * linewidth])
         
         self.send_command(0x10)
         self.send_data2(image)
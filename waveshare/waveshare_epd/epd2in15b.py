@@ -29,6 +29,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 160
@@ -36,6 +38,19 @@ EPD_HEIGHT      = 296
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x12,),  # SWRESET
+    epdsequence.Busy("busy"),
+    (0x11, 0x03),  # data entry mode
+)
+
+# init(), part 2
+INIT_2 = (
+    (0x3C, 0x05),  # BorderWavefrom
+    (0x18, 0x80),  # Read built-in temperature sensor
+    epdsequence.Busy("busy"),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -70,10 +85,7 @@ class EPD:
         
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     # judge e-Paper whether is busy
     def busy(self):
@@ -112,22 +124,12 @@ class EPD:
         self.reset()
 
         self.busy()
-        self.send_command(0x12)  # SWRESET
-        self.busy()   
-
-        self.send_command(0x11) # data entry mode       
-        self.send_data(0x03)
+        epdsequence.run(self, INIT)
 
         self.set_windows(0, 0, self.width - 1, self.height - 1)
         self.set_cursor(0, 0)
 
-        self.send_command(0x3C) # BorderWavefrom
-        self.send_data(0x05)	
-
-        self.send_command(0x18) # Read built-in temperature sensor
-        self.send_data(0x80)	
-
-        self.busy()
+        epdsequence.run(self, INIT_2)
         
         return 0
 
@@ -138,20 +140,12 @@ class EPD:
 
     # image converted to bytearray
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        if(imwidth == self.width and imheight == self.height):
-            img = img.convert('1')
-        elif(imwidth == self.height and imheight == self.width):
-            # image has correct dimensions, but needs to be rotated
-            img = img.rotate(90, expand=True).convert('1')
-        else:
-            logger.warning("Wrong image dimensions: must be " + str(self.width) + "x" + str(self.height))
+        # turn before converting so landscape frames dither in panel orientation
+        img = epdbuffer.native_image(image, self.width, self.height)
+        if img is None:
             # return a blank buffer
             return [0x00] * (int(self.width/8) * self.height)
-
-        buf = bytearray(img.tobytes('raw'))
-        return buf
+        return epdbuffer.pack_1bit(img, self.width, self.height)
 
     # display image
     def display(self, imageblack, imagered):
@@ -163,11 +157,8 @@ class EPD:
         self.send_command(0x24)
         self.send_data2(imageblack)
         
-        for j in range(0, self.height):
-            for i in range(0, linewidth):
-                imagered[i+j*linewidth] = (~imagered[i+j*linewidth])&0xFF
         self.send_command(0x26)
-        self.send_data2(imagered)
+        self.send_data2(epdbuffer.invert(imagered[0:self.height * linewidth]))
         
         self.ondisplay()
         
@@ -30,9 +30,10 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 import PIL
-from PIL import Image
 import io
 
 # Display resolution
@@ -41,6 +42,34 @@ EPD_HEIGHT      = 296
 
 logger = logging.getLogger(__name__)
 
+# The 4 colors supported by the panel, in panel index order
+PALETTE = (0,0,0,  255,255,255,  255,255,0,   255,0,0)
+
+INIT = (
+    (0x4D, 0x78),
+    (0x00, 0x0F, 0x29),
+    (0x01, 0x07, 0x00),
+    (0x03, 0x10, 0x54, 0x44),
+    (0x06, 0x0F, 0x0A, 0x2F, 0x25, 0x22, 0x2E, 0x21),
+    (0x30, 0x02),
+    (0x41, 0x00),
+    (0x50, 0x37),
+    (0x60, 0x02, 0x02),
+)
+
+# init(), part 2
+INIT_2 = (
+    (0x65, 0x00, 0x00, 0x00, 0x00),
+    (0XE7, 0x1C),
+    (0xE3, 0x22),
+    (0xE0, 0x00),
+    (0xB4, 0xD0),
+    (0xB5, 0x03),
+    (0xE9, 0x01),
+    (0x04,),
+    epdsequence.Busy("ReadBusy"),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -78,16 +107,12 @@ class EPD:
 
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):
         logger.debug("e-Paper busy H")
         epdconfig.delay_ms(100)
-        while(epdconfig.digital_read(self.busy_pin) == 0):      # 0: idle, 1: busy
-            epdconfig.delay_ms(5)
+        epdconfig.wait_busy(self.busy_pin, 0)      # 0: idle, 1: busy
         logger.debug("e-Paper busy release")
         
     def TurnOnDisplay(self):
@@ -103,43 +128,7 @@ class EPD:
         self.reset()
         
         self.ReadBusy()
-        self.send_command(0x4D)
-        self.send_data(0x78)
-
-        self.send_command(0x00)
-        self.send_data(0x0F)
-        self.send_data(0x29)
-
-        self.send_command(0x01)
-        self.send_data(0x07)
-        self.send_data(0x00)
-
-        self.send_command(0x03)
-        self.send_data(0x10)
-        self.send_data(0x54)
-        self.send_data(0x44)
-
-        self.send_command(0x06)
-        self.send_data(0x0F)
-        self.send_data(0x0A)
-        self.send_data(0x2F)
-        self.send_data(0x25)
-        self.send_data(0x22)
-        self.send_data(0x2E)
-        self.send_data(0x21)
-
-        self.send_command(0x30)
-        self.send_data(0x02)
-
-        self.send_command(0x41)
-        self.send_data(0x00)
-
-        self.send_command(0x50)
-        self.send_data(0x37)
-
-        self.send_command(0x60)
-        self.send_data(0x02)
-        self.send_data(0x02)
+        epdsequence.run(self, INIT)
         
         self.send_command(0x61)
         self.send_data(int(self.width/256))
@@ -147,64 +136,16 @@ class EPD:
         self.send_data(int(self.height/256))
         self.send_data(self.height%256)
         
-        self.send_command(0x65)
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0XE7)
-        self.send_data(0x1C)
-
-        self.send_command(0xE3)
-        self.send_data(0x22)
-
-        self.send_command(0xE0)
-        self.send_data(0x00)
-
-        self.send_command(0xB4)
-        self.send_data(0xD0)
-        self.send_command(0xB5)
-        self.send_data(0x03)
-
-        self.send_command(0xE9)
-        self.send_data(0x01)
-        
-        self.send_command(0x04)
-        self.ReadBusy()
+        epdsequence.run(self, INIT_2)
         return 0
 
-    def getbuffer(self, image):
-        # Create a pallette with the 4 colors supported by the panel
-        pal_image = Image.new("P", (1,1))
-        pal_image.putpalette( (0,0,0,  255,255,255,  255,255,0,   255,0,0) + (0,0,0)*252)
-
-        # Check if we need to rotate the image
-        imwidth, imheight = image.size
-        if(imwidth == self.width and imheight == self.height):
-            image_temp = image
-        elif(imwidth == self.height and imheight == self.width):
-            image_temp = image.rotate(90, expand=True)
-        else:
-            logger.warning("Invalid image dimensions: %d x %d, expected %d x %d" % (imwidth, imheight, self.width, self.height))
-
-        # Convert the soruce image to the 4 colors, dithering if needed
-        image_4color = image_temp.convert("RGB").quantize(palette=pal_image)
-        buf_4color = bytearray(image_4color.tobytes('raw'))
+    def getbuffer(self, image, dither=True):
+        # Turn the image to the panel's orientation if it was drawn the other way round
+        image_temp = epdbuffer.native_image(image, self.width, self.height)
 
+        # Convert the source image to the 4 colors, dithering if asked, and pack 4 pixels
         # into a single byte to transfer to the panel
-        if self.width % 4 == 0 :
-            Width = self.width // 4
-        else :
-            Width = self.width // 4 + 1
-        Height = self.height 
-        buf = [0x00] * int(Width * Height)
-        idx = 0
-        for j in range(0, Height):
-            for i in range(0, Width):
-                    buf[i + j * Width] = (buf_4color[idx] << 6) + (buf_4color[idx+1] << 4) + (buf_4color[idx+2] << 2) + buf_4color[idx+3]
-                    idx = idx + 4
-        return buf
+        return epdbuffer.pack_palette(image_temp, PALETTE, 2, dither)
 
     def display(self, image):
         self.send_command(0x10)
@@ -220,9 +161,7 @@ class EPD:
         Height = self.height
 
         self.send_command(0x10)
-        for j in range(0, Height):
-            for i in range(0, Width):
-                    self.send_data(color)
+        self.send_data2([color] * Width * Height)
         self.TurnOnDisplay()
 
     def sleep(self):
@@ -29,6 +29,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 152
@@ -36,6 +38,26 @@ EPD_HEIGHT      = 296
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x12,),
+    epdsequence.Delay(300),
+    epdsequence.Busy("ReadBusy"),
+    (0x11, 0x03),  # setting gaet number
+    (0x44, 0x01, 0x13),  # set gate voltage
+    (0x45, 0x0, 0x0, 0x28, 0x01),  # set source voltage
+)
+
+# init(), part 2
+INIT_2 = (
+    (0x37,  # set display option, these setting turn on previous function
+        0x00, 0x00, 0x00, 0x00, 0x00, 0x40, 0x00, 0x00, 0x00, 0x00,
+    ),
+    (0x3C, 0x80),
+    (0x22, 0xcf),
+    (0x20,),
+    epdsequence.Busy("ReadBusy"),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -90,16 +112,12 @@ class EPD:
 
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
 
 
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      #  0: idle, 1: busy
-            epdconfig.delay_ms(200) 
+        epdconfig.wait_busy(self.busy_pin, 1)      #  0: idle, 1: busy
         logger.debug("e-Paper busy release") 
 
 
@@ -109,20 +127,7 @@ class EPD:
         # EPD hardware init start
         self.reset()
         
-        self.send_command(0x12)
-        epdconfig.delay_ms(300)
-        self.ReadBusy()
-
-        self.send_command(0x11) # setting gaet number
-        self.send_data(0x03)
-        self.send_command(0x44) # set gate voltage
-        self.send_data(0x01)
-        self.send_data(0x13)
-        self.send_command(0x45) # set source voltage
-        self.send_data(0x0)
-        self.send_data(0x0)
-        self.send_data(0x28)
-        self.send_data(0x01)
+        epdsequence.run(self, INIT)
     
         if(mode == 0):      #full
             self.send_command(0x3C)
@@ -130,26 +135,7 @@ class EPD:
             
         elif(mode == 1):        #partial
             self.load_lut(self.WF_PARTIAL)
-            self.send_command(0x37) # set display option, these setting turn on previous function
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)  
-            self.send_data(0x40)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)
-            self.send_data(0x00)  
-
-            self.send_command(0x3C)
-            self.send_data(0x80)
-
-            self.send_command(0x22)
-            self.send_data(0xcf)
-            
-            self.send_command(0x20)
-            self.ReadBusy()
+            epdsequence.run(self, INIT_2)
 
         else:
             logger.debug("There is no such mode") 
@@ -168,30 +154,12 @@ class EPD:
         self.ReadBusy()
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
-
     def display(self, image):
         if (image == None):
             return            
@@ -29,6 +29,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 152
@@ -36,6 +38,13 @@ EPD_HEIGHT      = 296
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x12,),
+    epdsequence.Delay(30),
+    epdsequence.Busy("ReadBusy"),
+    (0x11, 0x03),  # setting gaet number
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -70,16 +79,12 @@ class EPD:
 
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
 
 
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      #  0: idle, 1: busy
-            epdconfig.delay_ms(20) 
+        epdconfig.wait_busy(self.busy_pin, 1)      #  0: idle, 1: busy
         logger.debug("e-Paper busy release") 
 
 
@@ -89,12 +94,7 @@ class EPD:
         # EPD hardware init start
         self.reset()
         
-        self.send_command(0x12)
-        epdconfig.delay_ms(30)
-        self.ReadBusy()
-
-        self.send_command(0x11) # setting gaet number
-        self.send_data(0x03)
+        epdsequence.run(self, INIT)
         
         self.setWindows(0, 0, self.width-1, self.height-1)
         
@@ -131,35 +131,16 @@ class EPD:
         self.ReadBusy()
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
     def display(self, Blackimage, Redimage):
         if (Blackimage == None or Redimage == None):
             return   
-        Redimage_1 = [0x00] * len(Redimage)
-        for i in range(len(Redimage)) :
-            Redimage_1[i] = ~Redimage[i]    
+        Redimage_1 = epdbuffer.invert(Redimage)
         self.send_command(0x24)
         self.send_data2(Blackimage) 
 
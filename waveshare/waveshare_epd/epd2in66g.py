@@ -30,9 +30,10 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 import PIL
-from PIL import Image
 import io
 
 # Display resolution
@@ -41,6 +42,33 @@ EPD_HEIGHT      = 360
 
 logger = logging.getLogger(__name__)
 
+# The 4 colors supported by the panel, in panel index order
+PALETTE = (0,0,0,  255,255,255,  255,255,0,   255,0,0)
+
+INIT = (
+    (0x4D, 0x78),
+    (0x00, 0x0F, 0x29),  #PSR
+    (0x01, 0x07, 0x00),  #PWRR
+    (0x03, 0x10, 0x54, 0x44),  #POFS
+    (0x06, 0x05, 0x00, 0x3F, 0x0A, 0x25, 0x12, 0x1A),  #BTST_P
+    (0x50, 0x37),  #CDI
+    (0x60, 0x02, 0x02),  #TCON
+    (0x61,  #TRES
+        EPD_WIDTH//256,  # Source_BITS_H
+        EPD_WIDTH%256,  # Source_BITS_L
+        EPD_HEIGHT//256,  # Gate_BITS_H
+        EPD_HEIGHT%256,  # Gate_BITS_L
+    ),
+    (0xE7, 0x1C),
+    (0xE3, 0x22),
+    (0xB4, 0xD0),
+    (0xB5, 0x03),
+    (0xE9, 0x01),
+    (0x30, 0x08),
+    (0x04,),
+    epdsequence.Busy("ReadBusyH"),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -74,17 +102,19 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 0)
         epdconfig.spi_writebyte([data])
         epdconfig.digital_write(self.cs_pin, 1)
+
+    # send a lot of data
+    def send_data2(self, data):
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusyH(self):
         logger.debug("e-Paper busy H")
-        while(epdconfig.digital_read(self.busy_pin) == 0):      # 0: idle, 1: busy
-            epdconfig.delay_ms(5)
+        epdconfig.wait_busy(self.busy_pin, 0)      # 0: idle, 1: busy
         logger.debug("e-Paper busy H release")
 
     def ReadBusyL(self):
         logger.debug("e-Paper busy L")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      # 0: busy, 1: idle
-            epdconfig.delay_ms(5)
+        epdconfig.wait_busy(self.busy_pin, 1)      # 0: busy, 1: idle
         logger.debug("e-Paper busy L release")
 
     def TurnOnDisplay(self):
@@ -99,91 +129,16 @@ class EPD:
 
         self.reset()
         self.ReadBusyH()
-        self.send_command(0x4D) 
-        self.send_data(0x78) 
-
-        self.send_command(0x00) 	#PSR
-        self.send_data(0x0F) 
-        self.send_data(0x29) 
-
-        self.send_command(0x01) 	#PWRR
-        self.send_data(0x07) 
-        self.send_data(0x00) 
-        
-        self.send_command(0x03) 	#POFS
-        self.send_data(0x10) 
-        self.send_data(0x54) 
-        self.send_data(0x44) 
-        
-        self.send_command(0x06) 	#BTST_P
-        self.send_data(0x05) 
-        self.send_data(0x00) 
-        self.send_data(0x3F) 
-        self.send_data(0x0A) 
-        self.send_data(0x25) 
-        self.send_data(0x12) 
-        self.send_data(0x1A)  
-
-        self.send_command(0x50) 	#CDI
-        self.send_data(0x37) 
-        
-        self.send_command(0x60) 	#TCON
-        self.send_data(0x02) 
-        self.send_data(0x02) 
-        
-        self.send_command(0x61)  #TRES
-        self.send_data(self.width//256) 		# Source_BITS_H
-        self.send_data(self.width%256) 		# Source_BITS_L
-        self.send_data(self.height//256) 			# Gate_BITS_H
-        self.send_data(self.height%256)  		# Gate_BITS_L	
-        
-        self.send_command(0xE7) 
-        self.send_data(0x1C) 
-        
-        self.send_command(0xE3) 	
-        self.send_data(0x22) 
-        
-        self.send_command(0xB4) 
-        self.send_data(0xD0) 
-        self.send_command(0xB5) 
-        self.send_data(0x03) 
-        
-        self.send_command(0xE9) 
-        self.send_data(0x01)  
-
-        self.send_command(0x30) 
-        self.send_data(0x08)   
-            
-        self.send_command(0x04) 
-        self.ReadBusyH()
+        epdsequence.run(self, INIT)
         return 0
 
-    def getbuffer(self, image):
-        # Create a pallette with the 4 colors supported by the panel
-        pal_image = Image.new("P", (1,1))
-        pal_image.putpalette( (0,0,0,  255,255,255,  255,255,0,   255,0,0) + (0,0,0)*252)
-
-        # Check if we need to rotate the image
-        imwidth, imheight = image.size
-        if(imwidth == self.width and imheight == self.height):
-            image_temp = image
-        elif(imwidth == self.height and imheight == self.width):
-            image_temp = image.rotate(90, expand=True)
-        else:
-            logger.warning("Invalid image dimensions: %d x %d, expected %d x %d" % (imwidth, imheight, self.width, self.height))
-
-        # Convert the soruce image to the 4 colors, dithering if needed
-        image_4color = image_temp.convert("RGB").quantize(palette=pal_image)
-        buf_4color = bytearray(image_4color.tobytes('raw'))
+    def getbuffer(self, image, dither=True):
+        # Turn the image to the panel's orientation if it was drawn the other way round
+        image_temp = epdbuffer.native_image(image, self.width, self.height)
 
+        # Convert the source image to the 4 colors, dithering if asked, and pack 4 pixels
         # into a single byte to transfer to the panel
-        buf = [0x00] * int(self.width * self.height / 4)
-        idx = 0
-        for i in range(0, len(buf_4color), 4):
-            buf[idx] = (buf_4color[i] << 6) + (buf_4color[i+1] << 4) + (buf_4color[i+2] << 2) + buf_4color[i+3]
-            idx += 1
-
-        return buf
+        return epdbuffer.pack_palette(image_temp, PALETTE, 2, dither)
 
     def display(self, image):
         if self.width % 4 == 0 :
@@ -193,9 +148,7 @@ class EPD:
         Height = self.height
 
         self.send_command(0x10)
-        for j in range(0, Height):
-            for i in range(0, Width):
-                    self.send_data(image[i + j * Width])
+        self.send_data2(image[0:Width * Height])
 
         self.TurnOnDisplay()
         
@@ -207,9 +160,7 @@ class EPD:
         Height = self.height
 
         self.send_command(0x10)
-        for j in range(0, Height):
-            for i in range(0, Width):
-                self.send_data(color)
+        self.send_data2([color] * Width * Height)
 
         self.TurnOnDisplay()
 
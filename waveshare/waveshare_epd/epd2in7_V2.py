@@ -29,6 +29,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 176
@@ -41,6 +43,69 @@ GRAY4  = 0x00 #Blackest
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x12,),  #SWRESET
+    epdsequence.Busy("ReadBusy"),
+    (0x45,  #set Ram-Y address start/end position
+        0x00,
+        0x00,
+        0x07,  #0x0107-->(263+1)=264
+        0x01,
+    ),
+    (0x4F, 0x00, 0x00),  # set RAM y address count to 0;
+    (0x11, 0x03),  # data entry mode
+)
+
+INIT_FAST = (
+    (0x12,),  #SWRESET
+    epdsequence.Busy("ReadBusy"),
+    (0x12,),  #SWRESET
+    epdsequence.Busy("ReadBusy"),
+    (0x18, 0x80),  #Read built-in temperature sensor
+    (0x22, 0xB1),  # Load temperature value
+    (0x20,),
+    epdsequence.Busy("ReadBusy"),
+    (0x1A, 0x64, 0x00),  # Write to temperature register
+    (0x45,  #set Ram-Y address start/end position
+        0x00,
+        0x00,
+        0x07,  #0x0107-->(263+1)=264
+        0x01,
+    ),
+    (0x4F, 0x00, 0x00),  # set RAM y address count to 0;
+    (0x11, 0x03),  # data entry mode
+    (0x22, 0x91),  # Load temperature value
+    (0x20,),
+    epdsequence.Busy("ReadBusy"),
+)
+
+INIT_4GRAY = (
+    (0x12,),  # soft reset
+    epdsequence.Busy("ReadBusy"),
+    (0x74, 0x54),  #set analog block control
+    (0x7E, 0x3B),  #set digital block control
+    (0x01, 0x07, 0x01, 0x00),  #Driver output control
+    (0x11, 0x03),  #data entry mode
+    (0x44,  #set Ram-X address start/end position
+        0x00,
+        0x15,  #0x15-->(21+1)*8=176
+    ),
+    (0x45,  #set Ram-Y address start/end position
+        0x00,
+        0x00,
+        0x07,  #0x0107-->(263+1)=264
+        0x01,
+    ),
+    (0x3C, 0x00),  #BorderWavefrom
+)
+
+# Init_4Gray(), part 2
+INIT_4GRAY_2 = (
+    (0x4E, 0x00),  # set RAM x address count to 0;
+    (0x4F, 0x00, 0x00),  # set RAM y address count to 0X199;
+    epdsequence.Busy("ReadBusy"),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -96,11 +161,14 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 0)
         epdconfig.spi_writebyte([data])
         epdconfig.digital_write(self.cs_pin, 1)
+
+    # send a lot of data
+    def send_data2(self, data):
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):        
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      #  1: idle, 0: busy
-            epdconfig.delay_ms(20)                
+        epdconfig.wait_busy(self.busy_pin, 1)      #  1: idle, 0: busy
         logger.debug("e-Paper busy release")
     
     def TurnOnDisplay(self):
@@ -128,9 +196,7 @@ class EPD:
         self.ReadBusy()
         
     def Lut(self):
-        self.send_command(0x32)
-        for i in range(159):
-            self.send_data(self.LUT_DATA_4Gray[i])
+        epdsequence.run(self, ((0x32, self.LUT_DATA_4Gray[0:159]),))
     
     def init(self):
         if (epdconfig.module_init() != 0):
@@ -140,21 +206,7 @@ class EPD:
         self.reset()
         self.ReadBusy()
 
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x45) #set Ram-Y address start/end position          
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x07) #0x0107-->(263+1)=264
-        self.send_data(0x01)
-
-        self.send_command(0x4F)   # set RAM y address count to 0;    
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x11)  # data entry mode
-        self.send_data(0x03)
+        epdsequence.run(self, INIT)
         return 0
         
     def init_Fast(self):
@@ -165,41 +217,7 @@ class EPD:
         self.reset()
         self.ReadBusy()
 
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x18) #Read built-in temperature sensor
-        self.send_data(0x80)	
-
-        self.send_command(0x22) # Load temperature value
-        self.send_data(0xB1)	
-        self.send_command(0x20)	
-        self.ReadBusy()
-
-        self.send_command(0x1A) # Write to temperature register
-        self.send_data(0x64)	
-        self.send_data(0x00)	
-
-        self.send_command(0x45) #set Ram-Y address start/end position          
-        self.send_data(0x00)   
-        self.send_data(0x00)
-        self.send_data(0x07) #0x0107-->(263+1)=264
-        self.send_data(0x01)
-
-        self.send_command(0x4F)   # set RAM y address count to 0;    
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x11)   # data entry mode      
-        self.send_data(0x03)
-
-        self.send_command(0x22) # Load temperature value
-        self.send_data(0x91)	
-        self.send_command(0x20)	
-        self.ReadBusy()
+        epdsequence.run(self, INIT_FAST)
         return 0
 
     def Init_4Gray(self):
@@ -207,35 +225,7 @@ class EPD:
             return -1
         self.reset()
         
-        self.send_command(0x12) # soft reset
-        self.ReadBusy();
-
-        self.send_command(0x74) #set analog block control       
-        self.send_data(0x54)
-        self.send_command(0x7E) #set digital block control          
-        self.send_data(0x3B)
-        
-        self.send_command(0x01) #Driver output control      
-        self.send_data(0x07)
-        self.send_data(0x01)
-        self.send_data(0x00) 
-        
-        self.send_command(0x11) #data entry mode       
-        self.send_data(0x03)
-
-        self.send_command(0x44) #set Ram-X address start/end position   
-        self.send_data(0x00)
-        self.send_data(0x15)   #0x15-->(21+1)*8=176
-
-        self.send_command(0x45) #set Ram-Y address start/end position          
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x07) #0x0107-->(263+1)=264
-        self.send_data(0x01)
-
-
-        self.send_command(0x3C) #BorderWavefrom
-        self.send_data(0x00)	
+        epdsequence.run(self, INIT_4GRAY)
 
 
         self.send_command(0x2C)     #VCOM Voltage
@@ -256,72 +246,21 @@ class EPD:
         self.Lut() #LUT
 
 
-        self.send_command(0x4E)   # set RAM x address count to 0;
-        self.send_data(0x00)
-        self.send_command(0x4F)  # set RAM y address count to 0X199;    
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.ReadBusy()
+        epdsequence.run(self, INIT_4GRAY_2)
         return 0
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
     
     def getbuffer_4Gray(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 4) * self.height)
-        image_monocolor = image.convert('L')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        i=0
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((x + (y * self.width))/4)] = ((pixels[x-3, y]&0xc0) | (pixels[x-2, y]&0xc0)>>2 | (pixels[x-1, y]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6)
-                        
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = self.height - x - 1
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((newx + (newy * self.width))/4)] = ((pixels[x, y-3]&0xc0) | (pixels[x, y-2]&0xc0)>>2 | (pixels[x, y-1]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6) 
+        buf = epdbuffer.pack_4gray(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width / 4) * self.height)
         return buf
     
     def Clear(self):
@@ -331,9 +270,7 @@ class EPD:
             Width = self.width // 8 +1
         Height = self.height
         self.send_command(0x24)
-        for j in range(Height):
-            for i in range(Width):
-                self.send_data(0XFF)
+        self.send_data2([0xFF] * Width * Height)
         self.TurnOnDisplay()
     
     def display(self, image):
@@ -343,9 +280,7 @@ class EPD:
             Width = self.width // 8 +1
         Height = self.height
         self.send_command(0x24)
-        for j in range(Height):
-            for i in range(Width):
-                self.send_data(image[i + j * Width])
+        self.send_data2(image[0:Width * Height])
         self.TurnOnDisplay()
         
     def display_Fast(self, image):
@@ -355,9 +290,7 @@ class EPD:
             Width = self.width // 8 +1
         Height = self.height
         self.send_command(0x24)
-        for j in range(Height):
-            for i in range(Width):
-                self.send_data(image[i + j * Width])
+        self.send_data2(image[0:Width * Height])
         self.TurnOnDisplay_Fast()
         
     def display_Base(self, image):
@@ -367,14 +300,10 @@ class EPD:
             Width = self.width // 8 +1
         Height = self.height
         self.send_command(0x24)   #Write Black and White image to RAM
-        for j in range(Height):
-            for i in range(Width):
-                self.send_data(image[i + j * Width])
+        self.send_data2(image[0:Width * Height])
                 
         self.send_command(0x26)  #Write Black and White image to RAM
-        for j in range(Height):
-            for i in range(Width):
-                self.send_data(image[i + j * Width])
+        self.send_data2(image[0:Width * Height])
         self.TurnOnDisplay()
         
     def display_Base_color(self, color):
@@ -384,14 +313,10 @@ class EPD:
             Width = self.width // 8 +1
         Height = self.height
         self.send_command(0x24)   #Write Black and White image to RAM
-        for j in range(Height):
-            for i in range(Width):
-                self.send_data(color)
+        self.send_data2([color] * Width * Height)
                 
         self.send_command(0x26)  #Write Black and White image to RAM
-        for j in range(Height):
-            for i in range(Width):
-                self.send_data(color)
+        self.send_data2([color] * Width * Height)
         # self.TurnOnDisplay()
     
     def display_Partial(self, Image, Xstart, Ystart, Xend, Yend):
@@ -436,14 +361,16 @@ class EPD:
         self.send_data((Ystart>>8) & 0x01)
 
         self.send_command(0x24)   #Write Black and White image to RAM
+        buf = bytearray()
         for j in range(Height):
-            for i in range(Width):
-                if((j > Ystart-1) & (j < (Yend + 1)) & (i > Xstart-1) & (i < (Xend + 1))):
-                    self.send_data(Image[i + j * Width])
+            if((j > Ystart-1) & (j < (Yend + 1))):
+                buf += bytes(Image[j * Width + max(Xstart, 0):j * Width + min(Xend + 1, Width)])
+        self.send_data2(buf)
         self.TurnOnDisplay_Partial()
   
     def display_4Gray(self, image):
         self.send_command(0x24)
+        buf = bytearray()
         for i in range(0, 5808):                     #5808*4  46464
             temp3=0
             for j in range(0, 2):
@@ -473,9 +400,11 @@ class EPD:
                     if(j!=1 or k!=1):				
                         temp3 <<= 1
                     temp1 <<= 2
-            self.send_data(temp3)
+            buf.append(temp3)
+        self.send_data2(buf)
             
         self.send_command(0x26)	       
+        buf = bytearray()
         for i in range(0, 5808):                #5808*4  46464
             temp3=0
             for j in range(0, 2):
@@ -505,7 +434,8 @@ class EPD:
                     if(j!=1 or k!=1):					
                         temp3 <<= 1
                     temp1 <<= 2
-            self.send_data(temp3)
+            buf.append(temp3)
+        self.send_data2(buf)
         
         self.TurnOnDisplay_4GRAY()
 
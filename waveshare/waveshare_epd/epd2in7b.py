@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 176
@@ -37,6 +39,39 @@ EPD_HEIGHT      = 264
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x04,),  # POWER_ON
+    epdsequence.Busy("ReadBusy"),
+    (0x00,  # PANEL_SETTING
+        0xaf,  #KW-BF   KWR-AF    BWROTP 0f
+    ),
+    (0x30,  # PLL_CONTROL
+        0x3a,  #3A 100HZ   29 150Hz 39 200HZ    31 171HZ
+    ),
+    (0x01,  # POWER_SETTING
+        0x03,  # VDS_EN, VDG_EN
+        0x00,  # VCOM_HV, VGHL_LV[1], VGHL_LV[0]
+        0x2b,  # VDH
+        0x2b,  # VDL
+        0x09,  # VDHR
+    ),
+    (0x06, 0x07, 0x07, 0x17),  # BOOSTER_SOFT_START
+    # Power optimization
+    (0xF8, 0x60, 0xA5),
+    # Power optimization
+    (0xF8, 0x89, 0xA5),
+    # Power optimization
+    (0xF8, 0x90, 0x00),
+    # Power optimization
+    (0xF8, 0x93, 0x2A),
+    # Power optimization
+    (0xF8, 0x73, 0x41),
+    (0x82, 0x12),  # VCM_DC_SETTING_REGISTER
+    (0x50,  # VCOM_AND_DATA_INTERVAL_SETTING
+        0x87,  # define by OTP
+    ),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -119,29 +154,24 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 0)
         epdconfig.spi_writebyte([data])
         epdconfig.digital_write(self.cs_pin, 1)
+
+    # send a lot of data
+    def send_data2(self, data):
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 0):      # 0: idle, 1: busy
-            epdconfig.delay_ms(100)
+        epdconfig.wait_busy(self.busy_pin, 0)      # 0: idle, 1: busy
         logger.debug("e-Paper busy release")
         
     def set_lut(self):
-        self.send_command(0x20)               # vcom
-        for count in range(0, 44):
-            self.send_data(self.lut_vcom_dc[count])
-        self.send_command(0x21)         # ww --
-        for count in range(0, 42):
-            self.send_data(self.lut_ww[count])
-        self.send_command(0x22)         # bw r
-        for count in range(0, 42):
-            self.send_data(self.lut_bw[count])
-        self.send_command(0x23)         # wb w
-        for count in range(0, 42):
-            self.send_data(self.lut_bb[count])
-        self.send_command(0x24)         # bb b
-        for count in range(0, 42):
-            self.send_data(self.lut_wb[count])
+        epdsequence.run(self, (
+            (0x20, self.lut_vcom_dc[0:44]),  # vcom
+            (0x21, self.lut_ww[0:42]),  # ww --
+            (0x22, self.lut_bw[0:42]),  # bw r
+            (0x23, self.lut_bb[0:42]),  # wb w
+            (0x24, self.lut_wb[0:42]),  # bb b
+        ))
             
     def init(self):
         if (epdconfig.module_init() != 0):
@@ -149,56 +179,7 @@ class EPD:
             
         self.reset()
 
-        self.send_command(0x04) # POWER_ON
-        self.ReadBusy()
-
-        self.send_command(0x00) # PANEL_SETTING
-        self.send_data(0xaf) #KW-BF   KWR-AF    BWROTP 0f
-        
-        self.send_command(0x30) # PLL_CONTROL
-        self.send_data(0x3a) #3A 100HZ   29 150Hz 39 200HZ    31 171HZ
-
-        self.send_command(0x01) # POWER_SETTING
-        self.send_data(0x03) # VDS_EN, VDG_EN
-        self.send_data(0x00) # VCOM_HV, VGHL_LV[1], VGHL_LV[0]
-        self.send_data(0x2b) # VDH
-        self.send_data(0x2b) # VDL
-        self.send_data(0x09) # VDHR
-
-        self.send_command(0x06) # BOOSTER_SOFT_START
-        self.send_data(0x07)
-        self.send_data(0x07)
-        self.send_data(0x17)
-
-        # Power optimization
-        self.send_command(0xF8)
-        self.send_data(0x60)
-        self.send_data(0xA5)
-
-        # Power optimization
-        self.send_command(0xF8)
-        self.send_data(0x89)
-        self.send_data(0xA5)
-
-        # Power optimization
-        self.send_command(0xF8)
-        self.send_data(0x90)
-        self.send_data(0x00)
-        
-        # Power optimization
-        self.send_command(0xF8)
-        self.send_data(0x93)
-        self.send_data(0x2A)
-
-        # Power optimization
-        self.send_command(0xF8)
-        self.send_data(0x73)
-        self.send_data(0x41)
-
-        self.send_command(0x82) # VCM_DC_SETTING_REGISTER
-        self.send_data(0x12)                   
-        self.send_command(0x50) # VCOM_AND_DATA_INTERVAL_SETTING
-        self.send_data(0x87) # define by OTP
+        epdsequence.run(self, INIT)
 
         self.set_lut()
 
@@ -208,38 +189,19 @@ class EPD:
         return 0
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
     def display(self, imageblack, imagered):
         self.send_command(0x10)
-        for i in range(0, int(self.width * self.height / 8)):
-            self.send_data(~imageblack[i])
+        self.send_data2([~b & 0xFF for b in imageblack[0:int(self.width * self.height / 8)]])
         self.send_command(0x11)
         
         self.send_command(0x13)
-        for i in range(0, int(self.width * self.height / 8)):
-            self.send_data(~imagered[i])
+        self.send_data2([~b & 0xFF for b in imagered[0:int(self.width * self.height / 8)]])
         self.send_command(0x11)
         
         self.send_command(0x12) 
@@ -247,13 +209,11 @@ class EPD:
         
     def Clear(self, color=0x00):
         self.send_command(0x10)
-        for i in range(0, int(self.width * self.height / 8)):
-            self.send_data(color)
+        self.send_data2([color] * int(self.width * self.height / 8))
         self.send_command(0x11) 
         
         self.send_command(0x13)
-        for i in range(0, int(self.width * self.height / 8)):
-            self.send_data(color)
+        self.send_data2([color] * int(self.width * self.height / 8))
         self.send_command(0x11)
         
         self.send_command(0x12) 
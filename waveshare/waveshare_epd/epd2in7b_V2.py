@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 176
@@ -37,6 +39,13 @@ EPD_HEIGHT      = 264
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x12,),
+    epdsequence.Busy("ReadBusy"),
+    (0x00, 0x27, 0x01, 0x00),
+    (0x11, 0x03),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -71,16 +80,12 @@ class EPD:
 
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     # Read Busy
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      # 0: idle, 1: busy
-            epdconfig.delay_ms(10)
+        epdconfig.wait_busy(self.busy_pin, 1)      # 0: idle, 1: busy
         logger.debug("e-Paper busy release")
             
     # Setting the display window
@@ -111,43 +116,17 @@ class EPD:
         self.reset()
 
         self.ReadBusy() 
-        self.send_command(0x12)      
-        self.ReadBusy() 
-        
-        self.send_command(0x00)     
-        self.send_data(0x27) 
-        self.send_data(0x01) 
-        self.send_data(0x00) 
-        
-        self.send_command(0x11)     
-        self.send_data(0x03) 
+        epdsequence.run(self, INIT)
         
         self.SetWindows(0, 0, self.width-1, self.height-1)
         self.SetCursor(0, 0)
         return 0
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
     
     # Sends the image buffer in RAM to e-Paper and displays
@@ -155,9 +134,7 @@ class EPD:
         Width = self.width / 8 
         Height = self.height 
 
-        buf = [0x00] * int(Width * Height)
-        for i in range(0, int(Width * Height)):
-            buf[i] = ~imagered[i]
+        buf = epdbuffer.invert(imagered[0:int(Width * Height)])
 
         self.send_command(0x24) 
         self.send_data2(imageblack) 
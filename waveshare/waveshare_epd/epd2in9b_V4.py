@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 128
@@ -37,6 +39,44 @@ EPD_HEIGHT      = 296
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x12,),  #SWRESET
+    epdsequence.Busy("ReadBusy"),
+    (0x01, (EPD_HEIGHT-1)%256, (EPD_HEIGHT-1)//256, 0x00),  #Driver output control
+    (0x11, 0x03),  #data entry mode
+    (0x44, 0x00, EPD_WIDTH//8-1),  #set Ram-X address start/end position
+    (0x45, 0x00, 0x00, (EPD_HEIGHT-1)%256, (EPD_HEIGHT-1)//256),  #set Ram-Y address start/end position
+    (0x3C, 0x05),  #BorderWavefrom
+    (0x21, 0x00, 0x80),  #  Display update control
+    (0x18, 0x80),  #Read built-in temperature sensor
+    (0x4E, 0x00),  # set RAM x address count to 0
+    (0x4F, 0x00, 0x00),  # set RAM y address count to 0X199
+    epdsequence.Busy("ReadBusy"),
+)
+
+INIT_FAST = (
+    (0x12,),  #SWRESET
+    epdsequence.Busy("ReadBusy"),
+    (0x18, 0x80),  #Read built-in temperature sensor
+    (0x22, 0xB1),  # Load temperature value
+    (0x20,),
+    epdsequence.Busy("ReadBusy"),
+    (0x1A,  # Write to temperature register
+        0x5a,  # 90
+        0x00,
+    ),
+    (0x22, 0x91),  # Load temperature value
+    (0x20,),
+    epdsequence.Busy("ReadBusy"),
+    (0x01, (EPD_HEIGHT-1)%256, (EPD_HEIGHT-1)//256, 0x00),  #Driver output control
+    (0x11, 0x03),  #data entry mode
+    (0x44, 0x00, EPD_WIDTH//8-1),  #set Ram-X address start/end position
+    (0x45, 0x00, 0x00, (EPD_HEIGHT-1)%256, (EPD_HEIGHT-1)//256),  #set Ram-Y address start/end position
+    (0x4E, 0x00),  # set RAM x address count to 0
+    (0x4F, 0x00, 0x00),  # set RAM y address count to 0X199
+    epdsequence.Busy("ReadBusy"),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -69,16 +109,12 @@ class EPD:
 
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):
         logger.debug("e-Paper busy")
         self.send_command(0X71)
-        while(epdconfig.digital_read(self.busy_pin) == 1):      #  0: idle, 1: busy
-            epdconfig.delay_ms(200)                
+        epdconfig.wait_busy(self.busy_pin, 1)      #  0: idle, 1: busy
         logger.debug("e-Paper busy release")
         
 
@@ -115,43 +151,7 @@ class EPD:
         self.reset()
 
         self.ReadBusy()   
-        self.send_command(0x12)  #SWRESET
-        self.ReadBusy()   
-
-        self.send_command(0x01) #Driver output control      
-        self.send_data((self.height-1)%256)    
-        self.send_data((self.height-1)//256)
-        self.send_data(0x00)
-
-        self.send_command(0x11) #data entry mode       
-        self.send_data(0x03)
-
-        self.send_command(0x44) #set Ram-X address start/end position   
-        self.send_data(0x00)
-        self.send_data(self.width//8-1)   
-
-        self.send_command(0x45) #set Ram-Y address start/end position          
-        self.send_data(0x00)
-        self.send_data(0x00) 
-        self.send_data((self.height-1)%256)    
-        self.send_data((self.height-1)//256)
-
-        self.send_command(0x3C) #BorderWavefrom
-        self.send_data(0x05)	
-
-        self.send_command(0x21) #  Display update control
-        self.send_data(0x00)		
-        self.send_data(0x80)	
-
-        self.send_command(0x18) #Read built-in temperature sensor
-        self.send_data(0x80)	
-
-        self.send_command(0x4E)   # set RAM x address count to 0
-        self.send_data(0x00)
-        self.send_command(0x4F)   # set RAM y address count to 0X199    
-        self.send_data(0x00)    
-        self.send_data(0x00)
-        self.ReadBusy()
+        epdsequence.run(self, INIT)
         
         return 0
     
@@ -163,75 +163,15 @@ class EPD:
         self.reset()
 
         self.ReadBusy()   
-        self.send_command(0x12)  #SWRESET
-        self.ReadBusy()   	
-
-        self.send_command(0x18) #Read built-in temperature sensor
-        self.send_data(0x80)
-
-        self.send_command(0x22) # Load temperature value
-        self.send_data(0xB1)		
-        self.send_command(0x20)	
-        self.ReadBusy()   
-
-        self.send_command(0x1A) # Write to temperature register
-        self.send_data(0x5a)		# 90		
-        self.send_data(0x00)	
-                    
-        self.send_command(0x22) # Load temperature value
-        self.send_data(0x91)		
-        self.send_command(0x20)	
-        self.ReadBusy()  
-
-        self.send_command(0x01) #Driver output control      
-        self.send_data((self.height-1)%256)    
-        self.send_data((self.height-1)//256)
-        self.send_data(0x00)
-
-        self.send_command(0x11) #data entry mode       
-        self.send_data(0x03)
-
-        self.send_command(0x44) #set Ram-X address start/end position   
-        self.send_data(0x00)
-        self.send_data(self.width//8-1)   
-
-        self.send_command(0x45) #set Ram-Y address start/end position          
-        self.send_data(0x00)
-        self.send_data(0x00) 
-        self.send_data((self.height-1)%256)    
-        self.send_data((self.height-1)//256)	
-
-        self.send_command(0x4E)   # set RAM x address count to 0
-        self.send_data(0x00)
-        self.send_command(0x4F)   # set RAM y address count to 0X199    
-        self.send_data(0x00)    
-        self.send_data(0x00)
-        self.ReadBusy()	
+        epdsequence.run(self, INIT_FAST)
         
         return 0
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
     def display(self, blackimage, ryimage): # ryimage: red or yellow image
@@ -244,11 +184,8 @@ class EPD:
             self.send_command(0x24)
             self.send_data2(blackimage)        
         if (ryimage != None):
-            for j in range(Height):
-                for i in range(Width):
-                    ryimage[i + j * Width] = ~ryimage[i + j * Width]
             self.send_command(0x26)
-            self.send_data2(ryimage)
+            self.send_data2(epdbuffer.invert(ryimage[0:Width * Height]))
 
         self.TurnOnDisplay()
 
@@ -262,11 +199,8 @@ class EPD:
             self.send_command(0x24)
             self.send_data2(blackimage)        
         if (ryimage != None):
-            for j in range(Height):
-                for i in range(Width):
-                    ryimage[i + j * Width] = ~ryimage[i + j * Width]
             self.send_command(0x26)
-            self.send_data2(ryimage)
+            self.send_data2(epdbuffer.invert(ryimage[0:Width * Height]))
 
         self.TurnOnDisplay_Fast()
         
@@ -296,20 +230,14 @@ class EPD:
             self.send_command(0x24)
             self.send_data2(blackimage)        
         if (ryimage != None):
-            for j in range(Height):
-                for i in range(Width):
-                    ryimage[i + j * Width] = ~ryimage[i + j * Width]
             self.send_command(0x26)
-            self.send_data2(ryimage)
+            self.send_data2(epdbuffer.invert(ryimage[0:Width * Height]))
 
         self.TurnOnDisplay_Base()
 
         if (blackimage != None):
-            for j in range(Height):
-                for i in range(Width):
-                    blackimage[i + j * Width] = ~blackimage[i + j * Width]
             self.send_command(0x26)
-            self.send_data2(blackimage)
+            self.send_data2(epdbuffer.invert(blackimage[0:Width * Height]))
         else:
             self.send_command(0x26)
             self.send_data2(blackimage)   
@@ -321,20 +249,14 @@ class EPD:
             Width = self.width // 8 +1
         Height = self.height
         self.send_command(0x24)   #Write Black and White image to RAM
-        for j in range(Height):
-            for i in range(Width):
-                self.send_data(color)
+        self.send_data2([color] * Width * Height)
                 
         self.send_command(0x26)  #Write Black and White image to RAM
-        for j in range(Height):
-            for i in range(Width):
-                self.send_data(~color)
+        self.send_data2([~color & 0xFF] * Width * Height)
         
         self.TurnOnDisplay_Base()
         self.send_command(0x26)   #Write Black and White image to RAM
-        for j in range(Height):
-            for i in range(Width):
-                self.send_data(color) 
+        self.send_data2([color] * Width * Height)
 
     def display_Partial(self, Image, Xstart, Ystart, Xend, Yend):
         if((Xstart % 8 + Xend % 8 == 8 & Xstart % 8 > Xend % 8) | Xstart % 8 + Xend % 8 == 0 | (Xend - Xstart)%8 == 0):
@@ -372,10 +294,11 @@ class EPD:
         self.send_data((Ystart>>8) & 0x01)
 
         self.send_command(0x24)   #Write Black and White image to RAM
+        buf = bytearray()
         for j in range(Height):
-            for i in range(Width):
-                if((j > Ystart-1) & (j < (Yend + 1)) & (i > Xstart-1) & (i < (Xend + 1))):
-                    self.send_data(Image[i + j * Width])
+            if((j > Ystart-1) & (j < (Yend + 1))):
+                buf += bytes(Image[j * Width + max(Xstart, 0):j * Width + min(Xend + 1, Width)])
+        self.send_data2(buf)
         self.TurnOnDisplay_Partial()
         
     def sleep(self):
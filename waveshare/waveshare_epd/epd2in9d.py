@@ -33,8 +33,9 @@
 from distutils.command.build_scripts import build_scripts
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 from PIL import Image
-import RPi.GPIO as GPIO
 
 # Display resolution
 EPD_WIDTH       = 128
@@ -42,6 +43,18 @@ EPD_HEIGHT      = 296
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x04,),
+    epdsequence.Busy("ReadBusy"),  #waiting for the electronic paper IC to release the idle signal
+    (0x00,  #panel setting
+        0x1f,  # LUT from OTP，KW-BF   KWR-AF    BWROTP 0f   BWOTP 1f
+    ),
+    (0x61, 0x80, 0x01, 0x28),  #resolution setting
+    (0X50,  #VCOM AND DATA INTERVAL SETTING
+        0x97,  #WBmode:VBDF 17|D7 VBDW 97 VBDB 57  WBRmode:VBDF F7 VBDW 77 VBDB 37  VBDR B7
+    ),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -133,10 +146,7 @@ class EPD:
 
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):
         logger.debug("e-Paper busy")
@@ -156,19 +166,7 @@ class EPD:
         # EPD hardware init start
         self.reset()
         
-        self.send_command(0x04)
-        self.ReadBusy() #waiting for the electronic paper IC to release the idle signal
-
-        self.send_command(0x00)     #panel setting
-        self.send_data(0x1f)        # LUT from OTP，KW-BF   KWR-AF    BWROTP 0f   BWOTP 1f
-
-        self.send_command(0x61)     #resolution setting
-        self.send_data (0x80)       
-        self.send_data (0x01)   
-        self.send_data (0x28)   
-
-        self.send_command(0X50) #VCOM AND DATA INTERVAL SETTING     
-        self.send_data(0x97)        #WBmode:VBDF 17|D7 VBDW 97 VBDB 57  WBRmode:VBDF F7 VBDW 77 VBDB 37  VBDR B7
+        epdsequence.run(self, INIT)
 
         return 0
     
@@ -218,27 +216,10 @@ class EPD:
         self.send_data2(self.lut_bb1)
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
     def display(self, image):
@@ -266,9 +247,7 @@ class EPD:
         self.send_data(0x28)
         
 
-        buf = [0x00] * int(self.width * self.height / 8)
-        for i in range(0, int(self.width * self.height / 8)):
-            buf[i] = ~image[i]
+        buf = epdbuffer.invert(image[0:int(self.width * self.height / 8)])
         self.send_command(0x10)
         self.send_data2(image)
         epdconfig.delay_ms(10)
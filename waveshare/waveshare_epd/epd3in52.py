@@ -30,6 +30,8 @@
 import logging
 from multiprocessing.reduction import recv_handle
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 240
@@ -37,6 +39,45 @@ EPD_HEIGHT      = 360
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x00,  # panel setting   PSR
+        0xFF,  # RES1 RES0 REG KW/R     UD    SHL   SHD_N  RST_N
+        0x01,  # x x x VCMZ TS_AUTO TIGE NORG VC_LUTZ
+    ),
+    (0x01,  # POWER SETTING   PWR
+        0x03,  #  x x x x x x VDS_EN VDG_EN
+        0x10,  #  x x x VCOM_SLWE VGH[3:0]   VGH=20V, VGL=-20V
+        0x3F,  #  x x VSH[5:0]    VSH = 15V
+        0x3F,  #  x x VSL[5:0]    VSL=-15V
+        0x03,  #  OPTEN VDHR[6:0]  VHDR=6.4V
+    ),
+)
+
+# init(), part 2
+INIT_2 = (
+    (0x06,  # booster soft start   BTST
+        0x37,  #  BT_PHA[7:0]
+        0x3D,  #  BT_PHB[7:0]
+        0x3D,  #  x x BT_PHC[5:0]
+    ),
+    (0x60,  # TCON setting            TCON
+        0x22,  # S2G[3:0] G2S[3:0]   non-overlap = 12
+    ),
+    (0x82,  # VCOM_DC setting        VDCS
+        0x07,  # x  VDCS[6:0]    VCOM_DC value= -1.9v    00~3f,0x12=-1.9v
+    ),
+    (0x30, 0x09),
+    (0xe3,  # power saving            PWS
+        0x88,  # VCOM_W[3:0] SD_W[3:0]
+    ),
+    (0x61,  # resoultion setting
+        0xf0,  #  HRES[7:3] 0 0 0
+        0x01,  #  x x x x x x x VRES[8]
+        0x68,  #  VRES[7:0]
+    ),
+    (0x50, 0xB7),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -217,15 +258,11 @@ class EPD:
 
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 0):      #  0: busy, 1: idle
-            epdconfig.delay_ms(5) 
+        epdconfig.wait_busy(self.busy_pin, 0)      #  0: busy, 1: idle
         logger.debug("e-Paper busy release")
 
     def lut(self) :
@@ -314,65 +351,16 @@ class EPD:
         self.Flag = 0
         self.reset()
 
-        self.send_command(0x00)     # panel setting   PSR
-        self.send_data(0xFF)        # RES1 RES0 REG KW/R     UD    SHL   SHD_N  RST_N    
-        self.send_data(0x01)        # x x x VCMZ TS_AUTO TIGE NORG VC_LUTZ
-
-        self.send_command(0x01)     # POWER SETTING   PWR
-        self.send_data(0x03)        #  x x x x x x VDS_EN VDG_EN    
-        self.send_data(0x10)        #  x x x VCOM_SLWE VGH[3:0]   VGH=20V, VGL=-20V    
-        self.send_data(0x3F)        #  x x VSH[5:0]    VSH = 15V
-        self.send_data(0x3F)        #  x x VSL[5:0]    VSL=-15V
-        self.send_data(0x03)        #  OPTEN VDHR[6:0]  VHDR=6.4V
+        epdsequence.run(self, INIT)
                                     # T_VDS_OFF[1:0] 00=1 frame; 01=2 frame; 10=3 frame; 11=4 frame
-        self.send_command(0x06)     # booster soft start   BTST 
-        self.send_data(0x37)        #  BT_PHA[7:0]      
-        self.send_data(0x3D)        #  BT_PHB[7:0]    
-        self.send_data(0x3D)        #  x x BT_PHC[5:0]    
-
-        self.send_command(0x60)     # TCON setting            TCON 
-        self.send_data(0x22)        # S2G[3:0] G2S[3:0]   non-overlap = 12        
-
-        self.send_command(0x82)     # VCOM_DC setting        VDCS 
-        self.send_data(0x07)        # x  VDCS[6:0]    VCOM_DC value= -1.9v    00~3f,0x12=-1.9v
-
-        self.send_command(0x30)             
-        self.send_data(0x09)        
-
-        self.send_command(0xe3)     # power saving            PWS 
-        self.send_data(0x88)        # VCOM_W[3:0] SD_W[3:0]
-
-        self.send_command(0x61)     # resoultion setting 
-        self.send_data(0xf0)        #  HRES[7:3] 0 0 0    
-        self.send_data(0x01)        #  x x x x x x x VRES[8]    
-        self.send_data(0x68)        #  VRES[7:0]
-
-        self.send_command(0x50);            
-        self.send_data(0xB7);    
+        epdsequence.run(self, INIT_2)
         return 0
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
     def display(self, image):
@@ -29,6 +29,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 280
@@ -41,6 +43,30 @@ GRAY4  = 0x00 #black
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x12,),
+    epdsequence.Delay(300),
+    (0x46, 0xF7),
+    epdsequence.Busy("ReadBusy"),
+    (0x47, 0xF7),
+    epdsequence.Busy("ReadBusy"),
+    (0x01, 0xDF, 0x01, 0x00),  # setting gaet number
+    (0x03, 0x00),  # set gate voltage
+    (0x04, 0x41, 0xA8, 0x32),  # set source voltage
+    (0x11, 0x03),  # set data entry sequence
+    (0x3C, 0x03),  # set border
+    (0x0C, 0xAE, 0xC7, 0xC3, 0xC0, 0xC0),  # set booster strength
+    (0x18, 0x80),  # set internal sensor on
+    (0x2C, 0x44),  # set vcom value
+)
+
+# init(), part 2
+INIT_2 = (
+    (0x44, 0x00, 0x00, 0x17, 0x01),  # setting X direction start/end position of RAM
+    (0x45, 0x00, 0x00, 0xDF, 0x01),  # setting Y direction start/end position of RAM
+    (0x22, 0xCF),  # Display Update Control 2
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -135,16 +161,12 @@ class EPD:
 
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
 
 
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      #  0: idle, 1: busy
-            epdconfig.delay_ms(10) 
+        epdconfig.wait_busy(self.busy_pin, 1)      #  0: idle, 1: busy
         logger.debug("e-Paper busy release") 
 
 
@@ -154,47 +176,7 @@ class EPD:
         # EPD hardware init start
         self.reset()
         
-        self.send_command(0x12)
-        epdconfig.delay_ms(300)
-        
-        self.send_command(0x46)
-        self.send_data(0xF7)
-        self.ReadBusy()
-        self.send_command(0x47)
-        self.send_data(0xF7)
-        self.ReadBusy()
-        
-        self.send_command(0x01) # setting gaet number
-        self.send_data(0xDF)
-        self.send_data(0x01)
-        self.send_data(0x00)
-
-        self.send_command(0x03) # set gate voltage
-        self.send_data(0x00)
-
-        self.send_command(0x04) # set source voltage
-        self.send_data(0x41)
-        self.send_data(0xA8)
-        self.send_data(0x32)
-
-        self.send_command(0x11) # set data entry sequence
-        self.send_data(0x03)
-
-        self.send_command(0x3C) # set border 
-        self.send_data(0x03)
-        
-        self.send_command(0x0C) # set booster strength
-        self.send_data(0xAE)
-        self.send_data(0xC7)
-        self.send_data(0xC3)
-        self.send_data(0xC0)
-        self.send_data(0xC0)
-
-        self.send_command(0x18) # set internal sensor on
-        self.send_data(0x80)
-         
-        self.send_command(0x2C) # set vcom value
-        self.send_data(0x44)
+        epdsequence.run(self, INIT)
         
         if(mode == 0):   #4Gray
             self.send_command(0x37) # set display option, these setting turn on previous function
@@ -223,20 +205,7 @@ class EPD:
         else:
             logger.debug("There is no such mode") 
 
-        self.send_command(0x44) # setting X direction start/end position of RAM
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x17)
-        self.send_data(0x01)
-
-        self.send_command(0x45) # setting Y direction start/end position of RAM
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0xDF)
-        self.send_data(0x01)
-
-        self.send_command(0x22) # Display Update Control 2
-        self.send_data(0xCF)
+        epdsequence.run(self, INIT_2)
         return 0
 
 
@@ -246,67 +215,19 @@ class EPD:
 
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
-
     def getbuffer_4Gray(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 4) * self.height)
-        image_monocolor = image.convert('L')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        i=0
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i = i + 1
-                    if(i%4 == 0):
-                        buf[int((x + (y * self.width))/4)] = ((pixels[x-3, y]&0xc0) | (pixels[x-2, y]&0xc0)>>2 | (pixels[x-1, y]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6)
-                        
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = imwidth - x - 1
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i = i + 1
-                    if(i%4 == 0):
-                        buf[int((newx + (newy * self.width))/4)] = ((pixels[x, y-3]&0xc0) | (pixels[x, y-2]&0xc0)>>2 | (pixels[x, y-1]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6) 
+        buf = epdbuffer.pack_4gray(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width / 4) * self.height)
         return buf
 
-
     def display_4Gray(self, image):
         if (image == None):
             return            
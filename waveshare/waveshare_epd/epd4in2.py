@@ -30,8 +30,9 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 from PIL import Image
-import RPi.GPIO as GPIO
 
 # Display resolution
 EPD_WIDTH  = 400
@@ -44,6 +45,61 @@ GRAY4 = 0x00  # Blackest
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x01,  # POWER SETTING
+        0x03,  # VDS_EN, VDG_EN
+        0x00,  # VCOM_HV, VGHL_LV[1], VGHL_LV[0]
+        0x2b,  # VDH
+        0x2b,  # VDL
+    ),
+    (0x06, 0x17, 0x17, 0x17),  # boost soft start
+    (0x04,),  # POWER_ON
+    epdsequence.Busy("ReadBusy"),
+    (0x00,  # panel setting
+        0xbf,  # KW-BF   KWR-AF  BWROTP 0f
+    ),
+    (0x30,  # PLL setting
+        0x3c,  # 3A 100HZ   29 150Hz 39 200HZ  31 171HZ
+    ),
+    (0x61,  # resolution setting
+        0x01,
+        0x90,  # 128
+        0x01,
+        0x2c,
+    ),
+    (0x82, 0x12),  # vcom_DC setting
+)
+
+INIT_4GRAY = (
+    (0x01,  # POWER SETTING
+        0x03,
+        0x00,  # VGH=20V,VGL=-20V
+        0x2b,  # VDH=15V
+        0x2b,  # VDL=-15V
+        0x13,
+    ),
+    (0x06,  # booster soft start
+        0x17,  # A
+        0x17,  # B
+        0x17,  # C
+    ),
+    (0x04,),
+    epdsequence.Busy("ReadBusy"),
+    (0x00,  # panel setting
+        0x3f,  # KW-3f   KWR-2F BWROTP 0f BWOTP 1f
+    ),
+    (0x30,  # PLL setting
+        0x3c,  # 100hz
+    ),
+    (0x61,  # resolution setting
+        0x01,  # 400
+        0x90,
+        0x01,  # 300
+        0x2c,
+    ),
+    (0x82, 0x12),  # vcom_DC setting
+    (0X50, 0x97),  # VCOM AND DATA INTERVAL SETTING
+)
 
 class EPD:
     def __init__(self):
@@ -245,10 +301,7 @@ class EPD:
 
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
 
     def ReadBusy(self):
         self.send_command(0x71)
@@ -313,34 +366,7 @@ class EPD:
         # EPD hardware init start
         self.reset()
 
-        self.send_command(0x01)  # POWER SETTING
-        self.send_data(0x03)  # VDS_EN, VDG_EN
-        self.send_data(0x00)  # VCOM_HV, VGHL_LV[1], VGHL_LV[0]
-        self.send_data(0x2b)  # VDH
-        self.send_data(0x2b)  # VDL
-
-        self.send_command(0x06)  # boost soft start
-        self.send_data(0x17)
-        self.send_data(0x17)
-        self.send_data(0x17)
-
-        self.send_command(0x04)  # POWER_ON
-        self.ReadBusy()
-
-        self.send_command(0x00)  # panel setting
-        self.send_data(0xbf)  # KW-BF   KWR-AF  BWROTP 0f
-
-        self.send_command(0x30)  # PLL setting
-        self.send_data(0x3c)  # 3A 100HZ   29 150Hz 39 200HZ  31 171HZ
-
-        self.send_command(0x61)  # resolution setting
-        self.send_data(0x01)
-        self.send_data(0x90)  # 128
-        self.send_data(0x01)
-        self.send_data(0x2c)
-
-        self.send_command(0x82)  # vcom_DC setting
-        self.send_data(0x12)
+        epdsequence.run(self, INIT)
 
         self.send_command(0X50)  # VCOM AND DATA INTERVAL SETTING
         self.send_data(
@@ -356,34 +382,7 @@ class EPD:
         # EPD hardware init start
         self.reset()
 
-        self.send_command(0x01)  # POWER SETTING
-        self.send_data(0x03)  # VDS_EN, VDG_EN
-        self.send_data(0x00)  # VCOM_HV, VGHL_LV[1], VGHL_LV[0]
-        self.send_data(0x2b)  # VDH
-        self.send_data(0x2b)  # VDL
-
-        self.send_command(0x06)  # boost soft start
-        self.send_data(0x17)
-        self.send_data(0x17)
-        self.send_data(0x17)
-
-        self.send_command(0x04)  # POWER_ON
-        self.ReadBusy()
-
-        self.send_command(0x00)  # panel setting
-        self.send_data(0xbf)  # KW-BF   KWR-AF  BWROTP 0f
-
-        self.send_command(0x30)  # PLL setting
-        self.send_data(0x3c)  # 3A 100HZ   29 150Hz 39 200HZ  31 171HZ
-
-        self.send_command(0x61)  # resolution setting
-        self.send_data(0x01)
-        self.send_data(0x90)  # 128
-        self.send_data(0x01)
-        self.send_data(0x2c)
-
-        self.send_command(0x82)  # vcom_DC setting
-        self.send_data(0x12)
+        epdsequence.run(self, INIT)
 
         self.send_command(0X50)  # VCOM AND DATA INTERVAL SETTING
         self.send_data(
@@ -399,102 +398,23 @@ class EPD:
         # EPD hardware init start
         self.reset()
 
-        self.send_command(0x01)  # POWER SETTING
-        self.send_data(0x03)
-        self.send_data(0x00)  # VGH=20V,VGL=-20V
-        self.send_data(0x2b)  # VDH=15V
-        self.send_data(0x2b)  # VDL=-15V
-        self.send_data(0x13)
-
-        self.send_command(0x06)  # booster soft start
-        self.send_data(0x17)  # A
-        self.send_data(0x17)  # B
-        self.send_data(0x17)  # C
-
-        self.send_command(0x04)
-        self.ReadBusy()
-
-        self.send_command(0x00)  # panel setting
-        self.send_data(0x3f)  # KW-3f   KWR-2F BWROTP 0f BWOTP 1f
-
-        self.send_command(0x30)  # PLL setting
-        self.send_data(0x3c)  # 100hz
-
-        self.send_command(0x61)  # resolution setting
-        self.send_data(0x01)  # 400
-        self.send_data(0x90)
-        self.send_data(0x01)  # 300
-        self.send_data(0x2c)
-
-        self.send_command(0x82)  # vcom_DC setting
-        self.send_data(0x12)
-
-        self.send_command(0X50)  # VCOM AND DATA INTERVAL SETTING
-        self.send_data(0x97)
+        epdsequence.run(self, INIT_4GRAY)
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy * self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
     def getbuffer_4Gray(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 4) * self.height)
-        image_monocolor = image.convert('L')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        i = 0
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0xC0:
-                        pixels[x, y] = 0x80
-                    elif pixels[x, y] == 0x80:
-                        pixels[x, y] = 0x40
-                    i = i + 1
-                    if i % 4 == 0:
-                        buf[int((x + (y * self.width)) / 4)] = (
-                                    (pixels[x - 3, y] & 0xc0) | (pixels[x - 2, y] & 0xc0) >> 2 | (
-                                        pixels[x - 1, y] & 0xc0) >> 4 | (pixels[x, y] & 0xc0) >> 6)
-
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Horizontal")
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = x
-                    if pixels[x, y] == 0xC0:
-                        pixels[x, y] = 0x80
-                    elif pixels[x, y] == 0x80:
-                        pixels[x, y] = 0x40
-                    i = i + 1
-                    if i % 4 == 0:
-                        buf[int((newx + (newy * self.width)) / 4)] = (
-                                    (pixels[x, y - 3] & 0xc0) | (pixels[x, y - 2] & 0xc0) >> 2 | (
-                                        pixels[x, y - 1] & 0xc0) >> 4 | (pixels[x, y] & 0xc0) >> 6)
-
+        if image.size == (self.height, self.width):
+            # landscape frames are transposed (image x is the panel row) rather than turned on this panel
+            image = image.convert('L').transpose(Image.Transpose.TRANSPOSE)
+        buf = epdbuffer.pack_4gray(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width / 4) * self.height)
         return buf
 
     def display(self, image):
@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 800
@@ -42,6 +44,29 @@ GRAY4  = 0x00 #Blackest
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x12,),  #SWRESET
+    epdsequence.Busy("ReadBusy"),
+    (0x18, 0x80),  # use the internal temperature sensor
+    (0x0C, 0xAE, 0xC7, 0xC3, 0xC0, 0x80),  #set soft start
+    (0x01,  #      drive output control
+        (EPD_HEIGHT-1)%256,  #  Y
+        (EPD_HEIGHT-1)//256,  #  Y
+        0x02,
+    ),
+    (0x3C, 0x01),  # Border       Border setting
+    (0x11,  #    data  entry  mode
+        0x01,  #       X-mode  x+ y-
+    ),
+)
+
+INIT_FAST = (
+    (0x1A, 0x5A),
+    (0x22, 0x91),
+    (0x20,),
+    epdsequence.Busy("ReadBusy"),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -97,17 +122,11 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 1)
 
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.SPI.writebytes2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
 
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        busy = epdconfig.digital_read(self.busy_pin)
-        while(busy == 1):
-            busy = epdconfig.digital_read(self.busy_pin)
-            epdconfig.delay_ms(20)
+        epdconfig.wait_busy(self.busy_pin, 1)
         epdconfig.delay_ms(20)
         logger.debug("e-Paper busy release")
 
@@ -179,29 +198,7 @@ class EPD:
         self.reset()
         self.ReadBusy()
 
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x18) # use the internal temperature sensor
-        self.send_data(0x80)
-
-        self.send_command(0x0C) #set soft start     
-        self.send_data(0xAE)
-        self.send_data(0xC7)
-        self.send_data(0xC3)
-        self.send_data(0xC0)
-        self.send_data(0x80)
-
-        self.send_command(0x01)   #      drive output control    
-        self.send_data((self.height-1)%256) #  Y  
-        self.send_data((self.height-1)//256) #  Y 
-        self.send_data(0x02)
-
-        self.send_command(0x3C)        # Border       Border setting 
-        self.send_data(0x01)
-
-        self.send_command(0x11)        #    data  entry  mode
-        self.send_data(0x01)           #       X-mode  x+ y-    
+        epdsequence.run(self, INIT)
 
         self.SetWindow(0, self.height-1, self.width-1, 0)
 
@@ -218,29 +215,7 @@ class EPD:
         self.reset()
         self.ReadBusy()
 
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-        
-        self.send_command(0x18) # use the internal temperature sensor
-        self.send_data(0x80)
-
-        self.send_command(0x0C) #set soft start     
-        self.send_data(0xAE)
-        self.send_data(0xC7)
-        self.send_data(0xC3)
-        self.send_data(0xC0)
-        self.send_data(0x80)
-
-        self.send_command(0x01)   #      drive output control    
-        self.send_data((self.height-1)%256) #  Y  
-        self.send_data((self.height-1)//256) #  Y 
-        self.send_data(0x02)
-
-        self.send_command(0x3C)        # Border       Border setting 
-        self.send_data(0x01)
-
-        self.send_command(0x11)        #    data  entry  mode
-        self.send_data(0x01)           #       X-mode  x+ y-    
+        epdsequence.run(self, INIT)
 
         self.SetWindow(0, self.height-1, self.width-1, 0)
 
@@ -248,22 +223,13 @@ class EPD:
         self.ReadBusy()
 
         #TEMP (1.5s)
-        self.send_command(0x1A)  
-        self.send_data(0x5A) 
-
-        self.send_command(0x22)  
-        self.send_data(0x91) 
-        self.send_command(0x20) 
-        
-        self.ReadBusy()
+        epdsequence.run(self, INIT_FAST)
 
         # EPD hardware init end
         return 0
 
     def Lut(self):
-        self.send_command(0x32)
-        for count in range(0, 105):
-            self.send_data(self.LUT_DATA_4Gray[count])
+        epdsequence.run(self, ((0x32, self.LUT_DATA_4Gray[0:105]),))
 
         self.send_command(0x03) #VGH      
         self.send_data(self.LUT_DATA_4Gray[105])
@@ -283,29 +249,7 @@ class EPD:
         self.reset()
         self.ReadBusy()
 
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-        
-        self.send_command(0x18) # use the internal temperature sensor
-        self.send_data(0x80)
-
-        self.send_command(0x0C) #set soft start     
-        self.send_data(0xAE)
-        self.send_data(0xC7)
-        self.send_data(0xC3)
-        self.send_data(0xC0)
-        self.send_data(0x80)
-
-        self.send_command(0x01)   #      drive output control    
-        self.send_data((self.height-1)%256) #  Y  
-        self.send_data((self.height-1)//256) #  Y 
-        self.send_data(0x02)
-
-        self.send_command(0x3C)        # Border       Border setting 
-        self.send_data(0x01)
-
-        self.send_command(0x11)        #    data  entry  mode
-        self.send_data(0x01)           #       X-mode  x+ y-    
+        epdsequence.run(self, INIT)
 
         self.SetWindow(0, self.height-1, self.width-1, 0)
 
@@ -318,63 +262,17 @@ class EPD:
 
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy * self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
     
     def getbuffer_4Gray(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 4) * self.height)
-        image_monocolor = image.convert('L')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        i=0
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((x + (y * self.width))/4)] = ((pixels[x-3, y]&0xc0) | (pixels[x-2, y]&0xc0)>>2 | (pixels[x-1, y]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6)
-                        
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = self.height - x - 1
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((newx + (newy * self.width))/4)] = ((pixels[x, y-3]&0xc0) | (pixels[x, y-2]&0xc0)>>2 | (pixels[x, y-1]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6) 
+        buf = epdbuffer.pack_4gray(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width / 4) * self.height)
         return buf
 
     def display(self, image):
@@ -427,6 +325,7 @@ class EPD:
 
     def display_4Gray(self, image):
         self.send_command(0x24)
+        buf = bytearray()
         for i in range(0, 48000):                     #5808*4  46464
             temp3=0
             for j in range(0, 2):
@@ -456,9 +355,11 @@ class EPD:
                     if(j!=1 or k!=1):				
                         temp3 <<= 1
                     temp1 <<= 2
-            self.send_data(temp3)
+            buf.append(temp3)
+        self.send_data2(buf)
             
         self.send_command(0x26)	       
+        buf = bytearray()
         for i in range(0, 48000):                #5808*4  46464
             temp3=0
             for j in range(0, 2):
@@ -488,7 +389,8 @@ class EPD:
                     if(j!=1 or k!=1):					
                         temp3 <<= 1
                     temp1 <<= 2
-            self.send_data(temp3)
+            buf.append(temp3)
+        self.send_data2(buf)
         
         self.TurnOnDisplay_4GRAY()
 
@@ -30,8 +30,9 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 from PIL import Image
-import RPi.GPIO as GPIO
 
 # Display resolution
 EPD_WIDTH  = 400
@@ -44,6 +45,67 @@ GRAY4 = 0x00  # Blackest
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x12,),  #SWRESET
+    epdsequence.Busy("ReadBusy"),
+    (0x21, 0x40, 0x00),  # Display update control
+    (0x3C, 0x05),  # BorderWavefrom
+    (0x11,  # data  entry  mode
+        0x03,  # X-mode
+    ),
+    (0x44, 0x00, 0x31),
+    (0x45, 0x00, 0x00, 0x2B, 0x01),
+    (0x4E, 0x00),
+    (0x4F, 0x00, 0x00),
+    epdsequence.Busy("ReadBusy"),
+)
+
+INIT_FAST = (
+    (0x12,),  #SWRESET
+    epdsequence.Busy("ReadBusy"),
+    (0x21, 0x40, 0x00),  # Display update control
+    (0x3C, 0x05),  # BorderWavefrom
+)
+
+# init_fast(), part 2
+INIT_FAST_2 = (
+    (0x22, 0x91),  # Load temperature value
+    (0x20,),
+    epdsequence.Busy("ReadBusy"),
+    (0x11,  # data  entry  mode
+        0x03,  # X-mode
+    ),
+    (0x44, 0x00, 0x31),
+    (0x45, 0x00, 0x00, 0x2B, 0x01),
+    (0x4E, 0x00),
+    (0x4F, 0x00, 0x00),
+    epdsequence.Busy("ReadBusy"),
+)
+
+INIT_4GRAY = (
+    (0x12,),  #SWRESET
+    epdsequence.Busy("ReadBusy"),
+    (0x21, 0x00, 0x00),  # Display update control
+    (0x3C, 0x03),  # BorderWavefrom
+    (0x0C,  # BTST
+        0x8B,  # 8B
+        0x9C,  # 9C
+        0xA4,  # 96 A4
+        0x0F,  # 0F
+    ),
+)
+
+# Init_4Gray(), part 2
+INIT_4GRAY_2 = (
+    (0x11,  # data  entry  mode
+        0x03,  # X-mode
+    ),
+    (0x44, 0x00, 0x31),
+    (0x45, 0x00, 0x00, 0x2B, 0x01),
+    (0x4E, 0x00),
+    (0x4F, 0x00, 0x00),
+    epdsequence.Busy("ReadBusy"),
+)
 
 class EPD:
     def __init__(self):
@@ -118,15 +180,11 @@ class EPD:
 
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
 
     def ReadBusy(self):        
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      #  0: idle, 1: busy
-            epdconfig.delay_ms(20)                
+        epdconfig.wait_busy(self.busy_pin, 1)      #  0: idle, 1: busy
         logger.debug("e-Paper busy release")
     
     def TurnOnDisplay(self):
@@ -160,36 +218,7 @@ class EPD:
         self.reset()
         self.ReadBusy()
 
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x21)  # Display update control
-        self.send_data(0x40)
-        self.send_data(0x00)
-
-        self.send_command(0x3C)  # BorderWavefrom
-        self.send_data(0x05)
-
-        self.send_command(0x11)  # data  entry  mode
-        self.send_data(0x03)  # X-mode
-
-        self.send_command(0x44) 
-        self.send_data(0x00)
-        self.send_data(0x31)  
-        
-        self.send_command(0x45) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0x2B)
-        self.send_data(0x01)
-
-        self.send_command(0x4E) 
-        self.send_data(0x00)
-
-        self.send_command(0x4F) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.ReadBusy()
+        epdsequence.run(self, INIT)
 
         return 0
     
@@ -200,15 +229,7 @@ class EPD:
         self.reset()
         self.ReadBusy()
 
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x21)  # Display update control
-        self.send_data(0x40)
-        self.send_data(0x00)
-
-        self.send_command(0x3C)  # BorderWavefrom
-        self.send_data(0x05)
+        epdsequence.run(self, INIT_FAST)
 
         if mode == self.Seconds_1_5S:
             self.send_command(0x1A)
@@ -217,38 +238,12 @@ class EPD:
             self.send_command(0x1A)
             self.send_data(0x5A)  
 
-        self.send_command(0x22)  # Load temperature value
-        self.send_data(0x91)  
-        self.send_command(0x20)  
-        self.ReadBusy()
-
-        self.send_command(0x11)  # data  entry  mode
-        self.send_data(0x03)  # X-mode
-
-        self.send_command(0x44) 
-        self.send_data(0x00)
-        self.send_data(0x31)  
-        
-        self.send_command(0x45) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0x2B)
-        self.send_data(0x01)
-
-        self.send_command(0x4E) 
-        self.send_data(0x00)
-
-        self.send_command(0x4F) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.ReadBusy()
+        epdsequence.run(self, INIT_FAST_2)
 
         return 0
 
     def Lut(self):
-        self.send_command(0x32)
-        for i in range(227):
-            self.send_data(self.LUT_ALL[i])
+        epdsequence.run(self, ((0x32, self.LUT_ALL[0:227]),))
 
         self.send_command(0x3F)
         self.send_data(self.LUT_ALL[227])
@@ -273,110 +268,29 @@ class EPD:
         self.reset()
         self.ReadBusy()
 
-        self.send_command(0x12) #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x21)  # Display update control
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x3C)  # BorderWavefrom
-        self.send_data(0x03)
-
-        self.send_command(0x0C)  # BTST
-        self.send_data(0x8B) # 8B
-        self.send_data(0x9C) # 9C 
-        self.send_data(0xA4) # 96 A4
-        self.send_data(0x0F) # 0F
+        epdsequence.run(self, INIT_4GRAY)
 
         self.Lut()
 
-        self.send_command(0x11)  # data  entry  mode
-        self.send_data(0x03)  # X-mode
-
-        self.send_command(0x44) 
-        self.send_data(0x00)
-        self.send_data(0x31)  
-        
-        self.send_command(0x45) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0x2B)
-        self.send_data(0x01)
-
-        self.send_command(0x4E) 
-        self.send_data(0x00)
-
-        self.send_command(0x4F) 
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.ReadBusy()
+        epdsequence.run(self, INIT_4GRAY_2)
 
         return 0
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy * self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
     def getbuffer_4Gray(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 4) * self.height)
-        image_monocolor = image.convert('L')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        i = 0
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0xC0:
-                        pixels[x, y] = 0x80
-                    elif pixels[x, y] == 0x80:
-                        pixels[x, y] = 0x40
-                    i = i + 1
-                    if i % 4 == 0:
-                        buf[int((x + (y * self.width)) / 4)] = (
-                                    (pixels[x - 3, y] & 0xc0) | (pixels[x - 2, y] & 0xc0) >> 2 | (
-                                        pixels[x - 1, y] & 0xc0) >> 4 | (pixels[x, y] & 0xc0) >> 6)
-
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Horizontal")
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = x
-                    if pixels[x, y] == 0xC0:
-                        pixels[x, y] = 0x80
-                    elif pixels[x, y] == 0x80:
-                        pixels[x, y] = 0x40
-                    i = i + 1
-                    if i % 4 == 0:
-                        buf[int((newx + (newy * self.width)) / 4)] = (
-                                    (pixels[x, y - 3] & 0xc0) | (pixels[x, y - 2] & 0xc0) >> 2 | (
-                                        pixels[x, y - 1] & 0xc0) >> 4 | (pixels[x, y] & 0xc0) >> 6)
-
+        if image.size == (self.height, self.width):
+            # landscape frames are transposed (image x is the panel row) rather than turned on this panel
+            image = image.convert('L').transpose(Image.Transpose.TRANSPOSE)
+        buf = epdbuffer.pack_4gray(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width / 4) * self.height)
         return buf
     
     def Clear(self):
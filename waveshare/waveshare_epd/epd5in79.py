@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 792
@@ -42,6 +44,89 @@ GRAY4  = 0x00 #Blackest
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x12,),  # POWER ON
+    epdsequence.Busy("ReadBusy"),  # waiting for the electronic paper IC to release the idle signal
+    (0x11, 0x01),
+    (0x44,  #  Set Ram X- address Start / End position
+        0x00,  #  XStart, POR = 00h
+        0x31,  # 400/8-1
+    ),
+    (0x45,  #  Set Ram Y- address  Start / End position
+        0x0f,
+        0x01,  # 300-1
+        0x00,  #  YEnd L
+        0x00,  #  YEnd H
+    ),
+    (0x4e, 0x00),
+    (0x4f, 0x0f, 0x01),
+    epdsequence.Busy("ReadBusy"),
+    (0x91, 0x00),
+    (0xC4,  #  Set Ram X- address Start / End position
+        0x31,  #  XStart, POR = 00h
+        0x00,  # 400/8-1
+    ),
+    (0xC5,  #  Set Ram Y- address  Start / End position
+        0x0f,
+        0x01,  # 300-1
+        0x00,  # YEnd L
+        0x00,  # YEnd H
+    ),
+    (0xCE, 0x31),
+    (0xCF, 0x0f, 0x01),
+    epdsequence.Busy("ReadBusy"),
+)
+
+INIT_FAST = (
+    (0x12,),
+    epdsequence.Busy("ReadBusy"),
+    (0x18, 0x80),
+    (0x22, 0xB1),
+    (0x20,),
+    epdsequence.Busy("ReadBusy"),
+    (0x1A, 0x64, 0x00),
+    (0x22, 0x91),
+    (0x20,),
+    epdsequence.Busy("ReadBusy"),
+    (0x11, 0x01),
+    (0x44, 0x00, 0x31),
+    (0x45, 0x0f, 0x01, 0x00, 0x00),
+    (0x4e, 0x00),
+    (0x4f, 0x0f, 0x01),
+    epdsequence.Busy("ReadBusy"),
+    (0x91, 0x00),
+    (0xC4, 0x31, 0x00),
+    (0xC5, 0x0f, 0x01, 0x00, 0x00),
+    (0xCe, 0x31),
+    (0xCf, 0x0f, 0x01),
+    epdsequence.Busy("ReadBusy"),
+)
+
+INIT_PARTIAL = (
+    (0x12,),
+    epdsequence.Busy("ReadBusy"),
+    (0x3C, 0x80),
+)
+
+INIT_4GRAY = (
+    (0x12,),
+    epdsequence.Busy("ReadBusy"),
+    (0x0C, 0x8B, 0x9C, 0xA6, 0x0F),
+    (0x3C, 0x81),
+    epdsequence.Busy("ReadBusy"),
+    (0x11, 0x01),
+    (0x44, 0x00, 0x31),
+    (0x45, 0x0f, 0x01, 0x00, 0x00),
+    (0x4e, 0x00),
+    (0x4f, 0x0f, 0x01),
+    epdsequence.Busy("ReadBusy"),
+    (0x91, 0x00),
+    (0xC4, 0x31, 0x00),
+    (0xC5, 0x0f, 0x01, 0x00, 0x00),
+    (0xCe, 0x31),
+    (0xCf, 0x0f, 0x01),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -120,15 +205,11 @@ class EPD:
 
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      #  0: idle, 1: busy
-            epdconfig.delay_ms(200)
+        epdconfig.wait_busy(self.busy_pin, 1)      #  0: idle, 1: busy
         logger.debug("e-Paper busy release")
 
     def TurnOnDisplay(self):
@@ -182,48 +263,7 @@ class EPD:
             
         self.reset()
         self.ReadBusy()             # waiting for the electronic paper IC to release the idle signal
-        self.send_command(0x12)     # POWER ON
-        self.ReadBusy()             # waiting for the electronic paper IC to release the idle signal
-
-        self.send_command(0x11)
-        self.send_data(0x01)
-
-        self.send_command(0x44)	    #  Set Ram X- address Start / End position
-        self.send_data(0x00)        #  XStart, POR = 00h
-        self.send_data(0x31)        # 400/8-1
-        self.send_command(0x45)     #  Set Ram Y- address  Start / End position 
-        self.send_data(0x0f)  
-        self.send_data(0x01)        # 300-1	
-        self.send_data(0x00)        #  YEnd L
-        self.send_data(0x00)        #  YEnd H 
-
-        self.send_command(0x4e)	 						 
-        self.send_data(0x00)	
-        self.send_command(0x4f)	 
-        self.send_data(0x0f)  
-        self.send_data(0x01) 	
-
-        self.ReadBusy()   
-
-        self.send_command(0x91)
-        self.send_data(0x00)
-
-        self.send_command(0xC4)     #  Set Ram X- address Start / End position
-        self.send_data(0x31)        #  XStart, POR = 00h
-        self.send_data(0x00)        # 400/8-1
-        self.send_command(0xC5)     #  Set Ram Y- address  Start / End position 
-        self.send_data(0x0f)  
-        self.send_data(0x01)        # 300-1	
-        self.send_data(0x00)        # YEnd L
-        self.send_data(0x00)        # YEnd H 
-
-        self.send_command(0xCE)	 						 
-        self.send_data(0x31)	
-        self.send_command(0xCF)	 
-        self.send_data(0x0f)  
-        self.send_data(0x01)
-
-        self.ReadBusy()   
+        epdsequence.run(self, INIT)
 
         return 0
 
@@ -233,65 +273,7 @@ class EPD:
             
         self.reset()
         self.ReadBusy()
-        self.send_command(0x12)
-        self.ReadBusy()
-
-        self.send_command(0x18)
-        self.send_data(0x80)	
-
-        self.send_command(0x22)
-        self.send_data(0xB1)		
-        self.send_command(0x20)	
-        self.ReadBusy()   
-
-        self.send_command(0x1A)
-        self.send_data(0x64)		
-        self.send_data(0x00)	
-                
-        self.send_command(0x22)
-        self.send_data(0x91)		
-        self.send_command(0x20)	
-        self.ReadBusy()   
-
-        self.send_command(0x11)
-        self.send_data(0x01)
-
-        self.send_command(0x44)
-        self.send_data(0x00)
-        self.send_data(0x31)
-        self.send_command(0x45)
-        self.send_data(0x0f)  
-        self.send_data(0x01)
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x4e)	 						 
-        self.send_data(0x00)	
-        self.send_command(0x4f)	 
-        self.send_data(0x0f)  
-        self.send_data(0x01) 	
-
-        self.ReadBusy()   
-
-        self.send_command(0x91)
-        self.send_data(0x00)
-
-        self.send_command(0xC4)
-        self.send_data(0x31)
-        self.send_data(0x00)
-        self.send_command(0xC5)
-        self.send_data(0x0f)  
-        self.send_data(0x01)
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0xCe)	 						 
-        self.send_data(0x31)	
-        self.send_command(0xCf)	 
-        self.send_data(0x0f)  
-        self.send_data(0x01)
-
-        self.ReadBusy()   
+        epdsequence.run(self, INIT_FAST)
 
         return 0
     
@@ -301,11 +283,7 @@ class EPD:
             
         self.reset()
         self.ReadBusy()
-        self.send_command(0x12)
-        self.ReadBusy() 
-
-        self.send_command(0x3C)
-        self.send_data(0x80)
+        epdsequence.run(self, INIT_PARTIAL)
 
         return 0
     
@@ -315,119 +293,23 @@ class EPD:
             
         self.reset()
         self.ReadBusy()   
-        self.send_command(0x12) 
-        self.ReadBusy() 
-
-        self.send_command(0x0C)     
-        self.send_data(0x8B)    
-        self.send_data(0x9C)    
-        self.send_data(0xA6)    
-        self.send_data(0x0F)
-
-        self.send_command(0x3C)
-        self.send_data(0x81)
-
-        self.ReadBusy()	
-
-        self.send_command(0x11)
-        self.send_data(0x01)
-
-        self.send_command(0x44)
-        self.send_data(0x00)
-        self.send_data(0x31)
-        self.send_command(0x45)
-        self.send_data(0x0f)  
-        self.send_data(0x01)
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x4e)	 						 
-        self.send_data(0x00)	
-        self.send_command(0x4f)	 
-        self.send_data(0x0f)  
-        self.send_data(0x01) 	
-
-        self.ReadBusy()   
-
-        self.send_command(0x91)
-        self.send_data(0x00)
-
-        self.send_command(0xC4)
-        self.send_data(0x31)
-        self.send_data(0x00)
-        self.send_command(0xC5)
-        self.send_data(0x0f)  
-        self.send_data(0x01)
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0xCe)	 						 
-        self.send_data(0x31)	
-        self.send_command(0xCf)	 
-        self.send_data(0x0f)  
-        self.send_data(0x01)
+        epdsequence.run(self, INIT_4GRAY)
 
         self.EPD_5in79_Lut()
         return 0
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if imwidth == self.width and imheight == self.height:
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif imwidth == self.height and imheight == self.width:
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy * self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
     
     def getbuffer_4Gray(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 4) * self.height)
-        image_monocolor = image.convert('L')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        i=0
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((x + (y * self.width))/4)] = ((pixels[x-3, y]&0xc0) | (pixels[x-2, y]&0xc0)>>2 | (pixels[x-1, y]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6)
-                        
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = self.height - x - 1
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((newx + (newy * self.width))/4)] = ((pixels[x, y-3]&0xc0) | (pixels[x, y-2]&0xc0)>>2 | (pixels[x, y-1]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6) 
+        buf = epdbuffer.pack_4gray(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width / 4) * self.height)
         return buf
 
     def display(self, imageblack):
@@ -564,6 +446,7 @@ class EPD:
         Width1 =int(self.width / 8)
 
         self.send_command(0x24)
+        buf = bytearray()
         for j in range(self.height):   
             for i in range(Width):
                 temp3=0
@@ -582,9 +465,11 @@ class EPD:
                         if(o!=1 or k!=3):
                             temp3 <<= 1
                         temp1 <<= 2
-                self.send_data(temp3)
+                buf.append(temp3)
+        self.send_data2(buf)
             
         self.send_command(0x26)	       
+        buf = bytearray()
         for j in range(self.height):   
             for i in range(Width):
                 temp3=0
@@ -603,9 +488,11 @@ class EPD:
                         if(o!=1 or k!=3):
                             temp3 <<= 1
                         temp1 <<= 2
-                self.send_data(temp3)
+                buf.append(temp3)
+        self.send_data2(buf)
 
         self.send_command(0xA4)
+        buf = bytearray()
         for j in range(self.height):   
             for i in range(Width):
                 temp3=0
@@ -624,9 +511,11 @@ class EPD:
                         if(o!=1 or k!=3):
                             temp3 <<= 1
                         temp1 <<= 2
-                self.send_data(temp3)
+                buf.append(temp3)
+        self.send_data2(buf)
             
         self.send_command(0xA6)	       
+        buf = bytearray()
         for j in range(self.height):   
             for i in range(Width):
                 temp3=0
@@ -645,7 +534,8 @@ class EPD:
                         if(o!=1 or k!=3):
                             temp3 <<= 1
                         temp1 <<= 2
-                self.send_data(temp3)
+                buf.append(temp3)
+        self.send_data2(buf)
         
         self.TurnOnDisplay_4GRAY()
 
@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 792
@@ -37,6 +39,37 @@ EPD_HEIGHT      = 272
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x12,),  # POWER ON
+    epdsequence.Busy("ReadBusy"),  # waiting for the electronic paper IC to release the idle signal
+    (0x11, 0x01),
+    (0x44,  # Set Ram X- address Start / End position
+        0x00,  # XStart, POR = 00h
+        0x31,  # 400/8-1
+    ),
+    (0x45,  # Set Ram Y- address  Start / End position
+        0x0f,
+        0x01,  # 300-1
+        0x00,  # YEnd L
+        0x00,  # YEnd H
+    ),
+    (0x4e, 0x00),
+    (0x4f, 0x0f, 0x01),
+    (0x91, 0x00),
+    (0xC4,  # Set Ram X- address Start / End position
+        0x31,  # XStart, POR = 00h
+        0x00,  # 400/8-1
+    ),
+    (0xC5,  # Set Ram Y- address  Start / End position
+        0x0f,
+        0x01,  # 300-1
+        0x00,  # YEnd L
+        0x00,  # YEnd H
+    ),
+    (0xCe, 0x31),
+    (0xCf, 0x0f, 0x01),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -69,15 +102,11 @@ class EPD:
 
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      #  0: idle, 1: busy
-            epdconfig.delay_ms(200)
+        epdconfig.wait_busy(self.busy_pin, 1)      #  0: idle, 1: busy
         logger.debug("e-Paper busy release")
 
     def TurnOnDisplay(self):
@@ -94,74 +123,18 @@ class EPD:
         self.reset()
 
         self.ReadBusy()                 # waiting for the electronic paper IC to release the idle signal
-        self.send_command(0x12)         # POWER ON
-        self.ReadBusy()                 # waiting for the electronic paper IC to release the idle signal
-
-        self.send_command(0x11)
-        self.send_data(0x01)
-        self.send_command(0x44)	 		# Set Ram X- address Start / End position
-        self.send_data(0x00)     		# XStart, POR = 00h
-        self.send_data(0x31)            # 400/8-1
-        self.send_command(0x45)	 		# Set Ram Y- address  Start / End position 
-        self.send_data(0x0f)  
-        self.send_data(0x01)            # 300-1	
-        self.send_data(0x00)     		# YEnd L
-        self.send_data(0x00)			# YEnd H 
-
-        self.send_command(0x4e)	 						 
-        self.send_data(0x00)	
-        self.send_command(0x4f)	 
-        self.send_data(0x0f)  
-        self.send_data(0x01) 	
-
-
-        self.send_command(0x91)
-        self.send_data(0x00)
-
-        self.send_command(0xC4)		    # Set Ram X- address Start / End position
-        self.send_data(0x31)     		# XStart, POR = 00h
-        self.send_data(0x00)            # 400/8-1
-        self.send_command(0xC5)	 	    # Set Ram Y- address  Start / End position 
-        self.send_data(0x0f)  
-        self.send_data(0x01)            # 300-1	
-        self.send_data(0x00)     		# YEnd L
-        self.send_data(0x00)			# YEnd H 
-
-        self.send_command(0xCe)	 						 
-        self.send_data(0x31)	
-        self.send_command(0xCf)	 
-        self.send_data(0x0f)  
-        self.send_data(0x01)
+        epdsequence.run(self, INIT)
         return 0
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
     def display(self, imageblack, imagered):
-        buf = [0x00] * int(self.width * self.height / 8)
-        for i in range(0, int(self.width * self.height / 8)):
-            buf[i] = ~imagered[i]
+        buf = epdbuffer.invert(imagered[0:int(self.width * self.height / 8)])
 
         Width =int(self.width / 16)+1
         Width1 =int(self.width / 8)
@@ -30,9 +30,10 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 import PIL
-from PIL import Image
 import io
 
 # Display resolution
@@ -41,6 +42,24 @@ EPD_HEIGHT      = 272
 
 logger = logging.getLogger(__name__)
 
+# The 4 colors supported by the panel, in panel index order
+PALETTE = (0,0,0,  255,255,255,  255,255,0,   255,0,0)
+
+INIT = (
+    (0xA2, 0x01),
+    (0x00, 0x03, 0x29),
+    (0xA2, 0x02),
+    (0x00, 0x07, 0x29),
+    (0xA2, 0x00),
+    (0x50, 0x97),
+    (0x61, 0x01, 0x8c, 0x01, 0x10),
+    (0x06, 0x38, 0x38, 0x38, 0x00),
+    (0xE9, 0x01),
+    (0xE0, 0x01),
+    (0x04,),
+    epdsequence.Busy("ReadBusyH"),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -77,22 +96,17 @@ class EPD:
 
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusyH(self):
         logger.debug("e-Paper busy H")
-        while(epdconfig.digital_read(self.busy_pin) == 0):      # 0: idle, 1: busy
-            epdconfig.delay_ms(5)
+        epdconfig.wait_busy(self.busy_pin, 0)      # 0: idle, 1: busy
         epdconfig.delay_ms(200)
         logger.debug("e-Paper busy H release")
 
     def ReadBusyL(self):
         logger.debug("e-Paper busy L")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      # 0: busy, 1: idle
-            epdconfig.delay_ms(5)
+        epdconfig.wait_busy(self.busy_pin, 1)      # 0: busy, 1: idle
         logger.debug("e-Paper busy L release")
 
     def TurnOnDisplay(self):
@@ -112,75 +126,16 @@ class EPD:
 
         self.ReadBusyH()      
 
-        self.send_command(0xA2)
-        self.send_data(0x01)
-
-        self.send_command(0x00)
-        self.send_data(0x03)	
-        self.send_data(0x29)
-
-        self.send_command(0xA2)
-        self.send_data(0x02)	
-
-        self.send_command(0x00)
-        self.send_data(0x07)	
-        self.send_data(0x29)
-
-        self.send_command(0xA2)
-        self.send_data(0x00)	
-
-        self.send_command(0x50)
-        self.send_data(0x97)	
-
-        self.send_command(0x61)
-        self.send_data(0x01)	
-        self.send_data(0x8c)	
-        self.send_data(0x01)	
-        self.send_data(0x10) 	
-
-        self.send_command(0x06)
-        self.send_data(0x38)	
-        self.send_data(0x38)
-        self.send_data(0x38)
-        self.send_data(0x00)
-
-
-        self.send_command(0xE9)
-        self.send_data(0x01)
-
-
-        self.send_command(0xE0)
-        self.send_data(0x01)
-
-        self.send_command(0x04)
-        self.ReadBusyH()	
+        epdsequence.run(self, INIT)
         return 0
 
-    def getbuffer(self, image):
-        # Create a pallette with the 4 colors supported by the panel
-        pal_image = Image.new("P", (1,1))
-        pal_image.putpalette( (0,0,0,  255,255,255,  255,255,0,   255,0,0) + (0,0,0)*252)
-
-        # Check if we need to rotate the image
-        imwidth, imheight = image.size
-        if(imwidth == self.width and imheight == self.height):
-            image_temp = image
-        elif(imwidth == self.height and imheight == self.width):
-            image_temp = image.rotate(90, expand=True)
-        else:
-            logger.warning("Invalid image dimensions: %d x %d, expected %d x %d" % (imwidth, imheight, self.width, self.height))
-
-        # Convert the soruce image to the 4 colors, dithering if needed
-        image_4color = image_temp.convert("RGB").quantize(palette=pal_image)
-        buf_4color = bytearray(image_4color.tobytes('raw'))
+    def getbuffer(self, image, dither=True):
+        # Turn the image to the panel's orientation if it was drawn the other way round
+        image_temp = epdbuffer.native_image(image, self.width, self.height)
 
+        # Convert the source image to the 4 colors, dithering if asked, and pack 4 pixels
         # into a single byte to transfer to the panel
-        buf = [0x00] * int(self.width * self.height / 4)
-        idx = 0
-        for i in range(0, len(buf_4color), 4):
-            buf[idx] = (buf_4color[i] << 6) + (buf_4color[i+1] << 4) + (buf_4color[i+2] << 2) + buf_4color[i+3]
-            idx += 1
-        return buf
+        return epdbuffer.pack_palette(image_temp, PALETTE, 2, dither)
 
     def display(self, image):
         Width =int(self.width / 8)
@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 648
@@ -37,6 +39,30 @@ EPD_HEIGHT      = 480
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x01,  #POWER SETTING
+        0x07,
+        0x07,  #VGH=20V,VGL=-20V
+        0x3f,  #VDH=15V
+        0x3f,  #VDL=-15V
+    ),
+    (0x04,),  #POWER ON
+    epdsequence.Delay(100),
+    epdsequence.Busy("ReadBusy"),  #waiting for the electronic paper IC to release the idle signal
+    (0X00,  #PANNEL SETTING
+        0x0F,  #KW-3f   KWR-2F    BWROTP 0f   BWOTP 1f
+    ),
+    (0x61,  #tres
+        0x02,  #source 648
+        0x88,
+        0x01,  #gate 480
+        0xe0,
+    ),
+    (0X15, 0x00),
+    (0X50, 0x11, 0x07),  #VCOM AND DATA INTERVAL SETTING
+    (0X60, 0x22),  #TCON SETTING
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -69,10 +95,7 @@ class EPD:
 
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):
         logger.debug("e-Paper busy")
@@ -88,65 +111,19 @@ class EPD:
             
         self.reset()
 
-        self.send_command(0x01)     #POWER SETTING
-        self.send_data (0x07)
-        self.send_data (0x07)       #VGH=20V,VGL=-20V
-        self.send_data (0x3f)       #VDH=15V
-        self.send_data (0x3f)       #VDL=-15V
-
-        self.send_command(0x04) #POWER ON
-        epdconfig.delay_ms(100)  
-        self.ReadBusy()   #waiting for the electronic paper IC to release the idle signal
-
-        self.send_command(0X00)     #PANNEL SETTING
-        self.send_data(0x0F)        #KW-3f   KWR-2F    BWROTP 0f   BWOTP 1f
-
-        self.send_command(0x61)     #tres
-        self.send_data (0x02)       #source 648
-        self.send_data (0x88)
-        self.send_data (0x01)       #gate 480
-        self.send_data (0xe0)
-
-        self.send_command(0X15)
-        self.send_data(0x00)
-
-        self.send_command(0X50)     #VCOM AND DATA INTERVAL SETTING
-        self.send_data(0x11)
-        self.send_data(0x07)
-
-        self.send_command(0X60)     #TCON SETTING
-        self.send_data(0x22)
+        epdsequence.run(self, INIT)
         
         return 0
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
     def display(self, imageblack, imagered):
-        buf = [0x00] * int(self.width * self.height / 8)
-        for i in range(0, int(self.width * self.height / 8)):
-            buf[i] = ~imagered[i]
+        buf = epdbuffer.invert(imagered[0:int(self.width * self.height / 8)])
 
         if (imageblack != None):
             self.send_command(0X10)
@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 600
@@ -37,6 +39,28 @@ EPD_HEIGHT      = 448
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x01, 0x37, 0x00),  # POWER_SETTING
+    (0x00, 0xCF, 0x08),  # PANEL_SETTING
+    (0x30,  # PLL_CONTROL
+        0x3A,  # PLL:  0-15:0x3C, 15+:0x3A
+    ),
+    (0X82,  # VCOM VOLTAGE SETTING
+        0x28,  # all temperature  range
+    ),
+    (0x06, 0xc7, 0xcc, 0x15),  # boost
+    (0X50, 0x77),  # VCOM AND DATA INTERVAL SETTING
+    (0X60, 0x22),  # TCON SETTING
+    (0X65, 0x00),  # FLASH CONTROL
+    (0x61,  # tres
+        0x02,  # source 600
+        0x58,
+        0x01,  # gate 448
+        0xc0,
+    ),
+    (0xe5, 0x03, 0x03),  # FLASH MODE
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -66,11 +90,14 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 0)
         epdconfig.spi_writebyte([data])
         epdconfig.digital_write(self.cs_pin, 1)
+
+    # send a lot of data
+    def send_data2(self, data):
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 0):      # 0: idle, 1: busy
-            epdconfig.delay_ms(100)
+        epdconfig.wait_busy(self.busy_pin, 0)      # 0: idle, 1: busy
         logger.debug("e-Paper busy release")
             
     def init(self):
@@ -79,71 +106,20 @@ class EPD:
             
         self.reset()
 
-        self.send_command(0x01) # POWER_SETTING
-        self.send_data(0x37)
-        self.send_data(0x00)
-        
-        self.send_command(0x00) # PANEL_SETTING
-        self.send_data(0xCF)
-        self.send_data(0x08)
-        
-        self.send_command(0x30) # PLL_CONTROL
-        self.send_data(0x3A) # PLL:  0-15:0x3C, 15+:0x3A
-        self.send_command(0X82) # VCOM VOLTAGE SETTING
-        self.send_data(0x28) # all temperature  range
-
-        self.send_command(0x06) # boost
-        self.send_data(0xc7) 	   	
-        self.send_data(0xcc) 
-        self.send_data(0x15) 
-
-        self.send_command(0X50) # VCOM AND DATA INTERVAL SETTING
-        self.send_data(0x77) 
-
-        self.send_command(0X60) # TCON SETTING
-        self.send_data(0x22) 
-
-        self.send_command(0X65) # FLASH CONTROL
-        self.send_data(0x00)
-
-        self.send_command(0x61) # tres			
-        self.send_data(0x02) # source 600
-        self.send_data(0x58) 
-        self.send_data(0x01) # gate 448
-        self.send_data(0xc0)
-
-        self.send_command(0xe5) # FLASH MODE		   	
-        self.send_data(0x03) 
-        self.send_data(0x03)
+        epdsequence.run(self, INIT)
         
         return 0
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        logger.debug('imwidth = %d  imheight =  %d ',imwidth, imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
+        buf = epdbuffer.pack_1bit(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width/8) * self.height)
         return buf
 
     def display(self, imageblack, imagered):
         self.send_command(0x10)
+        buf = bytearray()
         for i in range(0, int(self.width / 8 * self.height)):
             temp1 = imageblack[i]
             temp2 = imagered[i]
@@ -168,9 +144,10 @@ class EPD:
                     temp3 |= 0x03              #white
                 temp1 = (temp1 << 1) & 0xFF
                 temp2 = (temp2 << 1) & 0xFF
-                self.send_data(temp3)
+                buf.append(temp3)
                 j += 1
                 
+        self.send_data2(buf)
         self.send_command(0x04) # POWER ON
         self.ReadBusy()
         self.send_command(0x12) # display refresh
@@ -179,11 +156,7 @@ class EPD:
         
     def Clear(self):
         self.send_command(0x10)
-        for i in range(0, int(self.width / 8 * self.height)):
-            self.send_data(0x33)
-            self.send_data(0x33)
-            self.send_data(0x33)
-            self.send_data(0x33)
+        self.send_data2([0x33] * int(self.width / 8 * self.height) * 4)
             
         self.send_command(0x04) # POWER ON
         self.ReadBusy()
@@ -30,9 +30,10 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 import PIL
-from PIL import Image
 import io
 
 # Display resolution
@@ -41,6 +42,31 @@ EPD_HEIGHT      = 480
 
 logger = logging.getLogger(__name__)
 
+# The 7 colors supported by the panel, in panel index order
+PALETTE = (0,0,0,  255,255,255,  0,255,0,   0,0,255,  255,0,0,  255,255,0, 255,128,0)
+
+INIT = (
+    (0xAA, 0x49, 0x55, 0x20, 0x08, 0x09, 0x18),  # CMDH
+    (0x01, 0x3F, 0x00, 0x32, 0x2A, 0x0E, 0x2A),
+    (0x00, 0x5F, 0x69),
+    (0x03, 0x00, 0x54, 0x00, 0x44),
+    (0x05, 0x40, 0x1F, 0x1F, 0x2C),
+    (0x06, 0x6F, 0x1F, 0x1F, 0x22),
+    (0x08, 0x6F, 0x1F, 0x1F, 0x22),
+    (0x13, 0x00, 0x04),  # IPC
+    (0x30, 0x3C),
+    (0x41, 0x00),  # TSE
+    (0x50, 0x3F),
+    (0x60, 0x02, 0x00),
+    (0x61, 0x03, 0x20, 0x01, 0xE0),
+    (0x82, 0x1E),
+    (0x84, 0x00),
+    (0x86, 0x00),  # AGID
+    (0xE3, 0x2F),
+    (0xE0, 0x00),  # CCSET
+    (0xE6, 0x00),  # TSSET
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -80,15 +106,11 @@ class EPD:
         
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusyH(self):
         logger.debug("e-Paper busy H")
-        while(epdconfig.digital_read(self.busy_pin) == 0):      # 0: busy, 1: idle
-            epdconfig.delay_ms(5)
+        epdconfig.wait_busy(self.busy_pin, 0)      # 0: busy, 1: idle
         logger.debug("e-Paper busy H release")
 
     def TurnOnDisplay(self):
@@ -111,119 +133,16 @@ class EPD:
         self.ReadBusyH()
         epdconfig.delay_ms(30)
 
-        self.send_command(0xAA)    # CMDH
-        self.send_data(0x49)
-        self.send_data(0x55)
-        self.send_data(0x20)
-        self.send_data(0x08)
-        self.send_data(0x09)
-        self.send_data(0x18)
-
-        self.send_command(0x01)
-        self.send_data(0x3F)
-        self.send_data(0x00)
-        self.send_data(0x32)
-        self.send_data(0x2A)
-        self.send_data(0x0E)
-        self.send_data(0x2A)
-
-        self.send_command(0x00)
-        self.send_data(0x5F)
-        self.send_data(0x69)
-
-        self.send_command(0x03)
-        self.send_data(0x00)
-        self.send_data(0x54)
-        self.send_data(0x00)
-        self.send_data(0x44) 
-
-        self.send_command(0x05)
-        self.send_data(0x40)
-        self.send_data(0x1F)
-        self.send_data(0x1F)
-        self.send_data(0x2C)
-
-        self.send_command(0x06)
-        self.send_data(0x6F)
-        self.send_data(0x1F)
-        self.send_data(0x1F)
-        self.send_data(0x22)
-
-        self.send_command(0x08)
-        self.send_data(0x6F)
-        self.send_data(0x1F)
-        self.send_data(0x1F)
-        self.send_data(0x22)
-
-        self.send_command(0x13)    # IPC
-        self.send_data(0x00)
-        self.send_data(0x04)
-
-        self.send_command(0x30)
-        self.send_data(0x3C)
-
-        self.send_command(0x41)     # TSE
-        self.send_data(0x00)
-
-        self.send_command(0x50)
-        self.send_data(0x3F)
-
-        self.send_command(0x60)
-        self.send_data(0x02)
-        self.send_data(0x00)
-
-        self.send_command(0x61)
-        self.send_data(0x03)
-        self.send_data(0x20)
-        self.send_data(0x01) 
-        self.send_data(0xE0)
-
-        self.send_command(0x82)
-        self.send_data(0x1E) 
-
-        self.send_command(0x84)
-        self.send_data(0x00)
-
-        self.send_command(0x86)    # AGID
-        self.send_data(0x00)
-
-        self.send_command(0xE3)
-        self.send_data(0x2F)
-
-        self.send_command(0xE0)   # CCSET
-        self.send_data(0x00) 
-
-        self.send_command(0xE6)   # TSSET
-        self.send_data(0x00)
+        epdsequence.run(self, INIT)
         return 0
 
-    def getbuffer(self, image):
-        # Create a pallette with the 7 colors supported by the panel
-        pal_image = Image.new("P", (1,1))
-        pal_image.putpalette( (0,0,0,  255,255,255,  0,255,0,   0,0,255,  255,0,0,  255,255,0, 255,128,0) + (0,0,0)*249)
-
-        # Check if we need to rotate the image
-        imwidth, imheight = image.size
-        if(imwidth == self.width and imheight == self.height):
-            image_temp = image
-        elif(imwidth == self.height and imheight == self.width):
-            image_temp = image.rotate(90, expand=True)
-        else:
-            logger.warning("Invalid image dimensions: %d x %d, expected %d x %d" % (imwidth, imheight, self.width, self.height))
-
-        # Convert the soruce image to the 7 colors, dithering if needed
-        image_7color = image_temp.convert("RGB").quantize(palette=pal_image)
-        buf_7color = bytearray(image_7color.tobytes('raw'))
-
-        # PIL does not support 4 bit color, so pack the 4 bits of color
+    def getbuffer(self, image, dither=True):
+        # Turn the image to the panel's orientation if it was drawn the other way round
+        image_temp = epdbuffer.native_image(image, self.width, self.height)
+
+        # Convert the source image to the 7 colors, dithering if asked, and pack 2 pixels
         # into a single byte to transfer to the panel
-        buf = [0x00] * int(self.width * self.height / 2)
-        idx = 0
-        for i in range(0, len(buf_7color), 2):
-            buf[idx] = (buf_7color[i] << 4) + buf_7color[i+1]
-            idx += 1
-            
-        return buf
+        return epdbuffer.pack_palette(image_temp, PALETTE, 4, dither)
 
     def display(self, image):
         self.send_command(0x10)
@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 640
@@ -37,6 +39,23 @@ EPD_HEIGHT      = 384
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x04,),  # POWER_ON
+    epdsequence.Busy("ReadBusy"),
+    (0x30, 0x3c),  # PLL_CONTROL
+    (0x41, 0x00),  # TEMPERATURE_CALIBRATION
+    (0x50, 0x77),  # VCOM_AND_DATA_INTERVAL_SETTING
+    (0x60, 0x22),  # TCON_SETTING
+)
+
+# init(), part 2
+INIT_2 = (
+    (0x82,  # VCM_DC_SETTING
+        0x1E,  # decide by LUT file
+    ),
+    (0xe5, 0x03),  # FLASH MODE
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -68,15 +87,11 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 1)
         
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 0):      # 0: idle, 1: busy
-            epdconfig.delay_ms(100)    
+        epdconfig.wait_busy(self.busy_pin, 0)      # 0: idle, 1: busy
         logger.debug("e-Paper busy release")
         
     def init(self):
@@ -94,20 +109,7 @@ class EPD:
         self.send_command(0x06) # BOOSTER_SOFT_START
         self.send_data2([0xc7, 0xcc, 0x28])
         
-        self.send_command(0x04) # POWER_ON
-        self.ReadBusy()
-        
-        self.send_command(0x30) # PLL_CONTROL
-        self.send_data(0x3c)
-        
-        self.send_command(0x41) # TEMPERATURE_CALIBRATION
-        self.send_data(0x00)
-        
-        self.send_command(0x50) # VCOM_AND_DATA_INTERVAL_SETTING
-        self.send_data(0x77)
-        
-        self.send_command(0x60) # TCON_SETTING
-        self.send_data(0x22)
+        epdsequence.run(self, INIT)
         
         self.send_command(0x61) # TCON_RESOLUTION
         self.send_data(EPD_WIDTH >> 8)     #source 640
@@ -115,48 +117,19 @@ class EPD:
         self.send_data(EPD_HEIGHT >> 8)     #gate 384
         self.send_data(EPD_HEIGHT & 0xff)
         
-        self.send_command(0x82) # VCM_DC_SETTING
-        self.send_data(0x1E) # decide by LUT file
-        
-        self.send_command(0xe5) # FLASH MODE
-        self.send_data(0x03)
+        epdsequence.run(self, INIT_2)
         
         # EPD hardware init end
         return 0
 
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        halfwidth = int(self.width / 2)
-        buf = [0x33] * halfwidth * self.height
-        
-        if(imwidth == self.width and imheight == self.height):
-            img = img.convert('1')
-        elif(imwidth == self.height and imheight == self.width):
-            img = img.rotate(90, expand=True).convert('1')
-            imwidth, imheight = img.size
-        else:
-            logger.warning("Wrong image dimensions: must be " + str(self.width) + "x" + str(self.height))
+        # turn before converting so landscape frames dither in panel orientation
+        img = epdbuffer.native_image(image, self.width, self.height)
+        if img is None:
             # return a blank buffer
-            return buf
-        
-        pixels = img.load()
-
-        for y in range(imheight):
-            offset = y * halfwidth
-            for x in range(1, imwidth, 2):
-                i = offset + x // 2
-                if(pixels[x-1, y] > 191):
-                    if(pixels[x, y] > 191):
-                        buf[i] = 0x33
-                    else:
-                        buf[i] = 0x30
-                else:
-                    if(pixels[x, y] > 191):
-                        buf[i] = 0x03
-                    else:
-                        buf[i] = 0x00
-        return buf
+            return [0x33] * int(self.width / 2) * self.height
+        # the controller takes 4 bits a pixel, 0011 for white and 0000 for black
+        return epdbuffer.widen_1bit(epdbuffer.pack_1bit(img, self.width, self.height), 4, 0x3)
         
     def display(self, image):
         self.send_command(0x10)
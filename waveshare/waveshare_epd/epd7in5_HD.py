@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 880
@@ -37,6 +39,26 @@ EPD_HEIGHT      = 528
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x12,),  #SWRESET
+    epdsequence.Busy("ReadBusy"),
+    (0x46, 0xf7),  # Auto Write Red RAM
+    epdsequence.Busy("ReadBusy"),
+    (0x47, 0xf7),  # Auto Write  B/W RAM
+    epdsequence.Busy("ReadBusy"),
+)
+
+# init(), part 2
+INIT_2 = (
+    (0x3C,  # VBD
+        0x05,  # LUT1, for white
+    ),
+    (0x18, 0X80),
+    (0x22, 0XB1),  #Load Temperature and waveform setting.
+    (0x20,),
+    epdsequence.Busy("ReadBusy"),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -68,16 +90,11 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 1)
         
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
         
     def ReadBusy(self):
         logger.debug("e-Paper busy")
-        busy = epdconfig.digital_read(self.busy_pin)
-        while(busy == 1):
-            busy = epdconfig.digital_read(self.busy_pin)
+        epdconfig.wait_busy(self.busy_pin, 1)
         epdconfig.delay_ms(200)
         
     def init(self):
@@ -87,15 +104,7 @@ class EPD:
         self.reset()
         
         self.ReadBusy()
-        self.send_command(0x12)  #SWRESET
-        self.ReadBusy()
-
-        self.send_command(0x46)  # Auto Write Red RAM
-        self.send_data(0xf7)
-        self.ReadBusy()
-        self.send_command(0x47)  # Auto Write  B/W RAM
-        self.send_data(0xf7)
-        self.ReadBusy()
+        epdsequence.run(self, INIT)
 
         self.send_command(0x0C)  # Soft start setting
         self.send_data2([0xAE, 0xC7, 0xC3, 0xC0, 0x40])
@@ -111,17 +120,7 @@ class EPD:
         self.send_command(0x45) 
         self.send_data2([0xAF, 0x02, 0x00, 0x00])
 
-        self.send_command(0x3C) # VBD
-        self.send_data(0x05) # LUT1, for white
-
-        self.send_command(0x18)
-        self.send_data(0X80)
-
-
-        self.send_command(0x22)
-        self.send_data(0XB1) #Load Temperature and waveform setting.
-        self.send_command(0x20)
-        self.ReadBusy()
+        epdsequence.run(self, INIT_2)
 
         self.send_command(0x4E) # set RAM x address count to 0
         self.send_data2([0x00, 0x00])
@@ -131,19 +130,12 @@ class EPD:
         return 0
 
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        if(imwidth == self.width and imheight == self.height):
-            img = img.convert('1')
-        elif(imwidth == self.height and imheight == self.width):
-            img = img.rotate(90, expand=True).convert('1')
-        else:
-            logger.warning("Wrong image dimensions: must be " + str(self.width) + "x" + str(self.height))
+        # turn before converting so landscape frames dither in panel orientation
+        img = epdbuffer.native_image(image, self.width, self.height)
+        if img is None:
             # return a blank buffer
             return [0xff] * int(self.width * self.height / 8)
-
-        buf = bytearray(img.tobytes('raw'))
-        return buf
+        return epdbuffer.pack_1bit(img, self.width, self.height)
         
     def display(self, image):
         self.send_command(0x4F) 
@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 800
@@ -42,6 +44,87 @@ GRAY4  = 0x00 #Blackest
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x06,  # btst
+        0x17,
+        0x17,
+        0x28,  # If an exception is displayed, try using 0x38
+        0x17,
+    ),
+    (0x01,  #POWER SETTING
+        0x07,
+        0x07,  #VGH=20V,VGL=-20V
+        0x28,  #VDH=15V
+        0x17,  #VDL=-15V
+    ),
+    (0x04,),  #POWER ON
+    epdsequence.Delay(100),
+    epdsequence.Busy("ReadBusy"),
+    (0X00,  #PANNEL SETTING
+        0x1F,  #KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
+    ),
+    (0x61,  #tres
+        0x03,  #source 800
+        0x20,
+        0x01,  #gate 480
+        0xE0,
+    ),
+    (0X15, 0x00),
+    # If the screen appears gray, use the annotated initialization command
+    (0X50, 0x10, 0x07),
+    # self.send_command(0X50)
+    # self.send_data(0x10)
+    # self.send_data(0x17)
+    # self.send_command(0X52)		
+    # self.send_data(0x03)
+    (0X60, 0x22),  #TCON SETTING
+)
+
+INIT_FAST = (
+    (0X00,  #PANNEL SETTING
+        0x1F,  #KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
+    ),
+    # If the screen appears gray, use the annotated initialization command
+    (0X50, 0x10, 0x07),
+    # self.send_command(0X50)
+    # self.send_data(0x10)
+    # self.send_data(0x17)
+    # self.send_command(0X52)		
+    # self.send_data(0x03)
+    (0x04,),  #POWER ON
+    epdsequence.Delay(100),
+    epdsequence.Busy("ReadBusy"),  #waiting for the electronic paper IC to release the idle signal
+    #Enhanced display drive(Add 0x06 command)
+    (0x06, 0x27, 0x27, 0x18, 0x17),  #Booster Soft Start
+    (0xE0, 0x02),
+    (0xE5, 0x5A),
+)
+
+INIT_PART = (
+    (0X00,  #PANNEL SETTING
+        0x1F,  #KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
+    ),
+    (0x04,),  #POWER ON
+    epdsequence.Delay(100),
+    epdsequence.Busy("ReadBusy"),  #waiting for the electronic paper IC to release the idle signal
+    (0xE0, 0x02),
+    (0xE5, 0x6E),
+)
+
+INIT_4GRAY = (
+    (0X00,  #PANNEL SETTING
+        0x1F,  #KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
+    ),
+    (0X50, 0x10, 0x07),
+    (0x04,),  #POWER ON
+    epdsequence.Delay(100),
+    epdsequence.Busy("ReadBusy"),  #waiting for the electronic paper IC to release the idle signal
+    #Enhanced display drive(Add 0x06 command)
+    (0x06, 0x27, 0x27, 0x18, 0x17),  #Booster Soft Start
+    (0xE0, 0x02),
+    (0xE5, 0x5F),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -77,10 +160,7 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 1)
 
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.SPI.writebytes2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
 
     def ReadBusy(self):
         logger.debug("e-Paper busy")
@@ -98,46 +178,7 @@ class EPD:
         # EPD hardware init start
         self.reset()
         
-        self.send_command(0x06)     # btst
-        self.send_data(0x17)
-        self.send_data(0x17)
-        self.send_data(0x28)        # If an exception is displayed, try using 0x38
-        self.send_data(0x17)
-        
-        self.send_command(0x01)			#POWER SETTING
-        self.send_data(0x07)
-        self.send_data(0x07)    #VGH=20V,VGL=-20V
-        self.send_data(0x28)		#VDH=15V
-        self.send_data(0x17)		#VDL=-15V
-
-        self.send_command(0x04) #POWER ON
-        epdconfig.delay_ms(100)
-        self.ReadBusy()
-
-        self.send_command(0X00)			#PANNEL SETTING
-        self.send_data(0x1F)   #KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
-
-        self.send_command(0x61)        	#tres
-        self.send_data(0x03)		#source 800
-        self.send_data(0x20)
-        self.send_data(0x01)		#gate 480
-        self.send_data(0xE0)
-
-        self.send_command(0X15)
-        self.send_data(0x00)
-
-        # If the screen appears gray, use the annotated initialization command
-        self.send_command(0X50)
-        self.send_data(0x10)
-        self.send_data(0x07)
-        # self.send_command(0X50)
-        # self.send_data(0x10)
-        # self.send_data(0x17)
-        # self.send_command(0X52)		
-        # self.send_data(0x03)
-
-        self.send_command(0X60)			#TCON SETTING
-        self.send_data(0x22)
+        epdsequence.run(self, INIT)
 
         # EPD hardware init end
         return 0
@@ -148,34 +189,7 @@ class EPD:
         # EPD hardware init start
         self.reset()
         
-        self.send_command(0X00)			#PANNEL SETTING
-        self.send_data(0x1F)   #KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
-
-        # If the screen appears gray, use the annotated initialization command
-        self.send_command(0X50)
-        self.send_data(0x10)
-        self.send_data(0x07)
-        # self.send_command(0X50)
-        # self.send_data(0x10)
-        # self.send_data(0x17)
-        # self.send_command(0X52)		
-        # self.send_data(0x03)
-
-        self.send_command(0x04) #POWER ON
-        epdconfig.delay_ms(100) 
-        self.ReadBusy()        #waiting for the electronic paper IC to release the idle signal
-
-        #Enhanced display drive(Add 0x06 command)
-        self.send_command(0x06)			#Booster Soft Start 
-        self.send_data (0x27)
-        self.send_data (0x27)   
-        self.send_data (0x18)		
-        self.send_data (0x17)		
-
-        self.send_command(0xE0)
-        self.send_data(0x02)
-        self.send_command(0xE5)
-        self.send_data(0x5A)
+        epdsequence.run(self, INIT_FAST)
 
         # EPD hardware init end
         return 0
@@ -186,17 +200,7 @@ class EPD:
         # EPD hardware init start
         self.reset()
 
-        self.send_command(0X00)			#PANNEL SETTING
-        self.send_data(0x1F)   #KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
-
-        self.send_command(0x04) #POWER ON
-        epdconfig.delay_ms(100) 
-        self.ReadBusy()        #waiting for the electronic paper IC to release the idle signal
-
-        self.send_command(0xE0)
-        self.send_data(0x02)
-        self.send_command(0xE5)
-        self.send_data(0x6E)
+        epdsequence.run(self, INIT_PART)
 
         # EPD hardware init end
         return 0
@@ -208,86 +212,26 @@ class EPD:
         # EPD hardware init start
         self.reset()
 
-        self.send_command(0X00)			#PANNEL SETTING
-        self.send_data(0x1F)   #KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
-        
-        self.send_command(0X50)
-        self.send_data(0x10)
-        self.send_data(0x07)
-
-        self.send_command(0x04) #POWER ON
-        epdconfig.delay_ms(100) 
-        self.ReadBusy()        #waiting for the electronic paper IC to release the idle signal
-
-        #Enhanced display drive(Add 0x06 command)
-        self.send_command(0x06)			#Booster Soft Start 
-        self.send_data (0x27)
-        self.send_data (0x27)   
-        self.send_data (0x18)		
-        self.send_data (0x17)	
-
-        self.send_command(0xE0)
-        self.send_data(0x02)
-        self.send_command(0xE5)
-        self.send_data(0x5F)
+        epdsequence.run(self, INIT_4GRAY)
 
         # EPD hardware init end
         return 0
 
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        if(imwidth == self.width and imheight == self.height):
-            img = img.convert('1')
-        elif(imwidth == self.height and imheight == self.width):
-            # image has correct dimensions, but needs to be rotated
-            img = img.rotate(90, expand=True).convert('1')
-        else:
-            logger.warning("Wrong image dimensions: must be " + str(self.width) + "x" + str(self.height))
+        # turn before converting so landscape frames dither in panel orientation
+        img = epdbuffer.native_image(image, self.width, self.height)
+        if img is None:
             # return a blank buffer
             return [0x00] * (int(self.width/8) * self.height)
-
-        buf = bytearray(img.tobytes('raw'))
         # The bytes need to be inverted, because in the PIL world 0=black and 1=white, but
         # in the e-paper world 0=white and 1=black.
-        for i in range(len(buf)):
-            buf[i] ^= 0xFF
-        return buf
+        return epdbuffer.pack_1bit(img, self.width, self.height, invert=True)
     
     def getbuffer_4Gray(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 4) * self.height)
-        image_monocolor = image.convert('L')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        i=0
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((x + (y * self.width))/4)] = ((pixels[x-3, y]&0xc0) | (pixels[x-2, y]&0xc0)>>2 | (pixels[x-1, y]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6)
-                        
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = self.height - x - 1
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i= i+1
-                    if(i%4 == 0):
-                        buf[int((newx + (newy * self.width))/4)] = ((pixels[x, y-3]&0xc0) | (pixels[x, y-2]&0xc0)>>2 | (pixels[x, y-1]&0xc0)>>4 | (pixels[x, y]&0xc0)>>6) 
+        buf = epdbuffer.pack_4gray(image, self.width, self.height)
+        if buf is None:
+            # return a blank buffer
+            return [0xFF] * (int(self.width / 4) * self.height)
         return buf
 
     def display(self, image):
@@ -296,10 +240,7 @@ class EPD:
         else:
             Width = self.width // 8 +1
         Height = self.height
-        image1 = [0xFF] * int(self.width * self.height / 8)
-        for j in range(Height):
-                for i in range(Width):
-                    image1[i + j * Width] = ~image[i + j * Width]
+        image1 = epdbuffer.invert(image[0:Width * Height])
         self.send_command(0x10)
         self.send_data2(image1)
 
@@ -353,10 +294,9 @@ class EPD:
         self.send_data ((Yend-1)%256)  #y-end
         self.send_data (0x01)
 
-        image1 = [0xFF] * int(self.width * self.height / 8)
-        for j in range(Height):
-                for i in range(Width):
-                    image1[i + j * Width] = ~Image[i + j * Width]
+        # the window's bytes inverted, then white padding out to a full frame as the controller expects
+        image1 = bytearray(b"\xff") * int(self.width * self.height / 8)
+        image1[0:Width * Height] = epdbuffer.invert(Image[0:Width * Height])
 
         self.send_command(0x13)   #Write Black and White image to RAM
         self.send_data2(image1)
@@ -367,6 +307,7 @@ class EPD:
 
     def display_4Gray(self, image):
         self.send_command(0x10)
+        buf = bytearray()
         for i in range(0, 48000):     
             temp3=0
             for j in range(0, 2):
@@ -396,9 +337,11 @@ class EPD:
                     if(j!=1 or k!=1):				
                         temp3 <<= 1
                     temp1 <<= 2
-            self.send_data(temp3)
+            buf.append(temp3)
+        self.send_data2(buf)
             
         self.send_command(0x13)	       
+        buf = bytearray()
         for i in range(0, 48000):       
             temp3=0
             for j in range(0, 2):
@@ -428,7 +371,8 @@ class EPD:
                     if(j!=1 or k!=1):					
                         temp3 <<= 1
                     temp1 <<= 2
-            self.send_data(temp3)
+            buf.append(temp3)
+        self.send_data2(buf)
         
         self.send_command(0x12)
         epdconfig.delay_ms(100)
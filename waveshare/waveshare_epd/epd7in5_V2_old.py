@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 800
@@ -37,6 +39,49 @@ EPD_HEIGHT      = 480
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x04,),  # POWER ON
+    epdsequence.Delay(100),
+    epdsequence.Busy("ReadBusy"),
+    (0X00,  # PANNEL SETTING
+        0x3F,  # KW-3f KWR-2F BWROTP-0f BWOTP-1f
+    ),
+    (0x61,  # tres
+        0x03,  # source 800
+        0x20,
+        0x01,  # gate 480
+        0xE0,
+    ),
+    (0X15, 0x00),
+    (0X50, 0x10, 0x07),  # VCOM AND DATA INTERVAL SETTING
+    (0X60, 0x22),  # TCON SETTING
+    (0x65,  # Resolution setting
+        0x00,
+        0x00,  # 800*480
+        0x00,
+        0x00,
+    ),
+)
+
+INIT2 = (
+    (0x00, 0x3F),  # Panel setting
+    (0x06, 0x17, 0x17, 0x28, 0x18),  # Booster Setting
+    (0x50, 0x22, 0x07),  # VCOM and DATA interval setting
+    (0x60,  # TCON setting
+        0x22,  # S-G G-S
+    ),
+    (0x61,  # Resolution setting
+        0x03,  #800*480
+        0x20,
+        0x01,
+        0xE0,
+    ),
+    (0x65, 0x00, 0x00, 0x00, 0x00),  # Resolution setting
+    (0x04,),  #POWER ON
+    epdsequence.Delay(100),
+    epdsequence.Busy("ReadBusy"),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -222,10 +267,7 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 1)
 
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
 
     def ReadBusy(self):
         logger.debug("e-Paper busy")
@@ -238,25 +280,13 @@ class EPD:
         logger.debug("e-Paper busy release")
         
     def SetLut(self, lut_vcom, lut_ww, lut_bw, lut_wb, lut_bb):
-        self.send_command(0x20)
-        for count in range(0, 42):
-            self.send_data(lut_vcom[count])
-
-        self.send_command(0x21)
-        for count in range(0, 42):
-            self.send_data(lut_ww[count])
-
-        self.send_command(0x22)
-        for count in range(0, 42):
-            self.send_data(lut_bw[count])
-
-        self.send_command(0x23)
-        for count in range(0, 42):
-            self.send_data(lut_wb[count])
-
-        self.send_command(0x24)
-        for count in range(0, 42):
-            self.send_data(lut_bb[count])
+        epdsequence.run(self, (
+            (0x20, lut_vcom[0:42]),
+            (0x21, lut_ww[0:42]),
+            (0x22, lut_bw[0:42]),
+            (0x23, lut_wb[0:42]),
+            (0x24, lut_bb[0:42]),
+        ))
 
     def init(self):
         if (epdconfig.module_init() != 0):
@@ -295,34 +325,7 @@ class EPD:
         self.send_command(0x30)     # OSC Setting
         self.send_data(self.Voltage_Frame_7IN5_V2[0])   # 3C=50Hz, 3A=100HZ
 
-        self.send_command(0x04)     # POWER ON
-        epdconfig.delay_ms(100)
-        self.ReadBusy()
-
-        self.send_command(0X00)     # PANNEL SETTING
-        self.send_data(0x3F)        # KW-3f KWR-2F BWROTP-0f BWOTP-1f
-
-        self.send_command(0x61)     # tres
-        self.send_data(0x03)        # source 800
-        self.send_data(0x20)
-        self.send_data(0x01)        # gate 480
-        self.send_data(0xE0)
-
-        self.send_command(0X15)
-        self.send_data(0x00)
-
-        self.send_command(0X50)     # VCOM AND DATA INTERVAL SETTING
-        self.send_data(0x10)
-        self.send_data(0x07)
-
-        self.send_command(0X60)     # TCON SETTING
-        self.send_data(0x22)
-
-        self.send_command(0x65)     # Resolution setting
-        self.send_data(0x00)
-        self.send_data(0x00)        # 800*480
-        self.send_data(0x00)
-        self.send_data(0x00)
+        epdsequence.run(self, INIT)
 
         self.SetLut(self.LUT_VCOM_7IN5_V2, self.LUT_WW_7IN5_V2, self.LUT_BW_7IN5_V2, self.LUT_WB_7IN5_V2, self.LUT_BB_7IN5_V2)
         # EPD hardware init end
@@ -378,37 +381,7 @@ class EPD:
         # EPD hardware init start
         self.reset()
 
-        self.send_command(0x00)  # Panel setting   
-        self.send_data(0x3F)
-
-        self.send_command(0x06)  # Booster Setting
-        self.send_data(0x17)  
-        self.send_data(0x17)
-        self.send_data(0x28)
-        self.send_data(0x18)
-
-        self.send_command(0x50)  # VCOM and DATA interval setting    
-        self.send_data(0x22)
-        self.send_data(0x07)
-
-        self.send_command(0x60)  # TCON setting
-        self.send_data(0x22)  # S-G G-S
-
-        self.send_command(0x61)  # Resolution setting
-        self.send_data(0x03)#800*480
-        self.send_data(0x20)
-        self.send_data(0x01)
-        self.send_data(0xE0) 
-
-        self.send_command(0x65)  # Resolution setting
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x00)
-
-        self.send_command(0x04) #POWER ON
-        epdconfig.delay_ms(100)
-        self.ReadBusy() 
+        epdsequence.run(self, INIT2)
 
         return 0
 
@@ -425,24 +398,14 @@ class EPD:
     
 
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        if(imwidth == self.width and imheight == self.height):
-            img = img.convert('1')
-        elif(imwidth == self.height and imheight == self.width):
-            # image has correct dimensions, but needs to be rotated
-            img = img.rotate(90, expand=True).convert('1')
-        else:
-            logger.warning("Wrong image dimensions: must be " + str(self.width) + "x" + str(self.height))
+        # turn before converting so landscape frames dither in panel orientation
+        img = epdbuffer.native_image(image, self.width, self.height)
+        if img is None:
             # return a blank buffer
             return [0x00] * (int(self.width/8) * self.height)
-
-        buf = bytearray(img.tobytes('raw'))
         # The bytes need to be inverted, because in the PIL world 0=black and 1=white, but
         # in the e-paper world 0=white and 1=black.
-        for i in range(len(buf)):
-            buf[i] ^= 0xFF
-        return buf
+        return epdbuffer.pack_1bit(img, self.width, self.height, invert=True)
 
     def display(self, image):
         if(self.width % 8 == 0):
@@ -450,10 +413,7 @@ class EPD:
         else:
             Width = self.width // 8 +1
         Height = self.height
-        image1 = [0xFF] * int(self.width * self.height / 8)
-        for j in range(Height):
-                for i in range(Width):
-                    image1[i + j * Width] = ~image[i + j * Width]
+        image1 = epdbuffer.invert(image[0:Width * Height])
         self.send_command(0x10)
         self.send_data2(image1)
 
@@ -506,10 +466,9 @@ class EPD:
         self.send_data ((Yend-1)%256)  #y-end
         self.send_data (0x01)
 
-        image1 = [0xFF] * int(self.width * self.height / 8)
-        for j in range(Height):
-                for i in range(Width):
-                    image1[i + j * Width] = ~Image[i + j * Width]
+        # the window's bytes inverted, then white padding out to a full frame as the controller expects
+        image1 = bytearray(b"\xff") * int(self.width * self.height / 8)
+        image1[0:Width * Height] = epdbuffer.invert(Image[0:Width * Height])
 
         self.send_command(0x13)   #Write Black and White image to RAM
         self.send_data2(image1)
@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 800
@@ -37,6 +39,40 @@ EPD_HEIGHT      = 480
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x01, 0x07, 0x07, 0x3f, 0x3f),
+    (0x06, 0x17, 0x17, 0x28, 0x17),
+    (0x04,),
+    epdsequence.Delay(100),
+    epdsequence.Busy("ReadBusy"),
+    (0X00, 0x0F),
+    (0x61, 0x03, 0x20, 0x01, 0xE0),
+    (0X15, 0x00),
+    (0X50, 0x11, 0x07),
+    (0X60, 0x22),
+)
+
+INIT_FAST = (
+    (0X00, 0x0F),
+    (0x04,),
+    epdsequence.Delay(100),
+    epdsequence.Busy("ReadBusy"),
+    (0x06, 0x27, 0x27, 0x18, 0x17),
+    (0xE0, 0x02),
+    (0xE5, 0x5A),
+    (0X50, 0x11, 0x07),
+)
+
+INIT_PART = (
+    (0X00, 0x1F),
+    (0x04,),
+    epdsequence.Delay(100),
+    epdsequence.Busy("ReadBusy"),
+    (0xE0, 0x02),
+    (0xE5, 0x6E),
+    (0X50, 0xA9, 0x07),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -69,10 +105,7 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 1)
     
     def send_data2(self, data): #faster
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
 
     def ReadBusy(self):
         logger.debug("e-Paper busy")
@@ -91,40 +124,7 @@ class EPD:
         # EPD hardware init start
         self.reset()
 
-        self.send_command(0x01)
-        self.send_data(0x07)
-        self.send_data(0x07)
-        self.send_data(0x3f)
-        self.send_data(0x3f)
-
-        self.send_command(0x06)
-        self.send_data(0x17)
-        self.send_data(0x17) 
-        self.send_data(0x28)	
-        self.send_data(0x17)
-
-        self.send_command(0x04)
-        epdconfig.delay_ms(100)
-        self.ReadBusy()
-
-        self.send_command(0X00)
-        self.send_data(0x0F)
-
-        self.send_command(0x61)		
-        self.send_data(0x03)
-        self.send_data(0x20)
-        self.send_data(0x01)
-        self.send_data(0xE0)
-
-        self.send_command(0X15)
-        self.send_data(0x00)
-
-        self.send_command(0X50)
-        self.send_data(0x11)
-        self.send_data(0x07)
-
-        self.send_command(0X60)
-        self.send_data(0x22)
+        epdsequence.run(self, INIT)
             
         return 0
     
@@ -135,27 +135,7 @@ class EPD:
         # EPD hardware init start
         self.reset()
 
-        self.send_command(0X00)
-        self.send_data(0x0F)
-
-        self.send_command(0x04)
-        epdconfig.delay_ms(100)
-        self.ReadBusy()
-
-        self.send_command(0x06)
-        self.send_data(0x27)
-        self.send_data(0x27) 
-        self.send_data(0x18)		
-        self.send_data(0x17)		
-
-        self.send_command(0xE0)
-        self.send_data(0x02)
-        self.send_command(0xE5)
-        self.send_data(0x5A)
-
-        self.send_command(0X50)
-        self.send_data(0x11)
-        self.send_data(0x07)
+        epdsequence.run(self, INIT_FAST)
         
         return 0
     
@@ -165,51 +145,25 @@ class EPD:
         # EPD hardware init start
         self.reset()
 
-        self.send_command(0X00)
-        self.send_data(0x1F)
-
-        self.send_command(0x04)
-        epdconfig.delay_ms(100)
-        self.ReadBusy()
-
-        self.send_command(0xE0)
-        self.send_data(0x02)
-        self.send_command(0xE5)
-        self.send_data(0x6E)
-
-        self.send_command(0X50)
-        self.send_data(0xA9)
-        self.send_data(0x07)
+        epdsequence.run(self, INIT_PART)
 
         # EPD hardware init end
         return 0
 
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        if(imwidth == self.width and imheight == self.height):
-            img = img.convert('1')
-        elif(imwidth == self.height and imheight == self.width):
-            # image has correct dimensions, but needs to be rotated
-            img = img.rotate(90, expand=True).convert('1')
-        else:
-            logger.warning("Wrong image dimensions: must be " + str(self.width) + "x" + str(self.height))
+        # turn before converting so landscape frames dither in panel orientation
+        img = epdbuffer.native_image(image, self.width, self.height)
+        if img is None:
             # return a blank buffer
             return [0x00] * (int(self.width/8) * self.height)
-
-        buf = bytearray(img.tobytes('raw'))
         # The bytes need to be inverted, because in the PIL world 0=black and 1=white, but
         # in the e-paper world 0=white and 1=black.
-        for i in range(len(buf)):
-            buf[i] ^= 0xFF
-        return buf
+        return epdbuffer.pack_1bit(img, self.width, self.height, invert=True)
 
     def display(self, imageblack, imagered):
         self.send_command(0x10)
         # The black bytes need to be inverted back from what getbuffer did
-        for i in range(len(imageblack)):
-            imageblack[i] ^= 0xFF
-        self.send_data2(imageblack)
+        self.send_data2(epdbuffer.invert(imageblack))
 
         self.send_command(0x13)
         self.send_data2(imagered)
@@ -225,14 +179,10 @@ class EPD:
             Width = self.width // 8 +1
         Height = self.height
         self.send_command(0x10)   #Write Black and White image to RAM
-        for j in range(Height):
-            for i in range(Width):
-                self.send_data(color)
+        self.send_data2([color] * Width * Height)
                 
         self.send_command(0x13)  #Write Black and White image to RAM
-        for j in range(Height):
-            for i in range(Width):
-                self.send_data(~color)
+        self.send_data2([~color & 0xFF] * Width * Height)
 
         self.send_command(0x12)
         epdconfig.delay_ms(100)
@@ -274,9 +224,7 @@ class EPD:
         if self.partFlag == 1:
             self.partFlag = 0
             self.send_command(0x10)
-            for j in range(Height):
-                    for i in range(Width):
-                        self.send_data(0xff)
+            self.send_data2([0xff] * Width * Height)
 
         self.send_command(0x13)   #Write Black and White image to RAM
         self.send_data2(Image)
@@ -30,6 +30,8 @@
 
 import logging
 from . import epdconfig
+from . import epdbuffer
+from . import epdsequence
 
 # Display resolution
 EPD_WIDTH       = 800
@@ -37,6 +39,31 @@ EPD_HEIGHT      = 480
 
 logger = logging.getLogger(__name__)
 
+INIT = (
+    (0x01,  # POWER SETTING
+        0x07,
+        0x07,  # VGH=20V,VGL=-20V
+        0x3f,  # VDH=15V
+        0x3f,  # VDL=-15V
+    ),
+    (0x04,),  # POWER ON
+    epdsequence.Delay(100),
+    epdsequence.Busy("ReadBusy"),
+    (0X00,  # PANNEL SETTING
+        0x0F,  # KW-3f KWR-2F BWROTP-0f BWOTP-1f
+    ),
+    (0x61,  # tres
+        0x03,  # source 800
+        0x20,
+        0x01,  # gate 480
+        0xE0,
+    ),
+    (0X15, 0x00),
+    (0X50, 0x11, 0x07),  # VCOM AND DATA INTERVAL SETTING
+    (0X60, 0x22),  # TCON SETTING
+    (0x65, 0x00, 0x00, 0x00, 0x00),
+)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -68,10 +95,7 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 1)
     
     def send_data2(self, data): #faster
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        epdconfig.send_data_bulk(self.dc_pin, self.cs_pin, data)
 
     def ReadBusy(self):
         logger.debug("e-Paper busy")
@@ -95,69 +119,24 @@ class EPD:
         # self.send_data(0x38)      # If an exception is displayed, try using 0x38
         # self.send_data(0x17)
 
-        self.send_command(0x01)     # POWER SETTING
-        self.send_data(0x07)
-        self.send_data(0x07)        # VGH=20V,VGL=-20V
-        self.send_data(0x3f)        # VDH=15V
-        self.send_data(0x3f)        # VDL=-15V
-
-        self.send_command(0x04)     # POWER ON
-        epdconfig.delay_ms(100)
-        self.ReadBusy()
-
-        self.send_command(0X00)     # PANNEL SETTING
-        self.send_data(0x0F)        # KW-3f KWR-2F BWROTP-0f BWOTP-1f
-
-        self.send_command(0x61)     # tres
-        self.send_data(0x03)        # source 800
-        self.send_data(0x20)
-        self.send_data(0x01)        # gate 480
-        self.send_data(0xE0)
-
-        self.send_command(0X15)
-        self.send_data(0x00)
-
-        self.send_command(0X50)     # VCOM AND DATA INTERVAL SETTING
-        self.send_data(0x11)
-        self.send_data(0x07)
-
-        self.send_command(0X60)     # TCON SETTING
-        self.send_data(0x22)
-
-        self.send_command(0x65)
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_data(0x00)
+        epdsequence.run(self, INIT)
     
         return 0
 
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        if(imwidth == self.width and imheight == self.height):
-            img = img.convert('1')
-        elif(imwidth == self.height and imheight == self.width):
-            # image has correct dimensions, but needs to be rotated
-            img = img.rotate(90, expand=True).convert('1')
-        else:
-            logger.warning("Wrong image dimensions: must be " + str(self.width) + "x" + str(self.height))
+        # turn before converting so landscape frames dither in panel orientation
+        img = epdbuffer.native_image(image, self.width, self.height)
+        if img is None:
             # return a blank buffer
             return [0x00] * (int(self.width/8) * self.height)
-
-        buf = bytearray(img.tobytes('raw'))
         # The bytes need to be inverted, because in the PIL world 0=black and 1=white, but
         # in the e-paper world 0=white and 1=black.
-        for i in range(len(buf)):
-            buf[i] ^= 0xFF
-        return buf
+        return epdbuffer.pack_1bit(img, self.width, self.height, invert=True)
 
     def display(self, imageblack, imagered):
         self.send_command(0x10)
         # The black bytes need to be inverted back from what getbuffer did
-        for i in range(len(imageblack)):
-            imageblack[i] ^= 0xFF
-        self.send_data2(imageblack)
+        self.send_data2(epdbuffer.invert(imageblack))
 
         self.send_command(0x13)
         self.send_data2(imagered)
@@ -0,0 +1,222 @@
+# Shared frame buffer helpers for the waveshare drivers.
+# Pixel packing is done with PIL's C raw packers rather than per pixel python loops.
+
+import functools
+import logging
+
+from PIL import Image, ImageChops
+
+logger = logging.getLogger(__name__)
+
+# byte -> the same byte with every bit flipped, for bytes.translate
+INVERT = bytes(range(255, -1, -1))
+# 0 -> 0 and anything else -> 255, to turn a difference into a mask
+NONZERO = [0] + [255] * 255
+# gray value -> 2 bit level for the 4 gray drivers. 0xC0 and 0x80 (the drivers' two grays) move down a level, then
+# the top two bits are the level, as the drivers' per pixel loops did it
+GRAY4_LEVELS = [2 if v == 0xC0 else 1 if v == 0x80 else v >> 6 for v in range(256)]
+
+
+@functools.lru_cache(maxsize=None)
+def palette_image(colors):
+    """Build (once) the "P" image used to quantize frames to a panel's colours
+
+    Args:
+        colors (tuple): flat (r, g, b, r, g, b, ...) tuple of the colours the panel supports, in panel index order
+
+    Returns:
+        Image: 1x1 palette image
+    """
+    pal_image = Image.new("P", (1, 1))
+    pal_image.putpalette(colors + (0, 0, 0) * (256 - len(colors) // 3))
+    return pal_image
+
+
+def native_image(image, width, height):
+    """Image in the panel's own orientation. A frame drawn the other way round is turned with a transpose, the same
+    90 degree turn the drivers have always done, so callers that draw in panel orientation skip it entirely.
+
+    Args:
+        image (Image): frame in either orientation
+        width (int): panel width in pixels, as the driver sees it
+        height (int): panel height in pixels
+
+    Returns:
+        Image: image with size (width, height), or None (after logging a warning) if it fits neither way
+    """
+    if image.size == (width, height):
+        return image
+    if image.size == (height, width):
+        return image.transpose(Image.Transpose.ROTATE_90)
+    logger.warning("Invalid image dimensions: %d x %d, expected %d x %d" % (image.size + (width, height)))
+    return None
+
+
+def invert(buf):
+    """Flip every bit of a frame in one pass, for controllers where 1 means black rather than PIL's white
+
+    Args:
+        buf (bytes): frame, or a list of byte values
+
+    Returns:
+        bytearray: inverted copy
+    """
+    return bytearray(buf).translate(INVERT)
+
+
+def pack_1bit(image, width, height, invert=False):
+    """Convert an image to 1 bit and pack it 8 pixels per byte, MSB first, rows padded to whole bytes - PIL's own
+    mode "1" layout, which is what the black/white panels take. Converting happens before the image is turned so
+    landscape frames dither the same as the per pixel loops this replaces; turn the image first to dither it in
+    panel orientation instead.
+
+    Args:
+        image (Image): frame in either orientation
+        width (int): panel width in pixels
+        height (int): panel height in pixels
+        invert (bool): pack 1 for black, PIL's "1;I" packer does it without a second pass
+
+    Returns:
+        bytearray: packed frame, or None if the image fits neither orientation
+    """
+    if image.mode != "1":
+        image = image.convert("1")
+    image = native_image(image, width, height)
+    if image is None:
+        return None
+    return bytearray(image.tobytes("raw", "1;I" if invert else "1"))
+
+
+def pack_4gray(image, width, height):
+    """Convert an image to gray and pack it as 2 bit levels (see GRAY4_LEVELS), 4 pixels per byte, MSB first -
+    the frame format of the drivers' getbuffer_4Gray. The level lookup and packing both run inside PIL.
+
+    Args:
+        image (Image): frame in either orientation, landscape frames are turned like native_image does
+        width (int): panel width in pixels
+        height (int): panel height in pixels
+
+    Returns:
+        bytearray: packed frame, or None if the image fits neither orientation
+    """
+    if image.mode != "L":
+        image = image.convert("L")
+    image = native_image(image, width, height)
+    if image is None:
+        return None
+    # "L" -> "P" keeps the values as palette indices, and PIL only has a 2 bit packer for "P"
+    return bytearray(image.convert("P").point(GRAY4_LEVELS).tobytes("raw", "P;2"))
+
+
+@functools.lru_cache(maxsize=None)
+def widen_table(bits, white):
+    """Byte of 8 packed pixels -> the same pixels at `bits` bits each, see widen_1bit"""
+    table = []
+    for byte in range(256):
+        value = 0
+        for i in range(8):
+            value = (value << bits) | (white if byte & (0x80 >> i) else 0)
+        table.append(value.to_bytes(bits, "big"))
+    return table
+
+
+def widen_1bit(buf, bits, white):
+    """Spread a packed 1 bit frame to `bits` bits per pixel, for controllers that take a grey/colour format even for
+    black and white frames. Done a byte (8 pixels) at a time through a lookup table.
+
+    Args:
+        buf (bytes): frame from pack_1bit
+        bits (int): bits per pixel on the panel - 2 or 4
+        white (int): pixel value the panel uses for white, black is 0
+
+    Returns:
+        bytearray: widened frame
+    """
+    return bytearray(b"".join(map(widen_table(bits, white).__getitem__, buf)))
+
+
+def pack_palette(image, colors, bits, dither=True):
+    """Quantize an image to the panel colours and pack `8 // bits` pixels per byte, MSB first.
+    Rows are padded to whole bytes, matching how the panels expect each line.
+
+    Args:
+        image (Image): frame already in panel orientation
+        colors (tuple): flat rgb tuple of panel colours, see palette_image
+        bits (int): bits per pixel - 1, 2 or 4
+        dither (bool): Floyd-Steinberg dither colours the panel can't show. Off maps each pixel to the nearest panel
+            colour, which is faster and keeps text and flat fills free of speckle
+
+    Returns:
+        bytes: packed frame ready for SPI
+    """
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image_pal = image.quantize(
+        palette=palette_image(colors), dither=Image.Dither.FLOYDSTEINBERG if dither else Image.Dither.NONE
+    )
+    return image_pal.tobytes("raw", "P;%d" % bits if bits != 8 else "P")
+
+
+def pack_palette_exact(image, colors, bits):
+    """Like pack_palette, but only pixels that are exactly one of the panel colours keep it, anything else is packed
+    as colour 0. For drivers that have always matched colours exactly rather than quantizing.
+
+    Args:
+        image (Image): frame already in panel orientation
+        colors (tuple): flat rgb tuple of panel colours, see palette_image
+        bits (int): bits per pixel - 1, 2 or 4
+
+    Returns:
+        bytes: packed frame ready for SPI
+    """
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image_pal = image.quantize(palette=palette_image(colors), dither=Image.Dither.NONE)
+    # nearest colour is the exact one where there is one, anywhere the colour moved at all goes to 0
+    diff = ImageChops.difference(image, image_pal.convert("RGB"))
+    if diff.getbbox():
+        r, g, b = diff.split()
+        image_pal.paste(0, mask=ImageChops.lighter(ImageChops.lighter(r, g), b).point(NONZERO))
+    return image_pal.tobytes("raw", "P;%d" % bits if bits != 8 else "P")
+
+
+def dirty_rect(old, new, stride):
+    """Smallest byte aligned rectangle that differs between two packed 1 bit frames.
+    Works on the panel buffers so it doesn't matter how the driver rotated the image.
+
+    Args:
+        old (bytes): frame on the panel
+        new (bytes): frame about to be shown, same size as old
+        stride (int): bytes per panel row
+
+    Returns:
+        tuple: (x0, y0, x1, y1) in panel pixels, x1/y1 exclusive, or None if the frames are the same
+    """
+    rows = [
+        y for y in range(len(new) // stride) if old[y * stride:(y + 1) * stride] != new[y * stride:(y + 1) * stride]
+    ]
+    if not rows:
+        return None
+    x0, x1 = stride, 0
+    for y in rows:
+        row = slice(y * stride, (y + 1) * stride)
+        diff = int.from_bytes(old[row], "big") ^ int.from_bytes(new[row], "big")
+        # first/last differing byte from the highest/lowest set bit of the xor
+        x0 = min(x0, stride - 1 - (diff.bit_length() - 1) // 8)
+        x1 = max(x1, stride - ((diff & -diff).bit_length() - 1) // 8)
+    return x0 * 8, rows[0], x1 * 8, rows[-1] + 1
+
+
+def crop_rect(buf, stride, rect):
+    """Cut a byte aligned rectangle out of a packed 1 bit frame
+
+    Args:
+        buf (bytes): full frame
+        stride (int): bytes per panel row
+        rect (tuple): (x0, y0, x1, y1) from dirty_rect
+
+    Returns:
+        bytes: the rectangle's rows, (x1 - x0) // 8 bytes each
+    """
+    x0, y0, x1, y1 = rect
+    return b"".join(buf[y * stride + x0 // 8:y * stride + x1 // 8] for y in range(y0, y1))
@@ -31,12 +31,51 @@ import os
 import logging
 import sys
 import time
-import subprocess
-
-from ctypes import *
+import threading
 
 logger = logging.getLogger(__name__)
 
+# seconds to wait for BUSY before giving up, the slowest colour panels take ~40s to refresh
+BUSY_TIMEOUT = 120
+
+def gpio_wait_for_idle(gpio, pin, busy_level, timeout):
+    # Jetson.GPIO/Hobot.GPIO: sleep in wait_for_edge until BUSY leaves busy_level. Each wait is capped at
+    # a second so an edge landing between the read and the wait only costs that second, not the timeout
+    deadline = None if timeout is None else time.monotonic() + timeout
+    edge = gpio.FALLING if busy_level else gpio.RISING
+    while gpio.input(pin) == busy_level:
+        wait = 1.0
+        if deadline is not None:
+            wait = min(wait, deadline - time.monotonic())
+            if wait <= 0:
+                return False
+        gpio.wait_for_edge(pin, edge, timeout=max(1, int(wait * 1000)))
+    return True
+
+
+def load_dev_spi():
+    # DEV_Config library the 3 wire SPI panels (epd4in2b_V2) talk through
+    from ctypes import CDLL
+    find_dirs = [
+        os.path.dirname(os.path.realpath(__file__)),
+        '/usr/local/lib',
+        '/usr/lib',
+    ]
+    DEV_SPI = None
+    for find_dir in find_dirs:
+        val = int(os.popen('getconf LONG_BIT').read())
+        logging.debug("System is %d bit"%val)
+        if val == 64:
+            so_filename = os.path.join(find_dir, 'DEV_Config_64.so')
+        else:
+            so_filename = os.path.join(find_dir, 'DEV_Config_32.so')
+        if os.path.exists(so_filename):
+            DEV_SPI = CDLL(so_filename)
+            break
+    if DEV_SPI is None:
+        RuntimeError('Cannot find DEV_Config.so')
+    return DEV_SPI
+
 
 class RaspberryPi:
     # Pin definition
@@ -98,6 +137,13 @@ class RaspberryPi:
     def delay_ms(self, delaytime):
         time.sleep(delaytime / 1000.0)
 
+    def wait_for_idle(self, pin, busy_level, timeout=None):
+        # BUSY is a pulled down Button so "pressed" is high. gpiozero sets an event from the pin's edge
+        # callback, so this sleeps until the panel is done rather than polling
+        if busy_level:
+            return self.GPIO_BUSY_PIN.wait_for_release(timeout)
+        return self.GPIO_BUSY_PIN.wait_for_press(timeout)
+
     def spi_writebyte(self, data):
         self.SPI.writebytes(data)
 
@@ -117,25 +163,7 @@ class RaspberryPi:
         self.GPIO_PWR_PIN.on()
         
         if cleanup:
-            find_dirs = [
-                os.path.dirname(os.path.realpath(__file__)),
-                '/usr/local/lib',
-                '/usr/lib',
-            ]
-            self.DEV_SPI = None
-            for find_dir in find_dirs:
-                val = int(os.popen('getconf LONG_BIT').read())
-                logging.debug("System is %d bit"%val)
-                if val == 64:
-                    so_filename = os.path.join(find_dir, 'DEV_Config_64.so')
-                else:
-                    so_filename = os.path.join(find_dir, 'DEV_Config_32.so')
-                if os.path.exists(so_filename):
-                    self.DEV_SPI = CDLL(so_filename)
-                    break
-            if self.DEV_SPI is None:
-                RuntimeError('Cannot find DEV_Config.so')
-
+            self.DEV_SPI = load_dev_spi()
             self.DEV_SPI.DEV_Module_Init()
 
         else:
@@ -165,6 +193,111 @@ class RaspberryPi:
 
 
 
+class RaspberryPiLgpio:
+    # Pin definition
+    RST_PIN  = 17
+    DC_PIN   = 25
+    CS_PIN   = 8
+    BUSY_PIN = 24
+    PWR_PIN  = 18
+    MOSI_PIN = 10
+    SCLK_PIN = 11
+
+    # Same pins as RaspberryPi, but GPIO goes straight to lgpio rather than through gpiozero objects. Each write is
+    # a dict lookup and one lgpio call, which matters for the drivers that still send a byte per send_data.
+    # EPD_GPIOCHIP picks the gpiochip (default 0, older Pi 5 kernels put the header on 4)
+    def __init__(self):
+        import spidev
+        import lgpio
+
+        self.lgpio = lgpio
+        self.gpio_write = lgpio.gpio_write
+        self.gpio_read = lgpio.gpio_read
+        self.SPI = spidev.SpiDev()
+        self.chip = lgpio.gpiochip_open(int(os.environ.get('EPD_GPIOCHIP', 0)))
+        # pin -> chip handle for the outputs, CS is left to the SPI driver as with gpiozero
+        self.handles = {}
+        for pin in (self.RST_PIN, self.DC_PIN, self.PWR_PIN):
+            lgpio.gpio_claim_output(self.chip, pin, 0)
+            self.handles[pin] = self.chip
+        lgpio.gpio_claim_alert(self.chip, self.BUSY_PIN, lgpio.BOTH_EDGES, lgpio.SET_PULL_DOWN)
+        self.busy_edge = threading.Event()
+        self.busy_callback = lgpio.callback(self.chip, self.BUSY_PIN, lgpio.BOTH_EDGES, self._busy_changed)
+
+    def _busy_changed(self, chip, gpio, level, tick):
+        self.busy_edge.set()
+
+    def digital_write(self, pin, value):
+        handle = self.handles.get(pin)
+        if handle is not None:
+            self.gpio_write(handle, pin, 1 if value else 0)
+
+    def digital_read(self, pin):
+        return self.gpio_read(self.chip, pin)
+
+    def delay_ms(self, delaytime):
+        time.sleep(delaytime / 1000.0)
+
+    def wait_for_idle(self, pin, busy_level, timeout=None):
+        # the alert callback sets busy_edge on every BUSY edge, so this sleeps until the level changes. Each wait
+        # is capped at a second in case an edge lands between the read and the wait
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.busy_edge.clear()
+            if self.gpio_read(self.chip, pin) != busy_level:
+                return True
+            wait = 1.0
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    return False
+            self.busy_edge.wait(wait)
+
+    def spi_writebyte(self, data):
+        self.SPI.writebytes(data)
+
+    def spi_writebyte2(self, data):
+        self.SPI.writebytes2(data)
+
+    def DEV_SPI_write(self, data):
+        self.DEV_SPI.DEV_SPI_SendData(data)
+
+    def DEV_SPI_nwrite(self, data):
+        self.DEV_SPI.DEV_SPI_SendnData(data)
+
+    def DEV_SPI_read(self):
+        return self.DEV_SPI.DEV_SPI_ReadData()
+
+    def module_init(self, cleanup=False):
+        self.digital_write(self.PWR_PIN, 1)
+
+        if cleanup:
+            self.DEV_SPI = load_dev_spi()
+            self.DEV_SPI.DEV_Module_Init()
+
+        else:
+            # SPI device, bus = 0, device = 0
+            self.SPI.open(0, 0)
+            self.SPI.max_speed_hz = 4000000
+            self.SPI.mode = 0b00
+        return 0
+
+    def module_exit(self, cleanup=False):
+        logger.debug("spi end")
+        self.SPI.close()
+
+        self.digital_write(self.RST_PIN, 0)
+        self.digital_write(self.DC_PIN, 0)
+        self.digital_write(self.PWR_PIN, 0)
+        logger.debug("close 5V, Module enters 0 power consumption ...")
+
+        if cleanup:
+            self.busy_callback.cancel()
+            for pin in (self.RST_PIN, self.DC_PIN, self.PWR_PIN, self.BUSY_PIN):
+                self.lgpio.gpio_free(self.chip, pin)
+            self.lgpio.gpiochip_close(self.chip)
+
+
 class JetsonNano:
     # Pin definition
     RST_PIN  = 17
@@ -201,6 +334,9 @@ class JetsonNano:
     def delay_ms(self, delaytime):
         time.sleep(delaytime / 1000.0)
 
+    def wait_for_idle(self, pin, busy_level, timeout=None):
+        return gpio_wait_for_idle(self.GPIO, self.BUSY_PIN, busy_level, timeout)
+
     def spi_writebyte(self, data):
         self.SPI.SYSFS_software_spi_transfer(data[0])
 
@@ -259,6 +395,9 @@ class SunriseX3:
     def delay_ms(self, delaytime):
         time.sleep(delaytime / 1000.0)
 
+    def wait_for_idle(self, pin, busy_level, timeout=None):
+        return gpio_wait_for_idle(self.GPIO, pin, busy_level, timeout)
+
     def spi_writebyte(self, data):
         self.SPI.writebytes(data)
 
@@ -301,22 +440,194 @@ class SunriseX3:
         self.GPIO.cleanup([self.RST_PIN, self.DC_PIN, self.CS_PIN, self.BUSY_PIN], self.PWR_PIN)
 
 
-if sys.version_info[0] == 2:
-    process = subprocess.Popen("cat /proc/cpuinfo | grep Raspberry", shell=True, stdout=subprocess.PIPE)
-else:
-    process = subprocess.Popen("cat /proc/cpuinfo | grep Raspberry", shell=True, stdout=subprocess.PIPE, text=True)
-output, _ = process.communicate()
-if sys.version_info[0] == 2:
-    output = output.decode(sys.stdout.encoding)
+class Simulated:
+    # Pin definition
+    RST_PIN  = 17
+    DC_PIN   = 25
+    CS_PIN   = 8
+    BUSY_PIN = 24
+    PWR_PIN  = 18
+
+    # No hardware at all - lets the drivers run on a dev box. Bytes are counted but dropped and BUSY flips on
+    # every read so both busy high and busy low waits return straight away.
+    def __init__(self):
+        self._busy = 0
+        self.bytes_sent = 0
+
+    def digital_write(self, pin, value):
+        pass
+
+    def digital_read(self, pin):
+        if pin == self.BUSY_PIN:
+            self._busy ^= 1
+            return self._busy
+        return 0
+
+    def delay_ms(self, delaytime):
+        pass
+
+    def wait_for_idle(self, pin, busy_level, timeout=None):
+        return True
+
+    def spi_writebyte(self, data):
+        self.bytes_sent += len(data)
+
+    def spi_writebyte2(self, data):
+        self.bytes_sent += len(data)
+
+    def DEV_SPI_write(self, data):
+        self.bytes_sent += 1
+
+    def DEV_SPI_nwrite(self, data):
+        self.bytes_sent += len(data)
+
+    def DEV_SPI_read(self):
+        return 0
 
-if "Raspberry" in output:
-    implementation = RaspberryPi()
-elif os.path.exists('/sys/bus/platform/drivers/gpio-x3'):
-    implementation = SunriseX3()
-else:
-    implementation = JetsonNano()
+    def module_init(self, cleanup=False):
+        logger.debug("simulated e-Paper backend, nothing is sent to a panel")
+        return 0
 
-for func in [x for x in dir(implementation) if not x.startswith('_')]:
-    setattr(sys.modules[__name__], func, getattr(implementation, func))
+    def module_exit(self, cleanup=False):
+        pass
+
+
+# EPD_BACKEND=<name> skips detection, e.g. EPD_BACKEND=simulated on a dev box
+BACKENDS = {
+    'raspberrypi': RaspberryPi,
+    'lgpio': RaspberryPiLgpio,
+    'jetsonnano': JetsonNano,
+    'sunrisex3': SunriseX3,
+    'simulated': Simulated,
+    'null': Simulated,
+}
+
+implementation = None
+implementation_lock = threading.Lock()
+# backend picked by select_backend, used instead of detecting the board. EPD_BACKEND still wins over it
+selected_backend = None
+
+def board_model():
+    # device-tree model is the cheapest answer, older kernels only name the board in cpuinfo
+    try:
+        with open('/proc/device-tree/model') as f:
+            return f.read().strip('\x00\n ')
+    except OSError:
+        pass
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith(('Model', 'Hardware')):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return ''
+
+def select_backend(name):
+    # Pick the backend by name (a BACKENDS key) instead of detecting it. Has to happen before anything talks to the
+    # panel, the backend can't be swapped once it has claimed the GPIO
+    global selected_backend
+    name = name.strip().lower()
+    if name not in BACKENDS:
+        raise RuntimeError('Unknown e-Paper backend %r, expected one of %s' % (name, ', '.join(BACKENDS)))
+    with implementation_lock:
+        if implementation is not None and not isinstance(implementation, BACKENDS[name]):
+            raise RuntimeError('e-Paper backend %s is already in use' % type(implementation).__name__)
+        selected_backend = name
+
+def detect_backend():
+    name = os.environ.get('EPD_BACKEND', '').strip().lower()
+    if name:
+        if name not in BACKENDS:
+            raise RuntimeError('Unknown EPD_BACKEND %r, expected one of %s' % (name, ', '.join(BACKENDS)))
+        return BACKENDS[name]
+    if selected_backend:
+        return BACKENDS[selected_backend]
+
+    model = board_model()
+    logger.debug("board model: %r" % model)
+    if "Raspberry" in model:
+        return RaspberryPi
+    if os.path.exists('/sys/bus/platform/drivers/gpio-x3'):
+        return SunriseX3
+    if "Jetson" not in model:
+        logger.warning("Unknown board %r, trying Jetson Nano. Set EPD_BACKEND=simulated to run without a panel" % model)
+    return JetsonNano
+
+def get_implementation():
+    # Detect the board and claim its GPIO on first use instead of at import
+    global implementation
+    with implementation_lock:
+        if implementation is None:
+            backend = detect_backend()
+            logger.debug("e-Paper backend: %s" % backend.__name__)
+            impl = backend()
+            module = sys.modules[__name__]
+            for func in [x for x in dir(impl) if not x.startswith('_')]:
+                setattr(module, func, getattr(impl, func))
+            implementation = impl
+    return implementation
+
+def __getattr__(name):
+    # only called for names not set yet, i.e. before get_implementation has copied the backend onto the module
+    if name.startswith('_'):
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    impl = get_implementation()
+    try:
+        return getattr(impl, name)
+    except AttributeError:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name)) from None
+
+
+def wait_busy(pin, busy_level, timeout=BUSY_TIMEOUT):
+    # Block until BUSY stops reading busy_level, sleeping on the pin's edge instead of a 5ms poll loop.
+    # Returns False (and the driver carries on) if the panel is still busy after timeout seconds
+    if get_implementation().wait_for_idle(pin, busy_level, timeout):
+        return True
+    logger.warning("e-Paper still busy after %ss, carrying on" % timeout)
+    return False
+
+async def wait_busy_async(pin, busy_level, timeout=BUSY_TIMEOUT):
+    # Same wait for asyncio callers, run on an executor thread so the event loop keeps going during a refresh
+    import asyncio
+    return await asyncio.get_running_loop().run_in_executor(None, wait_busy, pin, busy_level, timeout)
+
+
+def spidev_bufsiz():
+    # spidev rejects single transfers bigger than its bufsiz module parameter
+    try:
+        with open('/sys/module/spidev/parameters/bufsiz') as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return 4096
+
+SPI_CHUNK_SIZE = spidev_bufsiz()
+
+def send_data_bulk(dc_pin, cs_pin, data):
+    # Send a whole buffer as data: DC/CS are set once and the bytes are streamed in
+    # transfers of up to SPI_CHUNK_SIZE instead of toggling the pins for every byte
+    impl = get_implementation()
+    impl.digital_write(dc_pin, 1)
+    impl.digital_write(cs_pin, 0)
+    if not isinstance(data, (list, tuple)):
+        data = memoryview(data)
+    for start in range(0, len(data), SPI_CHUNK_SIZE):
+        impl.spi_writebyte2(data[start:start + SPI_CHUNK_SIZE])
+    impl.digital_write(cs_pin, 1)
+
+def send_command_bulk(dc_pin, cs_pin, command, data=()):
+    # Send a command and all its parameters with CS held low once: the command byte with DC low, then the
+    # parameters with DC high in transfers of up to SPI_CHUNK_SIZE, rather than a CS frame per byte
+    impl = get_implementation()
+    impl.digital_write(dc_pin, 0)
+    impl.digital_write(cs_pin, 0)
+    impl.spi_writebyte([command])
+    if len(data):
+        impl.digital_write(dc_pin, 1)
+        if not isinstance(data, (list, tuple)):
+            data = memoryview(data)
+        for start in range(0, len(data), SPI_CHUNK_SIZE):
+            impl.spi_writebyte2(data[start:start + SPI_CHUNK_SIZE])
+    impl.digital_write(cs_pin, 1)
 
 ### END OF FILE ###
@@ -0,0 +1,145 @@
+# Registry of the bundled panels so the app can pick a driver from config and import only that module.
+# Nothing here imports a driver (or epdconfig) until load_driver is called.
+
+import importlib
+from collections import namedtuple
+
+# How a driver does partial updates on a 1 bit frame (from getbuffer):
+#   mode: "frame" partial(buffer) - the controller diffs against the base image itself
+#         "window" partial(buffer, x0, y0, x1, y1) - full frame, only the window is sent
+#         "region" partial(window_buffer, x0, y0, x1, y1) - just the window's bytes
+#   base: full refresh that also sets the base image partial updates are diffed against
+#   init_part: called after a full refresh to switch the controller to partial mode, if the driver needs it
+PartialUpdate = namedtuple("PartialUpdate", "mode, base, init_part, partial")
+
+PARTIAL_BASE_IMAGE = PartialUpdate("frame", "displayPartBaseImage", None, "displayPartial")
+PARTIAL_BASE = PartialUpdate("frame", "display_Base", None, "display_Partial")
+PARTIAL_DISPLAY = PartialUpdate("frame", "display", None, "display_Partial")
+PARTIAL_WINDOW = PartialUpdate("window", "display_Base", None, "display_Partial")
+PARTIAL_WINDOW_INIT = PartialUpdate("window", "display_Base", "init_Part", "display_Partial")
+PARTIAL_REGION = PartialUpdate("region", "display", "init_part", "display_Partial")
+
+# module: driver module in this package
+# width/height: native resolution in pixels (portrait, as the driver sees it)
+# colors/bpp: colours the panel shows and bits per pixel in the getbuffer frame. 3 colour panels take two 1 bit
+#   frames, display(black, red)
+# partial: PartialUpdate if the driver can update part of the screen
+# fast/gray4: driver has a fast full refresh / 4 level gray mode
+# refresh_secs: rough full refresh time, for logging and picking refresh intervals - not measured per panel
+# init_args: arguments init() needs, strings are names of attributes on the EPD (e.g. its full update lut)
+Panel = namedtuple("Panel", "module, width, height, colors, bpp, partial, fast, gray4, refresh_secs, init_args")
+
+PANELS = {
+    "epd13in3b": Panel("epd13in3b", 960, 680, 3, 1, None, False, False, 15, ()),
+    "epd13in3k": Panel("epd13in3k", 960, 680, 2, 1, PARTIAL_WINDOW_INIT, False, True, 5, ()),
+    "epd1in54": Panel("epd1in54", 200, 200, 2, 1, None, False, False, 3, ("lut_full_update",)),
+    "epd1in54_V2": Panel("epd1in54_V2", 200, 200, 2, 1, None, False, False, 3, (0,)),
+    "epd1in54b": Panel("epd1in54b", 200, 200, 3, 1, None, False, False, 15, ()),
+    "epd1in54b_V2": Panel("epd1in54b_V2", 200, 200, 3, 1, None, False, False, 15, ()),
+    "epd1in54c": Panel("epd1in54c", 152, 152, 3, 1, None, False, False, 15, ()),
+    "epd1in64g": Panel("epd1in64g", 168, 168, 4, 2, None, False, False, 20, ()),
+    "epd2in13": Panel("epd2in13", 122, 250, 2, 1, None, False, False, 3, ("lut_full_update",)),
+    "epd2in13_V2": Panel("epd2in13_V2", 122, 250, 2, 1, None, False, False, 3, ("FULL_UPDATE",)),
+    "epd2in13_V3": Panel("epd2in13_V3", 122, 250, 2, 1, PARTIAL_BASE_IMAGE, False, False, 3, ()),
+    "epd2in13_V4": Panel("epd2in13_V4", 122, 250, 2, 1, PARTIAL_BASE_IMAGE, True, False, 3, ()),
+    "epd2in13b_V3": Panel("epd2in13b_V3", 104, 212, 3, 1, None, False, False, 15, ()),
+    "epd2in13b_V4": Panel("epd2in13b_V4", 122, 250, 3, 1, None, False, False, 15, ()),
+    "epd2in13bc": Panel("epd2in13bc", 104, 212, 3, 1, None, False, False, 15, ()),
+    "epd2in13d": Panel("epd2in13d", 104, 212, 2, 1, None, False, False, 3, ()),
+    "epd2in13g": Panel("epd2in13g", 122, 250, 4, 2, None, False, False, 20, ()),
+    "epd2in15b": Panel("epd2in15b", 160, 296, 3, 1, None, False, False, 15, ()),
+    "epd2in15g": Panel("epd2in15g", 160, 296, 4, 2, None, False, False, 20, ()),
+    "epd2in36g": Panel("epd2in36g", 168, 296, 4, 2, None, False, False, 20, ()),
+    "epd2in66": Panel("epd2in66", 152, 296, 2, 1, None, False, False, 3, (0,)),
+    "epd2in66b": Panel("epd2in66b", 152, 296, 3, 1, None, False, False, 15, ()),
+    "epd2in66g": Panel("epd2in66g", 184, 360, 4, 2, None, False, False, 20, ()),
+    "epd2in7": Panel("epd2in7", 176, 264, 2, 1, None, False, True, 3, ()),
+    "epd2in7_V2": Panel("epd2in7_V2", 176, 264, 2, 1, PARTIAL_WINDOW, True, True, 3, ()),
+    "epd2in7b": Panel("epd2in7b", 176, 264, 3, 1, None, False, False, 15, ()),
+    "epd2in7b_V2": Panel("epd2in7b_V2", 176, 264, 3, 1, None, False, False, 15, ()),
+    "epd2in9": Panel("epd2in9", 128, 296, 2, 1, None, False, False, 3, ("lut_full_update",)),
+    "epd2in9_V2": Panel("epd2in9_V2", 128, 296, 2, 1, PARTIAL_BASE, True, True, 3, ()),
+    "epd2in9b_V3": Panel("epd2in9b_V3", 128, 296, 3, 1, None, False, False, 15, ()),
+    "epd2in9b_V4": Panel("epd2in9b_V4", 128, 296, 3, 1, None, True, False, 15, ()),
+    "epd2in9bc": Panel("epd2in9bc", 128, 296, 3, 1, None, False, False, 15, ()),
+    "epd2in9d": Panel("epd2in9d", 128, 296, 2, 1, None, False, False, 3, ()),
+    "epd3in0g": Panel("epd3in0g", 168, 400, 4, 2, None, False, False, 20, ()),
+    "epd3in52": Panel("epd3in52", 240, 360, 2, 1, None, False, False, 3, ()),
+    "epd4in01f": Panel("epd4in01f", 640, 400, 7, 4, None, False, False, 30, ()),
+    "epd4in2": Panel("epd4in2", 400, 300, 2, 1, None, False, True, 3, ()),
+    "epd4in26": Panel("epd4in26", 800, 480, 2, 1, PARTIAL_BASE, True, True, 5, ()),
+    "epd4in2_V2": Panel("epd4in2_V2", 400, 300, 2, 1, PARTIAL_DISPLAY, True, True, 3, ()),
+    "epd4in2b_V2": Panel("epd4in2b_V2", 400, 300, 3, 1, None, False, False, 15, ()),
+    "epd4in2b_V2_old": Panel("epd4in2b_V2_old", 400, 300, 3, 1, None, False, False, 15, ()),
+    "epd4in2bc": Panel("epd4in2bc", 400, 300, 3, 1, None, False, False, 15, ()),
+    "epd4in37g": Panel("epd4in37g", 512, 368, 4, 2, None, False, False, 20, ()),
+    "epd5in65f": Panel("epd5in65f", 600, 448, 7, 4, None, False, False, 30, ()),
+    "epd5in79": Panel("epd5in79", 792, 272, 2, 1, None, True, True, 3, ()),
+    "epd5in79b": Panel("epd5in79b", 792, 272, 3, 1, None, False, False, 15, ()),
+    "epd5in79g": Panel("epd5in79g", 792, 272, 4, 2, None, False, False, 20, ()),
+    "epd5in83": Panel("epd5in83", 600, 448, 2, 1, None, False, False, 5, ()),
+    "epd5in83_V2": Panel("epd5in83_V2", 648, 480, 2, 1, None, False, False, 5, ()),
+    "epd5in83b_V2": Panel("epd5in83b_V2", 648, 480, 3, 1, None, False, False, 15, ()),
+    "epd5in83bc": Panel("epd5in83bc", 600, 448, 3, 1, None, False, False, 15, ()),
+    "epd7in3e": Panel("epd7in3e", 800, 480, 6, 4, None, False, False, 30, ()),
+    "epd7in3f": Panel("epd7in3f", 800, 480, 7, 4, None, False, False, 30, ()),
+    "epd7in3g": Panel("epd7in3g", 800, 480, 4, 2, None, False, False, 20, ()),
+    "epd7in5": Panel("epd7in5", 640, 384, 2, 1, None, False, False, 5, ()),
+    "epd7in5_HD": Panel("epd7in5_HD", 880, 528, 2, 1, None, False, False, 5, ()),
+    "epd7in5_V2": Panel("epd7in5_V2", 800, 480, 2, 1, PARTIAL_REGION, True, True, 5, ()),
+    "epd7in5_V2_old": Panel("epd7in5_V2_old", 800, 480, 2, 1, None, True, False, 5, ()),
+    "epd7in5b_HD": Panel("epd7in5b_HD", 880, 528, 3, 1, None, False, False, 15, ()),
+    "epd7in5b_V2": Panel("epd7in5b_V2", 800, 480, 3, 1, None, True, False, 15, ()),
+    "epd7in5b_V2_old": Panel("epd7in5b_V2_old", 800, 480, 3, 1, None, False, False, 15, ()),
+    "epd7in5bc": Panel("epd7in5bc", 640, 384, 3, 1, None, False, False, 15, ()),
+}
+
+# names used in data.json before the registry existed
+ALIASES = {
+    "3inch": "epd3in0g",
+}
+
+
+def get_panel(key):
+    """Look up a panel from the Eink "size" config
+
+    Args:
+        key (str): driver module name with or without the "epd" prefix (e.g. "epd2in13_V4", "7in5_V2") or an alias
+
+    Raises:
+        RuntimeError: no panel matches the key
+
+    Returns:
+        Panel: the panel
+    """
+    name = ALIASES.get(key, key)
+    if not name.startswith("epd"):
+        name = "epd" + name
+    if name not in PANELS:
+        raise RuntimeError("Unknown e-Paper panel %r, expected one of %s" % (key, ", ".join(sorted(PANELS))))
+    return PANELS[name]
+
+
+def load_driver(panel):
+    """Import the driver module for a panel, the first call for a panel is the only one that imports anything
+
+    Args:
+        panel (Panel): panel from get_panel
+
+    Returns:
+        module: the driver module, use its EPD class
+    """
+    return importlib.import_module("%s.%s" % (__package__, panel.module))
+
+
+def init_args(panel, epd):
+    """Resolve a panel's init arguments against a driver instance
+
+    Args:
+        panel (Panel): panel from get_panel
+        epd (EPD): driver instance
+
+    Returns:
+        tuple: arguments for epd.init
+    """
+    return tuple(getattr(epd, arg) if isinstance(arg, str) else arg for arg in panel.init_args)
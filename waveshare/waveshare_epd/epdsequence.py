@@ -0,0 +1,51 @@
+# Command sequences (init, LUT loading) for the waveshare drivers as data, and the one interpreter that sends them.
+#
+# A sequence is a tuple of steps:
+#   (command, data, data, ...)  command byte followed by its parameter bytes, sent as one CS frame
+#   (command, data_sequence)    same, with the parameters as a list/bytes (e.g. a LUT)
+#   Delay(ms)                   epdconfig.delay_ms
+#   Busy("ReadBusy")            call the driver's busy wait by name, drivers differ in which level is busy and
+#                               some poll with a command while they wait
+
+from collections import namedtuple
+
+from . import epdconfig
+
+Delay = namedtuple("Delay", "ms")
+Busy = namedtuple("Busy", "method")
+
+
+def steps(sequence):
+    """Flatten a sequence to what gets sent, without touching the hardware
+
+    Args:
+        sequence (tuple): steps, see the top of this module
+
+    Yields:
+        tuple: ("command", command, data_bytes), ("delay", ms) or ("busy", method name)
+    """
+    for step in sequence:
+        if isinstance(step, Delay):
+            yield "delay", step.ms
+        elif isinstance(step, Busy):
+            yield "busy", step.method
+        elif len(step) == 2 and not isinstance(step[1], int):
+            yield "command", step[0], step[1]
+        else:
+            yield "command", step[0], step[1:]
+
+
+def run(epd, sequence):
+    """Send a sequence to a panel
+
+    Args:
+        epd (EPD): driver, for its dc/cs pins and busy wait
+        sequence (tuple): steps, see the top of this module
+    """
+    for step in steps(sequence):
+        if step[0] == "command":
+            epdconfig.send_command_bulk(epd.dc_pin, epd.cs_pin, step[1], step[2])
+        elif step[0] == "delay":
+            epdconfig.delay_ms(step[1])
+        else:
+            getattr(epd, step[1])()